@@ -52,6 +52,18 @@ def prody_catdcd(*dcd, **kwargs):
     if ag is None and (align or select):
         raise ValueError('one of PSF or PDB files must be provided for '
                          'align and select options to work')
+    if not align and kwargs.get('stride', 1) > 0:
+        indices = None
+        if ag and select:
+            select = ag.select(select)
+            if select is None:
+                raise ValueError('{0} did not match any atoms'
+                                 .format(repr(kwargs.get('select'))))
+            LOGGER.info('{0} atoms are selected for writing output.'
+                        .format(len(select)))
+            indices = select._getIndices()
+        return _catdcd(dcd, indices, kwargs)
+
     dcd = list(dcd)
     traj = prody.Trajectory(dcd.pop(0))
     while dcd:
@@ -100,6 +112,66 @@ def prody_catdcd(*dcd, **kwargs):
     LOGGER.info("{0} frames are written into {1}."
                 .format(count, output))
 
+
+def _catdcd(filenames, indices, kwargs):
+    """Concatenate frames of DCD files with *filenames* by copying blocks
+    of frame records from memory maps of the files.  Coordinates of atoms
+    with *indices* are written, or of all atoms if **None**."""
+
+    import prody
+    from prody.trajectory.dcdfile import BLOCK_SIZE, _parseUnitcells
+    LOGGER = prody.LOGGER
+
+    dcds = [prody.DCDFile(fn) for fn in filenames]
+    n_atoms = dcds[0].numAtoms()
+    for dcd in dcds[1:]:
+        if dcd.numAtoms() != n_atoms:
+            raise IOError('DCD files must have same number of atoms')
+    if indices is not None and indices.max() >= n_atoms:
+        raise ValueError('atom selection does not match DCD files')
+    n_frames = sum(dcd.numFrames() for dcd in dcds)
+
+    start, stop, stride = slice(kwargs.get('first', 0),
+                                kwargs.get('last', -1),
+                                kwargs.get('stride', 1)).indices(n_frames+1)
+
+    output = kwargs.get('output', 'trajectory.dcd')
+    out = prody.DCDFile(output, 'w')
+    n_block = max(1, BLOCK_SIZE // (n_atoms * 12))
+    count = 0
+    offset = 0
+    for dcd in dcds:
+        # first output frame in this file, counting from the file start
+        first = start - offset
+        if first < 0:
+            first %= stride
+        last = min(stop - offset, dcd.numFrames())
+        offset += dcd.numFrames()
+        if first >= last:
+            dcd.close()
+            continue
+        records = dcd._mapFrames()[first:last:stride]
+        for i in range(0, len(records), n_block):
+            block = records[i:i + n_block]
+            xyz = block['xyz'][:, :, 1:-1]
+            if indices is not None:
+                xyz = xyz[:, :, indices]
+            if dcd.hasUnitcell():
+                unitcell = _parseUnitcells(block['unitcell'])
+            else:
+                unitcell = None
+            out.write(xyz.transpose(0, 2, 1), unitcell,
+                      timestep=dcd.getTimestep(),
+                      firsttimestep=dcd.getFirstTimestep(),
+                      framefreq=dcd.getFrameFreq())
+            count += len(block)
+        del records
+        dcd.close()
+    out.close()
+    LOGGER.info("{0} frames are written into {1}."
+                .format(count, output))
+
+
 def addCommand(commands):
 
     subparser = commands.add_parser('catdcd',
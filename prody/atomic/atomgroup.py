@@ -10,7 +10,7 @@ import numpy as np
 from prody import LOGGER, PY2K
 from prody.kdtree import KDTree
 from prody.utilities import (checkCoords, checkAnisous, 
-                             rangeString, getDistance, copy)
+                             rangeString, getDistance, copy, appendRows)
 
 from .atomic import Atomic
 from .fields import ATOMIC_FIELDS, READONLY
@@ -132,7 +132,7 @@ class AtomGroup(Atomic):
                  '_donors', '_acceptors', '_nbexclusions', '_crossterms',
                  '_cslabels', '_acsi', '_n_csets', '_data',
                  '_fragments', '_flags', '_flagsts', '_subsets',
-                 '_msa', '_sequenceMap', '_anisous']
+                 '_msa', '_sequenceMap', '_anisous', '_buffers', '_reserved']
 
     def __init__(self, title='Unnamed'):
 
@@ -175,6 +175,21 @@ class AtomGroup(Atomic):
         self._msa = None
         self._sequenceMap = None
         self._anisous = None
+        self._buffers = {}  # arrays that hold per-coordinate set data
+        self._reserved = 0
+
+    def __getstate__(self):
+
+        state = Atomic.__getstate__(self)
+        state['_buffers'] = {}
+        return state
+
+    def __setstate__(self, state):
+
+        # atom groups pickled by earlier versions have no buffers
+        self._buffers = {}
+        self._reserved = 0
+        Atomic.__setstate__(self, state)
 
     def __repr__(self):
 
@@ -752,14 +767,13 @@ class AtomGroup(Atomic):
             anisous = anisous.reshape((1, n_atoms, 6))
 
         diff = coords.shape[0]
-        self._coords = np.concatenate((self._coords, coords), axis=0)
+        self._coords = self._appendRows('_coords', self._coords, coords)
         if anisous is not None and self._anisous is not None:
-            self._anisous = np.concatenate((self._anisous, anisous/10000), axis=0)
+            self._anisous = self._appendRows('_anisous', self._anisous,
+                                             anisous/10000)
         self._n_csets = self._coords.shape[0]
-        timestamps = self._timestamps
-        self._timestamps = np.zeros(self._n_csets)
-        self._timestamps[:len(timestamps)] = timestamps
-        self._timestamps[len(timestamps):] = time()
+        self._timestamps = self._appendRows('_timestamps', self._timestamps,
+                                            np.full(diff, time()))
         self._kdtrees.extend([None] * diff)
         if label is None or isinstance(label, str):
             self._cslabels.extend([label] * diff)
@@ -772,6 +786,23 @@ class AtomGroup(Atomic):
         else:
             LOGGER.warn('Wrong type for `label` argument.')
 
+    def _appendRows(self, key, array, rows):
+        """Returns *array* with *rows* appended, using the buffer stored
+        under *key* to avoid copying *array*."""
+
+        array, self._buffers[key] = appendRows(array, rows,
+                                               self._buffers.get(key),
+                                               self._reserved)
+        return array
+
+    def reserve(self, n_csets):
+        """Reserve room for *n_csets* coordinate sets in total, so that they
+        can be added one at a time using :meth:`addCoordset` without copying
+        the coordinate sets that are already in the atom group.  Room is
+        allocated when coordinate sets are added next."""
+
+        self._reserved = int(n_csets)
+
     def delCoordset(self, index):
         """Delete a coordinate set from the atom group."""
 
@@ -1,7 +1,7 @@
 import numpy as np
 from prody import LOGGER, SETTINGS
 from prody.dynamics import MaskedGNM
-from prody.utilities import showFigure, bin2dec
+from prody.utilities import showFigure
 from numbers import Integral
 
 from .functions import _getEigvecs
@@ -9,18 +9,14 @@ from .functions import _getEigvecs
 __all__ = ['calcGNMDomains', 'Hingeplane', 'KMeans', 'Hierarchy', 'Discretize', 'showLinkage', 'GaussianMixture', 'BayesianGaussianMixture']
 
 def Hingeplane(V, **kwargs):
-    S = np.sign(np.sign(V) + 1)
+    S = np.sign(np.sign(V) + 1).astype(int)
     n, m = S.shape
 
-    labels = np.zeros(n)
-    for i, s in enumerate(S):
-        labels[i] = bin2dec(s)
+    # binary code of the sign pattern of each row
+    codes = S.dot(1 << np.arange(m))
 
-    uniq_labels = np.unique(labels)
-
-    for i, l in enumerate(uniq_labels):
-        labels[labels==l] = i
-    return labels
+    _, labels = np.unique(codes, return_inverse=True)
+    return labels.astype(float)
 
 def KMeans(V, **kwargs):
     """Performs k-means clustering on *V*. The function uses :func:`sklearn.cluster.KMeans`. See sklearn documents 
@@ -322,14 +318,14 @@ def calcGNMDomains(modes, method=Discretize, **kwargs):
         model = modes
         
     if isinstance(model, MaskedGNM):
-        currlbl = labels[0]
+        first = labels[0]
         labels = model._extend(labels, -1)
-        
-        for i, l in enumerate(labels):
-            if l < 0:
-                labels[i] = currlbl
-            elif currlbl != l:
-                currlbl = l
+
+        # unmapped loci take the label of the preceding mapped locus
+        index = np.where(labels < 0, 0, np.arange(len(labels)))
+        np.maximum.accumulate(index, out=index)
+        labels = labels[index]
+        labels[labels < 0] = first
 
     return labels
     
\ No newline at end of file
@@ -2,12 +2,11 @@ from numbers import Integral
 
 from numpy import ma
 import numpy as np
-from scipy.sparse import coo_matrix
-from scipy.stats import mode
+from scipy.sparse import coo_matrix, csr_matrix, diags, issparse, triu, tril
 from prody.chromatin.norm import VCnorm, SQRTVCnorm, Filenorm
 from prody.chromatin.functions import div0, showDomains, _getEigvecs
 
-from prody import PY2K
+from prody import PY2K, LOGGER
 from prody.dynamics import GNM, MaskedGNM
 from prody.dynamics.functions import writeArray
 from prody.dynamics.mode import Mode
@@ -21,6 +20,9 @@ class HiC(object):
 
     """This class is used to store and preprocess Hi-C contact map. A :class:`.GNM`
     instance for analyzing the contact map can be also created by using this class.
+    The contact map may be a :class:`~numpy.ndarray` or a :mod:`scipy.sparse` 
+    matrix, in which case it is stored in CSR format and is never densified by 
+    :meth:`getKirchhoff`, :meth:`normalize` or :meth:`calcGNM`.
     """
 
     def __init__(self, title='Unknown', map=None, bin=None):
@@ -44,18 +46,21 @@ class HiC(object):
         if value is None: 
             self._map = None
         else:
-            self._map = np.asarray(value)
-            self._map = makeSymmetric(self._map)
+            if issparse(value):
+                self._map = _makeSymmetricSparse(value)
+            else:
+                self._map = np.asarray(value)
+                self._map = makeSymmetric(self._map)
             self._maskUnmappedRegions()
-            self._labels = np.zeros(len(self._map), dtype=int)
+            self._labels = np.zeros(self._map.shape[0], dtype=int)
 
     def __repr__(self):
         mask = self.mask
         
         if np.isscalar(mask):
-            return '<HiC: {0} ({1} loci)>'.format(self._title, len(self._map))
+            return '<HiC: {0} ({1} loci)>'.format(self._title, self._map.shape[0])
         else:
-            return '<HiC: {0} ({1} mapped loci; {2} in total)>'.format(self._title, np.count_nonzero(mask), len(self._map))
+            return '<HiC: {0} ({1} mapped loci; {2} in total)>'.format(self._title, np.count_nonzero(mask), self._map.shape[0])
 
     def __str__(self):
 
@@ -63,7 +68,10 @@ class HiC(object):
 
     def __getitem__(self, index):
         if isinstance(index, Integral):
-            return self.map.flatten()[index]
+            M = self.map
+            if issparse(M):
+                return M[np.unravel_index(index, M.shape)]
+            return M.flatten()[index]
         else:
             i, j = index
             return self.map[i,j]
@@ -72,12 +80,12 @@ class HiC(object):
         mask = self.mask 
         
         if np.isscalar(mask):
-            return len(self._map)
+            return self._map.shape[0]
         else:
             return np.count_nonzero(mask)
     
     def numAtoms(self):
-        return len(self.map)
+        return self.map.shape[0]
 
     def getTitle(self):
         """Returns title of the instance."""
@@ -102,6 +110,10 @@ class HiC(object):
         if np.isscalar(self.mask):
             return self._map
 
+        if issparse(self._map):
+            indices = np.flatnonzero(self.mask)
+            return self._map[indices][:, indices]
+
         M = ma.array(self._map)
         M.mask = np.diag(~self.mask)
         return ma.compress_rowcols(M)
@@ -187,6 +199,13 @@ class HiC(object):
             return None
         else:
             M = self.map
+
+            if issparse(M):
+                A = M - diags(M.diagonal())
+                A.eliminate_zeros()
+                D = diags(np.asarray(A.sum(axis=0)).ravel())
+                K = (D - A).tocsr()
+                return K
             
             I = np.eye(M.shape[0], dtype=bool)
             A = M.copy()
@@ -205,9 +224,9 @@ class HiC(object):
             # Obtain the diagonal values, need to make sure d is an array 
             # instead of a matrix, otherwise diag() later will not work as 
             # intended.
-            d = np.array(np.diag(M))
+            d = M.diagonal() if issparse(M) else np.array(np.diag(M))
         else:
-            d = np.array(M.sum(0))
+            d = np.asarray(M.sum(0)).ravel()
 
         # mask if a diagonal value is zero
         mask_zero = np.array(d==0)
@@ -221,10 +240,18 @@ class HiC(object):
     
     def calcGNM(self, n_modes=None, **kwargs):
         """Calculates GNM on the current Hi-C map. By default, ``n_modes`` is 
-        set to **None** and ``zeros`` to **True**."""
+        set to **None** and ``zeros`` to **True**.
+
+        If the map is sparse, the Kirchhoff matrix is built in CSR format from 
+        the loci that are not masked and only the lowest *n_modes* modes (20 
+        if **None**) are calculated using :func:`scipy.sparse.linalg.eigsh`. 
+        The Kirchhoff matrix is not stored in the model."""
 
         if 'zeros' not in kwargs:
             kwargs['zeros'] = True
+
+        if issparse(self._map):
+            return self._calcSparseGNM(n_modes, **kwargs)
             
         if self.masked:
             gnm = MaskedGNM(self._title, self.mask)
@@ -234,6 +261,82 @@ class HiC(object):
         gnm.calcModes(n_modes=n_modes, **kwargs)
         return gnm
     
+    def _calcSparseGNM(self, n_modes=None, zeros=True, **kwargs):
+        """Calculates the lowest GNM modes of the sparse Hi-C map."""
+
+        from scipy.sparse.csgraph import connected_components
+        from scipy.sparse.linalg import eigsh, LinearOperator
+
+        if n_modes is None:
+            n_modes = 20
+        tol = kwargs.pop('tol', 0)
+
+        M = self._map.tocsr()
+        if M.dtype != float:
+            M = M.astype(float)
+        if self.masked and not np.isscalar(self.mask):
+            mapped = np.flatnonzero(self.mask)
+            M = M[mapped][:, mapped]
+        n = M.shape[0]
+
+        LOGGER.timeit('_hic_gnm')
+        A = M - diags(M.diagonal())
+        A.eliminate_zeros()
+        degrees = np.asarray(A.sum(axis=0)).ravel()
+        K = (diags(degrees) - A).tocsr()
+
+        # zero modes are the normalized indicators of connected components of 
+        # the mapped loci. Lifting all of them above the spectrum leaves the lowest nonzero modes to the solver, 
+        # which would otherwise miss some of the repeated zero eigenvalues.
+        n_components, components = connected_components(A, directed=False)
+        del A
+        sizes = np.bincount(components)
+        z = 1. / np.sqrt(sizes[components])
+        lift = 2 * degrees.max() + 1.
+
+        def matvec(x):
+            x = np.ravel(x)
+            proj = np.bincount(components, x * z, minlength=n_components)
+            return K.dot(x) + lift * z * proj[components]
+
+        op = LinearOperator((n, n), matvec=matvec, dtype=float)
+
+        n_zeros = min(n_components, n_modes) if zeros else 0
+        k = min(n_modes - n_zeros, n - n_components)
+        if k > 0:
+            values, vectors = eigsh(op, k=k, which='SA', tol=tol)
+            order = values.argsort()
+            values = values[order]
+            vectors = vectors[:, order]
+        else:
+            values = np.zeros(0)
+            vectors = np.zeros((n, 0))
+        variances = 1. / values
+
+        if n_zeros:
+            zero_vectors = np.zeros((n, n_zeros))
+            for i in range(n_zeros):
+                member = components == i
+                zero_vectors[member, i] = z[member]
+            values = np.concatenate((np.zeros(n_zeros), values))
+            vectors = np.hstack((zero_vectors, vectors))
+            variances = np.concatenate((np.zeros(n_zeros), variances))
+
+        if self.masked:
+            gnm = MaskedGNM(self._title, self.mask)
+        else:
+            gnm = GNM(self._title)
+        gnm._reset()
+        gnm._n_atoms = gnm._dof = vectors.shape[0]
+        gnm._eigvals = values
+        gnm._array = vectors
+        gnm._vars = variances
+        gnm._trace = variances.sum()
+        gnm._n_modes = len(values)
+        LOGGER.report('{0} modes were calculated in %.2fs.'
+                      .format(gnm._n_modes), label='_hic_gnm')
+        return gnm
+
     def normalize(self, method=VCnorm, **kwargs):
         """Applies chosen normalization on the current Hi-C map."""
 
@@ -328,6 +431,8 @@ class HiC(object):
                 dm_kwargs[k[7:]] = kwargs.pop(k)
 
         M = self.map
+        if issparse(M):
+            M = M.toarray()
         if 'p' in spec:
             p = kwargs.pop('p', 5)
             lp = kwargs.pop('lp', p)
@@ -365,6 +470,11 @@ def parseHiC(filename, **kwargs):
 
     :arg filename: the filename to the Hi-C data file.
     :type filename: str
+
+    :arg dense: if **False**, the contact map is stored as a 
+        :class:`~scipy.sparse.csr_matrix` instead of a full matrix, 
+        default is **True**
+    :type dense: bool
     """
 
     import os, struct
@@ -389,71 +499,155 @@ def parseHiC(filename, **kwargs):
 
     return hic
 
-def _sparse2dense(I, J, values, bin=None):
+def _sparse2map(I, J, values, bin=None, dense=True):
     I = np.asarray(I, dtype=int)
     J = np.asarray(J, dtype=int)
     values = np.asarray(values, dtype=float)
     # determine the bin size by the most frequent interval
     if bin is None:
-        loci = np.unique(np.sort(I))
-        bins = np.diff(loci)
-        bin = mode(bins)[0][0]
+        loci = np.unique(I)
+        bins, counts = np.unique(np.diff(loci), return_counts=True)
+        bin = bins[counts.argmax()]
     # convert coordinate from basepair to locus index
     bin = int(bin)
     I = I // bin
     J = J // bin
-    # make sure that the matrix is square
-    # if np.max(I) != np.max(J):
-    #     b = np.max(np.append(I, J))
-    #     I = np.append(I, b)
-    #     J = np.append(J, b)
-    #     values = np.append(values, 0.)
-    # Convert to sparse matrix format, then full matrix format
-    # and finally array type. Matrix format is avoided because
-    # diag() won't work as intended for Matrix instances.
-    M = np.array(coo_matrix((values, (I, J))).todense())
+    # duplicate entries are summed in both formats. Matrix format is 
+    # avoided because diag() won't work as intended for Matrix instances.
+    M = coo_matrix((values, (I, J)))
+    if dense:
+        M = M.toarray()
+    else:
+        M = M.tocsr()
     return M, bin
 
+def _makeSymmetricSparse(M, rtol=1e-05, atol=1e-08):
+    """Sparse counterpart of :func:`.makeSymmetric`. Returns a CSR matrix."""
+
+    M = csr_matrix(M)
+    n, m = M.shape
+    if n != m:
+        l = max((n, m))
+        M.resize((l, l))
+
+    D = abs(M - M.T)
+    if D.nnz == 0 or D.max() <= atol + rtol * abs(M).max():
+        return M
+
+    U = triu(M, k=1)
+    L = tril(M, k=-1)
+
+    if U.sum() == 0:
+        M = M + L.T
+    elif L.sum() == 0:
+        M = M + U.T
+    else:
+        M = (M + M.T) / 2.
+    return M.tocsr()
+
+def _countFields(text):
+    """Returns the number of fields delimited by whitespace or control 
+    characters on each line of *text*, including blank lines."""
+
+    buf = np.frombuffer(text.encode(), dtype=np.uint8)
+    space = buf <= ord(' ')
+    starts = ~space
+    starts[1:] &= space[:-1]
+    ends = np.flatnonzero(buf == ord('\n')) + 1
+    counts = np.concatenate([[0], starts.cumsum()[ends - 1], [starts.sum()]])
+    return np.diff(counts)
+
+def _loadNumbers(stream, chunk_size=2**24):
+    """Bulk parses delimited numbers from *stream* into a 2D array. Lines 
+    are read and converted by chunks of about *chunk_size* characters."""
+
+    import warnings
+
+    delimiter = None
+    n_cols = None
+    blocks = []
+    while True:
+        lines = stream.readlines(chunk_size)
+        if not lines:
+            break
+        text = lines[0][:0].join(lines)
+        if isinstance(text, bytes):
+            text = text.decode()
+
+        if delimiter is None:
+            for line in text.splitlines():
+                if line.strip():
+                    break
+            else:
+                continue
+            delimiter = ' '
+            for d in (',', ';'):
+                if d in line:
+                    delimiter = d
+                    break
+            n_cols = len(line.replace(delimiter, ' ').split())
+
+        if delimiter != ' ':
+            text = text.replace(delimiter, ' ')
+        fields = _countFields(text)
+        if np.any((fields != 0) & (fields != n_cols)):
+            raise ValueError('cannot parse the file: rows have inconsistent '
+                             'numbers of columns.')
+        # parsing stops at the first value that is not a number
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            data = np.fromstring(text, sep=' ')
+        if data.size != fields.sum():
+            raise ValueError('cannot parse the file: non-numeric values '
+                             'were found.')
+        blocks.append(data.reshape(-1, n_cols))
+
+    if not blocks:
+        raise ValueError('cannot parse the file: no data were found.')
+    if len(blocks) == 1:
+        return blocks[0]
+    return np.concatenate(blocks)
+
 def parseHiCStream(stream, **kwargs):
     """Returns an :class:`.HiC` from a stream of Hi-C data lines.
 
-    :arg stream: Anything that implements the method ``read``, ``seek``
+    :arg stream: Anything that implements the method ``readlines``
         (e.g. :class:`file`, buffer, stdin)
+
+    :arg sparse: whether the data is in three-column sparse format, 
+        i.e. locus *i*, locus *j* and the contact value. By default, it is 
+        determined by the number of columns.
+    :type sparse: bool
+
+    :arg dense: if **False**, the contact map is returned as a 
+        :class:`~scipy.sparse.csr_matrix`, default is **True**
+    :type dense: bool
     """
 
-    issparse = kwargs.get('sparse', None)
+    is_sparse = kwargs.get('sparse', None)
+    dense = kwargs.get('dense', True)
 
-    import csv
-    dialect = csv.Sniffer().sniff(stream.read(1024))
-    stream.seek(0)
-    reader = csv.reader(stream, dialect)
-    D = list()
-    for row in reader:
-        d = list()
-        for element in row:
-            d.append(np.double(element))
-        D.append(d)
-    D = np.array(D)
+    D = _loadNumbers(stream)
 
     res = kwargs.get('bin', None)
     if res is not None:
         res = int(res)
     size = D.shape
-    if len(D.shape) <= 1:
+    if size[1] <= 1:
         raise ValueError("cannot parse the file: input file only contains one column.")
     
-    if issparse is None:
-        issparse = size[1] == 3
+    if is_sparse is None:
+        is_sparse = size[1] == 3
 
-    if not issparse:
-        M = D
+    if not is_sparse:
+        M = D if dense else csr_matrix(D)
     else:
         try:
             I, J, values = D.T[:3]
         except ValueError:
             raise ValueError('the sparse matrix format should have three columns')
         
-        M, res = _sparse2dense(I, J, values, bin=res)
+        M, res = _sparse2map(I, J, values, bin=res, dense=dense)
     return M, res
 
 def parseHiCBinary(filename, **kwargs):
@@ -470,11 +664,13 @@ def parseHiCBinary(filename, **kwargs):
     if res is None:
         raise ValueError('bin needs to be specified when parsing .hic format')
     res = int(res)
+    dense = kwargs.get('dense', True)
 
     from .straw import straw
-    result = straw(norm, filename, chrloc1, chrloc2, unit, res)
+    result = straw(norm, filename, chrloc1, chrloc2, unit, res, 
+                   n_cpu=kwargs.get('n_cpu', None))
 
-    M, res = _sparse2dense(*result, bin=res)
+    M, res = _sparse2map(*result, bin=res, dense=dense)
     return M, res
 
 def writeMap(filename, map, bin=None, format='%f'):
@@ -484,16 +680,29 @@ def writeMap(filename, map, bin=None, format='%f'):
     :type filename: str
 
     :arg map: a Hi-C contact map.
-    :type map: :class:`numpy.ndarray`
+    :type map: :class:`numpy.ndarray`, :class:`~scipy.sparse.csr_matrix`
 
     :arg bin: bin size of the *map*. If bin is `None`, *map* will be 
-              written in full matrix format.
+              written in full matrix format. Only the nonzero elements of 
+              a sparse *map* are written.
     :type bin: int
 
     :arg format: output format for map elements.
     :type format: str
     """
 
+    if issparse(map):
+        if bin is None:
+            return writeArray(filename, map.toarray(), format=format)
+        U = triu(map).tocoo()
+        order = np.lexsort((U.col, U.row))
+        spmat = np.empty((U.nnz, 3))
+        spmat[:, 0] = U.row[order] * bin
+        spmat[:, 1] = U.col[order] * bin
+        spmat[:, 2] = U.data[order]
+        fmt = ['%d', '%d', format]
+        return writeArray(filename, spmat, format=fmt)
+
     assert isinstance(map, np.ndarray), 'map must be a numpy.ndarray.'
 
     if bin is None:
@@ -533,6 +742,12 @@ def saveHiC(hic, filename=None, map=True, **kwargs):
     attr_dict = hic.__dict__.copy()
     if not map:
         attr_dict.pop('_map')
+    elif issparse(hic._map):
+        M = attr_dict.pop('_map')
+        attr_dict['_map_data'] = M.data
+        attr_dict['_map_indices'] = M.indices
+        attr_dict['_map_indptr'] = M.indptr
+        attr_dict['_map_shape'] = M.shape
 
     ostream = openFile(filename, 'wb', **kwargs)
     np.savez_compressed(ostream, **attr_dict)
@@ -551,10 +766,17 @@ def loadHiC(filename):
     keys = attr_dict.keys()
 
     for k in keys:
+        if k.startswith('_map_'):
+            continue
         val = attr_dict[k]
         if len(val.shape) == 0:
-            val = np.asscalar(val)
+            val = val.item()
         setattr(hic, k, val)
+
+    if '_map_data' in keys:
+        hic._map = csr_matrix((attr_dict['_map_data'], attr_dict['_map_indices'],
+                               attr_dict['_map_indptr']), 
+                              shape=tuple(attr_dict['_map_shape']))
     return hic
 
 def saveHiC_h5(hic, filename=None, **kwargs):
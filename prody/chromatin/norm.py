@@ -1,50 +1,95 @@
 import numpy as np
+from scipy.sparse import csr_matrix, issparse
 
 from prody.chromatin.functions import div0
 from prody.utilities import importLA
 from prody import LOGGER
 
-__all__ = ['VCnorm', 'SQRTVCnorm', 'Filenorm', 'SCN']
+__all__ = ['VCnorm', 'SQRTVCnorm', 'Filenorm', 'SCN', 'KRnorm']
 
-def VCnorm(M, **kwargs):
-    """ Performs vanilla coverage normalization on matrix *M*."""
+def _sums(M, axis):
+    """Returns row (*axis* = 1) or column (*axis* = 0) sums of *M* as a 1D 
+    array."""
 
-    total_count = kwargs.get('total_count', 'original')
+    return np.asarray(M.sum(axis=axis)).ravel()
 
-    C = np.diag(div0(1., np.sum(M, axis=0)))
-    R = np.diag(div0(1., np.sum(M, axis=1)))
+def _rowIndices(M):
+    """Returns row indices of the stored elements of CSR matrix *M*."""
 
-    # N = R * M * C
-    N = np.dot(np.dot(R,M),C)
+    return np.repeat(np.arange(M.shape[0]), np.diff(M.indptr))
+
+def _transposeIndex(M):
+    """Returns the permutation that maps the stored elements of CSR matrix 
+    *M* onto those of its transpose, or **None** if the sparsity pattern of 
+    *M* is not symmetric."""
+
+    index = csr_matrix((np.arange(M.nnz), M.indices, M.indptr), shape=M.shape)
+    index = index.T.tocsr()
+    index.sort_indices()
+    if (np.array_equal(index.indptr, M.indptr) and 
+        np.array_equal(index.indices, M.indices)):
+        return index.data
+    return None
+
+def _scale(M, r=None, c=None, copy=True):
+    """Returns ``diag(r) * M * diag(c)``, computed by broadcasting for arrays 
+    and on the stored elements only, i.e. in O(nnz), for sparse matrices."""
+
+    if issparse(M):
+        N = M.tocsr(copy=copy)
+        if r is not None:
+            N.data *= r[_rowIndices(N)]
+        if c is not None:
+            N.data *= c[N.indices]
+        return N
+
+    N = M
+    if r is not None:
+        N = r[:, np.newaxis] * N
+    if c is not None:
+        N = N * c
+    if N is M and copy:
+        N = M.copy()
+    return N
+
+def _setTotalCount(M, N, total_count):
+    """Rescales *N* so that its elements sum up to *total_count*, which 
+    may be ``'original'`` for the sum of *M*, or **None** for no rescaling."""
 
     if total_count == 'original':
-        total_count = np.sum(M)
+        total_count = M.sum()
 
     if total_count is not None:
-        sum_N = np.sum(N)
+        sum_N = N.sum()
         k = total_count / sum_N
         N = N * k
     return N
 
+def VCnorm(M, **kwargs):
+    """ Performs vanilla coverage normalization on matrix *M*."""
+
+    total_count = kwargs.get('total_count', 'original')
+
+    c = div0(1., _sums(M, 0))
+    r = div0(1., _sums(M, 1))
+
+    # N = R * M * C
+    N = _scale(M, r, c)
+
+    return _setTotalCount(M, N, total_count)
+
 def SQRTVCnorm(M, **kwargs):
     """ Performs square-root vanilla coverage normalization on matrix *M*."""
 
     total_count = kwargs.get('total_count', 'original')
 
-    C = np.diag(np.sqrt(div0(1., np.sum(M, axis=0))))
-    R = np.diag(np.sqrt(div0(1., np.sum(M, axis=1))))
+    c = np.sqrt(div0(1., _sums(M, 0)))
+    r = np.sqrt(div0(1., _sums(M, 1)))
 
     # N = R * M * C
-    N = np.dot(np.dot(R,M),C)
+    N = _scale(M, r, c)
 
-    if total_count == 'original':
-        total_count = np.sum(M)
-
-    if total_count is not None:
-        sum_N = np.sum(N)
-        k = total_count / sum_N
-        N = N * k
-    return N
+    return _setTotalCount(M, N, total_count)
 
 def SCN(M, **kwargs):
     """ Performs Sequential Component Normalization on matrix *M*.
@@ -57,23 +102,30 @@ def SCN(M, **kwargs):
     max_loops = kwargs.pop('max_loops', 100)
     tol = kwargs.pop('tol', 1e-5)
 
-    N = M.copy()
+    N = _scale(M)
+    if issparse(N):
+        N.sum_duplicates()
+        transpose = _transposeIndex(N)
     n = 0
     d0 = None
     p = 1
     last_p = None
 
     while True:
-        C = np.diag(div0(1., np.sum(N, axis=0)))
-        N = np.dot(N, C)
-
-        R = np.diag(div0(1., np.sum(N, axis=1)))
-        N = np.dot(R, N)
+        N = _scale(N, c=div0(1., _sums(N, 0)), copy=False)
+        N = _scale(N, r=div0(1., _sums(N, 1)), copy=False)
 
         n += 1
 
         # check convergence of symmetry
-        d = np.mean(np.abs(N - N.T))
+        if issparse(N):
+            if transpose is not None:
+                d = np.abs(N.data - N.data[transpose]).sum()
+            else:
+                d = abs(N - N.T).sum()
+            d /= np.prod(N.shape)
+        else:
+            d = np.mean(np.abs(N - N.T))
         
         if d0 is not None:
             p = div0(d, d0)
@@ -92,165 +144,164 @@ def SCN(M, **kwargs):
                 break
     # guarantee symmetry
     N = (N + N.T) / 2.
-    if total_count == 'original':
-        total_count = np.sum(M)
 
-    if total_count is not None:
-        sum_N = np.sum(N)
-        k = total_count / sum_N
-        N = N * k
-    return N
+    return _setTotalCount(M, N, total_count)
 
-def bnewt(A, mask=[], tol = 1e-6, delta_lower = 0.1, delta_upper = 3, fl = 0, check = 1, largemem = 0, chunk_size = 10000):
-    """
-    BNEWT A balancing algorithm for symmetric matrices
-    X = BNEWT(A) attempts to find a vector X such that
-    diag(X)*A*diag(X) is close to doubly stochastic. A must
-    be symmetric and nonnegative.
-    
-    X0: initial guess. TOL: error tolerance.
-    delta/Delta: how close/far balancing vectors can get
-    to/from the edge of the positive cone.
-    We use a relative measure on the size of elements.
-    FL: intermediate convergence statistics on/off.
-    RES: residual error, measured by norm(diag(x)*A*x - e).
+def bnewt(A, tol=1e-6, delta_lower=0.1, delta_upper=3, x0=None, max_mvp=50000):
+    """Balances the symmetric and nonnegative matrix *A*, i.e. finds a vector 
+    *x* such that ``diag(x) * A * diag(x)`` is close to doubly stochastic, 
+    using the inexact Newton method of Knight and Ruiz [KR12]_. *A* may be a 
+    :class:`~numpy.ndarray` or a :mod:`scipy.sparse` matrix. It is accessed 
+    only through matrix-vector products, so each iteration is O(nnz). *A* 
+    must not have empty rows.
+
+    :arg tol: error tolerance on the residual ``norm(x * (A x) - 1)``
+    :type tol: float
+
+    :arg delta_lower: how close balancing vectors can get to the edge of 
+        the positive cone, relative to the current iterate
+    :type delta_lower: float
+
+    :arg delta_upper: how far balancing vectors can get from the edge of 
+        the positive cone, relative to the current iterate
+    :type delta_upper: float
+
+    :arg x0: initial guess, a vector of ones by default
+    :type x0: :class:`~numpy.ndarray`
+
+    :arg max_mvp: maximum number of matrix-vector products
+    :type max_mvp: int
+
+    .. [KR12] Knight PA, Ruiz D. A fast algorithm for matrix balancing. 
+       *IMA J Numer Anal* **2013** 33:1029-1047.
     """
-    # see details in Knight and Ruiz (2012)
-    (n,m) = A.shape
-    #np.seterr(divide='ignore')
-    print('Verifying Matrix')
-    if (n != m):
-        print('Matrix must be symmetric to converge')
-        return 'NaN'
-    if (check):
-        for i in range(0,n):
-            for j in range(i,n):
-                if (A[i][j] != A[j][i])or(A[i][j] < 0):
-                    print('Matrix must be symmetric and nonnegative to converge')
-                    return 'NaN'
-        print('Check OK\n')
-    else:
-        print('Check escaped\n')
-  
-    e        = np.ones((n,1))
-    e[mask]  = 0
-    #res      = np.empty((n,1))
-    
-    g        = 0.9
-    etamax   = 0.1
-    eta      = etamax
-    stop_tol = tol*0.5
-    x        = e #initial guess
-    rt       = tol*tol
-    if largemem:
-        v      = x * chunking_dot(A,x,chunk_size=chunk_size)
-    else:
-        v      = x*np.dot(A,x)
-    rk       = 1 - v
-    rk[mask] = 0
-    rho_km1  = np.dot(np.transpose(rk),rk)
-    rout     = rho_km1
-    rold     = rout
-    
-    MVP = 0 #matrix vector products
+
+    n = A.shape[0]
+    e = np.ones(n)
+    x = e.copy() if x0 is None else np.array(x0, dtype=float).ravel()
+
+    g = 0.9
+    etamax = 0.1
+    eta = etamax
+    stop_tol = tol * 0.5
+    rt = tol * tol
+
+    v = x * A.dot(x)
+    rk = 1 - v
+    rho_km1 = rk.dot(rk)
+    rout = rho_km1
+    rold = rout
+
+    mvp = 0
     i = 0
-  
+    converged = True
     while rout > rt:
-        i = i+1
-        k=0
-        y=e
-        innertol = max(eta*eta*rout,rt)
-    
-        while rho_km1 > innertol: #inner iteration by CG
-            k = k+1
-            if k==1:
-                with np.errstate(invalid='ignore'):
-                    Z       = rk/v
-                Z[mask] = 0
-                p       = Z
-                rho_km1 = np.dot(np.transpose(rk),Z)
-            else:
-                beta = rho_km1/rho_km2
-                p    =  Z + beta*p
-      
-            #update search direction 
-            if largemem:
-                w   = x*chunking_dot(A,x*p,chunk_size=chunk_size) + v*p
+        if mvp > max_mvp:
+            converged = False
+            break
+        i += 1
+        k = 0
+        y = e.copy()
+        innertol = max(eta * eta * rout, rt)
+
+        # inner iteration by conjugate gradient
+        while rho_km1 > innertol:
+            k += 1
+            if k == 1:
+                Z = rk / v
+                p = Z
+                rho_km1 = rk.dot(Z)
             else:
-                w   = x*np.dot(A,x*p) + v*p
-      
-            alpha = rho_km1/np.dot(np.transpose(p),w)
-            ap = alpha*p
-      
-            #test distance to boundary of cone
+                beta = rho_km1 / rho_km2
+                p = Z + beta * p
+
+            # update search direction
+            w = x * A.dot(x * p) + v * p
+            alpha = rho_km1 / p.dot(w)
+            ap = alpha * p
+
+            # test distance to boundary of cone
             ynew = y + ap
-            if min(np.delete(ynew,mask)) <= delta_lower:
+            if ynew.min() <= delta_lower:
                 if delta_lower == 0:
                     break
-                else:
-                    ind = np.nonzero(ap < 0)
-                    gamma = min((delta_lower - y[ind])/ap[ind])
-                    y = y + gamma*ap
-                    break
-                if max(ynew) >= delta_upper:
-                    ind = np.nonzero(ynew > delta_upper)
-                    gamma = min((delta_upper-y[ind])/ap[ind])
-                    y = y + gamma*ap
-                    break
-      
-            y       = ynew
-            rk      = rk - alpha*w
+                ind = ap < 0
+                gamma = ((delta_lower - y[ind]) / ap[ind]).min()
+                y = y + gamma * ap
+                break
+            if ynew.max() >= delta_upper:
+                ind = ynew > delta_upper
+                gamma = ((delta_upper - y[ind]) / ap[ind]).min()
+                y = y + gamma * ap
+                break
+
+            y = ynew
+            rk = rk - alpha * w
             rho_km2 = rho_km1
-            with np.errstate(invalid='ignore'):
-                Z       = rk/v
-            Z[mask] = 0
-            rho_km1 = np.dot(np.transpose(rk),Z)
-        #end inner iteration
-    
-        x        = x*y
-        if largemem:
-            v      = x * chunking_dot(A,x,chunk_size=chunk_size)
-        else:
-            v      = x*np.dot(A,x)
-        rk       = 1-v
-        rk[mask] = 0
-        rho_km1  = np.dot(np.transpose(rk),rk)
-        rout     = rho_km1
-        MVP      = MVP + k + 1
-        #print MVP,res
-        #update inner iteration stopping criterion
-        rat      = rout/rold
-        rold     = rout
-        res_norm = math.sqrt(rout)
-        eta_o    = eta
-        eta      = g*rat
-    
-        if g*eta_o*eta_o > 0.1:
-            eta = max(eta,g*eta_o*eta_o)
-        eta = max(min(eta,etamax),stop_tol/res_norm)
-    
-        if fl == 1:
-            print('%3d %6d %.3f \n' % (i,k,r_norm))
-      
-        if MVP > 50000:
-            break
-    #end outer
-  
-    print('Matrix vector products = %6d' % MVP)
-    #x = np.array(x)
-    #x[mask] = 0
+            Z = rk / v
+            rho_km1 = rk.dot(Z)
+
+        x = x * y
+        v = x * A.dot(x)
+        rk = 1 - v
+        rho_km1 = rk.dot(rk)
+        rout = rho_km1
+        mvp += k + 1
+
+        # update inner iteration stopping criterion
+        rat = rout / rold
+        rold = rout
+        res_norm = np.sqrt(rout)
+        eta_o = eta
+        eta = g * rat
+        if g * eta_o * eta_o > 0.1:
+            eta = max(eta, g * eta_o * eta_o)
+        eta = max(min(eta, etamax), stop_tol / res_norm)
+        LOGGER.debug('Iteration {0}: residual = {1}, {2} inner steps'
+                     .format(i, res_norm, k))
+
+    res_norm = np.sqrt(rout)
+    if converged:
+        LOGGER.info('KR balancing converged after {0} iterations and {1} '
+                    'matrix-vector products (residual {2:.2e}).'
+                    .format(i, mvp, res_norm))
+    else:
+        LOGGER.warn('KR balancing did not converge after {0} matrix-vector '
+                    'products (residual {1:.2e}).'.format(mvp, res_norm))
     return x
 
-def KRnorm(M, mask=None, **kwargs):
-    """
-    Uses Knight-Ruiz normalization to balance the matrix.
+def KRnorm(M, **kwargs):
+    """ Performs Knight-Ruiz matrix balancing on matrix *M*, which must be 
+    symmetric and nonnegative. Unmapped loci, i.e. empty rows, are left out 
+    of balancing and remain zero. *kwargs* are passed to :func:`.bnewt`.
+
+    :arg total_count: the sum of the normalized matrix. If ``'original'``, 
+        the sum of *M* is used, and if **None**, rows and columns of the 
+        normalized matrix sum up to 1. Default is ``'original'``
+    :type total_count: float, str
     """
 
-    x = bnewt(M, mask=mask, check=0, **kwargs)*100
-    M *= X 
-    M *= X.T
+    total_count = kwargs.pop('total_count', 'original')
+
+    if issparse(M):
+        M = M.tocsr()
+        # same tolerance as np.allclose, which checks dense maps
+        if ((M.data < 0).any() or 
+            (abs(M - M.T) - 1e-5 * abs(M.T)).max() > 1e-8):
+            raise ValueError('M must be symmetric and nonnegative')
+    elif (M < 0).any() or not np.allclose(M, M.T):
+        raise ValueError('M must be symmetric and nonnegative')
+
+    mapped = _sums(M, 1) != 0
+    indices = np.flatnonzero(mapped)
+    A = M[indices][:, indices]
+
+    x = np.zeros(M.shape[0])
+    x[indices] = bnewt(A, **kwargs)
 
-    return M
+    N = _scale(M, x, x)
+
+    return _setTotalCount(M, N, total_count)
 
 def Filenorm(M, **kwargs):
     """ Performs normalization on matrix *M* given a file. *filename* specifies 
@@ -265,8 +316,19 @@ def Filenorm(M, **kwargs):
 
     if filename is None:
         raise IOError("'filename' is not specified.")
-    factors = np.loadtxt(filename)
+    factors = np.array(np.loadtxt(filename))
     L = M.shape[0]
+
+    if issparse(M):
+        N = M.tocsr(copy=True)
+        rows = _rowIndices(N)
+        if not expected:
+            factors.resize(L)
+            N.data = div0(N.data, factors[rows] * factors[N.indices])
+        else:
+            N.data = div0(N.data, factors[np.abs(rows - N.indices)])
+        return N
+
     if not expected:
         factors.resize(L)
         norm_mat = np.outer(factors, factors)
@@ -274,8 +336,6 @@ def Filenorm(M, **kwargs):
         N = div0(M, norm_mat)
         return N
     else:
-        N = np.zeros(M.shape)
-        for i in range(L):
-            for j in range(L):
-                N[i,j] = div0(M[i,j], factors[abs(i-j)])
+        index = np.arange(L)
+        N = div0(M, factors[np.abs(index[:, np.newaxis] - index)])
         return N
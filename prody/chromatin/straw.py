@@ -32,6 +32,9 @@ import struct
 import zlib
 import requests
 import io
+import numpy as np
+
+from prody.utilities import runThreads
 
 blockMap = dict()
 # global version
@@ -293,6 +296,8 @@ def getBlockNumbersForRegionFromBinPosition(regionIndices, blockBinCount, blockC
     # print(str(blocksSet))
     return blocksSet
 
+_V6_RECORD = [('binX', '<i4'), ('binY', '<i4'), ('counts', '<f4')]
+
 def readBlock(req, size):
     """ Reads the block - reads the compressed bytes, decompresses, and stores
     results in array. Presumes file pointer is in correct position.
@@ -303,87 +308,72 @@ def readBlock(req, size):
        size (int): How many bytes to read
 
     Returns:
-       array containing row, column, count data for this block
+       arrays of row (binX), column (binY) and count data for this block
     """
     compressedBytes = req.read(size)
+    return decodeBlock(compressedBytes)
+
+def decodeBlock(compressedBytes):
+    """ Decompresses a block and decodes its records into column arrays.
+    Independent blocks can be decoded in separate threads since
+    decompression releases the GIL.
+
+    Args:
+       compressedBytes (bytes): Compressed block data
+
+    Returns:
+       arrays of row (binX), column (binY) and count data for this block
+    """
     uncompressedBytes = zlib.decompress(compressedBytes)
     nRecords = struct.unpack('<i',uncompressedBytes[0:4])[0]
-    v=[]
     global version
     if (version < 7):
-        for i in range(nRecords):
-            binX = struct.unpack('<i',uncompressedBytes[(12*i+4):(12*i+8)])[0]
-            binY = struct.unpack('<i',uncompressedBytes[(12*i+8):(12*i+12)])[0]
-            counts = struct.unpack('<f',uncompressedBytes[(12*i+12):(12*i+16)])[0]
-            record = dict()
-            record['binX'] = binX
-            record['binY'] = binY
-            record['counts'] = counts
-            v.append(record)
+        records = np.frombuffer(uncompressedBytes, dtype=_V6_RECORD,
+                                count=nRecords, offset=4)
+        return (records['binX'].astype(int), records['binY'].astype(int),
+                records['counts'].astype(float))
+
+    binXOffset = struct.unpack('<i',uncompressedBytes[4:8])[0]
+    binYOffset = struct.unpack('<i',uncompressedBytes[8:12])[0]
+    useShort = struct.unpack('<b',uncompressedBytes[12:13])[0]
+    type_ = struct.unpack('<b',uncompressedBytes[13:14])[0]
+    countType = '<i2' if useShort == 0 else '<f4'
+    if (type_==1):
+        # rows have variable lengths, so only the row headers are walked and
+        # records of each row are viewed in place as a structured array
+        rowCount = struct.unpack('<h',uncompressedBytes[14:16])[0]
+        dtype = np.dtype([('x', '<i2'), ('counts', countType)])
+        temp = 16
+        ys = np.empty(rowCount, dtype=int)
+        colCounts = np.empty(rowCount, dtype=int)
+        rows = []
+        for i in range(rowCount):
+            ys[i], colCounts[i] = struct.unpack_from('<hh', uncompressedBytes, temp)
+            rows.append(np.frombuffer(uncompressedBytes, dtype=dtype,
+                                      count=colCounts[i], offset=temp+4))
+            temp = temp+4+colCounts[i]*dtype.itemsize
+        records = np.concatenate(rows) if rows else np.zeros(0, dtype=dtype)
+        binX = records['x'].astype(int) + binXOffset
+        binY = np.repeat(ys, colCounts) + binYOffset
+        counts = records['counts'].astype(float)
+    elif (type_== 2):
+        nPts = struct.unpack('<i',uncompressedBytes[14:18])[0]
+        w = struct.unpack('<h',uncompressedBytes[18:20])[0]
+        counts = np.frombuffer(uncompressedBytes, dtype=countType, 
+                               count=nPts, offset=20)
+        if (useShort==0):
+            keep = counts != -32768
+        else:
+            keep = ~np.isnan(counts)
+        index = np.flatnonzero(keep)
+        row = index // w
+        binX = binXOffset + index - row*w
+        binY = binYOffset + row
+        counts = counts[keep].astype(float)
     else:
-        binXOffset = struct.unpack('<i',uncompressedBytes[4:8])[0]
-        binYOffset = struct.unpack('<i',uncompressedBytes[8:12])[0]
-        useShort = struct.unpack('<b',uncompressedBytes[12:13])[0]
-        type_ = struct.unpack('<b',uncompressedBytes[13:14])[0]
-        index=0
-        if (type_==1):
-            rowCount = struct.unpack('<h',uncompressedBytes[14:16])[0]
-            temp = 16
-            for i in range(rowCount):
-                y = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                temp=temp+2
-                binY = y + binYOffset
-                colCount = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                temp=temp+2
-                for j in range(colCount):
-                    x = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                    temp=temp+2
-                    binX = binXOffset + x
-                    if (useShort==0):
-                        c = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                        temp=temp+2
-                        counts = c
-                    else:
-                        counts = struct.unpack('<f',uncompressedBytes[temp:(temp+4)])[0]
-                        temp=temp+4
-                    record = dict()
-                    record['binX'] = binX
-                    record['binY'] = binY
-                    record['counts'] = counts
-                    v.append(record)
-                    index = index + 1
-        elif (type_== 2):
-            temp=14
-            nPts = struct.unpack('<i',uncompressedBytes[temp:(temp+4)])[0]
-            temp=temp+4
-            w = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-            temp=temp+2
-            for i in range(nPts):
-                row=int(i/w)
-                col=i-row*w
-                bin1=int(binXOffset+col)
-                bin2=int(binYOffset+row)
-                if (useShort==0):
-                    c = struct.unpack('<h',uncompressedBytes[temp:(temp+2)])[0]
-                    temp=temp+2
-                    if (c != -32768):
-                        record = dict()
-                        record['binX'] = bin1
-                        record['binY'] = bin2
-                        record['counts'] = c
-                        v.append(record)
-                        index = index + 1
-                else:
-                    counts = struct.unpack('<f',uncompressedBytes[temp:(temp+4)])[0]
-                    temp=temp+4
-                    if (countsnot != 0x7fc00000):
-                        record = dict()
-                        record['binX'] = bin1
-                        record['binY'] = bin2
-                        record['counts'] = counts
-                        v.append(record)
-                        index = index + 1
-    return v
+        return (np.zeros(0, dtype=int), np.zeros(0, dtype=int), 
+                np.zeros(0, dtype=float))
+    return binX, binY, counts
 
 def readNormalizationVector(req):
     """ Reads the normalization vector from the file; presumes file pointer is
@@ -397,16 +387,12 @@ def readNormalizationVector(req):
       Array of normalization values
 
     """
-    value = []
     nValues = struct.unpack('<i',req.read(4))[0]
-    for i in range(nValues):
-        d = struct.unpack('<d',req.read(8))[0]
-        value.append(d)
-    return value
+    return np.frombuffer(req.read(8*nValues), dtype='<f8').astype(float)
 
-def straw(norm, infile, chr1loc, chr2loc, unit, binsize):
+def straw(norm, infile, chr1loc, chr2loc, unit, binsize, n_cpu=None):
     """ This is the main workhorse method of the module. Reads a .hic file and
-    extracts the given contact matrix. Stores in an array in sparse upper
+    extracts the given contact matrix. Stores in arrays in sparse upper
     triangular format: row, column, (normalized) count
 
     Args:
@@ -416,6 +402,8 @@ def straw(norm, infile, chr1loc, chr2loc, unit, binsize):
        chr2loc(str): Chromosome name and (optionally) range, i.e. "1" or "1:10000:25000"
        unit(str): One of BP or FRAG
        binsize(int): Resolution, i.e. 25000 for 25K
+       n_cpu(int, optional): Number of threads used to decompress and decode
+       blocks, all available CPUs by default
     """
     # clear the global variable blockMap so that it won't keep the data from previous calls
     for blockNum in list(blockMap.keys()):
@@ -531,10 +519,8 @@ def straw(norm, infile, chr1loc, chr2loc, unit, binsize):
     blockBinCount=list1[0]
     blockColumnCount=list1[1]
     blockNumbers = getBlockNumbersForRegionFromBinPosition(regionIndices, blockBinCount, blockColumnCount, c1==c2)
-    yActual=[]
-    xActual=[]
-    counts=[]
 
+    compressed=[]
     for i_set in (blockNumbers):
         idx=dict()
         if(i_set in blockMap):
@@ -542,9 +528,7 @@ def straw(norm, infile, chr1loc, chr2loc, unit, binsize):
         else:
             idx['size']=0
             idx['position']=0
-        if (idx['size']==0):
-            records=[]
-        else:
+        if (idx['size']!=0):
             if (infile.startswith("http")):
                 endrange='bytes={0}-{1}'.format(idx['position'], idx['position']+idx['size'])
                 headers={'range' : endrange, 'x-amz-meta-requester' : 'straw'}
@@ -552,24 +536,38 @@ def straw(norm, infile, chr1loc, chr2loc, unit, binsize):
                 req=io.BytesIO(r.content);
             else:
                 req.seek(idx['position'])
-            records=readBlock(req, idx['size'])
-
-        for j in range(len(records)):
-            rec=records[j]
-            x=rec['binX']*binsize
-            y=rec['binY']*binsize
-            c=rec['counts']
-            if (norm != "NONE"):
-                a=c1Norm[rec['binX']]*c2Norm[rec['binY']]
-                if (a!=0.0):
-                    c=(c/(c1Norm[rec['binX']]*c2Norm[rec['binY']]))
-                else:
-                    c="inf"
-            if ((x>=origRegionIndices[0] and x<=origRegionIndices[1] and y>=origRegionIndices[2] and y<=origRegionIndices[3]) or ((c1==c2) and y>=origRegionIndices[0] and y<=origRegionIndices[1] and x>= origRegionIndices[2] and x<=origRegionIndices[3])):
-	            xActual.append(x)
-	            yActual.append(y)
-	            counts.append(c)
-    return [xActual, yActual, counts]
+            compressed.append(req.read(idx['size']))
+    if (not infile.startswith("http")):
+        req.close()
+
+    blocks = [None] * len(compressed)
+
+    def decode(start, stop, thread):
+        for i in range(start, stop):
+            blocks[i] = decodeBlock(compressed[i])
+
+    runThreads(decode, len(compressed), n_cpu, size=1)
+    del compressed
+
+    if (not blocks):
+        return [np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)]
+    binX = np.concatenate([block[0] for block in blocks])
+    binY = np.concatenate([block[1] for block in blocks])
+    counts = np.concatenate([block[2] for block in blocks])
+    del blocks
+
+    x = binX*binsize
+    y = binY*binsize
+    if (norm != "NONE"):
+        c1Norm = np.asarray(c1Norm)
+        c2Norm = np.asarray(c2Norm)
+        a = c1Norm[binX]*c2Norm[binY]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            counts = np.where(a != 0.0, counts/a, np.inf)
+    keep = ((x>=origRegionIndices[0]) & (x<=origRegionIndices[1]) & (y>=origRegionIndices[2]) & (y<=origRegionIndices[3]))
+    if (c1==c2):
+        keep |= ((y>=origRegionIndices[0]) & (y<=origRegionIndices[1]) & (x>=origRegionIndices[2]) & (x<=origRegionIndices[3]))
+    return [x[keep], y[keep], counts[keep]]
 
 def printme(norm, infile, chr1loc, chr2loc, unit, binsize, outfile):
     """ Reads a .hic file and extracts and prints the given contact matrix
@@ -14,7 +14,8 @@ from prody.atomic.atomgroup import AtomGroup
 from prody.atomic.functions import extendAtomicData
 from prody.proteins.pdbfile import parsePDB
 from prody.trajectory.psffile import parsePSF, writePSF
-from prody.trajectory.dcdfile import parseDCD
+from prody.trajectory.dcdfile import parseDCD, writeDCD
+from prody.trajectory.xtcfile import XTCFile
 
 __all__ = ['fetchBioexcelPDB', 'parseBioexcelPDB', 'convertXtcToDcd',
            'fetchBioexcelTrajectory', 'parseBioexcelTrajectory',
@@ -65,8 +66,7 @@ def fetchBioexcelPDB(acc, **kwargs):
 
 def fetchBioexcelTrajectory(acc, **kwargs):
     """Returns a path to the downloaded BioExcel-CV19 trajectory
-    in xtc format or in dcd format if mdtraj is installed and 
-    *convert* is **True**.
+    in xtc format or in dcd format if *convert* is **True**.
 
     :arg acc: BioExcel-CV19 project accession or ID
     :type acc: str
@@ -95,7 +95,7 @@ def fetchBioexcelTrajectory(acc, **kwargs):
 
     See https://bioexcel-cv19.bsc.es/api/rest/docs for more info
 
-    :arg convert: convert to dcd if mdtraj is installed
+    :arg convert: convert to dcd
         default is True
     type convert: bool
     """
@@ -224,9 +224,6 @@ def parseBioexcelTopology(query, **kwargs):
 def parseBioexcelTrajectory(query, **kwargs):
     """Parse a BioExcel-CV19 topology json into an :class:`.Ensemble`,
     fetching it if needed using **kwargs
-
-    :arg top: topology filename
-    :type top: str
     """
     kwargs['convert'] = True
     if isfile(query) and query.endswith('.dcd'):
@@ -266,27 +263,13 @@ def parseBioexcelPDB(query, **kwargs):
     return ag
 
 def convertXtcToDcd(filepath, **kwargs):
-    """Convert xtc trajectories to dcd files using mdtraj.
-    Returns path to output dcd file.
-
-    :arg top: topology filename
-    :type top: str    
-    """
-    topFile = kwargs.get('top', None)
-    if topFile is not None:
-        acc = topFile
-    else:
-        acc = basename(splitext(filepath)[0])
+    """Convert xtc trajectories to dcd files using :class:`.XTCFile`.
+    Returns path to output dcd file.  Note that xtc files can be
+    analyzed directly using :class:`.XTCFile`, without conversion."""
 
-    try:
-        import mdtraj
-    except ImportError:
-        raise ImportError('Please install mdtraj to convert to dcd.')
-    else:
-        top = mdtraj.load_psf(fetchBioexcelTopology(acc, **kwargs))
-        traj = mdtraj.load_xtc(filepath, top=top)
-        filepath = filepath.replace('xtc', 'dcd')
-        traj.save_dcd(filepath)
+    xtc = XTCFile(filepath)
+    filepath = writeDCD(filepath.replace('xtc', 'dcd'), xtc)
+    xtc.close()
 
     return filepath
 
@@ -294,11 +277,8 @@ def requestFromUrl(url, timeout, filepath, source=None):
     """Helper function to make a request from a url and return the response"""
     import requests
     import json
-    import mdtraj
     import tempfile
 
-    acc = url.split(prefix)[1].split('/')[0]
-
     LOGGER.timeit('_bioexcel')
     response = None
     sleep = 2
@@ -321,8 +301,7 @@ def requestFromUrl(url, timeout, filepath, source=None):
                 fo.write(response)
                 fo.close()
                 
-                top = mdtraj.load_psf(fetchBioexcelTopology(acc, timeout=timeout))
-                mdtraj.load_xtc(filepath, top=top)
+                XTCFile(filepath).close()
 
             elif source == 'pdb':
                 if PY3K:
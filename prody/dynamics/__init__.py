@@ -110,6 +110,7 @@ The following functions can be used to generate conformers along normal modes:
 
   * :func:`.deformAtoms` - deform atoms along a mode
   * :func:`.sampleModes` - deform along random combination of a set of modes
+  * :func:`.iterSampleModes` - yield blocks of randomly sampled conformations
   * :func:`.traverseMode` - traverse a mode along both directions
 
 Adaptive ANM
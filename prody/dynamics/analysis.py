@@ -12,6 +12,7 @@ from prody.ensemble import Ensemble, Conformation
 from prody.trajectory import TrajBase
 from prody.utilities import importLA, checkCoords, div0
 from numpy import sqrt, arange, log, polyfit, array
+from scipy.sparse import issparse
 
 from .nma import NMA
 from .modeset import ModeSet
@@ -646,7 +647,7 @@ def calcHinges(modes, atoms=None, flag=False):
         return sorted(set(hinge_list))
     return hinges
 
-def calcHitTime(model, method='standard'):
+def calcHitTime(model, method='standard', **kwargs):
     """Returns the hit and commute times between pairs of nodes calculated 
     based on a :class:`.NMA` object. 
 
@@ -657,9 +658,34 @@ def calcHitTime(model, method='standard'):
     :type model: :class:`.NMA`  
 
     :arg method: method to be used to calculate hit times. Available options are 
-        ``"standard"`` or ``"kirchhoff"``. Default is ``"standard"``
+        ``"standard"``, ``"kirchhoff"``, ``"modes"`` or ``"sparse"``. 
+        Default is ``"standard"``. The first two invert the full Kirchhoff 
+        matrix. ``"modes"`` uses the modes that are already calculated for 
+        *model* in place of the pseudo-inverse, which is exact when all 
+        non-zero modes are available and an approximation otherwise. 
+        ``"sparse"`` factorizes the Kirchhoff matrix grounded at its last node 
+        as a sparse matrix. The last two methods never form an N-by-N 
+        intermediate and calculate the results in blocks of *chunk_size* 
+        source nodes.
     :type method: str
 
+    :arg sources: indices of nodes from which hit times are calculated, 
+        i.e. rows of the returned matrices, default is all nodes
+    :type sources: list, :class:`~numpy.ndarray`
+
+    :arg targets: indices of nodes to which hit times are calculated, 
+        i.e. columns of the returned matrices, default is all nodes
+    :type targets: list, :class:`~numpy.ndarray`
+
+    :arg chunk_size: number of source nodes handled at a time by the 
+        ``"modes"`` and ``"sparse"`` methods
+    :type chunk_size: int
+
+    :arg filename: if given, results are written into memory-mapped 
+        :file:`.npy` files named *filename* followed by :file:`_hit.npy` and 
+        :file:`_commute.npy`, which are returned in place of arrays
+    :type filename: str
+
     :returns: (:class:`~numpy.ndarray`, :class:`~numpy.ndarray`)
     """
 
@@ -672,11 +698,85 @@ def calcHitTime(model, method='standard'):
         raise ValueError('model not built')
     
     method = method.lower()
+    if method not in ('standard', 'kirchhoff', 'modes', 'sparse'):
+        raise ValueError('method must be "standard", "kirchhoff", "modes" '
+                         'or "sparse"')
+    if method == 'modes' and not model.numModes():
+        raise ValueError('model does not have any modes, calculate modes or '
+                         'use another method')
+
+    n_nodes = K.shape[0]
+    sources = kwargs.get('sources', None)
+    targets = kwargs.get('targets', None)
+    sources = np.arange(n_nodes) if sources is None else _getNodes(sources, n_nodes)
+    targets = np.arange(n_nodes) if targets is None else _getNodes(targets, n_nodes)
+    filename = kwargs.get('filename', None)
+
+    start = time.time()
+    if method in ('standard', 'kirchhoff'):
+        if issparse(K):
+            K = K.toarray()
+        H, C = _calcHitTimeDense(K, method)
+        if len(sources) != n_nodes or len(targets) != n_nodes or \
+            np.any(sources != arange(n_nodes)) or np.any(targets != arange(n_nodes)):
+            H = H[np.ix_(sources, targets)]
+            C = C[np.ix_(sources, targets)]
+        if filename is not None:
+            hit, commute = _allocHitTime(H.shape, filename)
+            hit[:] = H
+            commute[:] = C
+            H, C = hit, commute
+    else:
+        H, C = _allocHitTime((len(sources), len(targets)), filename)
+
+        chunk_size = kwargs.get('chunk_size', None)
+        if chunk_size is None:
+            # keep each block of pseudo-inverse columns around 64 MB
+            chunk_size = max(1, 2**23 // n_nodes)
+        elif chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer')
+
+        degrees = K.diagonal() if issparse(K) else np.diag(K)
+        volume = degrees.sum()
+
+        if method == 'modes':
+            factor = model._getArray() * np.sqrt(model.getVariances())
+            getColumns = lambda nodes: np.dot(factor, factor[nodes].T)
+            u = np.dot(factor, np.dot(factor.T, degrees))
+            diag = (factor[targets]**2).sum(1)
+        else:
+            getColumns, project = _getGroundedSolver(K)
+            u = project(degrees.reshape((n_nodes, 1)))[:, 0]
+            diag = np.zeros(len(targets))
+            for i in range(0, len(targets), chunk_size):
+                nodes = targets[i:i+chunk_size]
+                diag[i:i+chunk_size] = getColumns(nodes)[nodes, arange(len(nodes))]
+
+        for i in range(0, len(sources), chunk_size):
+            nodes = sources[i:i+chunk_size]
+            columns = getColumns(nodes)
+            pinv = columns[targets].T
+            self_pinv = columns[nodes, arange(len(nodes))].reshape((-1, 1))
+            H[i:i+chunk_size] = (volume * (self_pinv - pinv) + u[targets] - 
+                                 u[nodes].reshape((-1, 1)))
+            C[i:i+chunk_size] = volume * (self_pinv + diag - 2 * pinv)
+
+        if filename is not None:
+            H.flush()
+            C.flush()
+
+    LOGGER.debug('Hit and commute times are calculated in  {0:.2f}s.'
+                 .format(time.time()-start)) 
+    return H, C
+
+
+def _calcHitTimeDense(K, method):
+    """Returns hit and commute times for all node pairs by inverting dense 
+    Kirchhoff matrix *K*."""
 
     D = np.diag(K)
     A = np.diag(D) - K
 
-    start = time.time()
     linalg = importLA()
     if method == 'standard':
         st = D / sum(D)
@@ -701,12 +801,63 @@ def calcHitTime(model, method='standard'):
         H = T1 - T2 + T3_i - T3_i.T
 
     C = H + H.T
-
-    LOGGER.debug('Hit and commute times are calculated in  {0:.2f}s.'
-                 .format(time.time()-start)) 
     return H, C
 
 
+def _getNodes(nodes, n_nodes):
+
+    nodes = np.asarray(nodes, dtype=int).ravel()
+    if len(nodes) and (nodes.min() < 0 or nodes.max() >= n_nodes):
+        raise IndexError('node indices must be between 0 and {0}'
+                         .format(n_nodes - 1))
+    return nodes
+
+
+def _allocHitTime(shape, filename=None):
+    """Returns arrays for hit and commute times, memory-mapped to files 
+    starting with *filename* when it is given."""
+
+    if filename is None:
+        return np.zeros(shape), np.zeros(shape)
+
+    from numpy.lib.format import open_memmap
+    return (open_memmap(filename + '_hit.npy', mode='w+', dtype=float, shape=shape),
+            open_memmap(filename + '_commute.npy', mode='w+', dtype=float, shape=shape))
+
+
+def _getGroundedSolver(K):
+    """Returns two functions based on a sparse LU factorization of Kirchhoff 
+    matrix *K* grounded at its last node.  The first returns columns of the 
+    pseudo-inverse of *K* for given node indices and the second multiplies 
+    the pseudo-inverse with a matrix.  *K* must describe a connected graph."""
+
+    from scipy.sparse import csc_matrix
+    from scipy.sparse.linalg import splu
+
+    n_nodes = K.shape[0]
+    ground = n_nodes - 1
+    K = csc_matrix(K)
+    try:
+        lu = splu(K[:ground, :ground].tocsc())
+    except RuntimeError:
+        raise ValueError('Kirchhoff matrix is singular after grounding, '
+                         'the network may be disconnected')
+
+    def project(B):
+        # pinv(K) = P G P, where G is the grounded inverse and P removes the mean
+        B = B - B.mean(0)
+        Y = np.zeros(B.shape)
+        Y[:ground] = lu.solve(np.ascontiguousarray(B[:ground]))
+        return Y - Y.mean(0)
+
+    def getColumns(nodes):
+        B = np.zeros((n_nodes, len(nodes)))
+        B[nodes, arange(len(nodes))] = 1
+        return project(B)
+
+    return getColumns, project
+
+
 def calcAnisousFromModel(model, ):
     """Returns a Nx6 matrix containing anisotropic B factors (ANISOU lines)
     from a covariance matrix calculated from **model**.
@@ -27,12 +27,12 @@ __email__ = ['burak.kaynak@pitt.edu', 'doruker@pitt.edu', 'shz66@pitt.edu']
 from itertools import product
 from multiprocessing import cpu_count, Pool
 from collections import OrderedDict
-from os import chdir, mkdir
-from os.path import isdir
+from os import chdir, mkdir, replace
+from os.path import isdir, isfile
 from sys import stdout
 
 import numpy as np
-from scipy.spatial.distance import pdist, squareform
+from scipy.spatial.distance import squareform
 from scipy.cluster.hierarchy import fcluster, linkage
 
 from prody import LOGGER
@@ -100,6 +100,7 @@ class ClustENM(Ensemble):
         self._v1 = False
         self._platform = None 
         self._parallel = False
+        self._pool = None
 
         self._topology = None
         self._positions = None
@@ -116,6 +117,13 @@ class ClustENM(Ensemble):
         super(ClustENM, self).__init__('Unknown')   # dummy title; will be replaced in the next line
         self._title = title
 
+    def __getstate__(self):
+
+        # worker pools cannot be sent to worker processes
+        state = super(ClustENM, self).__getstate__()
+        state['_pool'] = None
+        return state
+
     def __getitem__(self, index):
 
         if isinstance(index, tuple):
@@ -570,10 +578,9 @@ class ClustENM(Ensemble):
             coordsets = np.array(kept_coordsets)
 
         if self._targeted:
-            if self._parallel:
-                with Pool(cpu_count()) as p:
-                    pot_conf = p.map(self._multi_targeted_sim,
-                                     [(conf, coords) for coords in coordsets])
+            if self._pool is not None:
+                pot_conf = self._pool.map(self._multi_targeted_sim,
+                                          [(conf, coords) for coords in coordsets])
             else:
                 pot_conf = [self._multi_targeted_sim((conf, coords)) for coords in coordsets]
 
@@ -592,15 +599,24 @@ class ClustENM(Ensemble):
 
         # coords: (n_conf, n_cg, 3)
 
+        # pairwise squared distances from a single matrix product, centering 
+        # first keeps the cancellation error small for similar conformers
         tmp = coords.reshape(-1, 3 * self._n_cg)
+        tmp = tmp - tmp.mean(0)
+        sq = (tmp ** 2).sum(1)
+        dist2 = sq.reshape(-1, 1) + sq - 2 * np.dot(tmp, tmp.T)
+        np.fill_diagonal(dist2, 0.)
+        np.clip(dist2, 0., None, out=dist2)
 
-        return pdist(tmp) / np.sqrt(self._n_cg)
+        return squareform(np.sqrt(dist2 / self._n_cg), checks=False)
 
-    def _hc(self, arg):
+    def _hc(self, arg, rmsds=None):
 
         # arg: coords   (n_conf, n_cg, 3)
+        # rmsds: condensed pairwise RMSDs of arg, if already calculated
 
-        rmsds = self._rmsds(arg)
+        if rmsds is None:
+            rmsds = self._rmsds(arg)
         # optimal_ordering=True can be slow, particularly on large datasets.
         link = linkage(rmsds, method='average')
 
@@ -616,13 +632,15 @@ class ClustENM(Ensemble):
 
         return hcl
 
-    def _centroid(self, arg):
+    def _centroid(self, arg, rmsds=None):
 
         # arg: coords   (n_conf_clust, n_cg, 3)
+        # rmsds: square matrix of pairwise RMSDs of arg, if already calculated
 
         if arg.shape[0] > 2:
-            rmsds = self._rmsds(arg)
-            sim = np.exp(- squareform(rmsds) / rmsds.std())
+            if rmsds is None:
+                rmsds = squareform(self._rmsds(arg))
+            sim = np.exp(- rmsds / squareform(rmsds, checks=False).std())
             idx = sim.sum(1).argmax()
             return idx
         else:
@@ -632,6 +650,9 @@ class ClustENM(Ensemble):
 
         # args[0]: coords   (n_conf, n_cg, 3)
         # args[1]: labels
+        # args[2]: condensed pairwise RMSDs of coords (optional)
+
+        rmsds = squareform(args[2]) if len(args) > 2 else None
 
         nl = np.unique(args[1])
         idx = OrderedDict()
@@ -642,7 +663,8 @@ class ClustENM(Ensemble):
         wei = [idx[k].size for k in idx.keys()]
         centers = np.empty(nl.size, dtype=int)
         for i in nl:
-            tmp = self._centroid(args[0][idx[i]])
+            sub = None if rmsds is None else rmsds[np.ix_(idx[i], idx[i])]
+            tmp = self._centroid(args[0][idx[i]], sub)
             centers[i] = idx[i][tmp]
 
         return centers, wei
@@ -669,12 +691,13 @@ class ClustENM(Ensemble):
         LOGGER.info('Sampling conformers in generation %d ...' % self._cycle)
         LOGGER.timeit('_clustenm_gen')
 
-        sample_method = self._sample_v1 if self._v1 else self._sample
-
-        if self._parallel:
-            with Pool(cpu_count()) as p:
-                tmp = p.map(sample_method, [conf for conf in confs])
+        if self._pool is not None:
+            # workers draw their random numbers from seeds of the main 
+            # process so that runs are reproducible and can be resumed
+            seeds = np.random.randint(2**31 - 1, size=len(confs))
+            tmp = self._pool.map(self._sample_seeded, list(zip(confs, seeds)))
         else:
+            sample_method = self._sample_v1 if self._v1 else self._sample
             tmp = [sample_method(conf) for conf in confs]
 
         tmp = [r for r in tmp if r is not None]
@@ -683,30 +706,31 @@ class ClustENM(Ensemble):
 
         confs_cg = confs_ex[:, self._idx_cg]
 
-        LOGGER.info('Clustering in generation %d ...' % self._cycle)
-        label_cg = self._hc(confs_cg)
-        centers, wei = self._centers(confs_cg, label_cg)
-        LOGGER.report('Centroids were generated in %.2fs.',
-                      label='_clustenm_gen')
-        
-        confs_centers = confs_ex[centers]
-        
         if self._fitmap is not None:
             self._cc_prev = max(self._cc)
             LOGGER.info('Best CC is %f from %d conformers' % (self._cc_prev, len(confs_cg)))
 
         if len(confs_cg) > 1:
             LOGGER.info('Clustering in generation %d ...' % self._cycle)
-            label_cg = self._hc(confs_cg)
-            centers, wei = self._centers(confs_cg, label_cg)
+            rmsds = self._rmsds(confs_cg)
+            label_cg = self._hc(confs_cg, rmsds)
+            centers, wei = self._centers(confs_cg, label_cg, rmsds)
             LOGGER.report('Centroids were generated in %.2fs.',
                         label='_clustenm_gen')
             confs_centers = confs_ex[centers]
         else:
-            confs_centers, wei = confs_cg, [len(confs_cg)]
+            confs_centers, wei = confs_ex, [len(confs_ex)]
 
         return confs_centers, wei
 
+    def _sample_seeded(self, args):
+
+        # args: (conf, seed)
+
+        np.random.seed(args[1])
+        sample_method = self._sample_v1 if self._v1 else self._sample
+        return sample_method(args[0])
+
     def _outliers(self, arg):
 
         # arg : potential energies
@@ -1064,6 +1088,12 @@ class ClustENM(Ensemble):
         :arg replace_filtered: If it is True (default is False), conformer sampling and filtering 
             will be repeated until the desired number of conformers have been kept.
         :type replace_filtered: bool  
+
+        :arg checkpoint: Name of a file in which conformers, keys, potentials and the state 
+            of the random number generator are saved after each generation, default is None.
+            If the file exists, the run is resumed after the last generation saved in it. 
+            The other parameters should be the same as those of the interrupted run.
+        :type checkpoint: str
         '''
 
         if self._isBuilt():
@@ -1085,6 +1115,7 @@ class ClustENM(Ensemble):
         self._n_gens = n_gens
         self._platform = kwargs.pop('platform', None)
         self._parallel = kwargs.pop('parallel', False)
+        checkpoint = kwargs.pop('checkpoint', None)
         self._targeted = kwargs.pop('targeted', False)
         self._tmdk = kwargs.pop('tmdk', 15.)
 
@@ -1173,72 +1204,100 @@ class ClustENM(Ensemble):
 
         LOGGER.timeit('_clustenm_overall')
 
-        LOGGER.info('Generation 0 ...')
+        state = None
+        if checkpoint is not None and isfile(checkpoint):
+            state = self._loadCheckpoint(checkpoint)
 
-        if self._sim:
-            if self._t_steps[0] != 0:
-                LOGGER.info('Minimization, heating-up & simulation in generation 0 ...')
+        if state is None:
+            LOGGER.info('Generation 0 ...')
+
+            if self._sim:
+                if self._t_steps[0] != 0:
+                    LOGGER.info('Minimization, heating-up & simulation in generation 0 ...')
+                else:
+                    LOGGER.info('Minimization & heating-up in generation 0 ...')
             else:
-                LOGGER.info('Minimization & heating-up in generation 0 ...')
-        else:
-            LOGGER.info('Minimization in generation 0 ...')
-        LOGGER.timeit('_clustenm_min')
-        potential, conformer = self._min_sim(self._atoms.getCoords())
-        if np.isnan(potential):
-            raise ValueError('Initial structure could not be minimized. Try again and/or check your structure.')
+                LOGGER.info('Minimization in generation 0 ...')
+            LOGGER.timeit('_clustenm_min')
+            potential, conformer = self._min_sim(self._atoms.getCoords())
+            if np.isnan(potential):
+                raise ValueError('Initial structure could not be minimized. Try again and/or check your structure.')
 
-        LOGGER.report(label='_clustenm_min')
+            LOGGER.report(label='_clustenm_min')
 
-        LOGGER.info('#' + '-' * 19 + '/*\\' + '-' * 19 + '#')
+            LOGGER.info('#' + '-' * 19 + '/*\\' + '-' * 19 + '#')
+
+            potentials = [potential]
+            sizes = [1]
+            new_shape = [1]
+            for s in conformer.shape:
+                new_shape.append(s)
+            conf = conformer.reshape(new_shape)
+            conformers = start_confs = conf
+            keys = [(0, 0)]
+
+            if checkpoint is not None:
+                self._saveCheckpoint(checkpoint, conformers, keys, potentials,
+                                     sizes, start_confs)
+        else:
+            conformers, keys, potentials, sizes, start_confs = state
+            conformer = conformers[0]
+            LOGGER.info('Resuming after generation %d from %s ...'
+                        % (self._cycle, checkpoint))
 
         self.setCoords(conformer)
 
-        potentials = [potential]
-        sizes = [1]
-        new_shape = [1]
-        for s in conformer.shape:
-            new_shape.append(s)
-        conf = conformer.reshape(new_shape)
-        conformers = start_confs = conf
-        keys = [(0, 0)]
-
-        for i in range(1, self._n_gens+1):
-            self._cycle += 1
-            LOGGER.info('Generation %d ...' % i)
-            confs, weights = self._generate(start_confs)
-            if self._sim:
-                if self._t_steps[i] != 0:
-                    LOGGER.info('Minimization, heating-up & simulation in generation %d ...' % i)
+        if self._parallel:
+            # a single pool of workers is used for all generations
+            self._pool = Pool(cpu_count())
+
+        try:
+            for i in range(self._cycle + 1, self._n_gens + 1):
+                self._cycle += 1
+                LOGGER.info('Generation %d ...' % i)
+                confs, weights = self._generate(start_confs)
+                if self._sim:
+                    if self._t_steps[i] != 0:
+                        LOGGER.info('Minimization, heating-up & simulation in generation %d ...' % i)
+                    else:
+                        LOGGER.info('Minimization & heating-up in generation %d ...' % i)
                 else:
-                    LOGGER.info('Minimization & heating-up in generation %d ...' % i)
-            else:
-                LOGGER.info('Minimization in generation %d ...' % i)
-            LOGGER.timeit('_clustenm_min_sim')
+                    LOGGER.info('Minimization in generation %d ...' % i)
+                LOGGER.timeit('_clustenm_min_sim')
 
-            pot_conf = [self._min_sim(conf) for conf in confs]
+                pot_conf = [self._min_sim(conf) for conf in confs]
 
-            LOGGER.report('Structures were sampled in %.2fs.',
-                          label='_clustenm_min_sim')
-            LOGGER.info('#' + '-' * 19 + '/*\\' + '-' * 19 + '#')
+                LOGGER.report('Structures were sampled in %.2fs.',
+                              label='_clustenm_min_sim')
+                LOGGER.info('#' + '-' * 19 + '/*\\' + '-' * 19 + '#')
 
-            pots, confs = list(zip(*pot_conf))
-            idx = np.logical_not(np.isnan(pots))
-            weights = np.array(weights)[idx]
-            pots = np.array(pots)[idx]
-            confs = np.array(confs)[idx]
+                pots, confs = list(zip(*pot_conf))
+                idx = np.logical_not(np.isnan(pots))
+                weights = np.array(weights)[idx]
+                pots = np.array(pots)[idx]
+                confs = np.array(confs)[idx]
 
-            if self._outlier:
-                idx = np.logical_not(self._outliers(pots))
-            else:
-                idx = np.full(pots.size, True, dtype=bool)
+                if self._outlier:
+                    idx = np.logical_not(self._outliers(pots))
+                else:
+                    idx = np.full(pots.size, True, dtype=bool)
 
-            sizes.extend(weights[idx])
-            potentials.extend(pots[idx])
-            start_confs = self._superpose_cg(confs[idx])
+                sizes.extend(weights[idx])
+                potentials.extend(pots[idx])
+                start_confs = self._superpose_cg(confs[idx])
 
-            for j in range(start_confs.shape[0]):
-                keys.append((i, j))
-            conformers = np.vstack((conformers, start_confs))
+                for j in range(start_confs.shape[0]):
+                    keys.append((i, j))
+                conformers = np.vstack((conformers, start_confs))
+
+                if checkpoint is not None:
+                    self._saveCheckpoint(checkpoint, conformers, keys, potentials,
+                                         sizes, start_confs)
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
 
         LOGGER.timeit('_clustenm_ens')
         LOGGER.info('Creating an ensemble of conformers ...')
@@ -1249,6 +1308,53 @@ class ClustENM(Ensemble):
         self._time = LOGGER.timing(label='_clustenm_overall')
         LOGGER.report('All completed in %.2fs.', label='_clustenm_overall')
 
+    def _saveCheckpoint(self, filename, conformers, keys, potentials, sizes,
+                        start_confs):
+
+        # the file is replaced only after it has been completely written
+        # so that an interruption never leaves a broken checkpoint behind
+
+        rng = np.random.get_state()
+        data = dict(conformers=conformers, keys=np.array(keys),
+                    potentials=np.array(potentials), sizes=np.array(sizes),
+                    start_confs=start_confs, cycle=self._cycle,
+                    rng_keys=rng[1], rng_pos=rng[2], rng_has_gauss=rng[3],
+                    rng_gauss=rng[4])
+        if self._cc is not None:
+            data['cc'] = np.array(self._cc)
+
+        tmp = filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **data)
+        replace(tmp, filename)
+
+        LOGGER.debug('Generation %d was saved in %s.' % (self._cycle, filename))
+
+    def _loadCheckpoint(self, filename):
+
+        with np.load(filename) as data:
+            conformers = data['conformers']
+            if conformers.shape[1] != self._atoms.numAtoms():
+                raise ValueError('checkpoint %s does not match the atoms of this run'
+                                 % filename)
+            if int(data['cycle']) > self._n_gens:
+                raise ValueError('checkpoint %s has more generations than n_gens'
+                                 % filename)
+
+            keys = [tuple(key) for key in data['keys'].tolist()]
+            potentials = data['potentials'].tolist()
+            sizes = data['sizes'].tolist()
+            start_confs = data['start_confs']
+            self._cycle = int(data['cycle'])
+            if 'cc' in data:
+                self._cc = data['cc'].tolist()
+                self._cc_prev = max(self._cc)
+
+            np.random.set_state(('MT19937', data['rng_keys'], int(data['rng_pos']),
+                                 int(data['rng_has_gauss']), float(data['rng_gauss'])))
+
+        return conformers, keys, potentials, sizes, start_confs
+
     def writeParameters(self, filename=None):
 
         '''
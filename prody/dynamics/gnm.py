@@ -76,11 +76,15 @@ class GNMBase(NMA):
         return self._kirchhoff
 
     def setKirchhoff(self, kirchhoff):
-        """Set Kirchhoff matrix."""
+        """Set Kirchhoff matrix. :mod:`scipy.sparse` matrices are accepted 
+        and kept in CSR format."""
 
-        if not isinstance(kirchhoff, np.ndarray):
+        if _issparse(kirchhoff):
+            kirchhoff = kirchhoff.tocsr()
+        elif not isinstance(kirchhoff, np.ndarray):
             raise TypeError('kirchhoff must be a Numpy array')
-        elif (not kirchhoff.ndim == 2 or
+
+        if (not kirchhoff.ndim == 2 or
               kirchhoff.shape[0] != kirchhoff.shape[1]):
             raise ValueError('kirchhoff must be a square matrix')
         elif kirchhoff.dtype != float:
@@ -287,6 +291,14 @@ class GNMBase(NMA):
         super(GNMBase, self).setEigens(vectors, values)
 
 
+def _issparse(M):
+    try:
+        from scipy.sparse import issparse
+    except ImportError:
+        return False
+    return issparse(M)
+
+
 def checkENMParameters(cutoff, gamma):
     """Check type and values of *cutoff* and *gamma*."""
 
@@ -341,11 +353,15 @@ class MaskedGNM(GNM, MaskedNMA):
         self._maskedarray = None
 
     def setKirchhoff(self, kirchhoff):
-        """Set Kirchhoff matrix."""
+        """Set Kirchhoff matrix. :mod:`scipy.sparse` matrices are accepted 
+        and kept in CSR format."""
 
-        if not isinstance(kirchhoff, np.ndarray):
+        if _issparse(kirchhoff):
+            kirchhoff = kirchhoff.tocsr()
+        elif not isinstance(kirchhoff, np.ndarray):
             raise TypeError('kirchhoff must be a Numpy array')
-        elif (not kirchhoff.ndim == 2 or
+
+        if (not kirchhoff.ndim == 2 or
               kirchhoff.shape[0] != kirchhoff.shape[1]):
             raise ValueError('kirchhoff must be a square matrix')
         elif kirchhoff.dtype != float:
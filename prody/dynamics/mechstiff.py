@@ -6,13 +6,13 @@ from numbers import Integral
 import numpy as np
 
 from prody import LOGGER
-from prody.utilities import checkCoords
+from prody.utilities import checkCoords, runThreads
 
 
 __all__ = ['calcMechStiff', 'calcStiffnessRange', 'calcMechStiffStatistic', 
            'calcStiffnessRangeSel']
 
-def calcMechStiff(modes, coords, kbt=1.):
+def calcMechStiff(modes, coords, kbt=1., **kwargs):
     """Calculate stiffness matrix calculated using :class:`.ANM` instance. 
     Method described in [EB08]_ and [KMR17]_. 
 
@@ -26,6 +26,28 @@ def calcMechStiff(modes, coords, kbt=1.):
     :arg n_modes: number of non-zero eigenvalues/vectors to calculate.
         If **None** is given, all modes will be calculated (3x number of atoms).
     :type n_modes: int or **None**, default is 20.
+
+    :arg pairs: atom index pairs, an array with shape ``(n_pairs, 2)``, for 
+        which effective spring constants are calculated, e.g. pulling 
+        geometries of interest. An array with shape ``(n_pairs,)`` is returned.
+    :type pairs: :class:`numpy.ndarray`
+
+    :arg rows: atom indices for which rows of the stiffness matrix are 
+        calculated. An array with shape ``(len(rows), n_atoms)`` is returned.
+    :type rows: list, :class:`numpy.ndarray`
+
+    :arg out: array into which results are written, e.g. a memory-mapped 
+        array, it must be a C-contiguous array of floats with the shape of 
+        the result
+    :type out: :class:`numpy.ndarray`
+
+    :arg filename: if given and *out* is not, results are written into a 
+        memory-mapped :file:`.npy` file with this name
+    :type filename: str
+
+    :arg n_cpu: number of threads among which atom pairs are distributed, 
+        default is 1
+    :type n_cpu: int
     
     Authors: Mustafa Tekpinar & Karolina Mikulska-Ruminska & Cihan Kaya
     """
@@ -41,8 +63,8 @@ def calcMechStiff(modes, coords, kbt=1.):
                             'with `getCoords` method')
     try:
         is3d = modes.is3d()
-        eigvecs = modes.getArray().T.flatten()
-        eigvals = modes.getEigvals()
+        eigvecs = np.ascontiguousarray(modes.getArray(), np.double)
+        eigvals = np.ascontiguousarray(modes.getEigvals(), np.double)
     except:
         raise TypeError('modes must be either an NMA or ModeSet object')
 
@@ -51,24 +73,96 @@ def calcMechStiff(modes, coords, kbt=1.):
 
     n_atoms = modes.numAtoms()
     n_modes = modes.numModes()
+    coords = np.ascontiguousarray(coords, np.double)
+
+    pairs = kwargs.get('pairs', None)
+    rows = kwargs.get('rows', None)
+    if pairs is not None and rows is not None:
+        raise ValueError('pairs and rows cannot be given together')
+
+    n_cpu = kwargs.get('n_cpu', 1)
+    if not isinstance(n_cpu, Integral):
+        raise TypeError('n_cpu must be an integer')
+    elif n_cpu < 1:
+        raise ValueError('n_cpu must be equal to or greater than 1')
+
+    if pairs is not None:
+        pairs = np.ascontiguousarray(pairs, np.intp)
+        if pairs.ndim != 2 or pairs.shape[1] != 2:
+            raise ValueError('pairs must be an array with shape (n_pairs, 2)')
+        _checkIndices(pairs, n_atoms)
+        shape = (len(pairs),)
+    elif rows is not None:
+        rows = np.ascontiguousarray(rows, np.intp).ravel()
+        _checkIndices(rows, n_atoms)
+        shape = (len(rows), n_atoms)
+    else:
+        shape = (n_atoms, n_atoms)
+
+    sm = kwargs.get('out', None)
+    if sm is None:
+        filename = kwargs.get('filename', None)
+        if filename is None:
+            sm = np.zeros(shape, np.double)
+        else:
+            from numpy.lib.format import open_memmap
+            sm = open_memmap(filename, mode='w+', dtype=np.double, shape=shape)
+    elif (not isinstance(sm, np.ndarray) or sm.shape != shape or 
+          sm.dtype != np.double or not sm.flags.c_contiguous):
+        raise ValueError('out must be a C-contiguous float array with '
+                         'shape {0}'.format(shape))
     
     LOGGER.timeit('_sm')
 
-    sm = np.zeros((n_atoms, n_atoms), np.double)
-    from .smtools import calcSM
+    from .smtools import calcSMRows, calcSMPairs
     LOGGER.info('Calculating stiffness matrix.')
 
-    calcSM(coords, sm, eigvecs, eigvals,
-            n_atoms, n_modes, float(kbt))
+    kbt = float(kbt)
+    if pairs is not None:
+        def calc(start, stop, thread):
+            calcSMPairs(coords, sm[start:stop], eigvecs, eigvals,
+                        pairs[start:stop], n_modes, kbt)
+        runThreads(calc, len(pairs), n_cpu, 1024)
+    elif rows is not None:
+        def calc(start, stop, thread):
+            calcSMRows(coords, sm[start:stop], eigvecs, eigvals,
+                       rows[start:stop], n_atoms, n_modes, kbt)
+        runThreads(calc, len(rows), n_cpu, 16)
+    else:
+        all_rows = np.arange(n_atoms, dtype=np.intp)
+        def calc(start, stop, thread):
+            calcSMRows(coords, sm[start:stop], eigvecs, eigvals,
+                       all_rows[start:stop], n_atoms, n_modes, kbt, upper=1)
+        runThreads(calc, n_atoms, n_cpu, 16)
+
+        # copy the upper triangle to the lower one block by block
+        for start in range(0, n_atoms, 256):
+            stop = min(start + 256, n_atoms)
+            sm[start:stop, :start] = sm[:start, start:stop].T
+            block = sm[start:stop, start:stop]
+            lower = np.tril_indices(stop - start, -1)
+            block[lower] = block.T[lower]
+            block[np.diag_indices(stop - start)] = 0.
 
     LOGGER.report('Stiffness matrix calculated in %.2lfs.', label='_sm')
-    
-    LOGGER.info('The range of effective force constant is: {0} to {1}.'
-                                .format(*calcStiffnessRange(sm)))
+
+    if hasattr(sm, 'flush'):
+        sm.flush()
+
+    if pairs is None and rows is None:
+        LOGGER.info('The range of effective force constant is: {0} to {1}.'
+                                    .format(*calcStiffnessRange(sm)))
 
     return sm
 
 
+def _checkIndices(indices, n_atoms):
+
+    if indices.size and (indices.min() < 0 or indices.max() >= n_atoms):
+        raise IndexError('atom indices must be between 0 and {0}'
+                         .format(n_atoms - 1))
+
+
 def calcStiffnessRange(stiffness):
     """ Return the range of effective spring constant."""
     
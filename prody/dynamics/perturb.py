@@ -10,7 +10,7 @@ except ImportError:
     from numpy import isin
 
 from prody import LOGGER
-from prody.atomic import AtomGroup, Selection, Atomic, sliceAtomicData
+from prody.atomic import AtomGroup, Selection, Atomic, sliceAtomicData, sliceAtoms
 from prody.utilities import div0
 
 from .nma import NMA
@@ -52,6 +52,24 @@ def calcPerturbResponse(model, **kwargs):
     large numbers of forces and no perturbation forces are explicitly applied. 
     If set to **False**, then each residue/node is perturbed *repeats* times (default 100) 
     with a random unit force vector as in ProDy v1.8 and earlier.
+
+    With *turbo*, the PRS matrix is calculated block by block from the modes 
+    of *model* without forming the covariance matrix, so that memory use 
+    scales with the number of nodes times the number of modes. 
+
+    :arg chunk_size: number of rows of the PRS matrix calculated at a time, 
+        by default it is chosen to keep each block around 64 MB
+    :type chunk_size: int
+
+    :arg rows: indices of perturbed nodes whose rows of the PRS matrix are 
+        calculated and returned, other rows are never calculated, so 
+        effectiveness of other nodes is **nan** and sensitivity is averaged 
+        over perturbations of *rows* only
+    :type rows: list, :class:`~numpy.ndarray`
+
+    :arg return_matrix: if **False**, the PRS matrix is never stored and 
+        **None** is returned in its place, default is **True**
+    :type return_matrix: bool
     """
 
     if not isinstance(model, (NMA, ModeSet, Mode)):
@@ -73,35 +91,45 @@ def calcPerturbResponse(model, **kwargs):
             raise ValueError('model and atoms must have the same number atoms')
 
     n_atoms = model.numAtoms()
-    # LOGGER.timeit('_prody_prs_all')
-    # LOGGER.info('Calculating covariance matrix')
-    # LOGGER.timeit('_prody_cov')
-
-    cov = model.getCovariance()
 
     turbo = kwargs.get('turbo', True)
     if turbo:
-        if not model.is3d():
-            prs_matrix = cov**2
-
-        else:
-            cov_squared = cov**2
-            n_by_3n_cov_squared = np.zeros((n_atoms, 3 * n_atoms))
-            prs_matrix = np.zeros((n_atoms, n_atoms))
-            i3 = -3
-            i3p3 = 0
-            for i in range(n_atoms):
-                i3 += 3
-                i3p3 += 3
-                n_by_3n_cov_squared[i,:] = (cov_squared[i3:i3p3,:]).sum(0)
-
-            j3 = -3
-            j3p3 = 0
-            for j in range(n_atoms):
-                j3 += 3
-                j3p3 += 3                
-                prs_matrix[:,j] = (n_by_3n_cov_squared[:,j3:j3p3]).sum(1)
+        rows = kwargs.get('rows', None)
+        return_matrix = kwargs.get('return_matrix', True)
+        if rows is not None:
+            rows = _getNodeIndices(rows, n_atoms, 'rows')
+
+        nodes = np.arange(n_atoms) if rows is None else rows
+        effectiveness = np.zeros(n_atoms)
+        if rows is not None:
+            effectiveness[:] = np.nan
+        sensitivity = np.zeros(n_atoms)
+        norm_prs_matrix = None
+        if return_matrix:
+            norm_prs_matrix = np.zeros((len(nodes), n_atoms))
+
+        chunk_size = kwargs.get('chunk_size', None)
+        for start, block in _iterPRSRows(model, rows=rows,
+                                         chunk_size=chunk_size,
+                                         no_diag=no_diag):
+            stop = start + len(block)
+            perturbed = nodes[start:stop]
+            diag = block[np.arange(len(block)), perturbed]
+            effectiveness[perturbed] = block.sum(1) - diag
+            sensitivity += block.sum(0)
+            np.subtract.at(sensitivity, perturbed, diag)
+
+            if norm_prs_matrix is not None:
+                norm_prs_matrix[start:stop] = block
+
+        effectiveness /= n_atoms - 1
+        # number of perturbations of other nodes that each node responds to
+        counts = np.zeros(n_atoms) + len(nodes)
+        np.subtract.at(counts, nodes, 1)
+        sensitivity = div0(sensitivity, counts)
     else:
+        cov = model.getCovariance()
+
         repeats = kwargs.pop('repeats', 100)
         LOGGER.info('Calculating perturbation response with {0} repeats'.format(repeats))
         LOGGER.timeit('_prody_prs_mat')
@@ -127,20 +155,20 @@ def calcPerturbResponse(model, **kwargs):
         LOGGER.report('Perturbation response matrix calculated in %.1fs.',
                     '_prody_prs_mat')
 
-    norm_prs_matrix = np.zeros((n_atoms, n_atoms))
-    self_dp = np.diag(prs_matrix)  
-    self_dp = self_dp.reshape(n_atoms, 1)
-    re_self_dp = np.repeat(self_dp, n_atoms, axis=1)
-    norm_prs_matrix = div0(prs_matrix, re_self_dp)
+        prs_matrix = response_matrix
+        self_dp = np.diag(prs_matrix)
+        self_dp = self_dp.reshape(n_atoms, 1)
+        re_self_dp = np.repeat(self_dp, n_atoms, axis=1)
+        norm_prs_matrix = div0(prs_matrix, re_self_dp)
 
-    if no_diag:
-       # suppress the diagonal (self displacement) to facilitate
-       # visualizing the response profile
-       norm_prs_matrix = norm_prs_matrix - np.diag(np.diag(norm_prs_matrix))
-    
-    W = 1 - np.eye(n_atoms)
-    effectiveness = np.average(norm_prs_matrix, weights=W, axis=1)
-    sensitivity = np.average(norm_prs_matrix, weights=W, axis=0)
+        if no_diag:
+           # suppress the diagonal (self displacement) to facilitate
+           # visualizing the response profile
+           norm_prs_matrix = norm_prs_matrix - np.diag(np.diag(norm_prs_matrix))
+
+        W = 1 - np.eye(n_atoms)
+        effectiveness = np.average(norm_prs_matrix, weights=W, axis=1)
+        sensitivity = np.average(norm_prs_matrix, weights=W, axis=0)
 
     # LOGGER.report('Perturbation response scanning completed in %.1fs.',
     #               '_prody_prs_all')
@@ -161,6 +189,89 @@ def calcPerturbResponse(model, **kwargs):
     return norm_prs_matrix, effectiveness, sensitivity
 
 
+def _getNodeIndices(indices, n_nodes, name='indices'):
+    """Returns *indices* as a flat integer array after checking bounds."""
+
+    indices = np.asarray(indices)
+    if indices.dtype == bool:
+        if len(indices) != n_nodes:
+            raise ValueError('{0} must have length {1} when given as a '
+                             'boolean mask'.format(name, n_nodes))
+        indices = np.flatnonzero(indices)
+    indices = indices.astype(int).ravel()
+    if len(indices) and (indices.min() < -n_nodes or indices.max() >= n_nodes):
+        raise IndexError('{0} must be between 0 and {1}'
+                         .format(name, n_nodes - 1))
+    return indices % n_nodes if len(indices) else indices
+
+
+def _getCovFactor(model):
+    """Returns a tuple of *factor* and *cov*. *factor* is a ``(n_dof, n_modes)``
+    array whose outer product with itself gives the covariance of *model*. If 
+    *model* already holds a covariance matrix (e.g. set with 
+    :meth:`.PCA.setCovariance`), *factor* is **None** and that matrix is 
+    returned as *cov* instead, so that it is not approximated by the modes."""
+
+    if isinstance(model, NMA) and model._cov is not None:
+        return None, model._cov
+
+    array = model._getArray()
+    if isinstance(model, Mode):
+        array = array.reshape((-1, 1))
+        variances = np.array([model.getVariance()])
+    else:
+        variances = model.getVariances()
+    return array * np.sqrt(variances), None
+
+
+def _iterCovRows(model, rows=None, chunk_size=None):
+    """Yields ``(start, nodes, block)`` tuples, where *block* holds the 
+    covariance rows of *nodes* (``nodes[start:start+chunk_size]`` of *rows*) 
+    against all degrees of freedom.  For 3-dimensional models, *block* has 
+    shape ``(n, 3, n_atoms, 3)``, and ``(n, n_atoms)`` otherwise.  Only 
+    ``chunk_size`` rows of the covariance matrix are held at a time, and it is 
+    calculated from the modes without forming the full matrix."""
+
+    n_atoms = model.numAtoms()
+    dof = 3 if model.is3d() else 1
+    if rows is None:
+        rows = np.arange(n_atoms)
+
+    if chunk_size is None:
+        # keep each block around 64 MB
+        chunk_size = max(1, 2**23 // (dof * dof * n_atoms))
+    elif chunk_size < 1:
+        raise ValueError('chunk_size must be a positive integer')
+
+    factor, cov = _getCovFactor(model)
+    for start in range(0, len(rows), chunk_size):
+        nodes = rows[start:start+chunk_size]
+        dofs = _getDOFIndices(nodes, dof == 3)
+        if factor is None:
+            block = cov[dofs]
+        else:
+            block = np.dot(factor[dofs], factor.T)
+        if dof == 3:
+            block = block.reshape((len(nodes), 3, n_atoms, 3))
+        yield start, nodes, block
+
+
+def _iterPRSRows(model, rows=None, chunk_size=None, no_diag=False):
+    """Yields ``(start, block)`` tuples, where *block* holds normalized PRS rows 
+    for ``rows[start:start+len(block)]``.  See :func:`calcPerturbResponse`."""
+
+    for start, nodes, block in _iterCovRows(model, rows, chunk_size):
+        block **= 2
+        if block.ndim == 4:
+            block = block.sum(axis=(1, 3))
+        index = np.arange(len(nodes))
+        self_dp = block[index, nodes].reshape((-1, 1))
+        block = div0(block, self_dp)
+        if no_diag:
+            block[index, nodes] = 0.
+        yield start, block
+
+
 def calcDynamicFlexibilityIndex(matrix, atoms, select, **kwargs):
     """
     Calculate the dynamic flexibility index for the selected residue(s).
@@ -191,18 +302,31 @@ def calcDynamicFlexibilityIndex(matrix, atoms, select, **kwargs):
     if not isinstance(select, (str, Selection)):
         raise TypeError('select should be a Selection or selection string')
 
-    if isinstance(matrix, NMA):
+    if isinstance(matrix, (NMA, ModeSet, Mode)):
         model = matrix
-        
+        _checkModelAtoms(model, atoms)
+        indices, _ = sliceAtoms(atoms, select)
+
         norm = kwargs.get('norm', False)
         if norm:
-            matrix, _, _ = calcPerturbResponse(model, atoms=atoms, **kwargs)
+            no_diag = kwargs.get('no_diag', kwargs.get('suppress_diag', False))
+            row_sums = np.zeros(model.numAtoms())
+            for start, block in _iterPRSRows(model, no_diag=no_diag,
+                                             chunk_size=kwargs.get('chunk_size')):
+                row_sums[start:start+len(block)] = block.sum(1)
         else:
-            matrix = model.getCovariance()
+            factor, cov = _getCovFactor(model)
+            if factor is None:
+                row_sums = cov.sum(1)
+            else:
+                row_sums = np.dot(factor, factor.sum(0))
+            indices = _getDOFIndices(indices, model.is3d())
+
+        return row_sums[indices]/np.sum(row_sums)
 
     elif not isinstance(matrix, np.ndarray):
         raise TypeError('matrix must be an array, ANM, GNM or PCA, not {0}'
-                        .format(type(model)))
+                        .format(type(matrix)))
 
     profiles = sliceAtomicData(matrix, atoms, select, axis=0)
     return np.sum(profiles, axis=1)/np.sum(matrix)
@@ -244,18 +368,42 @@ def calcDynamicCouplingIndex(matrix, atoms, select, func_sel, **kwargs):
     if not isinstance(func_sel, (str, Selection)):
         raise TypeError('func_sel should be a Selection or selection string')
 
-    if isinstance(matrix, NMA):
+    if isinstance(matrix, (NMA, ModeSet, Mode)):
         model = matrix
+        _checkModelAtoms(model, atoms)
+        indices, _ = sliceAtoms(atoms, select)
+        func_indices, _ = sliceAtoms(atoms, func_sel)
+        N_functional = len(func_indices)
 
         norm = kwargs.get('norm', False)
         if norm:
-            matrix, _, _ = calcPerturbResponse(model, atoms=atoms, **kwargs)
+            no_diag = kwargs.get('no_diag', kwargs.get('suppress_diag', False))
+            func_sums = np.zeros(len(indices))
+            row_sums = np.zeros(len(indices))
+            for start, block in _iterPRSRows(model, rows=indices, no_diag=no_diag,
+                                             chunk_size=kwargs.get('chunk_size')):
+                stop = start + len(block)
+                func_sums[start:stop] = block[:, func_indices].sum(1)
+                row_sums[start:stop] = block.sum(1)
         else:
-            matrix = model.getCovariance()
+            is3d = model.is3d()
+            indices = _getDOFIndices(indices, is3d)
+            func_indices = _getDOFIndices(func_indices, is3d)
+            factor, cov = _getCovFactor(model)
+            if factor is None:
+                func_sums = cov[indices][:, func_indices].sum(1)
+                row_sums = cov[indices].sum(1)
+            else:
+                func_sums = np.dot(factor[indices], factor[func_indices].sum(0))
+                row_sums = np.dot(factor[indices], factor.sum(0))
+
+        numerator = func_sums / N_functional
+        denominator = row_sums / atoms.numAtoms()
+        return numerator/denominator
 
     elif not isinstance(matrix, np.ndarray):
         raise TypeError('matrix must be an array, ANM, GNM or PCA, not {0}'
-                        .format(type(model)))
+                        .format(type(matrix)))
 
     profiles = sliceAtomicData(matrix, atoms, select, axis=0)
     func_profiles = sliceAtomicData(profiles, atoms, func_sel, axis=1)
@@ -268,4 +416,20 @@ def calcDynamicCouplingIndex(matrix, atoms, select, func_sel, **kwargs):
     numerator = np.sum(func_profiles, axis=1) / N_functional
     denominator = np.sum(profiles, axis=1) / atoms.numAtoms()
     return numerator/denominator
+
+
+def _checkModelAtoms(model, atoms):
+    """Raises :exc:`ValueError` if *model* and *atoms* differ in size."""
+
+    if model.numAtoms() != atoms.numAtoms():
+        raise ValueError('model and atoms must have the same number atoms')
+
+
+def _getDOFIndices(indices, is3d):
+    """Returns indices of degrees of freedom of nodes with *indices*."""
+
+    indices = np.asarray(indices, dtype=int)
+    if is3d:
+        return (indices.reshape((-1, 1)) * 3 + np.arange(3)).ravel()
+    return indices
     
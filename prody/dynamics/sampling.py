@@ -7,15 +7,16 @@ import numpy as np
 from prody import LOGGER
 from prody.atomic import Atomic, AtomGroup
 from prody.ensemble import Ensemble
+from prody.trajectory import DCDFile
 
 from .nma import NMA
 from .mode import Mode, VectorBase
 from .modeset import ModeSet
 
-__all__ = ['deformAtoms', 'sampleModes', 'traverseMode']
+__all__ = ['deformAtoms', 'sampleModes', 'iterSampleModes', 'traverseMode']
 
 
-def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
+def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0, **kwargs):
     """Returns an ensemble of randomly sampled conformations along given
     *modes*.  If *atoms* are provided, sampling will be around its active
     coordinate set.  Otherwise, sampling is around the 0 coordinate set.
@@ -35,7 +36,17 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
         respect to the initial conformation, default is 1.0 Å
     :type rmsd: float
 
-    :returns: :class:`.Ensemble`
+    :arg filename: if given, conformations are written to a DCD file with 
+        this name in blocks of *chunk_size* without keeping them in memory, 
+        and the filename is returned
+    :type filename: str
+
+    :arg chunk_size: number of conformations generated at a time when 
+        writing to *filename*, default is 1000
+    :type chunk_size: int
+
+    :returns: :class:`.Ensemble` of sampled conformations, or the name of 
+        the DCD file when *filename* is given
 
     For given normal modes :math:`[u_1 u_2 ... u_m]` and their eigenvalues
     :math:`[\\lambda_1 \\lambda_2 ... \\lambda_m]`, a new conformation
@@ -81,6 +92,63 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
 
     See also :func:`.showEllipsoid`."""
 
+    filename = kwargs.get('filename', None)
+    if filename is not None:
+        if not filename.lower().endswith('.dcd'):
+            filename += '.dcd'
+        dcd = DCDFile(filename, mode='w')
+        try:
+            for confs in iterSampleModes(modes, atoms, n_confs, rmsd,
+                                         chunk_size=kwargs.get('chunk_size', 1000)):
+                dcd.write(confs)
+        finally:
+            dcd.close()
+        return filename
+
+    initial, array, randn = _getSampling(modes, atoms, n_confs, rmsd)
+    n_atoms = modes.numAtoms()
+    confs = np.dot(randn, array.T).reshape((len(randn), n_atoms, 3))
+
+    ensemble = Ensemble('Conformations along {0}'.format(modes))
+    if initial is None:
+        ensemble.setCoords(np.zeros((n_atoms, 3)))
+    else:
+        ensemble.setCoords(initial)
+        confs += initial
+    ensemble.addCoordset(confs)
+    return ensemble
+
+
+def iterSampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0, chunk_size=1000):
+    """Yields randomly sampled conformations along given *modes* in blocks of 
+    *chunk_size*, as arrays with shape ``(chunk_size, n_atoms, 3)``.  Random 
+    numbers for all conformations are drawn at once and each block is 
+    calculated with a single matrix product, so conformations are identical 
+    to those of :func:`.sampleModes` for the same random state.  This allows 
+    streaming large numbers of conformations into a file, e.g. using 
+    :meth:`.DCDFile.write`, or a memory-mapped array.  See :func:`.sampleModes` 
+    for a description of the other arguments."""
+
+    chunk_size = int(chunk_size)
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be a positive integer')
+
+    initial, array, randn = _getSampling(modes, atoms, n_confs, rmsd)
+    n_atoms = modes.numAtoms()
+
+    for i in range(0, len(randn), chunk_size):
+        confs = np.dot(randn[i:i+chunk_size], array.T)
+        confs = confs.reshape((len(confs), n_atoms, 3))
+        if initial is not None:
+            confs += initial
+        yield confs
+
+
+def _getSampling(modes, atoms, n_confs, rmsd):
+    """Returns initial coordinates, an array of scaled modes with shape 
+    ``(n_dof, n_modes)`` and random numbers with shape ``(n_confs, n_modes)`` 
+    for sampling conformations as described in :func:`.sampleModes`."""
+
     if not isinstance(modes, (Mode, NMA, ModeSet)):
         raise TypeError('modes must be a NMA or ModeSet instance, '
                         'not {0}'.format(type(modes)))
@@ -122,26 +190,10 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
 
     LOGGER.info('Modes are scaled by {0}.'.format(scale))
 
-    confs = []
-    append = confs.append
     scale = scale / magnitudes * variances ** 0.5
 
-    array = modes._getArray()
-    if array.ndim > 1:
-        for i in range(n_confs):
-            append((array * scale * randn[i]).sum(1).reshape((n_atoms, 3)))
-    else:
-        for i in range(n_confs):
-            append((array * scale * randn[i]).reshape((n_atoms, 3)))
-
-    ensemble = Ensemble('Conformations along {0}'.format(modes))
-    if initial is None:
-        ensemble.setCoords(np.zeros((n_atoms, 3)))
-        ensemble.addCoordset(np.array(confs))
-    else:
-        ensemble.setCoords(initial)
-        ensemble.addCoordset(np.array(confs) + initial)
-    return ensemble
+    array = modes._getArray().reshape((n_atoms * 3, n_modes))
+    return initial, array * scale, randn
 
 
 def traverseMode(mode, atoms, n_steps=10, rmsd=1.5, **kwargs):
@@ -228,23 +280,12 @@ def traverseMode(mode, atoms, n_steps=10, rmsd=1.5, **kwargs):
     LOGGER.info('Mode is scaled by {0}.'.format(scale))
 
     array = arr * var**0.5 * scale / abs(mode)
-    confs_add = [initial + array]
-    for s in range(1, n_steps):
-        confs_add.append(confs_add[-1] + array)
-    confs_sub = [initial - array]
-    for s in range(1, n_steps):
-        confs_sub.append(confs_sub[-1] - array)
-    confs_sub.reverse()
     ensemble = Ensemble('Conformations along {0}'.format(name))
     ensemble.setAtoms(atoms)
     ensemble.setCoords(initial)
 
-    conf_list = [initial]
-    if pos:
-        conf_list = conf_list + confs_add
-    if  neg:
-        conf_list = confs_sub + conf_list
-    conf_array = np.array(conf_list)
+    steps = np.arange(-n_steps if neg else 0, n_steps + 1 if pos else 1)
+    conf_array = initial + steps.reshape((-1, 1, 1)) * array
 
     if reverse:
         conf_array = conf_array[::-1]
@@ -4,23 +4,52 @@
 #include "math.h"
 #include "stdio.h"
 
-#define NR_END 1
-#define FREE_ARG char*
-#define square(x) x * x
+static double pairStiffness(const double *XYZ, const double *U, const double *lambda,
+                            const double *d_scale, int i, int j, int nmodes)
+{
+  /* U has shape (3 * natoms, nmodes) and d_scale[k] is sqrt(kbt/lambda[k]) */
+  int k;
+  double r_ij, x_ij, y_ij, z_ij, d_ij_sup_k;
+  double sum1=0.0, sum2=0.0;
+  const double *ui, *uj;
+
+  x_ij = XYZ[j*3]-XYZ[i*3];
+  y_ij = XYZ[j*3+1]-XYZ[i*3+1];
+  z_ij = XYZ[j*3+2]-XYZ[i*3+2];
+  r_ij = sqrt(x_ij*x_ij + y_ij*y_ij + z_ij*z_ij);
+  x_ij /= r_ij;
+  y_ij /= r_ij;
+  z_ij /= r_ij;
+
+  ui = U + (npy_intp)i*3*nmodes;
+  uj = U + (npy_intp)j*3*nmodes;
+  for(k=0; k<nmodes; k++){
+    d_ij_sup_k = d_scale[k] * (x_ij * (uj[k] - ui[k]) +
+                               y_ij * (uj[nmodes+k] - ui[nmodes+k]) +
+                               z_ij * (uj[2*nmodes+k] - ui[2*nmodes+k]));
+    sum1 += fabs(lambda[k]*d_ij_sup_k);
+    sum2 += fabs(d_ij_sup_k);
+  }
+  return sum1/sum2;
+}
 
-double **dmatrix(long nrl, long nrh, long ncl, long nch);
-void free_dmatrix(double **m, long nrl, long nrh, long ncl, long nch);
-double **zero_dmatrix(long nrl,long nrh,long ncl,long nch);
-void nrerror(char error_text[]);
-double *dvector(long nl, long nh);
+static double *modeScales(const double *lambda, int nmodes, double kbt)
+{
+  int k;
+  double *d_scale = (double *) malloc((size_t) (nmodes * sizeof(double)));
+  if (!d_scale)
+    return NULL;
+  for(k=0; k<nmodes; k++)
+    d_scale[k] = sqrt(kbt/lambda[k]);
+  return d_scale;
+}
 
 static PyObject *calcSM(PyObject *self, PyObject *args, PyObject *kwargs)
 {
+  /* Fills the full stiffness matrix. eigvecs has shape (3 * natoms, n_modes). */
   PyArrayObject *coords, *sm, *eigvecs, *eigvals;
-  int numCA, i, j, k, nmodes;
-  double *XYZ, *SM, *lambda, *U, kbt=1.;
-  double **stiff_matrix;
-  double r_ij, x_ij, y_ij, z_ij;//, norm_U;
+  int numCA, i, j, nmodes;
+  double *XYZ, *SM, *lambda, *U, *d_scale, kbt=1.;
   static char *kwlist[] = {"coords", "sm", "eigvecs", "eigvals",
           "natoms","n_modes",
           "kbt",NULL};
@@ -36,53 +65,108 @@ static PyObject *calcSM(PyObject *self, PyObject *args, PyObject *kwargs)
   U = (double *) PyArray_DATA(eigvecs);
   lambda = (double *) PyArray_DATA(eigvals);
 
-  stiff_matrix=zero_dmatrix(0,numCA-1,0,numCA-1);
+  d_scale = modeScales(lambda, nmodes, kbt);
+  if (!d_scale)
+    return PyErr_NoMemory();
 
+  Py_BEGIN_ALLOW_THREADS
   for (i=0; i<numCA; i++){
+    SM[(npy_intp)i*numCA+i] = 0.0;
     for (j=i+1; j<numCA; j++){
-      r_ij = sqrt((XYZ[j*3]-XYZ[i*3])*(XYZ[j*3]-XYZ[i*3])+\
-        (XYZ[j*3+1]-XYZ[i*3+1])*(XYZ[j*3+1]-XYZ[i*3+1])+\
-        (XYZ[j*3+2]-XYZ[i*3+2])*(XYZ[j*3+2]-XYZ[i*3+2]));
-      x_ij = (XYZ[j*3]-XYZ[i*3])/r_ij;
-      y_ij = (XYZ[j*3+1]-XYZ[i*3+1])/r_ij;
-      z_ij = (XYZ[j*3+2]-XYZ[i*3+2])/r_ij;
-      double u_ij_sup_k[3]={0.0, 0.0, 0.0};
-      double d_ij_sup_k=0.0;
-      double sum1=0.0;
-      double sum2=0.0;
-      double cos_alpha_ij=0.0;
-
-      for(k=0; k<nmodes; k++){
-      //      u_ij_sup_k[0]=(eigvecs[k][ind_3j  ]-eigvecs[k][ind_3i  ]);
-        u_ij_sup_k[0]=(U[(k)*3*numCA+j*3]-U[(k)*3*numCA+i*3]);
-
-      //      u_ij_sup_k[1]=(eigvecs[k][ind_3j+1]-eigvecs[k][ind_3i+1]);
-        u_ij_sup_k[1]=(U[(k)*3*numCA+j*3+1]-U[(k)*3*numCA+i*3+1]);
-
-      //      u_ij_sup_k[2]=(eigvecs[k][ind_3j+2]-eigvecs[k][ind_3i+2]);
-        u_ij_sup_k[2]=(U[(k)*3*numCA+j*3+2]-U[(k)*3*numCA+i*3+2]);
-
-        cos_alpha_ij=(  (x_ij*u_ij_sup_k[0]) +\
-          (y_ij*u_ij_sup_k[1]) +\
-          (z_ij*u_ij_sup_k[2])  );
-        d_ij_sup_k=sqrt(kbt/lambda[k])*cos_alpha_ij;
-
-      
-        sum1+=fabs(lambda[k]*d_ij_sup_k);
-        sum2+=fabs(d_ij_sup_k);
-       
-      }
-      stiff_matrix[i][j]=sum1/sum2;
-      stiff_matrix[j][i]=stiff_matrix[i][j];
-     
+      SM[(npy_intp)i*numCA+j] = pairStiffness(XYZ, U, lambda, d_scale, i, j, nmodes);
+      SM[(npy_intp)j*numCA+i] = SM[(npy_intp)i*numCA+j];
     }
   }
-  for (i=0;i<numCA;i++)
-    for (j=0;j<numCA;j++)
-      SM[i*numCA+j]=stiff_matrix[i][j];
+  Py_END_ALLOW_THREADS
 
-  free_dmatrix(stiff_matrix,0,numCA-1,0,numCA-1);
+  free(d_scale);
+  Py_RETURN_NONE;
+}
 
+static PyObject *calcSMRows(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+  /* Fills rows of the stiffness matrix for atom indices in rows. sm has shape
+     (len(rows), natoms). When upper is non-zero, only elements to the right
+     of the diagonal are calculated. The GIL is released so that blocks of
+     rows can be calculated in parallel threads. */
+  PyArrayObject *coords, *sm, *eigvecs, *eigvals, *rows;
+  int numCA, nrows, r, i, j, nmodes, upper=0;
+  npy_intp *ROWS;
+  double *XYZ, *SM, *lambda, *U, *d_scale, kbt=1.;
+  static char *kwlist[] = {"coords", "sm", "eigvecs", "eigvals", "rows",
+          "natoms", "n_modes", "kbt", "upper", NULL};
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOii|di", kwlist,
+          &coords, &sm, &eigvecs, &eigvals, &rows,
+          &numCA, &nmodes, &kbt, &upper))
+    return NULL;
+
+  XYZ = (double *) PyArray_DATA(coords);
+  SM = (double *) PyArray_DATA(sm);
+  U = (double *) PyArray_DATA(eigvecs);
+  lambda = (double *) PyArray_DATA(eigvals);
+  ROWS = (npy_intp *) PyArray_DATA(rows);
+  nrows = (int) PyArray_SIZE(rows);
+
+  d_scale = modeScales(lambda, nmodes, kbt);
+  if (!d_scale)
+    return PyErr_NoMemory();
+
+  Py_BEGIN_ALLOW_THREADS
+  for (r=0; r<nrows; r++){
+    i = (int) ROWS[r];
+    for (j=upper ? i+1 : 0; j<numCA; j++){
+      if (j == i)
+        SM[(npy_intp)r*numCA+j] = 0.0;
+      else
+        SM[(npy_intp)r*numCA+j] = pairStiffness(XYZ, U, lambda, d_scale, i, j, nmodes);
+    }
+  }
+  Py_END_ALLOW_THREADS
+
+  free(d_scale);
+  Py_RETURN_NONE;
+}
+
+static PyObject *calcSMPairs(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+  /* Calculates stiffness for atom pairs, an array with shape (n_pairs, 2),
+     and writes them into sm with shape (n_pairs,). */
+  PyArrayObject *coords, *sm, *eigvecs, *eigvals, *pairs;
+  int npairs, p, i, j, nmodes;
+  npy_intp *PAIRS;
+  double *XYZ, *SM, *lambda, *U, *d_scale, kbt=1.;
+  static char *kwlist[] = {"coords", "sm", "eigvecs", "eigvals", "pairs",
+          "n_modes", "kbt", NULL};
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOi|d", kwlist,
+          &coords, &sm, &eigvecs, &eigvals, &pairs,
+          &nmodes, &kbt))
+    return NULL;
+
+  XYZ = (double *) PyArray_DATA(coords);
+  SM = (double *) PyArray_DATA(sm);
+  U = (double *) PyArray_DATA(eigvecs);
+  lambda = (double *) PyArray_DATA(eigvals);
+  PAIRS = (npy_intp *) PyArray_DATA(pairs);
+  npairs = (int) (PyArray_SIZE(pairs) / 2);
+
+  d_scale = modeScales(lambda, nmodes, kbt);
+  if (!d_scale)
+    return PyErr_NoMemory();
+
+  Py_BEGIN_ALLOW_THREADS
+  for (p=0; p<npairs; p++){
+    i = (int) PAIRS[2*p];
+    j = (int) PAIRS[2*p+1];
+    if (i == j)
+      SM[p] = 0.0;
+    else
+      SM[p] = pairStiffness(XYZ, U, lambda, d_scale, i, j, nmodes);
+  }
+  Py_END_ALLOW_THREADS
+
+  free(d_scale);
   Py_RETURN_NONE;
 }
 
@@ -92,6 +176,14 @@ static PyMethodDef smtools_methods[] = {
      METH_VARARGS | METH_KEYWORDS,
      "Build stiffness matrix."},
 
+    {"calcSMRows",  (PyCFunction)calcSMRows,
+     METH_VARARGS | METH_KEYWORDS,
+     "Calculate rows of stiffness matrix."},
+
+    {"calcSMPairs",  (PyCFunction)calcSMPairs,
+     METH_VARARGS | METH_KEYWORDS,
+     "Calculate stiffness for pairs of atoms."},
+
     {NULL, NULL, 0, NULL}
 };
 
@@ -117,71 +209,3 @@ PyMODINIT_FUNC initsmtools(void) {
     import_array();
 }
 #endif
-
-double **dmatrix(long nrl, long nrh, long ncl, long nch)
-/* allocate a double matrix with subscript range m[nrl..nrh][ncl..nch] */
-{
-  long i, nrow=nrh-nrl+1,ncol=nch-ncl+1;
-  double **m;
-
-  /* allocate pointers to rows */
-  m=(double **) malloc((size_t)((nrow+NR_END)*sizeof(double*)));
-  if (!m) nrerror("allocation failure 1 in matrix()");
-  m += NR_END;
-  m -= nrl;
-
-  /* allocate rows and set pointers to them */
-  m[nrl]=(double *) malloc((size_t)((nrow*ncol+NR_END)*sizeof(double)));
-  if (!m[nrl]) nrerror("allocation failure 2 in matrix()");
-  m[nrl] += NR_END;
-  m[nrl] -= ncl;
-
-  for(i=nrl+1;i<=nrh;i++) m[i]=m[i-1]+ncol;
-
-  /* return pointer to array of pointers to rows */
-  return m;
-}
-
-void nrerror(char error_text[])
-/* Numerical Recipes standard error handler */
-{
-  fprintf(stderr,"Numerical Recipes run-time error...\n");
-  fprintf(stderr,"%s\n",error_text);
-  fprintf(stderr,"...now exiting to system...\n");
-  exit(1);
-}
-
-void free_dmatrix(double **m, long nrl, long nrh, long ncl, long nch)
-/* free a double matrix allocated by dmatrix() */
-{
-  free((FREE_ARG) (m[nrl]+ncl-NR_END));
-  free((FREE_ARG) (m+nrl-NR_END));
-}
-
-double **zero_dmatrix(long nrl,long nrh,long ncl,long nch)
-{
-  static double **M;
-  int i,j;
-
-  M=dmatrix(nrl,nrh,ncl,nch);
-  for(i=nrl;i<=nrh;i++)
-    for(j=ncl;j<=nch;j++)
-      M[i][j]=0.0;
-  return M;
-}
-
-void free_dvector(double *v, long nl, long nh)
-/* free a double vector allocated with dvector() */
-{
-  free((FREE_ARG) (v+nl-NR_END));
-}
-
-double *dvector(long nl, long nh)
-/* allocate a double vector with subscript range v[nl..nh] */
-{
-  double *v;
-
-  v=(double *)malloc((size_t) ((nh-nl+1+NR_END)*sizeof(double)));
-  if (!v) nrerror("allocation failure in dvector()");
-  return v-nl+NR_END;
-}
@@ -12,6 +12,7 @@ from prody.atomic import Atomic, sliceAtoms
 from prody.atomic.atomgroup import checkLabel
 from prody.measure import getRMSD, calcDeformVector
 from prody.utilities import importLA, checkCoords, checkWeights, copy, isListLike
+from prody.utilities import appendRows
 
 from .conformation import *
 
@@ -41,6 +42,8 @@ class Ensemble(object):
 
         self._confs = None       # coordinate sets
         self._data = dict()
+        self._buffers = {}  # arrays that hold per-conformation data
+        self._reserved = 0
 
         if isinstance(title, Ensemble):
             self._atoms = title.getAtoms()
@@ -51,6 +54,12 @@ class Ensemble(object):
             self.setCoords(title)
             self.addCoordset(title)
 
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+        state['_buffers'] = {}
+        return state
+
     def __repr__(self):
 
         if self._indices is None:
@@ -455,11 +464,8 @@ class Ensemble(object):
             full_coords[:, self._indices, :] = coords
             coords = full_coords
 
-        if self._confs is None:
-            self._confs = coords
-        else:
-            self._confs = concatenate((self._confs, coords), axis=0)
-        
+        self._confs = self._appendRows('_confs', self._confs, coords)
+
         # appending new data
         if self._data is None:
             self._data = {}
@@ -483,11 +489,28 @@ class Ensemble(object):
                 for s in newdata.shape[1:]:
                     shape.append(s)
                 data = zeros(shape, dtype=newdata.dtype)
-            self._data[key] = concatenate((data, newdata), axis=0)
+            self._data[key] = self._appendRows(('_data', key), data, newdata)
 
         # update the number of coordinate sets
         self._n_csets += n_confs
 
+    def _appendRows(self, key, array, rows):
+        """Returns *array* with *rows* appended, using the buffer stored
+        under *key* to avoid copying *array*."""
+
+        array, self._buffers[key] = appendRows(array, rows,
+                                               self._buffers.get(key),
+                                               self._reserved)
+        return array
+
+    def reserve(self, n_confs):
+        """Reserve room for *n_confs* conformations in total, so that they
+        can be added one at a time without copying the conformations that
+        are already in the ensemble.  Room is allocated when conformations
+        are added next."""
+
+        self._reserved = int(n_confs)
+
     def getCoordsets(self, indices=None, selected=True):
         """Returns a copy of coordinate set(s) at given *indices*, which may be
         an integer, a list of integers or **None**. **None** returns all
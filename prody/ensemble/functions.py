@@ -462,6 +462,7 @@ def buildPDBEnsemble(atomics, ref=None, title='Unknown', labels=None, atommaps=N
     if unmapped is None: unmapped = []
     if atommaps is None: atommaps = []
 
+    ensemble.reserve(ensemble.numConfs() + len(atomics))
     LOGGER.progress('Building the ensemble...', len(atomics), '_prody_buildPDBEnsemble')
     for i, atoms in enumerate(atomics):
         if atoms is None:
@@ -344,7 +344,7 @@ class PDBEnsemble(Ensemble):
             transformations = [transformation for _ in range(n_repeats)]
         else:
             if transformation is None:
-                if self._trans:
+                if self._trans is not None:
                     transformation = np.zeros((4, 4))
                 # transformation and transformations remain as None if _trans has not been set
             if isinstance(transformation, np.ndarray):
@@ -395,29 +395,17 @@ class PDBEnsemble(Ensemble):
 
         # update transformations
         if transformations:
-            trans = transformations
-            if self._trans is None:
-                if n_confs > 0:
-                    def_trans = np.zeros((4, 4))
-                    self._trans = list(def_trans)
-                    self._trans.extend(trans)
-                else:
-                    self._trans = trans
-            else:
-                self._trans.extend(trans)
-            self._trans = np.array(self._trans)
+            if self._trans is None and n_confs > 0:
+                self._trans = np.zeros((n_confs, 4, 4))
+            self._trans = self._appendRows('_trans', self._trans,
+                                           transformations)
 
         # update coordinates
-        if self._confs is None and self._weights is None:
-            self._confs = coords
-            self._weights = weights
-            
-        elif self._confs is not None and self._weights is not None:
-            self._confs = np.concatenate((self._confs, coords), axis=0)
-            self._weights = np.concatenate((self._weights, weights), axis=0)
-        else:
+        if (self._confs is None) != (self._weights is None):
             raise RuntimeError('_confs and _weights must be set or None at '
                                'the same time')
+        self._confs = self._appendRows('_confs', self._confs, coords)
+        self._weights = self._appendRows('_weights', self._weights, weights)
 
         # appending new data
         if self._data is not None and adddata is not None:
@@ -445,7 +433,7 @@ class PDBEnsemble(Ensemble):
                     for s in newdata.shape[1:]:
                         shape.append(s)
                     data = np.zeros(shape, dtype=newdata.dtype)
-                self._data[key] = np.concatenate((data, newdata), axis=0)
+                self._data[key] = self._appendRows(('_data', key), data, newdata)
         
         # update the number of coordinate sets
         self._n_csets += n_repeats
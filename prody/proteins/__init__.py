@@ -149,6 +149,11 @@ The following functions can be used to adjust alignment parameters:
   * :func:`.getGapPenalty`, :func:`.setGapPenalty`
   * :func:`.getGapExtPenalty`, :func:`.setGapExtPenalty`
 
+Mapping results are cached in a :class:`.MappingCache`, which can be kept on
+disk or turned off:
+
+  * :func:`.getMappingCache`, :func:`.setMappingCache`
+
 Execute DSSP
 ============
 
@@ -562,6 +562,7 @@ def _parseMMCIFLines(atomgroup, lines, model, chain, subset,
             atomgroup.setAnistds(siguij[mask][:modelSize])  # no division needed anymore
 
     if model is None:
+        atomgroup.reserve(nModels)
         for n in range(1, nModels):
             atomgroup.addCoordset(coordinates[mask][n*modelSize:(n+1)*modelSize])
 
@@ -10,7 +10,7 @@ from prody.atomic import flags, AAMAP
 from prody.utilities import openFile, alignBioPairwise, GAP_PENALTY, GAP_EXT_PENALTY
 
 from .localpdb import fetchPDB
-from .header import (Chemical, Polymer, DBRef, _PDB_DBREF,
+from .header import (Chemical, Polymer, DBRef, HeaderDict, _PDB_DBREF,
                      cleanString)
 
 from .starfile import parseSTARSection
@@ -126,13 +126,14 @@ def parseCIFHeader(pdb, *keys):
 
 def getCIFHeaderDict(stream, *keys):
     """Returns header data in a dictionary.  *stream* may be a list of PDB lines
-    or a stream."""
+    or a stream.  Values are parsed only when they are first accessed, see
+    :class:`.HeaderDict`."""
 
+    lines = _getHeaderLines(stream)
     try:
-        lines = stream.readlines()
         stream.close()
-    except:
-        lines = stream
+    except AttributeError:
+        pass
 
     pdbid = _PDB_HEADER_MAP['identifier'](lines)
     if keys:
@@ -156,18 +157,29 @@ def getCIFHeaderDict(stream, *keys):
         else:
             return tuple(keys)
     else:
-        header = {}
-        for key, func in _PDB_HEADER_MAP.items():  # PY3K: OK
-            value = func(lines)
-            if value is not None:
-                header[key] = value
-        for chem in header.get('chemicals', []):
-            chem.pdbentry = pdbid
-            header[chem.resname] = chem
-        for poly in header.get('polymers', []):
-            poly.pdbentry = pdbid
-            header[poly.chid] = poly
-        return header
+        return HeaderDict(lines, _PDB_HEADER_MAP, pdbid)
+
+
+def _getHeaderLines(lines):
+    """Returns a list of *lines* without the lines of the atom site table,
+    which header data is not parsed from.  *lines* may be a list of lines
+    or a stream."""
+
+    header = []
+    atoms = False
+    for line in lines:
+        if atoms:
+            if line.startswith('#'):
+                atoms = False
+            else:
+                continue
+        elif line.startswith('_atom_site.'):
+            atoms = True
+            if header and header[-1].strip() == 'loop_':
+                header.pop()
+            continue
+        header.append(line)
+    return header
 
 
 def _getBiomoltrans(lines):
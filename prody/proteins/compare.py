@@ -2,6 +2,9 @@
 """This module defines functions for comparing and mapping polypeptide chains.
 """
 
+from collections import OrderedDict
+from hashlib import sha1
+from itertools import product
 from numbers import Integral
 
 import numpy as np
@@ -10,13 +13,12 @@ from numpy import arange
 from prody.atomic import AtomMap as AM
 from prody.atomic import AtomGroup, Chain, AtomSubset, Selection
 from prody.atomic import AAMAP
-from prody.atomic import flags
 from prody.measure import calcTransformation, printRMSD, calcDistance, calcRMSD, superpose
 from prody import LOGGER, SELECT, PY2K, PY3K
-from prody.sequence import MSA
-from prody.utilities import cmp, pystr, isListLike, multilap, SolutionDepletionException, index
+from prody.sequence import MSA, alignPairwise
+from prody.utilities import cmp, pystr, isListLike, multilap, SolutionDepletionException
+from prody.utilities import openSQLite, runThreads
 from prody.utilities import MATCH_SCORE, MISMATCH_SCORE, GAP_PENALTY, GAP_EXT_PENALTY, ALIGNMENT_METHOD
-from prody.utilities import alignBioPairwise
 
 if PY2K:
     range = xrange
@@ -30,7 +32,8 @@ __all__ = ['matchChains', 'matchAlign', 'mapChainOntoChain', 'mapOntoChain', 'al
            'getMismatchScore', 'setMismatchScore', 'getGapPenalty', 
            'setGapPenalty', 'getGapExtPenalty', 'setGapExtPenalty',
            'getGoodSeqId', 'setGoodSeqId', 'getGoodCoverage', 'combineAtomMaps',
-           'setGoodCoverage', 'getAlignmentMethod', 'setAlignmentMethod']
+           'setGoodCoverage', 'getAlignmentMethod', 'setAlignmentMethod',
+           'MappingCache', 'getMappingCache', 'setMappingCache']
 
 GOOD_SEQID = 90.
 GOOD_COVERAGE = 90.
@@ -164,6 +167,184 @@ def setAlignmentMethod(method):
         raise ValueError('method must be "local" or "global"')
 
 
+class MappingCache(object):
+
+    """A cache for chain mapping and alignment results.  Results are kept in
+    an in-memory LRU of at most *maxsize* entries and, if *filename* is given,
+    also in an SQLite database so that they persist across sessions.  Keys are
+    digests of the residue sequences and numbers of the compared chains and of
+    the mapping parameters, see :func:`.mapChainOntoChain`.
+
+    Results are integer arrays of residue positions, or tuples of such an
+    array or **None**, sequence identity, and coverage.  On disk, positions
+    are stored as raw integer bytes next to the numbers, so that reading a
+    database never executes code stored in it.
+
+    :arg maxsize: maximum number of results kept in memory, default is 4096
+    :type maxsize: int
+
+    :arg filename: an SQLite database file for storing results on disk
+    :type filename: str"""
+
+    def __init__(self, maxsize=4096, filename=None):
+
+        self._maxsize = int(maxsize)
+        self._lru = OrderedDict()
+        self._filename = filename
+        self._db = None
+        if filename is not None:
+            self._db = openSQLite(filename)
+            self._db.execute('CREATE TABLE IF NOT EXISTS mappings '
+                             '(key TEXT PRIMARY KEY, positions BLOB, '
+                             'seqid REAL, cover REAL)')
+            self._db.commit()
+
+    def __repr__(self):
+
+        return '<MappingCache: {0} in memory{1}>'.format(len(self._lru),
+            '' if self._filename is None else ', ' + self._filename)
+
+    def __len__(self):
+
+        if self._db is None:
+            return len(self._lru)
+        return self._db.execute('SELECT COUNT(*) FROM mappings').fetchone()[0]
+
+    def __contains__(self, key):
+
+        if key in self._lru:
+            return True
+        if self._db is None:
+            return False
+        return self._db.execute('SELECT 1 FROM mappings WHERE key=?',
+                                (key,)).fetchone() is not None
+
+    def get(self, key, default=None):
+        """Returns result stored with *key*, or *default* if there is none."""
+
+        lru = self._lru
+        if key in lru:
+            value = lru.pop(key)
+            lru[key] = value
+            return value
+        if self._db is None:
+            return default
+        row = self._db.execute('SELECT positions, seqid, cover FROM mappings '
+                               'WHERE key=?', (key,)).fetchone()
+        if row is None:
+            return default
+        blob, seqid, cover = row
+        positions = None
+        if blob is not None:
+            positions = np.frombuffer(bytes(blob), '<i8').astype(np.intp)
+        value = positions if seqid is None else (positions, seqid, cover)
+        self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        """Store *value* with *key*."""
+
+        if self._db is not None:
+            if isinstance(value, tuple):
+                positions, seqid, cover = value
+                seqid, cover = float(seqid), float(cover)
+            else:
+                positions, seqid, cover = value, None, None
+            if positions is not None:
+                positions = np.asarray(positions)
+                if positions.dtype.kind not in 'iu' or positions.ndim != 1:
+                    raise TypeError('positions must be a 1D integer array')
+                positions = positions.astype('<i8').tobytes()
+            self._db.execute('INSERT OR REPLACE INTO mappings VALUES '
+                             '(?, ?, ?, ?)', (key, positions, seqid, cover))
+            self._db.commit()
+        self._remember(key, value)
+
+    def _remember(self, key, value):
+
+        lru = self._lru
+        lru.pop(key, None)
+        lru[key] = value
+        while len(lru) > self._maxsize:
+            lru.popitem(last=False)
+
+    def clear(self):
+        """Remove all results, including those stored on disk."""
+
+        self._lru.clear()
+        if self._db is not None:
+            self._db.execute('DELETE FROM mappings')
+            self._db.commit()
+
+    def close(self):
+        """Close the database connection, if any.  Results kept in memory
+        remain available."""
+
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            self._filename = None
+
+
+MAPPING_CACHE = MappingCache()
+
+
+def getMappingCache():
+    """Returns the :class:`.MappingCache` used by chain mapping functions, or
+    **None** if caching is turned off."""
+
+    return MAPPING_CACHE
+
+
+def setMappingCache(cache):
+    """Set the :class:`.MappingCache` used by chain mapping functions.  Pass
+    **None** to turn caching off, or a file name to store results in an SQLite
+    database in addition to memory."""
+
+    global MAPPING_CACHE
+    if isinstance(cache, basestring):
+        cache = MappingCache(filename=cache)
+    elif cache is not None and not isinstance(cache, MappingCache):
+        raise TypeError('cache must be a MappingCache instance, a filename, '
+                        'or None')
+    MAPPING_CACHE = cache
+
+
+def _getMappingCache(kwargs):
+    """Returns the cache requested by the *cache* keyword argument."""
+
+    cache = kwargs.get('cache', True)
+    if cache is True:
+        return MAPPING_CACHE
+    if isinstance(cache, MappingCache):
+        return cache
+    if cache is False or cache is None:
+        return None
+    raise TypeError('cache must be a MappingCache instance or a bool')
+
+
+def _getMappingKey(*items, **kwargs):
+    """Returns a digest of *items*, which may be :class:`SimpleChain`
+    instances, strings or numbers.  If *coords* is **True**, coordinates
+    of chains are included in the digest."""
+
+    coords = kwargs.get('coords', False)
+    digest = sha1()
+    for item in items:
+        if isinstance(item, SimpleChain):
+            digest.update(item.getSequence().encode())
+            digest.update(item._resnums.astype(np.int64).tobytes())
+            digest.update('\0'.join(item._icodes.tolist()).encode())
+            if coords:
+                xyz = item.getCoords()
+                if xyz is not None:
+                    digest.update(np.ascontiguousarray(xyz, float).tobytes())
+        else:
+            digest.update(repr(item).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
 class SimpleResidue(object):
 
     __slots__ = ['_chain', '_index', '_res', '_name', '_num', '_inc']
@@ -192,6 +373,8 @@ class SimpleResidue(object):
                 yield atom
 
     def getResidue(self):
+        if self._res is None and isinstance(self._chain, SimpleChain):
+            self._res = self._chain._getResidue(self._index)
         if self._res is not None:
             return self._res
         else:
@@ -213,8 +396,9 @@ class SimpleResidue(object):
         return self._name
 
     def getCoords(self):
-        if self._res:
-            return self._res._getCoords()
+        res = self.getResidue()
+        if res is not self:
+            return res._getCoords()
         return None
 
     def getName(self):
@@ -224,13 +408,17 @@ class SimpleResidue(object):
 
 class SimpleChain(object):
 
-    """An internal class used to compare two polypeptide chains.
-
+    """An internal class used to compare two polypeptide chains.  Residue
+    numbers, insertion codes and one-letter codes of residues, and indices
+    of their atoms, are kept in arrays.  :class:`SimpleResidue` instances
+    are built only when the chain is iterated or indexed.
 
     SimpleChain instances can be indexed using residue numbers. If a residue
     with given number is not found in the chain, **None** is returned."""
 
-    __slots__ = ['_list', '_seq', '_title', '_dict', '_gaps', '_chain']
+    __slots__ = ['_seq', '_title', '_gaps', '_chain', '_resnums', '_icodes',
+                 '_aas', '_resindices', '_indices', '_atomres', '_list',
+                 '_dict']
 
     def __init__(self, chain=None, allow_gaps=False):
         """Initialize SimpleChain with a chain id and a sequence (available).
@@ -242,35 +430,80 @@ class SimpleChain(object):
             default is False
         :type allow_gaps: bool"""
 
-        self._dict = dict()
-        self._list = list()
         self._seq = ''
         self._title = ''
         self._gaps = allow_gaps
         self._chain = None
+        self._resnums = np.zeros(0, int)
+        self._icodes = np.zeros(0, 'U1')
+        self._aas = np.zeros(0, 'U1')
+        self._resindices = self._indices = self._atomres = None
+        self._list = self._dict = None
         if isinstance(chain, Chain):
             self.buildFromChain(chain)
         elif isinstance(chain, str):
             self.buildFromSequence(chain)
 
     def __len__(self):
-        return len(self._list)
+        return len(self._resnums)
 
     def __iter__(self):
-        return self._list.__iter__()
+        return self._getList().__iter__()
 
     def __repr__(self):
         return '<SimpleChain: {0} with {1} residues>'.format(
-            self._title, len(self._list))
+            self._title, len(self))
 
     def __str__(self):
-        return '{0} with {1} residues'.format(self._title, len(self._list))
+        return '{0} with {1} residues'.format(self._title, len(self))
 
     def __getitem__(self, index):
+        if self._dict is None:
+            self._dict = dict(((num, inc), res) for num, inc, res in
+                              zip(self._resnums.tolist(),
+                                  self._icodes.tolist(), self._getList()))
         if isinstance(index, Integral):
             return self._dict.get((index, ''))
         return self._dict.get(index)
 
+    def _getList(self):
+
+        if self._list is None:
+            self._list = [SimpleResidue(self, i, num, aa, inc) for i, (num, aa, inc)
+                          in enumerate(zip(self._resnums.tolist(),
+                                           self._aas.tolist(),
+                                           self._icodes.tolist()))]
+        return self._list
+
+    def _getResidue(self, index):
+        """Returns :class:`.Residue` at position *index*, or **None** if the
+        chain was built from a sequence."""
+
+        if self._chain is not None:
+            return self._chain._hv._getResidue(self._resindices[index])
+
+    def _getAtoms(self):
+        """Returns indices of atoms ordered by residue, residue positions and
+        names of atoms.  Residues of a chain built from a sequence are
+        represented by a single alpha carbon with residue position as index."""
+
+        if self._chain is None:
+            positions = arange(len(self))
+            return positions, positions, np.array(['CA'] * len(self))
+        names = self._chain.getAtomGroup()._getNames()
+        return self._indices, self._atomres, names[self._indices]
+
+    def _getFirstAtoms(self, name):
+        """Returns indices of first atoms named *name* in residues, and -1 for
+        residues without such an atom."""
+
+        indices, atomres, names = self._getAtoms()
+        which = (names == name).nonzero()[0]
+        positions, first = np.unique(atomres[which], return_index=True)
+        atoms = np.full(len(self), -1, int)
+        atoms[positions] = indices[which[first]]
+        return atoms
+
     def getSequence(self):
         return self._seq
 
@@ -304,20 +537,12 @@ class SimpleChain(object):
 
         if resnums is None:
             resnums = arange(1, len(sequence)+1)
-        resid = 0
-        gaps = self._gaps
-        for i, aa in enumerate(sequence):
-            resid = resnums[i]
-            if gaps and aa in GAPCHARS:
-                aa = NONE_A
-                simpres = None 
-            else:
-                simpres = SimpleResidue(self, i, resid, aa)
+        self._resnums = np.array(resnums[:len(sequence)], int)
+        self._icodes = np.zeros(len(sequence), 'U1')
+        self._aas = np.array(list(sequence), 'U1')
+        self._seq = sequence
+        self._list = self._dict = None
 
-            self._list.append(simpres)
-            self._dict[resid] = simpres
-            self._seq += aa
-        
         self._title = 'built from sequence %s...'%sequence[:5]
 
     def buildFromChain(self, chain):
@@ -325,30 +550,44 @@ class SimpleChain(object):
 
         assert isinstance(chain, Chain), 'chain must be a Chain instance'
         self._chain = chain
-        gaps = self._gaps
-        residues = list(chain.iterResidues())
-        temp = residues[0].getResnum()-1
-        protein_resnames = flags.AMINOACIDS
-        for i, res in enumerate(chain):
-            resid = res.getResnum()
-            incod = res.getIcode()
-            aa = AAMAP.get(res.getResname(), 'X')
-            if aa == '-':
-                aa = 'X'
-            if aa == 'X':
-                LOGGER.warn("no one-letter mapping found for %s " % repr(res))
-            simpres = SimpleResidue(self, i, resid, aa, incod, res)
-            if gaps:
-                diff = resid - temp - 1
-                if diff > 0:
-                    self._seq += NONE_A * diff
-                temp = resid
-            self._seq += aa
-            self._list.append(simpres)
-            self._dict[(resid, incod)] = simpres
+
+        resindices, first, atomres = np.unique(chain._getResindices(),
+                                               return_index=True,
+                                               return_inverse=True)
+        atomres = atomres.reshape(-1)
+        order = atomres.argsort(kind='stable')
+        self._resindices = resindices
+        self._indices = chain._getIndices()[order]
+        self._atomres = atomres[order]
+
+        self._resnums = chain.getResnums()[first]
+        icodes = chain.getIcodes()
+        if icodes is None:
+            self._icodes = np.zeros(len(first), 'U1')
+        else:
+            self._icodes = icodes[first]
+
+        resnames, inverse = np.unique(chain.getResnames()[first],
+                                      return_inverse=True)
+        aas = np.array([AAMAP.get(rn, 'X') for rn in resnames], 'U1')
+        aas[aas == '-'] = 'X'
+        self._aas = aas[inverse.reshape(-1)]
         self._title = 'Chain {0} from {1}'.format(chain.getChid(),
                                                   chain.getAtomGroup()
                                                   .getTitle())
+        unknown = resnames[aas == 'X']
+        if len(unknown):
+            LOGGER.warn('no one-letter mapping found for {0} in {1}'
+                        .format(', '.join(unknown), self._title))
+
+        if self._gaps and len(first) > 1:
+            diffs = np.maximum(np.diff(self._resnums) - 1, 0).tolist()
+            aas = self._aas.tolist()
+            self._seq = aas[0] + ''.join([NONE_A * diff + aa for diff, aa
+                                          in zip(diffs, aas[1:])])
+        else:
+            self._seq = ''.join(self._aas.tolist())
+        self._list = self._dict = None
 
 
 def countUnpairedBreaks(chone, chtwo, resnum=True):
@@ -416,9 +655,7 @@ def countUnpairedBreaks(chone, chtwo, resnum=True):
     brone[(rnone[1:] - rnone[:-1]) > 1] = False
     brtwo[(rntwo[1:] - rntwo[:-1]) > 1] = False
 
-    brone = set(brone.nonzero()[0])
-    brtwo = set(brtwo.nonzero()[0])
-    return len(brone.union(brtwo)) - len(brone.intersection(brtwo))
+    return np.count_nonzero(brone != brtwo)
 
 
 _SUBSETS = {
@@ -564,7 +801,10 @@ def matchChains(atoms1, atoms2, **kwargs):
     Biopython is used for pairwise sequence alignment, and matching
     is performed based on the sequence alignment.  User can control, whether
     sequence alignment is performed or not with *pwalign* keyword.  If
-    ``pwalign=True`` is passed, pairwise alignment is enforced."""
+    ``pwalign=True`` is passed, pairwise alignment is enforced.
+
+    Pairwise alignments are cached as described for *cache* keyword of
+    :func:`.mapChainOntoChain`."""
 
     if not isinstance(atoms1, (AtomGroup, Chain, Selection)):
         raise TypeError('atoms1 must be an AtomGroup, Chain, or Selection')
@@ -651,12 +891,40 @@ def matchChains(atoms1, atoms2, **kwargs):
         if unmatched:
             LOGGER.debug('Trying to match chains based on {0} sequence '
                         'alignment:'.format(ALIGNMENT_METHOD))
+            # align each chain to all of its partners in a single batch
+            partners = {}
+            for simpch1, simpch2 in unmatched:
+                partners.setdefault(simpch1, []).append(simpch2)
+            cache = _getMappingCache(kwargs)
+            mappings = {}
+            for simpch1, chains in partners.items():
+                this = simpch1.getSequence()
+                keys = {}
+                if cache is not None:
+                    for simpch2 in chains:
+                        key = keys[simpch2] = _getMappingKey('align', this,
+                            simpch2.getSequence(), ALIGNMENT_METHOD,
+                            MATCH_SCORE, MISMATCH_SCORE, GAP_PENALTY,
+                            GAP_EXT_PENALTY)
+                        mapping = cache.get(key)
+                        if mapping is not None:
+                            mappings[simpch1, simpch2] = mapping
+                    chains = [ch for ch in chains
+                              if (simpch1, ch) not in mappings]
+                if not chains:
+                    continue
+                maps = _alignPairwise(this, [ch.getSequence() for ch in chains])
+                for simpch2, mapping in zip(chains, maps):
+                    mappings[simpch1, simpch2] = mapping
+                    if cache is not None:
+                        cache.set(keys[simpch2], mapping)
             for simpch1, simpch2 in unmatched:
                 LOGGER.debug(' Comparing {0} (len={1}) and {2} '
                             '(len={3}):'
                             .format(simpch1.getTitle(), len(simpch1),
                                     simpch2.getTitle(), len(simpch2)))
-                match1, match2, nmatches = getAlignedMatch(simpch1, simpch2)
+                match1, match2, nmatches = getAlignedMatch(
+                    simpch1, simpch2, mappings[simpch1, simpch2])
                 _seqid = nmatches * 100 / min(len(simpch1), len(simpch2))
                 _cover = len(match2) * 100 / max(len(simpch1), len(simpch2))
                 if _seqid >= seqid and _cover >= coverage:
@@ -675,67 +943,21 @@ def matchChains(atoms1, atoms2, **kwargs):
     for mi, result in enumerate(matches):
         match1, match2, _seqid, _cover, simpch1, simpch2 = result
 
-        indices1 = []
-        indices2 = []
-
-        for i in range(len(match1)):
-            ares = match1[i]
-            bres = match2[i]
+        if subset == 'ca' or subset == 'bb':
+            names = ('CA',) if subset == 'ca' else ('N', 'CA', 'C', 'O')
+            indices1 = np.array([simpch1._getFirstAtoms(name)[match1]
+                                 for name in names]).T
+            indices2 = np.array([simpch2._getFirstAtoms(name)[match2]
+                                 for name in names]).T
+            which = (indices1 >= 0) & (indices2 >= 0)
+        else:
+            indices1, indices2 = _mapAtoms(simpch1, match1, simpch2, match2)
+            which = indices2 >= 0
+            if subset == 'noh':
+                which &= atoms1.getFlags('noh')[indices1]
 
-            if subset == 'ca':
-                try:
-                    aid = ares.getNames().tolist().index('CA')
-                except ValueError:
-                    aid = None
-                try:
-                    bid = bres.getNames().tolist().index('CA')
-                    if aid is not None:
-                        indices1.append(ares._indices[aid])
-                        indices2.append(bres._indices[bid])
-                except ValueError:
-                    pass
-            elif subset == 'bb':
-                for bban in ('N', 'CA', 'C', 'O'):
-                    try:
-                        aid = ares.getNames().tolist().index(bban)
-                    except ValueError:
-                        continue
-                    try:
-                        bid = bres.getNames().tolist().index(bban)
-                    except ValueError:
-                        continue
-                    else:
-                        indices1.append(ares._indices[aid])
-                        indices2.append(bres._indices[bid])
-            elif subset == 'noh':
-                for han, aid, noh in zip(ares.getNames(), ares._indices,
-                                         ares.getFlags('noh')):
-                    if not noh:
-                        continue
-                    try:
-                        bid = bres.getNames().tolist().index(han)
-                    except ValueError:
-                        continue
-                    else:
-                        indices1.append(aid)
-                        indices2.append(bres._indices[bid])
-            elif subset is None or subset == 'all':
-                aans = ares.getNames()
-                bans = bres.getNames().tolist()
-
-                aids = ares.getIndices()
-                #bids = bres.getIndices()
-
-                for j in range(len(aans)):
-                    try:
-                        bid = bres._indices[bans.index(aans[j])]
-                        indices1.append(aids[j])
-                        indices2.append(bid)
-                    except ValueError:
-                        pass
-
-        indices1 = np.array(indices1, int)
-        indices2 = np.array(indices2, int)
+        indices1 = indices1[which]
+        indices2 = indices2[which]
 
         match1 = AM(atoms1, indices1, atoms1.getACSIndex(),
                     title=simpch1.getTitle() + ' -> ' + simpch2.getTitle(),
@@ -751,72 +973,126 @@ def matchChains(atoms1, atoms2, **kwargs):
 
 
 def getTrivialMatch(ach, bch):
-    """Returns lists of matching residues (match based on residue number).
-
+    """Returns positions of matching residues of *ach* and *bch* (match based
+    on residue number) and the number of residues with the same type.
     """
     #if not isinstance(ach, SimpleChain):
     #    raise TypeError('ach must be a SimpleChain instance')
     #if not isinstance(bch, SimpleChain):
     #    raise TypeError('bch must be a SimpleChain instance')
-    amatch = []
-    bmatch = []
-    match = 0.0
-    for ares in ach:
-        bres = bch[(ares.getResnum(), ares.getIcode())]
-        if bres is not None:
-            if ares.getResname() == bres.getResname():
-                match += 1
-            amatch.append(ares.getResidue())
-            bmatch.append(bres.getResidue())
-
+    bmatch = _matchResnums(ach, bch)
+    amatch = (bmatch >= 0).nonzero()[0]
+    bmatch = bmatch[amatch]
+    match = float(np.count_nonzero(ach._aas[amatch] == bch._aas[bmatch]))
     return amatch, bmatch, match
 
 
-def getAlignedMatch(ach, bch):
-    """Returns list of matching residues (match is based on sequence alignment).
+def getAlignedMatch(ach, bch, mapping=None):
+    """Returns positions of matching residues of *ach* and *bch* (match is
+    based on sequence alignment) and the number of identical residues.
+    *mapping* of residues of *ach* onto *bch* returned by
+    :func:`.alignPairwise` is calculated if not given.
     """
 
-    if ALIGNMENT_METHOD == 'local':
-        alignment = alignBioPairwise(ach.getSequence(),
-                                     bch.getSequence(),
-                                     "local",
-                                     MATCH_SCORE, MISMATCH_SCORE,
-                                     GAP_PENALTY, GAP_EXT_PENALTY,
-                                     max_alignments=1)
-    else:
-        alignment = alignBioPairwise(ach.getSequence(),
-                                     bch.getSequence(),
-                                     "global",
-                                     MATCH_SCORE, MISMATCH_SCORE,
-                                     GAP_PENALTY, GAP_EXT_PENALTY,
-                                     max_alignments=1)
-
-    amatch = []
-    bmatch = []
-    match = 0.0
-    try:
-        this = alignment[0][0]
-        that = alignment[0][1]
-    except IndexError:
+    this = ach.getSequence()
+    that = bch.getSequence()
+    if mapping is None:
+        mapping = _alignPairwise(this, that)
+
+    gap_chars = GAPCHARS + [NONE_A]
+    ares = _getResiduePositions(this, gap_chars)
+    bres = _getResiduePositions(that, gap_chars)
+    mapping = np.asarray(mapping, int)
+    i = (mapping >= 0).nonzero()[0]
+    j = mapping[i]
+    which = (ares[i] >= 0) & (bres[j] >= 0)
+    i = i[which]
+    j = j[which]
+    amatch = ares[i]
+    bmatch = bres[j]
+    match = float(np.count_nonzero(ach._aas[amatch] == bch._aas[bmatch]))
+    if not len(amatch):
         LOGGER.warning('Matching chains resulted in empty alignment.')
-        return amatch, bmatch, match
-    aiter = ach.__iter__()
-    biter = bch.__iter__()
-    for i in range(len(this)):
-        a = this[i]
-        b = that[i]
-        if a not in GAPCHARS:
-            ares = next(aiter)
-        if b not in GAPCHARS:
-            bres = next(biter)
-            if a not in GAPCHARS:
-                amatch.append(ares.getResidue())
-                bmatch.append(bres.getResidue())
-                if a == b:
-                    match += 1
     return amatch, bmatch, match
 
 
+def _alignPairwise(this, that):
+    """Returns mapping of sequence *this* onto sequence(s) *that* using
+    current alignment settings."""
+
+    mapping, _ = alignPairwise(this, that, method=ALIGNMENT_METHOD,
+                               match=MATCH_SCORE, mismatch=MISMATCH_SCORE,
+                               gap_opening=GAP_PENALTY,
+                               gap_extension=GAP_EXT_PENALTY)
+    return mapping
+
+
+def _getResiduePositions(sequence, gap_chars):
+    """Returns an array with positions of residues in places of *sequence*
+    that are not *gap_chars*, and -1 elsewhere."""
+
+    isres = ~np.in1d(np.array(list(sequence), 'U1'), gap_chars)
+    positions = np.full(len(sequence), -1, int)
+    positions[isres] = arange(np.count_nonzero(isres))
+    return positions
+
+
+def _matchResnums(ach, bch):
+    """Returns positions of residues of *bch* that have the same number and
+    insertion code as residues of *ach*, and -1 for residues without a
+    match."""
+
+    if not len(ach) or not len(bch):
+        return np.full(len(ach), -1, int)
+    icodes, codes = np.unique(np.concatenate([ach._icodes, bch._icodes]),
+                              return_inverse=True)
+    codes = codes.reshape(-1)
+    n_codes = len(icodes)
+    akeys = ach._resnums.astype(np.int64) * n_codes + codes[:len(ach)]
+    bkeys = bch._resnums.astype(np.int64) * n_codes + codes[len(ach):]
+    # the last one of residues with the same number and code is matched
+    order = bkeys.argsort(kind='stable')
+    bkeys = bkeys[order]
+    found = bkeys.searchsorted(akeys, side='right') - 1
+    which = found >= 0
+    which[which] = bkeys[found[which]] == akeys[which]
+    return np.where(which, order[found], -1)
+
+
+def _mapAtoms(ach, apos, bch, bpos):
+    """Returns indices of atoms of *ach* in residues at positions *apos*, and
+    indices of atoms with the same name in residues of *bch* at positions
+    *bpos*, or -1 where there is no such atom.  Atoms are ordered as residues
+    in *apos*, and the atom with the smaller index is used when a residue of
+    *bch* has more than one atom with the same name."""
+
+    aidx, ares, anames = ach._getAtoms()
+    bidx, bres, bnames = bch._getAtoms()
+
+    rank = np.full(len(ach), -1, int)
+    rank[apos] = arange(len(apos))
+    arank = rank[ares]
+    which = (arank >= 0).nonzero()[0]
+    order = which[arank[which].argsort(kind='stable')]
+    aidx = aidx[order]
+    partners = np.asarray(bpos, int)[arank[order]]
+
+    names, codes = np.unique(np.concatenate([anames[order], bnames]),
+                             return_inverse=True)
+    codes = codes.reshape(-1)
+    n_codes = len(names)
+    akeys = partners.astype(np.int64) * n_codes + codes[:len(aidx)]
+    bkeys = bres.astype(np.int64) * n_codes + codes[len(aidx):]
+    bkeys, first = np.unique(bkeys, return_index=True)
+    if not len(bkeys):
+        return aidx, np.full(len(aidx), -1, int)
+
+    found = bkeys.searchsorted(akeys)
+    which = (partners >= 0) & (found < len(bkeys))
+    which[which] = bkeys[found[which]] == akeys[which]
+    return aidx, np.where(which, bidx[first[found * which]], -1)
+
+
 def mapOntoChain(atoms, chain, **kwargs):
     """Map *atoms* onto *chain*. This function is a wrapper of 
     :func:`.mapChainOntoChain` that manages to map chains onto target *chain*. 
@@ -936,6 +1212,12 @@ def mapChainOntoChain(mobile, target, **kwargs):
         based on residue numbers (as well as insertion codes). This will be 
         overridden by the *mapping* keyword's value.
     :type pwalign: bool
+
+    :keyword cache: mapping results are looked up in and stored to the
+        :class:`.MappingCache` returned by :func:`.getMappingCache`, unless
+        **False** or another :class:`.MappingCache` is given. Results for
+        predefined alignments are not cached. Default is **True**
+    :type cache: bool, :class:`.MappingCache`
     
     .. [IS98] Shindyalov IN, Bourne PE. Protein structure alignment by 
        incremental combinatorial extension (CE) of the optimal path. 
@@ -983,6 +1265,69 @@ def mapChainOntoChain(mobile, target, **kwargs):
         raise ValueError('At least one of mobile and target should be a Chain object '
                          'or a SimpleChain object associated with a Chain object.')
 
+    cache = _getMappingCache(kwargs) if alignment is None else None
+    if cache is not None:
+        key = _getMappingKey('map', simple_mobile, simple_target, seqid, coverage,
+                             pwalign, GOOD_SEQID, GOOD_COVERAGE, ALIGNMENT_METHOD,
+                             MATCH_SCORE, MISMATCH_SCORE, GAP_PENALTY,
+                             GAP_EXT_PENALTY,
+                             coords=pwalign in ('auto', 'ce', 'cealign'))
+        cached = cache.get(key)
+    else:
+        cached = None
+
+    if cached is not None:
+        LOGGER.debug('  Using cached mapping of {0} onto {1}.'
+                     .format(simple_mobile.getTitle(), simple_target.getTitle()))
+        mapping = None if cached[0] is None else cached
+    else:
+        mapping = _mapSimpleChains(simple_mobile, simple_target, seqid, coverage,
+                                   pwalign, alignment, 'seqid' in kwargs)
+        if cache is not None:
+            cache.set(key, (None, 0., 0.) if mapping is None else mapping)
+
+    if mapping is not None:
+        positions, _seqid, _cover = mapping
+        indices_target, indices_chain = _mapAtoms(
+            simple_target, arange(len(simple_target)), simple_mobile, positions)
+        mapped = indices_chain >= 0
+        indices_chain = indices_chain[mapped]
+        indices_mapping = mapped.nonzero()[0]
+        indices_dummies = (~mapped).nonzero()[0]
+
+        if simple_target._chain is not None:
+            title_tar = simple_target.getTitle()
+        else:
+            title_tar = 'SimpleChain {0}'.format(simple_target.getTitle())
+
+        if simple_mobile._chain is not None:
+            title_chn = simple_mobile.getTitle()
+        else:
+            title_chn = 'SimpleChain {0}'.format(simple_mobile.getTitle())
+
+        # note that chain here is from atoms
+        if map_ag is not None:
+            atommap = AM(map_ag, indices_chain, mobile.getACSIndex(),
+                         mapping=indices_mapping, dummies=indices_dummies,
+                         title=title_chn + ' -> ' + title_tar)
+        else:
+            atommap = None
+
+        if target_ag is not None:
+            selection = AM(target_ag, indices_target, target.getACSIndex(),
+                           title=title_tar + ' -> ' + title_chn, intarrays=True)
+        else:
+            selection = None
+
+        mapping = (atommap, selection, _seqid, _cover)
+    return mapping
+
+def _mapSimpleChains(simple_mobile, simple_target, seqid, coverage, pwalign,
+                     alignment=None, user_seqid=True):
+    """Returns positions of residues of *simple_mobile* mapped onto residues
+    of *simple_target*, with -1 for unmapped residues, and percent sequence
+    identity and overlap, or **None** if mapping fails."""
+
     mapping = None
     LOGGER.debug('Trying to map atoms based on residue numbers and '
             'identities:')
@@ -993,8 +1338,8 @@ def mapChainOntoChain(mobile, target, **kwargs):
     # trivial mapping serves as a first simple trial of alignment the two 
     # sequences based on residue number, therefore the sequence identity 
     # (GOOD_SEQID) criterion is strict.
-    target_list, chain_list, n_match, n_mapped = getTrivialMapping(
-        simple_target, simple_mobile)
+    positions, n_match, n_mapped = getTrivialMapping(simple_target,
+                                                     simple_mobile)
     _seqid, _cover = calcScores(n_match, n_mapped, len(simple_target))
 
     trivial_seqid = max(GOOD_SEQID, seqid) if pwalign else seqid
@@ -1003,7 +1348,7 @@ def mapChainOntoChain(mobile, target, **kwargs):
         LOGGER.debug('\tMapped: {0} residues match with {1:.0f}% '
                 'sequence identity and {2:.0f}% overlap.'
                 .format(n_mapped, _seqid, _cover))
-        mapping = (target_list, chain_list, _seqid, _cover)
+        mapping = (positions, _seqid, _cover)
     else:
         if not pwalign:
             LOGGER.debug('\tFailed to match chains based on residue numbers '
@@ -1014,7 +1359,7 @@ def mapChainOntoChain(mobile, target, **kwargs):
         SEQ_ALIGNMENT = ('seq', ALIGNMENT_METHOD + ' sequence alignment', seqid, coverage)
         CE_ALIGNMENT = ('ce', 'CEalign', 0., coverage)
 
-        if not 'seqid' in kwargs:
+        if not user_seqid:
             tar_seqid = 0.
         else:
             tar_seqid = seqid
@@ -1049,7 +1394,7 @@ def mapChainOntoChain(mobile, target, **kwargs):
                     result = getAlignedMapping(simple_target, simple_mobile, alignment)
 
             if result is not None:
-                target_list, chain_list, n_match, n_mapped = result
+                positions, n_match, n_mapped = result
                 _seqid, _cover = calcScores(n_match, n_mapped, max(len(simple_target),
                                                                    len(simple_mobile)))
 
@@ -1057,67 +1402,16 @@ def mapChainOntoChain(mobile, target, **kwargs):
                     LOGGER.debug('\tMapped: {0} residues match with {1:.0f}%'
                                     ' sequence identity and {2:.0f}% overlap.'
                                     .format(n_mapped, _seqid, _cover))
-                    mapping = (target_list, chain_list, _seqid, _cover)
+                    mapping = (positions, _seqid, _cover)
                     break
                 else:
                     LOGGER.debug('\tFailed to match chains (seqid={0:.0f}%, '
                                     'overlap={1:.0f}%).'
                                     .format(_seqid, _cover))
 
-    if mapping is not None:
-        residues_target, residues_chain, _seqid, _cover = mapping
-        indices_target = []
-        indices_chain = []
-        indices_mapping = []
-        indices_dummies = []
-        counter = 0
-        for i in range(len(residues_target)):
-            res_tar = residues_target[i]
-            res_chn = residues_chain[i]
-
-            for atom_tar in res_tar:
-                indices_target.append(atom_tar.getIndex())
-                if res_chn is not None:
-                    atom_chn = res_chn.getAtom(atom_tar.getName())
-                    if atom_chn is not None:
-                        indices_chain.append(atom_chn.getIndex())
-                        indices_mapping.append(counter)
-                    else:
-                        indices_dummies.append(counter)
-                else:
-                    indices_dummies.append(counter)
-                counter += 1
-
-        ch_tar = next((r for r in residues_target if r is not None)).getChain()
-        ch_chn = next((r for r in residues_chain if r is not None)).getChain()
-
-        if isinstance(ch_tar, Chain):
-            title_tar = 'Chain {0} from {1}'.format(ch_tar.getChid(), ch_tar.getAtomGroup().getTitle())
-        else:
-            title_tar = 'SimpleChain {0}'.format(ch_tar.getTitle())
-
-        if isinstance(ch_chn, Chain):
-            title_chn = 'Chain {0} from {1}'.format(ch_chn.getChid(), ch_chn.getAtomGroup().getTitle())
-        else:
-            title_chn = 'SimpleChain {0}'.format(ch_tar.getTitle())
-
-        # note that chain here is from atoms
-        if map_ag is not None:
-            atommap = AM(map_ag, indices_chain, mobile.getACSIndex(),
-                         mapping=indices_mapping, dummies=indices_dummies,
-                         title=title_chn + ' -> ' + title_tar)
-        else:
-            atommap = None
-
-        if target_ag is not None:
-            selection = AM(target_ag, indices_target, target.getACSIndex(),
-                           title=title_tar + ' -> ' + title_chn, intarrays=True)
-        else:
-            selection = None
-
-        mapping = (atommap, selection, _seqid, _cover)
     return mapping
 
+
 def userDefined(chain1, chain2, correspondence):
     id1 = chain1.getTitle()
     id2 = chain2.getTitle()
@@ -1215,13 +1509,17 @@ def mapOntoChains(atoms, ref, match_func=bestMatch, **kwargs):
 
     # iterate through chains of both target and mobile
     mappings = np.empty((len(chs_ref), len(chs_atm)), dtype='O')
+    simple_targets = [None] * len(chs_atm)
     for i, chain in enumerate(chs_ref):
         simple_chain = chain if isinstance(chain, SimpleChain) else SimpleChain(chain, False) 
         for j, target_chain in enumerate(chs_atm):
             if not match_func(chain, target_chain):
                 continue
 
-            simple_target = target_chain if isinstance(target_chain, SimpleChain) else SimpleChain(target_chain, False)
+            simple_target = simple_targets[j]
+            if simple_target is None:
+                simple_target = target_chain if isinstance(target_chain, SimpleChain) else SimpleChain(target_chain, False)
+                simple_targets[j] = simple_target
             mappings[i, j] = mapChainOntoChain(simple_target, simple_chain, **kwargs)
 
     return mappings
@@ -1261,31 +1559,21 @@ def mapOntoChainByAlignment(atoms, chain, **kwargs):
     return []
 
 def getTrivialMapping(target, chain):
-    """Returns lists of matching residues (map based on residue number)."""
-
-    target_list = []
-    chain_list = []
-    n_match = 0
-    n_mapped = 0
-    chain_dict_get = chain._dict.get
-    append = target_list.append
-    for target_residue in target:
-        append(target_residue.getResidue())
-
-        chain_residue = chain_dict_get((target_residue.getResnum(),
-                                        target_residue.getIcode()))
-        if chain_residue is None:
-            chain_list.append(chain_residue)
-        else:
-            if target_residue.getResname() == chain_residue.getResname():
-                n_match += 1
-            chain_list.append(chain_residue.getResidue())
-            n_mapped += 1
+    """Returns positions of residues of *chain* mapped onto residues of
+    *target* (map based on residue number), with -1 for unmapped residues,
+    and numbers of matching and mapped residues."""
 
-    return target_list, chain_list, n_match, n_mapped
+    positions = _matchResnums(target, chain)
+    mapped = positions >= 0
+    n_mapped = np.count_nonzero(mapped)
+    n_match = np.count_nonzero(target._aas[mapped] ==
+                               chain._aas[positions[mapped]])
+    return positions, n_match, n_mapped
 
 def getDictMapping(target, chain, map_dict):
-    """Returns lists of matching residues (based on *map_dict*)."""
+    """Returns positions of residues of *chain* mapped onto residues of
+    *target* (based on *map_dict*), with -1 for unmapped residues, and
+    numbers of matching and mapped residues."""
 
     pdbid = chain._chain.getTitle()[:4].lower()
     chid = chain._chain.getChid().upper()
@@ -1296,62 +1584,46 @@ def getDictMapping(target, chain, map_dict):
         LOGGER.warn('map_dict does not have the mapping for {0}'.format(key))
         return None
 
-    tar_indices = mapping[0]
-    chn_indices = mapping[1]
-
-    chain_res_list = [res for res in chain]
-
-    amatch = []
-    bmatch = []
-    n_match = 0
-    n_mapped = 0
-    for i, a in enumerate(target):  
-        ares = a.getResidue()
-        amatch.append(ares)
-        if i in tar_indices:
-            try:
-                n = index(tar_indices, i)
-            except IndexError:
-                LOGGER.warn('\nthe number of residues in the map_dict ({0} residues) is inconsistent with {2} ({1} residues)'
-                            .format(max(tar_indices)+1, len(chain_res_list), target.getTitle()))
-                return None
-            try:
-                b = chain_res_list[chn_indices[n]]
-            except IndexError:
-                LOGGER.warn('\nthe number of residues in the map_dict ({0} residues) is inconsistent with {2} ({1} residues)'
-                            .format(max(chn_indices)+1, len(chain_res_list), chain.getTitle()))
-                return None
-            bres = b.getResidue()
-            bmatch.append(bres)
-            if a.getResname() == b.getResname():
-                n_match += 1
-            n_mapped += 1
-        else:
-            bmatch.append(None)
+    tar_indices = np.asarray(mapping[0], int)
+    chn_indices = np.asarray(mapping[1], int)
+
+    # the first occurrence of a target residue is used
+    tar_indices, first = np.unique(tar_indices, return_index=True)
+    which = (tar_indices >= 0) & (tar_indices < len(target))
+    tar_indices = tar_indices[which]
+    first = first[which]
+    if len(first) and (first.max() >= len(chn_indices) or
+                       chn_indices[first].max() >= len(chain)):
+        LOGGER.warn('\nthe number of residues in the map_dict ({0} residues) is inconsistent with {2} ({1} residues)'
+                    .format(max(chn_indices)+1, len(chain), chain.getTitle()))
+        return None
 
-    return amatch, bmatch, n_match, n_mapped
+    positions = np.full(len(target), -1, int)
+    positions[tar_indices] = chn_indices[first]
+    mapped = positions >= 0
+    n_mapped = np.count_nonzero(mapped)
+    n_match = np.count_nonzero(target._aas[mapped] ==
+                               chain._aas[positions[mapped]])
+    return positions, n_match, n_mapped
 
 def getAlignedMapping(target, chain, alignment=None):
-    """Returns lists of matching residues (map based on pairwise 
-    alignment or predefined alignment)."""
+    """Returns positions of residues of *chain* mapped onto residues of
+    *target* (map based on pairwise alignment or predefined alignment), with
+    -1 for unmapped residues, and numbers of matching and mapped residues."""
 
+    gap_chars = list(GAPCHARS)
+    gap_chars.append(NONE_A)
     if alignment is None:
-        if ALIGNMENT_METHOD == 'local':
-            alignments = alignBioPairwise(target.getSequence(),
-                                          chain.getSequence(),
-                                          "local",
-                                          MATCH_SCORE, MISMATCH_SCORE,
-                                          GAP_PENALTY,  GAP_EXT_PENALTY,
-                                          max_alignments=1)
-        else:
-            alignments = alignBioPairwise(target.getSequence(),
-                                          chain.getSequence(),
-                                          "global",
-                                          MATCH_SCORE, MISMATCH_SCORE,
-                                          GAP_PENALTY, GAP_EXT_PENALTY,
-                                          max_alignments=1)
-        alignment = alignments[0]
-        this, that = alignment[:2]
+        this = target.getSequence()
+        that = chain.getSequence()
+        tres = _getResiduePositions(this, gap_chars)
+        cres = _getResiduePositions(that, gap_chars)
+        mapping = np.asarray(_alignPairwise(this, that), int)
+
+        i = (tres >= 0).nonzero()[0]
+        j = mapping[i]
+        positions = np.full(len(target), -1, int)
+        positions[tres[i]] = np.where(j >= 0, cres[j], -1)
     else:
         def _findAlignment(sequence, alignment):
             for seq in alignment:
@@ -1375,31 +1647,23 @@ def getAlignedMapping(target, chain, alignment=None):
                         .format(chain.getTitle()))
             return None
 
-    amatch = []
-    bmatch = []
-    aiter = target.__iter__()
-    biter = chain.__iter__()
-    n_match = 0
-    n_mapped = 0
-    gap_chars = list(GAPCHARS)
-    gap_chars.append(NONE_A)
-    for i in range(len(this)):
-        a = this[i]
-        b = that[i]
-        if a not in gap_chars:
-            ares = next(aiter)
-            amatch.append(ares.getResidue())
-            if b not in gap_chars:
-                bres = next(biter)
-                bmatch.append(bres.getResidue())
-                if a == b:
-                    n_match += 1
-                n_mapped += 1
-            else:
-                bmatch.append(None)
-        elif b not in gap_chars:
-            bres = next(biter)
-    return amatch, bmatch, n_match, n_mapped
+        tres = _getResiduePositions(this, gap_chars)
+        cres = _getResiduePositions(that, gap_chars)
+        i = (tres >= 0).nonzero()[0]
+        positions = np.full(len(target), -1, int)
+        positions[tres[i]] = cres[i]
+
+    mapped = positions >= 0
+    n_mapped = np.count_nonzero(mapped)
+    if alignment is None:
+        n_match = np.count_nonzero(target._aas[mapped] ==
+                                   chain._aas[positions[mapped]])
+    else:
+        this = np.array(list(this), 'U1')
+        that = np.array(list(that), 'U1')
+        both = (tres >= 0) & (cres >= 0)
+        n_match = np.count_nonzero(this[both] == that[both])
+    return positions, n_match, n_mapped
 
 def getCEAlignMapping(target, chain):
     try:
@@ -1436,41 +1700,22 @@ def getCEAlignMapping(target, chain):
         return None
 
     paths, bestIdx, nres, rmsd = aln_info[:4]
-    path = paths[bestIdx]
-
-    tar_indices = []
-    chn_indices = []
-    for i, j in path:
-        # if i not in tar_dummies:
-        #     if j not in mob_dummies:
-        tar_indices.append(i)
-        chn_indices.append(j)
-
-    chain_res_list = [res for res in chain]
-
-    amatch = []
-    bmatch = []
-    n_match = 0
-    n_mapped = 0
-    for i, a in enumerate(target):
-        ares = a.getResidue()
-        amatch.append(ares)
-        if i in tar_indices:
-            n = tar_indices.index(i)
-            try:
-                b = chain_res_list[chn_indices[n]]
-            except IndexError:
-                bmatch.append(None)
-                continue
-            bres = b.getResidue()
-            bmatch.append(bres)
-            if a.getResname() == b.getResname():
-                n_match += 1
-            n_mapped += 1
-        else:
-            bmatch.append(None)
-
-    return amatch, bmatch, n_match, n_mapped
+    path = np.array(paths[bestIdx], int).reshape(-1, 2)
+
+    # the first occurrence of a target residue is used, and residues
+    # beyond the end of chain are left unmapped
+    tar_indices, first = np.unique(path[:, 0], return_index=True)
+    chn_indices = path[first, 1]
+    which = (tar_indices >= 0) & (tar_indices < len(target)) & \
+            (chn_indices < len(chain))
+    positions = np.full(len(target), -1, int)
+    positions[tar_indices[which]] = chn_indices[which]
+
+    mapped = positions >= 0
+    n_mapped = np.count_nonzero(mapped)
+    n_match = np.count_nonzero(target._aas[mapped] ==
+                               chain._aas[positions[mapped]])
+    return positions, n_match, n_mapped
 
 def combineAtomMaps(mappings, target=None, **kwargs):
     """Builds a grand :class:`.AtomMap` instance based on *mappings* obtained from 
@@ -1503,6 +1748,10 @@ def combineAtomMaps(mappings, target=None, **kwargs):
         Default is **None**
     :type least: int
 
+    :arg n_cpu: number of threads used for scoring candidate atommaps, default is
+        the number of CPUs
+    :type n_cpu: int
+
     :arg debug: a container (dict) that saves the following information for debugging purposes:
         * coverage: original coverage matrix, rows and columns correspond to the reference and the 
         mobile, respectively,
@@ -1511,6 +1760,14 @@ def combineAtomMaps(mappings, target=None, **kwargs):
         * rmsd: a list of ranked RMSDs of identified atommaps.
     :type debug: dict
 
+    Chains of *mobile* that are assigned to each chain of *target* are found by
+    solving the linear assignment problem on the coverage matrix.  When *mobile*
+    has more chains than *target*, each combination of assigned chains is a
+    candidate atommap.  If *target* has coordinates, candidates are scored by
+    their RMSD after superposition, which is calculated from sums over chain
+    pairs, and only those that may pass *rmsd_reject* and *drmsd* cutoffs are
+    built and ranked.  Combinations are searched chain by chain, and partial
+    combinations are dropped as soon as their RMSD bounds exceed the cutoffs.
     """
 
     BIG_NUMBER = 1e6
@@ -1518,35 +1775,32 @@ def combineAtomMaps(mappings, target=None, **kwargs):
     debug = kwargs.pop('debug', {})
     reject_rmsd = kwargs.pop('rmsd_reject', 15.)
     least_n_atommaps = kwargs.pop('least', None)
-    
-    def _build(mappings, nodes=[]):
-        m, n = mappings.shape
-        cov_matrix = np.zeros((m, n), dtype=float)
-        cost_matrix = np.zeros((m, n), dtype=float) 
-        for i in range(m):
-            for j in range(n):
-                mapping = mappings[i, j]
-                if mapping is None:
-                    cov_matrix[i, j] = 0  
-                    cost_matrix[i, j] = BIG_NUMBER
-                else:
-                    cov_matrix[i, j] = mapping[3] / 100.
-                    cost_matrix[i, j] = 1 - cov_matrix[i, j]
+    n_cpu = kwargs.pop('n_cpu', None)
 
+    def _build(nodes=[]):
         # uses LAP to find the optimal mappings of chains
-        atommaps = []
-        (R, C), crrpds = multilap(cost_matrix, nodes, BIG_NUMBER)
+        (R, C), _ = multilap(cost_matrix, nodes, BIG_NUMBER,
+                             combinations=False)
 
-        for row_ind, col_ind in crrpds:
-            if len(row_ind) != m:
-                continue
+        pool = [[] for _ in range(m)]
+        for r, c in zip(R, C):
+            if mapped[r, c]:
+                pool[r].append(c)
+
+        # if one of the chains failed to match then there is no atommap
+        if not all(pool):
+            combinations = []
+        elif target is not None and len(nodes) and stats is not None:
+            combinations = _searchAssignments(pool, stats, drmsd,
+                                              reject_rmsd, n_cpu)
+        else:
+            combinations = product(*pool)
+
+        atommaps = []
+        for cols in combinations:
             atommap = None
             title = ''
-            for r, c in zip(row_ind, col_ind):
-                # if one of the chains failed to match then discard the entire atommap
-                if mappings[r, c] is None: 
-                    atommap = None
-                    break
+            for r, c in enumerate(cols):
                 atommap_ = mappings[r, c][0]
                 title_ = '(' + atommap_.getTitle() + ')' 
                 if atommap is None:
@@ -1555,44 +1809,34 @@ def combineAtomMaps(mappings, target=None, **kwargs):
                 else:
                     atommap += atommap_
                     title = title_ + ' + ' + title
-            if atommap is not None:
-                atommap.setTitle(title)
-                atommaps.append(atommap)
+            atommap.setTitle(title)
+            atommaps.append((atommap, tuple(cols),
+                             set().union(*[segchids[r, c]
+                                           for r, c in enumerate(cols)])))
 
-        return atommaps, cov_matrix, (R, C)
+        return atommaps, (R, C)
 
     def _optimize(atommaps):
         # extract nonoverlaping mappings
         if len(atommaps):
-            atommaps, rmsds = rankAtomMaps(atommaps, target)
+            info = dict((id(atommap), (cols, segchids_))
+                        for atommap, cols, segchids_ in atommaps)
+            atommaps, rmsds = rankAtomMaps([atommap for atommap, _, _ in atommaps],
+                                           target)
 
             if rmsds is not None:
                 debug['rmsd'] = list(rmsds)
 
-                # if rmsd_cutoff is not None:
-                #     for i in reversed(range(len(atommaps))):
-                #         if rmsds[i] > rmsd_cutoff:
-                #             atommaps.pop(i)
-                #             rmsds.pop(i)
-
                 # pre-store chain IDs of atommaps
-                atommap_segchids = []
-                for atommap in atommaps:
-                    nodummies = atommap.select('not dummy')
-                    chids = nodummies.getChids()
-                    segids = nodummies.getSegnames()
-                    segchids = []
-                    for segid, chid in zip(segids, chids):
-                        if (segid, chid) not in segchids:
-                            segchids.append((segid, chid))
-                    atommap_segchids.append(segchids)
-                
+                atommap_segchids = [info[id(atommap)][1]
+                                    for atommap in atommaps]
+
                 atommaps_ = []
                 rmsd_standard = rmsds[0]
                 while len(atommaps):
                     atommap = atommaps.pop(0)
                     rmsd = rmsds.pop(0)
-                    segchids = atommap_segchids.pop(0)
+                    segchids_ = atommap_segchids.pop(0)
 
                     if reject_rmsd is not None:
                         if rmsd > reject_rmsd:
@@ -1601,21 +1845,22 @@ def combineAtomMaps(mappings, target=None, **kwargs):
                     if rmsd > rmsd_standard + drmsd:
                         break
 
-                    atommaps_.append(atommap)
+                    atommaps_.append((atommap, info[id(atommap)][0]))
 
                     # remove atommaps that share chains with the popped atommap
                     for i in reversed(range(len(atommap_segchids))):
-                        amsegchids = atommap_segchids[i]
-
-                        for segchid in amsegchids:
-                            if segchid in segchids:
-                                atommaps.pop(i)
-                                atommap_segchids.pop(i)
-                                break
+                        if atommap_segchids[i] & segchids_:
+                            atommaps.pop(i)
+                            rmsds.pop(i)
+                            atommap_segchids.pop(i)
 
                 atommaps = atommaps_
             else:
                 debug['rmsd'] = None
+                atommaps = [(atommap, info[id(atommap)][0])
+                            for atommap in atommaps]
+        else:
+            atommaps = []
 
         return atommaps
 
@@ -1634,16 +1879,35 @@ def combineAtomMaps(mappings, target=None, **kwargs):
     
     if mappings.ndim != 2:
         raise ValueError('mappings can only be either an 1-D or 2-D array')
-    
+
+    m, n = mappings.shape
+    mapped = np.array([mapping is not None for mapping in mappings.flat],
+                      dtype=bool).reshape(m, n)
+    cov_matrix = np.zeros((m, n), dtype=float)
+    cov_matrix[mapped] = [mapping[3] / 100. for mapping in mappings[mapped]]
+    cost_matrix = np.where(mapped, 1 - cov_matrix, BIG_NUMBER)
+
+    # segment names and chain identifiers of mapped atoms of each chain pair
+    segchids = np.empty((m, n), dtype='O')
+    for r, c in zip(*mapped.nonzero()):
+        atommap = mappings[r, c][0]
+        which = atommap.getFlags('mapped')
+        segnames = atommap.getSegnames()
+        if segnames is None:
+            segnames = np.zeros(len(which), dtype='U1')
+        segchids[r, c] = set(zip(segnames[which].tolist(),
+                                 atommap.getChids()[which].tolist()))
+
+    stats = None
+    if target is not None:
+        stats = _getSuperpositionStats(mappings, mapped, target)
+
     # build atommaps
     LOGGER.debug('Finding the atommaps based on their coverages...')
     nodes = []
-    atommaps, cov_matrix, (R, C) = _build(mappings, nodes)
+    atommaps, (R, C) = _build(nodes)
     if least_n_atommaps is None:
-        n_mapped = 0
-        for r, c in zip(R, C):
-            if cov_matrix[r, c] > 0:
-                n_mapped += 1
+        n_mapped = np.count_nonzero(cov_matrix[R, C] > 0)
         least_n_atommaps = int(np.floor(float(n_mapped) / mappings.shape[0]))
         LOGGER.debug('Identified that there exists %d atommap(s) potentially.'%least_n_atommaps)
 
@@ -1653,6 +1917,8 @@ def combineAtomMaps(mappings, target=None, **kwargs):
     # optimize atommaps based on superposition if target is given
     if target is not None and len(nodes):
         atommaps = _optimize(atommaps)
+        # atommaps are identified by the columns they are combined from
+        found = set(cols for _, cols in atommaps)
         i = 2
 
         if len(atommaps) < least_n_atommaps:
@@ -1663,13 +1929,14 @@ def combineAtomMaps(mappings, target=None, **kwargs):
             while len(atommaps) < least_n_atommaps:
                 LOGGER.update(i, label='_atommap_lap')
                 try:
-                    more_atommaps, _, _ = _build(mappings, nodes)
+                    more_atommaps, _ = _build(nodes)
                 except SolutionDepletionException:
                     break
                 more_atommaps = _optimize(more_atommaps)
                 for j in reversed(range(len(more_atommaps))):
-                    if more_atommaps[j] in atommaps:
+                    if more_atommaps[j][1] in found:
                         more_atommaps.pop(j)
+                found.update(cols for _, cols in more_atommaps)
                 if len(more_atommaps):
                     debug['solution'].append(i)
                 atommaps.extend(more_atommaps)
@@ -1678,6 +1945,9 @@ def combineAtomMaps(mappings, target=None, **kwargs):
             LOGGER.finish()
             LOGGER.report('%d atommaps were found in %%.2fs. %d requested'%(len(atommaps), least_n_atommaps), 
                           label='_atommap_lap')
+        atommaps = [atommap for atommap, _ in atommaps]
+    else:
+        atommaps = [atommap for atommap, _, _ in atommaps]
     
     if len(atommaps) == 0:
         if np.count_nonzero(cov_matrix) == 0:
@@ -1686,6 +1956,131 @@ def combineAtomMaps(mappings, target=None, **kwargs):
             LOGGER.warn('no atommaps were found. Consider inceasing rmsd_reject or drmsd')
     return atommaps
 
+
+def _getSuperpositionStats(mappings, mapped, target):
+    """Returns sums of weights, coordinates, squared coordinates and coordinate
+    products of mapped atoms of chain pairs in *mappings* and corresponding
+    atoms of *target*, or **None** if *target* does not match the atommaps
+    combined from *mappings*."""
+
+    coords0 = target.getCoords()
+    if coords0 is None:
+        return None
+
+    m, n = mappings.shape
+    lengths = np.zeros(m, int)
+    for r in range(m):
+        cols = mapped[r].nonzero()[0]
+        if len(cols):
+            lengths[r] = len(mappings[r, cols[0]][0])
+    if lengths.sum() != len(coords0):
+        return None
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    W = np.zeros((m, n))
+    Sx = np.zeros((m, n, 3))
+    Sy = np.zeros((m, n, 3))
+    Sxx = np.zeros((m, n))
+    Syy = np.zeros((m, n))
+    Sxy = np.zeros((m, n, 3, 3))
+    for r, c in zip(*mapped.nonzero()):
+        atommap = mappings[r, c][0]
+        weights = atommap.getFlags('mapped').astype(float)
+        if len(weights) != lengths[r]:
+            return None
+        x = atommap.getCoords()
+        y = coords0[offsets[r]:offsets[r+1]]
+        xw = x * weights[:, None]
+        yw = y * weights[:, None]
+        W[r, c] = weights.sum()
+        Sx[r, c] = xw.sum(0)
+        Sy[r, c] = yw.sum(0)
+        Sxx[r, c] = (xw * x).sum()
+        Syy[r, c] = (yw * y).sum()
+        Sxy[r, c] = np.dot(xw.T, y)
+    return W, Sx, Sy, Sxx, Syy, Sxy
+
+
+def _calcSuperposedErrors(W, Sx, Sy, Sxx, Syy, Sxy, n_cpu=None):
+    """Returns sums of squared deviations after optimal superposition for
+    stacks of sums returned by :func:`_getSuperpositionStats`."""
+
+    errors = np.zeros(len(W))
+
+    def calc(start, stop, thread):
+        w = W[start:stop]
+        w_ = np.where(w > 0, w, 1.)
+        sx = Sx[start:stop]
+        sy = Sy[start:stop]
+        cov = Sxy[start:stop] - sx[:, :, None] * sy[:, None, :] / w_[:, None, None]
+        e0 = (Sxx[start:stop] - (sx * sx).sum(1) / w_ +
+              Syy[start:stop] - (sy * sy).sum(1) / w_)
+        U, S, Vh = np.linalg.svd(cov)
+        d = np.sign(np.linalg.det(np.matmul(U, Vh)))
+        errors[start:stop] = np.maximum(
+            e0 - 2 * (S[:, 0] + S[:, 1] + d * S[:, 2]), 0.)
+
+    runThreads(calc, len(W), n_cpu, size=4096)
+    return errors
+
+
+def _searchAssignments(pool, stats, drmsd, reject_rmsd, n_cpu=None):
+    """Returns combinations of columns, one from each row of *pool*, whose
+    RMSD after superposition may be within *drmsd* of the lowest one and
+    not larger than *reject_rmsd*.  Combinations are returned in the order
+    they are yielded by :func:`itertools.product`."""
+
+    TOLERANCE = 1e-6
+    W, Sx, Sy, Sxx, Syy, Sxy = stats
+    m = len(pool)
+
+    # a combination of the chains that superpose best individually gives an
+    # upper bound on the lowest RMSD
+    best = []
+    for r, cols in enumerate(pool):
+        cols = np.array(cols)
+        errors = _calcSuperposedErrors(W[r, cols], Sx[r, cols], Sy[r, cols],
+                                       Sxx[r, cols], Syy[r, cols],
+                                       Sxy[r, cols], 1)
+        best.append(cols[np.argmin(errors / np.maximum(W[r, cols], 1.))])
+    rows = arange(m)
+    error = _calcSuperposedErrors(*[S[rows, best].sum(0)[None]
+                                    for S in stats], n_cpu=1)[0]
+    cutoff = np.sqrt(error / max(W[rows, best].sum(), 1.)) + drmsd
+    if reject_rmsd is not None:
+        cutoff = min(cutoff, reject_rmsd)
+    cutoff = (cutoff + TOLERANCE) ** 2
+
+    # total weight of atoms in remaining rows can be at most this much
+    wmax = np.array([W[r, cols].max() for r, cols in enumerate(pool)])
+    wrest = np.concatenate([np.cumsum(wmax[::-1])[::-1][1:], [0.]])
+
+    combinations = np.zeros((1, 0), int)
+    sums = [np.zeros((1,) + S.shape[2:]) for S in stats]
+    for r, cols in enumerate(pool):
+        cols = np.array(cols)
+        k = len(combinations)
+        combinations = np.column_stack([np.repeat(combinations, len(cols), 0),
+                                        np.tile(cols, k)])
+        sums = [np.repeat(s, len(cols), 0) + np.tile(S[r, cols],
+                                                    (k,) + (1,) * (S.ndim - 2))
+                for s, S in zip(sums, stats)]
+        # deviations of a subset of atoms after their own superposition
+        # cannot be larger than after superposition of all atoms
+        errors = _calcSuperposedErrors(*sums, n_cpu=n_cpu)
+        which = errors <= cutoff * (sums[0] + wrest[r])
+        combinations = combinations[which]
+        sums = [s[which] for s in sums]
+        errors = errors[which]
+
+    if len(combinations):
+        rmsds = np.sqrt(errors / np.maximum(sums[0], 1.))
+        cutoff = rmsds.min() + drmsd
+        if reject_rmsd is not None:
+            cutoff = min(cutoff, reject_rmsd)
+        combinations = combinations[rmsds <= cutoff + TOLERANCE]
+    return combinations.tolist()
+
 def rankAtomMaps(atommaps, target):
     """Ranks :class:`.AtomMap` instances from *atommaps* based on its RMSD 
     with *target*.
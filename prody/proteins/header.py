@@ -226,6 +226,169 @@ class DBRef(object):
 _START_COORDINATE_SECTION = set(['ATOM  ', 'MODEL ', 'HETATM'])
 
 
+class HeaderDict(dict):
+
+    """A dictionary of header data that parses the value of a header key only
+    when it is first accessed.  *lines* are header lines, grouped by record
+    type for PDB files, and *parsers* map header keys to functions that
+    parse their values from *lines*.  Like a dictionary of all parsed
+    values, a key is present only when its value is not **None**, and
+    chemical and polymer components can be accessed using their residue
+    names and chain identifiers, respectively.  Operations that need all
+    keys, such as iteration, parse all remaining values."""
+
+    def __init__(self, lines, parsers, pdbid=None):
+
+        dict.__init__(self)
+        self._lines = lines
+        self._parsers = dict(parsers)
+        self._pdbid = pdbid
+
+    def _parse(self, key):
+        """Parse value of *key* and set it, if it is not **None**."""
+
+        value = self._parsers.pop(key)(self._lines)
+        if value is None:
+            return
+        dict.__setitem__(self, key, value)
+        if key == 'chemicals':
+            polymers = set()
+            if 'polymers' not in self._parsers:
+                polymers.update(poly.chid for poly
+                                in dict.get(self, 'polymers', []))
+            for chem in value:
+                chem.pdbentry = self._pdbid
+                if chem.resname not in polymers:
+                    dict.__setitem__(self, chem.resname, chem)
+        elif key == 'polymers':
+            for poly in value:
+                poly.pdbentry = self._pdbid
+                dict.__setitem__(self, poly.chid, poly)
+
+    def _load(self, key=None):
+        """Parse value of *key*, or of all keys that are not parsed yet when
+        *key* is **None**."""
+
+        parsers = self._parsers
+        if key is None:
+            for each in list(parsers):
+                self._parse(each)
+        elif key in parsers:
+            self._parse(key)
+        elif parsers and not dict.__contains__(self, key):
+            # key may be a chemical residue name or a polymer chain id
+            for each in ('chemicals', 'polymers'):
+                if each in parsers:
+                    self._parse(each)
+
+    def __getitem__(self, key):
+
+        self._load(key)
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+
+        self._parsers.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+
+        self._load(key)
+        dict.__delitem__(self, key)
+
+    def __contains__(self, key):
+
+        self._load(key)
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+
+        self._load()
+        return dict.__iter__(self)
+
+    def __len__(self):
+
+        self._load()
+        return dict.__len__(self)
+
+    def __bool__(self):
+
+        while not dict.__len__(self) and self._parsers:
+            self._parse(next(iter(self._parsers)))
+        return dict.__len__(self) > 0
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+
+        self._load()
+        return dict.__repr__(self)
+
+    def __eq__(self, other):
+
+        self._load()
+        if isinstance(other, HeaderDict):
+            other._load()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __reduce__(self):
+
+        return dict, (self.copy(),)
+
+    def get(self, key, default=None):
+
+        self._load(key)
+        return dict.get(self, key, default)
+
+    def setdefault(self, key, default=None):
+
+        self._load(key)
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key, *default):
+
+        self._load(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+
+        self._load()
+        return dict.popitem(self)
+
+    def update(self, *args, **kwargs):
+
+        self._load()
+        dict.update(self, *args, **kwargs)
+
+    def keys(self):
+
+        self._load()
+        return dict.keys(self)
+
+    def values(self):
+
+        self._load()
+        return dict.values(self)
+
+    def items(self):
+
+        self._load()
+        return dict.items(self)
+
+    def copy(self):
+        """Returns a :class:`dict` with all header data."""
+
+        self._load()
+        return dict(dict.items(self))
+
+
 def cleanString(string, nows=False):
     """*nows* is no white space."""
 
@@ -304,7 +467,8 @@ def parsePDBHeader(pdb, *keys):
 
 def getHeaderDict(stream, *keys):
     """Returns header data in a dictionary.  *stream* may be a list of PDB lines
-    or a stream."""
+    or a stream.  Values are parsed only when they are first accessed, see
+    :class:`HeaderDict`."""
 
     lines = defaultdict(list)
     loc = 0
@@ -338,18 +502,7 @@ def getHeaderDict(stream, *keys):
         else:
             return tuple(keys), loc
     else:
-        header = {}
-        for key, func in _PDB_HEADER_MAP.items():  # PY3K: OK
-            value = func(lines)
-            if value is not None:
-                header[key] = value
-        for chem in header.get('chemicals', []):
-            chem.pdbentry = pdbid
-            header[chem.resname] = chem
-        for poly in header.get('polymers', []):
-            poly.pdbentry = pdbid
-            header[poly.chid] = poly
-        return header, loc
+        return HeaderDict(lines, _PDB_HEADER_MAP, pdbid), loc
 
 
 def _getBiomoltrans(lines):
@@ -1228,6 +1228,185 @@ def parseChainsList(filename):
 
     return ags, headers, chains
 
+def _formatNumbers(values, width, precision=0):
+    """Returns *values* formatted as with ``'%{width}.{precision}f'``, or with
+    ``'%{width}d'`` if *precision* is 0, in rows of an unsigned byte array.
+    Returns **None** if any value would not fit in *width* characters."""
+
+    values = np.asarray(values)
+    n_values = len(values)
+    int_width = width - precision - (1 if precision else 0)
+    if precision:
+        values = values.astype(float)
+        if not np.isfinite(values).all():
+            return None
+        if n_values and np.abs(values).max() >= 10 ** int_width:
+            return None
+        scaled = values * 10 ** precision
+        rounded = np.rint(scaled)
+        # scaled values that are close to halfway between two integers may
+        # not be rounded as Python rounds decimal representations
+        ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+        for i in ties.nonzero()[0]:
+            rounded[i] = float(('%.*f' % (precision, values[i])).replace('.', ''))
+        negative = np.signbit(values)
+    else:
+        if n_values and (values.max() >= 10 ** int_width or
+                         values.min() <= -10 ** (int_width - 1)):
+            return None
+        rounded = values
+        negative = values < 0
+    digits = np.abs(rounded).astype(np.int64)
+    whole = digits // 10 ** precision
+
+    n_digits = np.ones(n_values, int)
+    for k in range(1, int_width):
+        n_digits += whole >= 10 ** k
+    if (n_digits + negative > int_width).any():
+        return None
+
+    array = np.full((n_values, width), 32, np.uint8)
+    for k in range(precision):
+        array[:, width - 1 - k] = 48 + (digits // 10 ** k) % 10
+    last = width - 1
+    if precision:
+        array[:, width - 1 - precision] = 46
+        last = width - 2 - precision
+    for k in range(int_width):
+        which = n_digits > k
+        array[which, last - k] = 48 + (whole[which] // 10 ** k) % 10
+    which = negative.nonzero()[0]
+    array[which, last - n_digits[which]] = 45
+    return array
+
+
+def _formatStrings(values, width, left=False):
+    """Returns *values* justified in *width* characters, as with
+    ``'%-{width}s'`` if *left* is **True** and with ``'%{width}s'``
+    otherwise, in rows of an unsigned byte array.  Returns **None** if any
+    value is longer than *width* characters or is not ASCII."""
+
+    values = np.ascontiguousarray(values, dtype=str)
+    n_values = len(values)
+    array = np.full((n_values, width), 32, np.uint8)
+    size = values.dtype.itemsize // 4
+    if not size or not n_values:
+        return array
+
+    codes = values.view(np.uint32).reshape((n_values, size))
+    lengths = size - (codes[:, ::-1] != 0).argmax(1)
+    lengths[(codes == 0).all(1)] = 0
+    if lengths.max() > width or codes.max() > 127:
+        return None
+
+    size = min(size, width)
+    codes = codes[:, :size]
+    if left:
+        array[:, :size] = np.where(codes, codes, 32)
+        return array
+    columns = np.arange(width) - (width - lengths[:, None])
+    which = columns >= 0
+    array[which] = codes[np.nonzero(which)[0], columns[which]]
+    return array
+
+
+def _getPDBTemplates(hetero, atomnames, altlocs, resnames, chainids, resnums,
+                     icodes, occupancies, bfactors, segments, elements,
+                     charges):
+    """Returns fixed-width ATOM/HETATM, ANISOU and TER line templates with
+    all columns that do not change between models, or **None** if any value
+    does not fit in its columns."""
+
+    n_atoms = len(resnums)
+    if n_atoms > MAX_N_ATOM:
+        return None
+    columns = [(0, 6, _formatStrings(hetero, 6, True)),
+               (12, 16, _formatStrings(atomnames, 4, True)),
+               (16, 17, _formatStrings(altlocs, 1, True)),
+               (17, 20, _formatStrings(np.asarray(resnames, str).astype('U3'), 3, True)),
+               (20, 22, _formatStrings(np.asarray(chainids, str).astype('U1'), 2)),
+               (22, 26, _formatNumbers(resnums, 4)),
+               (26, 27, _formatStrings(icodes, 1, True)),
+               (54, 60, _formatNumbers(occupancies, 6, 2)),
+               (60, 66, _formatNumbers(bfactors, 6, 2)),
+               (72, 76, _formatStrings(segments, 4)),
+               (76, 78, _formatStrings(elements, 2)),
+               (78, 80, _formatStrings(charges, 2))]
+    chains = _formatStrings(chainids, 2)
+    if chains is None or any(column is None for _, _, column in columns):
+        return None
+
+    atomline = np.full((n_atoms, 81), 32, np.uint8)
+    atomline[:, 80] = 10
+    for start, stop, column in columns:
+        atomline[:, start:stop] = column
+
+    anisouline = atomline.copy()
+    anisouline[:, 0:6] = np.frombuffer(b'ANISOU', np.uint8)
+    anisouline[:, 20:22] = chains
+    anisouline[:, 27:72] = 32
+
+    terline = np.full((n_atoms, 81), 32, np.uint8)
+    terline[:, 80] = 10
+    terline[:, 0:3] = np.frombuffer(b'TER', np.uint8)
+    terline[:, 17:20] = atomline[:, 17:20]
+    terline[:, 20:22] = chains
+    terline[:, 22:26] = atomline[:, 22:26]
+    return atomline, anisouline, terline
+
+
+def _formatPDBModel(templates, serials, coords, anisous, ters, full_ter,
+                    blank_altlocs=False):
+    """Returns lines for atoms of a model as a string, or **None** if any
+    value does not fit in its columns.  *templates* are returned by
+    :func:`_getPDBTemplates` and *ters* marks atoms followed by a TER line."""
+
+    atomline, anisouline, terline = templates
+    n_atoms = len(atomline)
+    if len(coords) != n_atoms:
+        return None
+
+    serial = _formatNumbers(serials, 5)
+    xyz = _formatNumbers(np.asarray(coords).reshape(-1), 8, 3)
+    if serial is None or xyz is None:
+        return None
+    atoms = atomline.copy()
+    atoms[:, 6:11] = serial
+    atoms[:, 30:54] = xyz.reshape((n_atoms, 24))
+    if blank_altlocs:
+        atoms[:, 16] = 32
+
+    n_lines = 1 + ters.astype(int)
+    if anisous is not None:
+        uij = _formatNumbers(anisous.reshape(-1), 7)
+        if uij is None:
+            return None
+        n_lines += 1
+    starts = np.cumsum(n_lines) - n_lines
+
+    lines = np.empty((n_lines.sum(), 81), np.uint8)
+    lines[starts] = atoms
+    if anisous is not None:
+        anisou = anisouline.copy()
+        anisou[:, 6:11] = serial
+        anisou[:, 16] = atoms[:, 16]
+        anisou[:, 28:70] = uij.reshape((n_atoms, 42))
+        lines[starts + 1] = anisou
+
+    if ters.any():
+        ter = terline[ters]
+        if full_ter:
+            terserial = _formatNumbers(serials[ters] + 1, 5)
+            if terserial is None:
+                return None
+            ter[:, 6:11] = terserial
+        else:
+            ter[:, 3:80] = 32
+        lines[starts[ters] + n_lines[ters] - 1] = ter
+
+    return lines.tobytes().decode('ascii')
+
+
 def writePDBStream(stream, atoms, csets=None, **kwargs):
     """Write *atoms* in PDB format to a *stream*.
 
@@ -1324,9 +1503,8 @@ def writePDBStream(stream, atoms, csets=None, **kwargs):
     atomnames = atoms.getNames()
     if atomnames is None:
         raise ValueError('atom names are not set')
-    for i, an in enumerate(atomnames):
-        if len(an) < 4:
-            atomnames[i] = ' ' + an
+    short = (np.char.str_len(atomnames) < 4).nonzero()[0]
+    atomnames[short] = [' ' + atomnames[i] for i in short]
 
     s_or_u = np.array(['a']).dtype.char
 
@@ -1365,8 +1543,6 @@ def writePDBStream(stream, atoms, csets=None, **kwargs):
     elements = atoms._getElements()
     if elements is None:
         elements = np.zeros(n_atoms, s_or_u + '1')
-    else:
-        elements = np.char.rjust(elements, 2)
 
     segments = atoms._getSegnames()
     if segments is None:
@@ -1374,6 +1550,18 @@ def writePDBStream(stream, atoms, csets=None, **kwargs):
 
     charges = atoms._getCharges()
     charges2 = np.empty(n_atoms, s_or_u + '2')
+    if (charges is not None and s_or_u == 'U' and
+            np.isfinite(charges).all()):
+        # single digit charges are written as digit and sign, or as blanks
+        # if they are zero
+        ints = np.abs(charges.astype(int))
+        if (ints < 10).all():
+            codes = np.empty((n_atoms, 2), np.uint32)
+            codes[:, 0] = 48 + ints
+            codes[:, 1] = np.where(np.sign(charges) == -1, 45, 43)
+            codes[(ints == 0) & (codes[:, 1] == 43)] = 32
+            charges2 = codes.view('U2').ravel()
+            charges = None
     if charges is not None:
         for i, charge in enumerate(charges):
             charges2[i] = str(abs(int(charge)))
@@ -1448,6 +1636,32 @@ def writePDBStream(stream, atoms, csets=None, **kwargs):
     multi = len(coordsets) > 1
     write = stream.write
     num_ter_lines = 0
+
+    # lines of a model are formatted at once, unless some values need
+    # hybrid36 or hexadecimal formats or do not fit in their columns
+    templates = None
+    if not hybrid36:
+        templates = _getPDBTemplates(hetero, atomnames, altlocs, resnames,
+                                     chainids, resnums, icodes, occupancies,
+                                     bfactors, segments, elements, charges2)
+    if templates is not None:
+        resnames_ = np.asarray(resnames, str)
+        ters = np.zeros(n_atoms, bool)
+        amino = np.isin(resnames_, list(AAMAP))
+        if amino.any():
+            if isinstance(atoms, AtomGroup):
+                terflags = atoms._getFlags('pdbter')
+            else:
+                terflags = atoms._getFlags('selpdbter')
+            if terflags is not None:
+                ters = amino & terflags
+        n_ters = np.count_nonzero(ters)
+        ter_offsets = np.cumsum(ters) - ters
+        long_resname = None
+        if resnames_.dtype.itemsize > 12:
+            long_resname = (np.char.str_len(resnames_) > 3).nonzero()[0]
+            long_resname = long_resname[0] if len(long_resname) else None
+
     for m, coords in enumerate(coordsets):
 
         if had_atoms:
@@ -1459,173 +1673,185 @@ def writePDBStream(stream, atoms, csets=None, **kwargs):
         if multi:
             write('MODEL{0:9d}\n'.format(m+1))
 
-        if not hybrid36:
-            # We need to check whether serial and residue numbers become hexadecimal
-            reached_max_n_atom = False
-            reached_max_n_res = False
-
-            pdbline = PDBLINE_LT100K
-            anisouline = ANISOULINE_LT100K
+        lines = None
+        if templates is not None:
+            lines = _formatPDBModel(templates, serials + num_ter_lines + ter_offsets,
+                                    coords, anisous, ters, full_ter, m > 0)
+        if lines is not None:
+            if long_resname is not None:
+                LOGGER.warn('Resname {0} too long, cutting resname to 3 characters as {1}'.format(
+                    resnames[long_resname], resnames[long_resname][:3]
+                ))
+            write(lines)
+            num_ter_lines += n_ters
         else:
-            warned_hybrid36 = False
+            if not hybrid36:
+                # We need to check whether serial and residue numbers become hexadecimal
+                reached_max_n_atom = False
+                reached_max_n_res = False
 
-        warned_5_digit = False
-        warned_long_resname = False
+                pdbline = PDBLINE_LT100K
+                anisouline = ANISOULINE_LT100K
+            else:
+                warned_hybrid36 = False
 
-        for i, xyz in enumerate(coords):
+            warned_5_digit = False
+            warned_long_resname = False
 
-            serial = serials[i] + num_ter_lines
+            for i, xyz in enumerate(coords):
 
-            if hybrid36:
-                pdbline = PDBLINE_H36
-                anisouline = ANISOULINE_H36
+                serial = serials[i] + num_ter_lines
 
-                if not warned_hybrid36:
-                    LOGGER.warn('hybrid36 format is being used')
-                    warned_hybrid36 = True
+                if hybrid36:
+                    pdbline = PDBLINE_H36
+                    anisouline = ANISOULINE_H36
 
-            else:
-                if not (reached_max_n_atom or reached_max_n_res) and (i == MAX_N_ATOM or serial > MAX_N_ATOM):
-                    reached_max_n_atom = True
-                    pdbline = PDBLINE_GE100K
-                    anisouline = ANISOULINE_GE100K
-                    LOGGER.warn('Indices are exceeding 99999 and hexadecimal format is being used for indices')
-
-                elif not (reached_max_n_atom or reached_max_n_res) and resnums[i] > MAX_N_RES:
-                    reached_max_n_res = True
-                    pdbline = PDBLINE_GE10K
-                    anisouline = ANISOULINE_GE10K
-                    LOGGER.warn('Resnums are exceeding 9999 and hexadecimal format is being used for resnums')
-
-                elif reached_max_n_atom and not reached_max_n_res and resnums[i] > MAX_N_RES:
-                    reached_max_n_res = True
-                    pdbline = PDBLINE_GE100K_GE10K
-                    anisouline = ANISOULINE_GE100K_GE10K
-                    LOGGER.warn('Resnums are exceeding 9999 and hexadecimal format is being used for indices and resnums')
-
-                elif reached_max_n_res and not reached_max_n_atom and (i == MAX_N_ATOM or serial > MAX_N_ATOM):
-                    reached_max_n_atom = True
-                    pdbline = PDBLINE_GE100K_GE10K
-                    anisouline = ANISOULINE_GE100K_GE10K
-                    LOGGER.warn('Indices are exceeding 99999 and hexadecimal format is being used for indices and resnums')
-
-            if hybrid36:
-                serial = decToHybrid36(serial)
-                resnum = decToHybrid36(resnums[i], resnum=True)
-            else:
-                resnum = resnums[i]
-
-            resname = resnames[i]
-            if len(resnames[i]) > 3:
-                resname = resname[:3]
-                if not warned_long_resname:
-                    LOGGER.warn('Resname {0} too long, cutting resname to 3 characters as {1}'.format(
-                        resnames[i], resname
-                    ))
-                    warned_long_resname = True
-
-            if pdbline == PDBLINE_LT100K or hybrid36:
-                if len(str(resnum)) == 5:
-                    if icodes[i] == '':
-                        icodes[i] = str(resnum)[4]
+                    if not warned_hybrid36:
+                        LOGGER.warn('hybrid36 format is being used')
+                        warned_hybrid36 = True
 
+                else:
+                    if not (reached_max_n_atom or reached_max_n_res) and (i == MAX_N_ATOM or serial > MAX_N_ATOM):
+                        reached_max_n_atom = True
+                        pdbline = PDBLINE_GE100K
+                        anisouline = ANISOULINE_GE100K
+                        LOGGER.warn('Indices are exceeding 99999 and hexadecimal format is being used for indices')
+
+                    elif not (reached_max_n_atom or reached_max_n_res) and resnums[i] > MAX_N_RES:
+                        reached_max_n_res = True
+                        pdbline = PDBLINE_GE10K
+                        anisouline = ANISOULINE_GE10K
+                        LOGGER.warn('Resnums are exceeding 9999 and hexadecimal format is being used for resnums')
+
+                    elif reached_max_n_atom and not reached_max_n_res and resnums[i] > MAX_N_RES:
+                        reached_max_n_res = True
+                        pdbline = PDBLINE_GE100K_GE10K
+                        anisouline = ANISOULINE_GE100K_GE10K
+                        LOGGER.warn('Resnums are exceeding 9999 and hexadecimal format is being used for indices and resnums')
+
+                    elif reached_max_n_res and not reached_max_n_atom and (i == MAX_N_ATOM or serial > MAX_N_ATOM):
+                        reached_max_n_atom = True
+                        pdbline = PDBLINE_GE100K_GE10K
+                        anisouline = ANISOULINE_GE100K_GE10K
+                        LOGGER.warn('Indices are exceeding 99999 and hexadecimal format is being used for indices and resnums')
+
+                if hybrid36:
+                    serial = decToHybrid36(serial)
+                    resnum = decToHybrid36(resnums[i], resnum=True)
+                else:
+                    resnum = resnums[i]
+
+                resname = resnames[i]
+                if len(resnames[i]) > 3:
+                    resname = resname[:3]
+                    if not warned_long_resname:
+                        LOGGER.warn('Resname {0} too long, cutting resname to 3 characters as {1}'.format(
+                            resnames[i], resname
+                        ))
+                        warned_long_resname = True
+
+                if pdbline == PDBLINE_LT100K or hybrid36:
+                    if len(str(resnum)) == 5:
+                        if icodes[i] == '':
+                            icodes[i] = str(resnum)[4]
+
+                            if not warned_5_digit:
+                                LOGGER.warn('Storing 5-digit resnums using insertion codes')
+                                warned_5_digit = True
+                        else:
+                            LOGGER.warn('Truncating 5-digit resnum as insertion code is busy.')
+
+                        resnum = int(str(resnum)[:4])
+
+                    elif len(str(resnum)) > 5:
                         if not warned_5_digit:
-                            LOGGER.warn('Storing 5-digit resnums using insertion codes')
+                            LOGGER.warn('Truncating {0}-digit resnum as too long to be '
+                                        'supported by insertion code.'.format(len(str(resnum))))
                             warned_5_digit = True
-                    else:
-                        LOGGER.warn('Truncating 5-digit resnum as insertion code is busy.')
 
-                    resnum = int(str(resnum)[:4])
+                        resnum = int(str(resnum)[:4])
+                else:
+                    final_resnum = '%4x' % int(resnum)
 
-                elif len(str(resnum)) > 5:
-                    if not warned_5_digit:
-                        LOGGER.warn('Truncating {0}-digit resnum as too long to be '
-                                    'supported by insertion code.'.format(len(str(resnum))))
-                        warned_5_digit = True
+                    if len(str(final_resnum)) == 5:
+                        if icodes[i] == '':
+                            icodes[i] = str(final_resnum)[4]
 
-                    resnum = int(str(resnum)[:4])
-            else:
-                final_resnum = '%4x' % int(resnum)
+                            if not warned_5_digit:
+                                LOGGER.warn('Storing 5-digit hex resnums using insertion codes')
+                                warned_5_digit = True
+                        else:
+                            LOGGER.warn('Truncating 5-digit hex resnum as insertion code is busy.')
 
-                if len(str(final_resnum)) == 5:
-                    if icodes[i] == '':
-                        icodes[i] = str(final_resnum)[4]
+                        resnum = int(str(final_resnum)[:4], 16)
 
+                    elif len(str(final_resnum)) > 5:
                         if not warned_5_digit:
-                            LOGGER.warn('Storing 5-digit hex resnums using insertion codes')
+                            LOGGER.warn('Truncating {0}-digit hex resnum ({1}) as too long to be '
+                                        'supported by insertion code.'.format(len(str(final_resnum)), 
+                                                                              final_resnum))
                             warned_5_digit = True
-                    else:
-                        LOGGER.warn('Truncating 5-digit hex resnum as insertion code is busy.')
 
-                    resnum = int(str(final_resnum)[:4], 16)
+                        resnum = int(str(final_resnum)[:4], 16)
 
-                elif len(str(final_resnum)) > 5:
-                    if not warned_5_digit:
-                        LOGGER.warn('Truncating {0}-digit hex resnum ({1}) as too long to be '
-                                    'supported by insertion code.'.format(len(str(final_resnum)), 
-                                                                          final_resnum))
-                        warned_5_digit = True
 
-                    resnum = int(str(final_resnum)[:4], 16)
+                write(pdbline % (hetero[i], serial,
+                                 atomnames[i], altlocs[i],
+                                 resname, chainids[i][:1], resnum,
+                                 icodes[i],
+                                 xyz[0], xyz[1], xyz[2],
+                                 occupancies[i], bfactors[i],
+                                 segments[i], elements[i], charges2[i]))
 
+                if anisous is not None:
+                    anisou = anisous[i]
 
-            write(pdbline % (hetero[i], serial,
-                             atomnames[i], altlocs[i],
-                             resname, chainids[i][:1], resnum,
-                             icodes[i],
-                             xyz[0], xyz[1], xyz[2],
-                             occupancies[i], bfactors[i],
-                             segments[i], elements[i], charges2[i]))
+                    write(anisouline % ("ANISOU", serial,
+                                        atomnames[i], altlocs[i],
+                                        resname, chainids[i], resnum,
+                                        icodes[i],
+                                        anisou[0], anisou[1], anisou[2],
+                                        anisou[3], anisou[4], anisou[5],
+                                        segments[i], elements[i], charges2[i]))
 
-            if anisous is not None:
-                anisou = anisous[i]
-
-                write(anisouline % ("ANISOU", serial,
-                                    atomnames[i], altlocs[i],
-                                    resname, chainids[i], resnum,
-                                    icodes[i],
-                                    anisou[0], anisou[1], anisou[2],
-                                    anisou[3], anisou[4], anisou[5],
-                                    segments[i], elements[i], charges2[i]))
-
-            if isinstance(atoms, AtomGroup):
-                if resnames[i] in AAMAP and atoms._getFlags('pdbter') is not None and atoms.getFlags('pdbter')[i]:
-                    if hybrid36:
-                        serial = decToHybrid36(hybrid36ToDec(serial) + 1)
-                    else:
-                        serial += 1
-
-                    if full_ter:
-                        false_pdbline = pdbline % ("TER   ", serial,
-                                                   "", "",
-                                                   resname, chainids[i], resnum,
-                                                   icodes[i],
-                                                   xyz[0], xyz[1], xyz[2],
-                                                   occupancies[i], bfactors[i],
-                                                   segments[i], elements[i], charges2[i])
-                    else:
-                        false_pdbline = "TER" + " "*23
-                    write(false_pdbline[:26] + " "*54 + '\n')
-                    num_ter_lines += 1
-            else:
-                if resnames[i] in AAMAP and atoms._getFlags('selpdbter') is not None and atoms.getFlags('selpdbter')[i]:
-                    if hybrid36:
-                        serial = decToHybrid36(hybrid36ToDec(serial) + 1)
-                    else:
-                        serial += 1
-
-                    if full_ter:
-                        false_pdbline = pdbline % ("TER   ", serial,
-                                                   "", "",
-                                                   resname, chainids[i], resnum,
-                                                   icodes[i],
-                                                   xyz[0], xyz[1], xyz[2],
-                                                   occupancies[i], bfactors[i],
-                                                   segments[i], elements[i], charges2[i])
-                    else:
-                        false_pdbline = "TER" + " "*23
-                    write(false_pdbline[:26] + " "*54 + '\n')
-                    num_ter_lines += 1
+                if isinstance(atoms, AtomGroup):
+                    if resnames[i] in AAMAP and atoms._getFlags('pdbter') is not None and atoms.getFlags('pdbter')[i]:
+                        if hybrid36:
+                            serial = decToHybrid36(hybrid36ToDec(serial) + 1)
+                        else:
+                            serial += 1
+
+                        if full_ter:
+                            false_pdbline = pdbline % ("TER   ", serial,
+                                                       "", "",
+                                                       resname, chainids[i], resnum,
+                                                       icodes[i],
+                                                       xyz[0], xyz[1], xyz[2],
+                                                       occupancies[i], bfactors[i],
+                                                       segments[i], elements[i], charges2[i])
+                        else:
+                            false_pdbline = "TER" + " "*23
+                        write(false_pdbline[:26] + " "*54 + '\n')
+                        num_ter_lines += 1
+                else:
+                    if resnames[i] in AAMAP and atoms._getFlags('selpdbter') is not None and atoms.getFlags('selpdbter')[i]:
+                        if hybrid36:
+                            serial = decToHybrid36(hybrid36ToDec(serial) + 1)
+                        else:
+                            serial += 1
+
+                        if full_ter:
+                            false_pdbline = pdbline % ("TER   ", serial,
+                                                       "", "",
+                                                       resname, chainids[i], resnum,
+                                                       icodes[i],
+                                                       xyz[0], xyz[1], xyz[2],
+                                                       occupancies[i], bfactors[i],
+                                                       segments[i], elements[i], charges2[i])
+                        else:
+                            false_pdbline = "TER" + " "*23
+                        write(false_pdbline[:26] + " "*54 + '\n')
+                        num_ter_lines += 1
 
         if multi:
             write('ENDMDL' + " "*74 + '\n')
@@ -13,6 +13,7 @@ MSA IO
 
   * :class:`.MSAFile` - read/write MSA files in FASTA/SELEX/Stockholm formats
   * :func:`.parseMSA` - parse MSA files
+  * :func:`.iterMSAChunks` - iterate over chunks of large MSA files
   * :func:`.writeMSA` - parse MSA files
 
 Editing
@@ -37,6 +38,10 @@ Analysis
   * :func:`.applyMutinfoNorm` - apply normalization to mutual information
     matrix
   * :func:`.calcMeff` - calculate sequence weights
+  * :class:`.MSACountAccumulator` - accumulate residue counts over chunks
+  * :class:`.MSAPairCountAccumulator` - accumulate residue pair counts for
+    mutual information and OMES
+  * :class:`.MSAMeffAccumulator` - accumulate sequence weights over chunks
   * :func:`.calcRankorder` - rank order scores
 
 
@@ -8,13 +8,15 @@ import os
 
 from numpy import dtype, zeros, empty, ones, where, ceil, shape, eye
 from numpy import indices, tril_indices, array, ndarray, isscalar, unique
+from numpy import uint8, uint64, exp, log, bincount, arange, bitwise_or
+from numpy import triu_indices, matmul, minimum, maximum, intp
 
 from prody import LOGGER
 from prody.utilities import which, MATCH_SCORE, MISMATCH_SCORE
 from prody.utilities import GAP_PENALTY, GAP_EXT_PENALTY, ALIGNMENT_METHOD
-from prody.utilities import alignBioPairwise
+from prody.utilities import alignBioPairwise, runThreads
 
-from prody.sequence.msa import MSA, refineMSA
+from prody.sequence.msa import MSA, refineMSA, _INDEX, NUMCHARS
 from prody.sequence.msafile import parseMSA, writeMSA
 from prody.sequence.sequence import Sequence
 from prody.atomic import Atomic
@@ -25,9 +27,12 @@ import sys
 __all__ = ['calcShannonEntropy', 'buildMutinfoMatrix', 'calcMSAOccupancy',
            'applyMutinfoCorr', 'applyMutinfoNorm', 'calcRankorder', 'filterRankedPairs',
            'buildSeqidMatrix', 'uniqueSequences', 'buildOMESMatrix',
-           'buildSCAMatrix', 'buildDirectInfoMatrix', 'calcMeff', 
+           'buildSCAMatrix', 'buildDirectInfoMatrix', 'calcMeff',
+           'MSACountAccumulator', 'MSAPairCountAccumulator',
+           'MSAMeffAccumulator',
            'buildPCMatrix', 'buildMSA', 'showAlignment', 'alignTwoSequencesWithBiopython', 
            'alignSequenceToMSA', 'calcPercentIdentities', 'alignSequencesByChain',
+           'alignPairwise',
            'trimAtomsUsingMSA']
 
 
@@ -53,11 +58,13 @@ def calcPercentIdentities(msa):
 
     return percent_ids
 
-def getMSA(msa):
-    """Returns MSA character array."""
+def getMSA(msa, encoded=False):
+    """Returns MSA character array.  When *encoded* is **True**, the cached
+    uint8 encoding of an :class:`.MSA` instance is returned instead and uint8
+    arrays from :meth:`.MSA.getEncoded` are accepted."""
 
     try:
-        msa = msa._getArray()
+        msa = msa._getEncoded() if encoded else msa._getArray()
     except AttributeError:
         pass
 
@@ -66,7 +73,8 @@ def getMSA(msa):
     except AttributeError:
         raise TypeError('msa must be an MSA instance or a 2D character array')
 
-    if dtype_ != dtype('|S1') or ndim != 2:
+    if ndim != 2 or not (dtype_ == dtype('|S1') or
+                         encoded and dtype_ == dtype(uint8)):
         raise TypeError('msa must be an MSA instance or a 2D character array')
 
     return msa
@@ -94,7 +102,7 @@ def calcShannonEntropy(msa, ambiguity=True, omitgaps=True, **kwargs):
       * as a distinct character with its own probability, when *omitgaps* is
         **False**"""
 
-    msa = getMSA(msa)
+    msa = getMSA(msa, encoded=True)
     length = msa.shape[1]
     entropy = empty(length, float)
     from .msatools import msaentropy
@@ -125,9 +133,19 @@ def buildMutinfoMatrix(msa, ambiguity=True, turbo=True, **kwargs):
     Mutual information matrix can be normalized or corrected using
     :func:`applyMINormalization` and :func:`applyMICorrection` methods,
     respectively.  Normalization by joint entropy can performed using this
-    function with *norm* option set **True**."""
+    function with *norm* option set **True**.
 
-    msa = getMSA(msa)
+    Counts are weighted by *weights*, e.g. sequence weights returned by
+    :func:`.calcMeff`, when given, using :class:`.MSAPairCountAccumulator`."""
+
+    msa = getMSA(msa, encoded=True)
+
+    weights = kwargs.get('weights')
+    if weights is not None:
+        counts = MSAPairCountAccumulator(n_cpu=kwargs.get('n_cpu'))
+        counts.update(msa, weights)
+        return counts.calcMutinfoMatrix(ambiguity,
+                                        norm=bool(kwargs.get('norm', False)))
 
     from .msatools import msamutinfo
     LOGGER.timeit('_mutinfo')
@@ -155,7 +173,7 @@ def calcMSAOccupancy(msa, occ='res', count=False):
 
     from .msatools import msaocc
 
-    msa = getMSA(msa)
+    msa = getMSA(msa, encoded=True)
 
     try:
         dim = occ.startswith('res') or occ.startswith('col')
@@ -210,20 +228,22 @@ def applyMutinfoNorm(mutinfo, entropy, norm='sument'):
     except AttributeError:
         raise TypeError('norm must be a string')
 
+    i_val = entropy[:, None]
+    j_val = entropy[None, :]
     if sw('sument'):
-        norm = lambda i_val, j_val, val: i_val + j_val
+        div = i_val + j_val
 
     elif sw('minent'):
-        norm = lambda i_val, j_val, val: min(i_val, j_val)
+        div = minimum(i_val, j_val)
 
     elif sw('maxent'):
-        norm = lambda i_val, j_val, val: max(i_val, j_val)
+        div = maximum(i_val, j_val)
 
     elif sw('mincon'):
-        norm = lambda i_val, j_val, val: min(i_val - val, j_val - val)
+        div = minimum(i_val - mutinfo, j_val - mutinfo)
 
     elif sw('maxcon'):
-        norm = lambda i_val, j_val, val: max(i_val - val, j_val - val)
+        div = maximum(i_val - mutinfo, j_val - mutinfo)
 
     elif sw('joint'):
         raise ValueError('for joint entropy normalization, use '
@@ -232,15 +252,9 @@ def applyMutinfoNorm(mutinfo, entropy, norm='sument'):
         raise ValueError('norm={0} is not a valid normalization type'
                          .format(norm))
 
-    mi = mutinfo.copy()
-    for i, i_val in enumerate(entropy):
-        for j, j_val in enumerate(entropy):
-            val = mi[i, j]
-            div = norm(i_val, j_val, val)
-            if div == 0:
-                mi[i, j] = 0
-            else:
-                mi[i, j] /= div
+    zero = div == 0
+    mi = mutinfo / where(zero, 1, div)
+    mi[zero] = 0
 
     return mi
 
@@ -269,15 +283,12 @@ def applyMutinfoCorr(mutinfo, corr='prod'):
     avg_mipos = mutinfo.sum(1) / (shape[0] - 1)
     avg_mi = avg_mipos.mean()
 
-    mi = mutinfo.copy()
+    i_avg = avg_mipos[:, None]
+    j_avg = avg_mipos[None, :]
     if sw('prod') or sw('apc'):
-        for i, i_avg in enumerate(avg_mipos):
-            for j, j_avg in enumerate(avg_mipos):
-                mi[i, j] -= (i_avg * j_avg) / avg_mi
+        mi = mutinfo - (i_avg * j_avg) / avg_mi
     elif sw('sum') or sw('asc'):
-        for i, i_avg in enumerate(avg_mipos):
-            for j, j_avg in enumerate(avg_mipos):
-                mi[i, j] -= i_avg + j_avg - avg_mi
+        mi = mutinfo - (i_avg + j_avg - avg_mi)
     else:
         raise ValueError('correction must be prod or sum, not ' + corr)
 
@@ -360,40 +371,81 @@ def filterRankedPairs(pdb, indices, msa_indices, rank_row, rank_col, zscore_sort
     
     return pairList
 
-def buildSeqidMatrix(msa, turbo=True):
-    """Returns sequence identity matrix for *msa*."""
+def buildSeqidMatrix(msa, turbo=True, **kwargs):
+    """Returns sequence identity matrix for *msa*.  Sequences are compared
+    in a packed encoding, and blocks of rows are calculated concurrently
+    using *n_cpu* threads, which is the number of CPUs by default.  *turbo*
+    is accepted for backwards compatibility and has no effect."""
 
-    msa = getMSA(msa)
+    msa = getMSA(msa, encoded=True)
 
     LOGGER.timeit('_seqid')
     from .seqtools import msaeye
 
     dim = msa.shape[0]
-    seqid = msaeye(msa, ones((dim, dim), float), turbo=bool(turbo))
+    seqs, occs = _packMSA(_INDEX.take(_getCodes(msa)))
+    seqid = zeros((dim, dim), float)
+    runThreads(lambda start, stop, thread:
+                msaeye(seqs, occs, seqid, start=start, stop=stop),
+                dim, kwargs.get('n_cpu'))
 
     LOGGER.report('Sequence identity matrix was calculated in %.2fs.',
                   '_seqid')
     return seqid
 
-buildSeqidMatrix.__doc__ += doc_turbo
-
 
 def uniqueSequences(msa, seqid=0.98, turbo=True):
     """Returns a boolean array marking unique sequences in *msa*.  A sequence
     sharing sequence identity of *seqid* or more with another sequence coming
-    before itself in *msa* will have a **True** value in the array."""
+    before itself in *msa* will have a **True** value in the array.  Each
+    sequence is compared to preceding unique sequences until a similar one
+    is found, and comparison of a pair stops once mismatches rule out
+    reaching *seqid*.  *turbo* is accepted for backwards compatibility and
+    has no effect."""
 
-    msa = getMSA(msa)
+    msa = getMSA(msa, encoded=True)
 
-    from .seqtools import msaeye
+    from .seqtools import msaunique
 
     if not (0 < seqid <= 1):
         raise ValueError('seqid must satisfy 0 < seqid <= 1')
 
-    return msaeye(msa, zeros(msa.shape[0], bool),
-                  unique=seqid, turbo=bool(turbo))
+    seqs, occs = _packMSA(_INDEX.take(_getCodes(msa)))
+    unique = zeros(msa.shape[0], bool)
+    msaunique(seqs, occs, unique, unique=seqid)
+    return unique
+
+
+def _getCodes(msa):
+    """Returns uint8 codes for *msa* returned by :func:`getMSA`."""
 
-uniqueSequences.__doc__ += doc_turbo
+    if msa.dtype == uint8:
+        return msa
+    from .msa import _encodeMSA
+    return _encodeMSA(msa)
+
+
+def _packMSA(codes):
+    """Returns *codes*, which must be less than 32, packed into 5 bit fields
+    of 64-bit words, 12 residues per word, and words marking fields of
+    non-zero codes, as compared by the :mod:`.seqtools` kernels."""
+
+    number, length = codes.shape
+    words = (length + 11) // 12
+    shifts = arange(0, 60, 5, dtype=uint64)
+    seqs = empty((number, words), uint64)
+    occs = empty((number, words), uint64)
+    step = max(1, 2**20 // (words * 12))
+    block = zeros((min(step, number), words * 12), uint64)
+    for start in range(0, number, step):
+        rows = codes[start:start+step]
+        n = len(rows)
+        block[:n, :length] = rows
+        fields = block[:n].reshape((n, words, 12))
+        seqs[start:start+n] = bitwise_or.reduce(fields << shifts, 2)
+        occs[start:start+n] = bitwise_or.reduce(
+            (fields != 0).astype(uint64) << shifts, 2)
+    return seqs, occs
 
 
 def calcRankorder(matrix, zscore=False, **kwargs):
@@ -475,9 +527,18 @@ def buildOMESMatrix(msa, ambiguity=True, turbo=True, **kwargs):
     Selenocysteine (**U**, Sec) and pyrrolysine (**O**, Pyl) are considered
     as distinct amino acids.  When *ambiguity* is set **False**, all alphabet
     characters as considered as distinct types.  All non-alphabet characters
-    are considered as gaps."""
+    are considered as gaps.
 
-    msa = getMSA(msa)
+    Counts are weighted by *weights*, e.g. sequence weights returned by
+    :func:`.calcMeff`, when given, using :class:`.MSAPairCountAccumulator`."""
+
+    msa = getMSA(msa, encoded=True)
+
+    weights = kwargs.get('weights')
+    if weights is not None:
+        counts = MSAPairCountAccumulator(n_cpu=kwargs.get('n_cpu'))
+        counts.update(msa, weights)
+        return counts.calcOMESMatrix(ambiguity)
 
     from .msatools import msaomes
     LOGGER.timeit('_omes')
@@ -515,7 +576,7 @@ def buildSCAMatrix(msa, turbo=True, **kwargs):
     characters as considered as distinct types.  All non-alphabet characters
     are considered as gaps."""
 
-    msa = getMSA(msa)
+    msa = getMSA(msa, encoded=True)
     if msa.shape[0]<100:
         LOGGER.warning('SCA performs the best with higher number of sequences, and '
                        'minimal number of sequences is recommended as 100.')
@@ -576,28 +637,72 @@ def buildDirectInfoMatrix(msa, seqid=.8, pseudo_weight=.5, refine=False,
     Sequences are not refined by default. When *refine* is set **True**,
     the MSA will be refined by the first sequence and the shape of direct
     information matrix will be smaller.
+
+    :arg method: ``'mf'`` (default) for mean-field DCA, where the inverse
+        of the correlation matrix gives couplings, or ``'plm'`` for
+        asymmetric pseudo-likelihood maximization (plmDCA), which fits
+        couplings site by site without forming the correlation matrix
+    :type method: str
+
+    :arg dtype: precision of the correlation matrix in mean-field DCA,
+        ``'float32'`` halves memory usage, default is ``float``
+    :type dtype: type, str
+
+    :arg lambda_h: regularization strength for fields in plmDCA,
+        default is 0.01
+    :type lambda_h: float
+
+    :arg lambda_J: regularization strength for couplings in plmDCA,
+        default is 0.01
+    :type lambda_J: float
+
+    :arg n_cpu: number of threads used for fitting sites in plmDCA, default
+        is the number of CPUs
+    :type n_cpu: int
+
+    The correlation matrix of mean-field DCA is inverted in place using
+    Cholesky decomposition, so memory usage is a single (L*q)x(L*q) array
+    for L columns and q amino acid types.
     """
 
-    msa = getMSA(msa)
-    from .msatools import msadipretest, msadirectinfo1, msadirectinfo2
-    from numpy import matrix
+    msa = getMSA(msa, encoded=True)
+    method = str(kwargs.get('method', 'mf')).lower()
+    if method not in ('mf', 'plm'):
+        raise ValueError('method must be mf or plm')
 
     LOGGER.timeit('_di')
     if msa.shape[0]<250:
         LOGGER.warning('DI performs the best with higher number of sequences, and '
                        'minimal number of sequences is recommended as 250.')
+    if method == 'plm':
+        di = _buildDirectInfoPLM(msa, seqid, pseudo_weight, refine, **kwargs)
+        LOGGER.report('DI matrix was calculated in %.2fs.', '_di')
+        return di
+
+    from .msatools import msadipretest, msadirectinfo1, msadirectinfo2
+
+    dtype_ = dtype(kwargs.get('dtype', float))
+    if dtype_ not in (dtype('float64'), dtype('float32')):
+        raise ValueError('dtype must be float64 or float32')
+
     refine = 1 if refine else 0
     # msadipretest get some parameter from msa to set matrix size
     length, q = msadipretest(msa, refine=refine)
-    c = matrix.dot(matrix(zeros((length*q, 1), float)),
-                   matrix(zeros((1, length*q), float)))
+    c = empty((length*q, length*q), dtype_)
     prob = zeros((length, q+1), float)
     # msadirectinfo1 return c to be inversed and prob to be used
     meff, n, length, c, prob = msadirectinfo1(msa, c, prob, theta=1.-seqid,
                                               pseudocount_weight=pseudo_weight,
                                               refine=refine, q=q+1)
 
-    c = c.I
+    if not _invertCorrelation(c):
+        LOGGER.warning('Correlation matrix is not positive definite, '
+                       'LU decomposition will be used for inversion.')
+        from scipy.linalg import inv
+        meff, n, length, c, prob = msadirectinfo1(
+            msa, c, prob, theta=1.-seqid, pseudocount_weight=pseudo_weight,
+            refine=refine, q=q+1)
+        c[:] = inv(c, overwrite_a=True, check_finite=False)
 
     di = zeros((length, length), float)
     # get final DI
@@ -607,6 +712,180 @@ def buildDirectInfoMatrix(msa, seqid=.8, pseudo_weight=.5, refine=False,
     return di
 
 
+def _invertCorrelation(c):
+    """Invert symmetric positive definite matrix *c* in place using Cholesky
+    decomposition.  Only the upper triangle of *c* holds the inverse upon
+    return, which is all that :func:`msadirectinfo2` reads.  Returns
+    **False** if *c* is not positive definite."""
+
+    from numpy import may_share_memory
+    from scipy.linalg import get_lapack_funcs
+
+    potrf, potri = get_lapack_funcs(('potrf', 'potri'), (c,))
+    # upper triangle of C ordered c is the lower triangle of Fortran ordered
+    # c.T, which LAPACK overwrites without making a copy
+    ct, info = potrf(c.T, lower=1, clean=0, overwrite_a=1)
+    if info:
+        return False
+    ct, info = potri(ct, lower=1, overwrite_c=1)
+    if info:
+        return False
+    if not may_share_memory(ct, c):
+        c[:] = ct.T
+    return True
+
+
+# plmDCA uses the same 21 states as msadirectinfo1, standard amino acids as
+# 1-20 and gaps, lower case and ambiguous characters as 0
+_DCA_STATES = zeros(256, uint8)
+_DCA_STATES[1:27] = [1, 0, 2, 3, 4, 5, 6, 7, 8, 0, 9, 10, 11, 12,
+                     0, 13, 14, 15, 16, 17, 0, 18, 19, 0, 20, 0]
+
+
+def _buildDirectInfoPLM(msa, seqid, pseudo_weight, refine, **kwargs):
+    """Returns direct information matrix calculated from couplings fitted by
+    asymmetric pseudo-likelihood maximization."""
+
+    from numpy import arange, concatenate, float32
+    from scipy.sparse import csr_matrix
+    from scipy.optimize import minimize
+
+    msa = _getCodes(msa)
+    meff, w = calcMeff(msa, seqid=seqid, refine=refine, weight=True)
+    w = w / meff
+    if refine:
+        msa = msa[:, ((0 < msa[0]) & (msa[0] < 27)).nonzero()[0]]
+    number, length = msa.shape
+    q = 21
+    states = _DCA_STATES.take(msa)
+
+    # one-hot encoding of the MSA as a sparse matrix, each row has a single
+    # non-zero element for each column of the MSA
+    onehot = csr_matrix((ones(number * length),
+                         (arange(length) * q + states).ravel(),
+                         arange(0, number * length + 1, length)),
+                        shape=(number, length * q))
+    onehot_t = onehot.T.tocsr()
+
+    lambda_h = float(kwargs.get('lambda_h', 0.01))
+    # couplings are penalized half as much as in symmetric plmDCA, since
+    # each coupling is fitted twice, once from each site
+    lambda_J = float(kwargs.get('lambda_J', 0.01)) / 2.
+    max_iter = int(kwargs.get('max_iter', 500))
+
+    couplings = empty((length, length, q, q), float32)
+
+    def fitSite(r):
+
+        x_r = states[:, r]
+        mask = ones((length * q, q), bool)
+        mask[r * q:(r + 1) * q] = False
+        mask = mask.ravel()
+
+        def objective(theta):
+
+            h, J = theta[:q], theta[q:].reshape((length * q, q))
+            energy = onehot.dot(J) + h
+            energy -= energy.max(1)[:, None]
+            expE = exp(energy)
+            partition = expE.sum(1)
+            f = (w * (log(partition) - energy[arange(number), x_r])).sum()
+            grad = expE / partition[:, None]
+            grad[arange(number), x_r] -= 1.
+            grad *= w[:, None]
+            g_h = grad.sum(0) + 2 * lambda_h * h
+            g_J = onehot_t.dot(grad).ravel() + 2 * lambda_J * theta[q:]
+            g_J[~mask] = 0.
+            f += lambda_h * (h ** 2).sum() + lambda_J * (theta[q:] ** 2).sum()
+            return f, concatenate([g_h, g_J])
+
+        result = minimize(objective, zeros(q + length * q * q),
+                          method='L-BFGS-B', jac=True,
+                          options={'maxiter': max_iter})
+        J = result.x[q:].reshape((length, q, q))
+        couplings[r] = J.transpose(0, 2, 1)
+
+    def fitSites(start, stop, thread):
+        for r in range(start, stop):
+            fitSite(r)
+
+    # sites are independent, and most of the time is spent in NumPy and
+    # SciPy routines that release the GIL
+    runThreads(fitSites, length, kwargs.get('n_cpu'), size=1)
+
+    prob = ones((length, q)) * (pseudo_weight / q)
+    for j in range(length):
+        prob[j] += (1. - pseudo_weight) * bincount(states[:, j], w, q)
+
+    di = zeros((length, length), float)
+    for i in range(length - 1):
+        J = (couplings[i, i+1:] +
+             couplings[i+1:, i].transpose(0, 2, 1)) / 2.
+        di[i, i+1:] = di[i+1:, i] = _calcDirectInfo(J, prob[i], prob[i+1:])
+    return di
+
+
+def _calcDirectInfo(J, p_i, p_j, epsilon=1e-4, tiny=1e-100):
+    """Returns direct information for couplings *J* of a column with
+    probabilities *p_i* to columns with probabilities *p_j*, as calculated
+    in :func:`msadirectinfo2` for all columns at once."""
+
+    q = len(p_i)
+    W = exp(J - J.max((1, 2))[:, None, None])
+    mu1 = ones(p_j.shape) / q
+    mu2 = ones(p_j.shape) / q
+    diff = 1.
+    while diff > epsilon:
+        scra1 = p_i / (W * mu2[:, None, :]).sum(2)
+        scra2 = p_j / (W * mu1[:, :, None]).sum(1)
+        scra1 /= scra1.sum(1)[:, None]
+        scra2 /= scra2.sum(1)[:, None]
+        diff = max(abs(mu1 - scra1).max(), abs(mu2 - scra2).max())
+        mu1, mu2 = scra1, scra2
+
+    W *= mu1[:, :, None] * mu2[:, None, :]
+    W /= W.sum((1, 2))[:, None, None]
+    return (W * log((W + tiny) /
+                    (p_i[None, :, None] * p_j[:, None, :] + tiny))).sum((1, 2))
+
+
+# number of sequences whose neighbors are counted by a thread at a time
+_MEFF_BLOCK = 64
+
+
+def _numMeffThreads(n_cpu, stop):
+    """Returns number of threads that count neighbors of *stop* sequences,
+    at most *n_cpu* which is the number of CPUs by default."""
+
+    if n_cpu is None:
+        from multiprocessing import cpu_count
+        n_cpu = cpu_count()
+    return max(1, min(int(n_cpu), -(-stop // _MEFF_BLOCK)))
+
+
+def _countNeighbors(seqs, counts, buffers, theta, length, stop, jstart=0):
+    """Adds numbers of neighbors of packed sequences *seqs* to *counts*, for
+    rows [0, *stop*) compared to following rows starting from *jstart*.  The
+    first thread counts into *counts* and each of the other threads into a
+    row of *buffers*, which is reused and must have a row for each of them
+    and at least as many columns as *seqs* has rows."""
+
+    from .seqtools import msameff
+
+    number = len(seqs)
+    outs = [counts]
+    for buffer in buffers:
+        buffer = buffer[:number]
+        buffer.fill(0)
+        outs.append(buffer)
+    runThreads(lambda start, end, thread:
+               msameff(seqs, outs[thread], theta=theta, length=length,
+                       start=start, stop=end, jstart=jstart),
+               stop, len(outs), size=_MEFF_BLOCK)
+    for buffer in outs[1:]:
+        counts += buffer
+
+
 def calcMeff(msa, seqid=.8, refine=False, weight=False, **kwargs):
     """Returns the Meff for *msa*, which may be an :class:`.MSA`
     instance or a 2D Numpy character array.
@@ -625,22 +904,417 @@ def calcMeff(msa, seqid=.8, refine=False, weight=False, **kwargs):
     Sequences are not refined by default. When *refine* is set **True**, the
     MSA will be refined by the first sequence.
 
-    The weight for each sequence are returned when *weight* is **True**."""
+    The weight for each sequence are returned when *weight* is **True**.
 
-    msa = getMSA(msa)
-    from .msatools import msameff
+    Similar sequences are counted without forming the sequence identity
+    matrix, using *n_cpu* threads, which is the number of CPUs by default."""
+
+    msa = getMSA(msa, encoded=True)
     LOGGER.timeit('_meff')
-    refine = 1 if refine else 0
-    weight = 0 if weight else 1  # A Mark for return weighted array.
-    if (not weight):
-        w = zeros((msa.shape[0]), float)
-        meff = msameff(msa, theta=1.-seqid, meff_only=weight,
-                       refine=refine, w=w)
-    else:
-        meff = msameff(msa, theta=1.-seqid, meff_only=weight, refine=refine)
+    codes = _getCodes(msa)
+    if refine:
+        codes = codes[:, ((0 < codes[0]) & (codes[0] < 27)).nonzero()[0]]
+    number, length = codes.shape
+    seqs, _ = _packMSA(_DCA_STATES.take(codes))
+    n_threads = _numMeffThreads(kwargs.get('n_cpu'), number)
+    counts = zeros(number)
+    _countNeighbors(seqs, counts, zeros((n_threads - 1, number)),
+                    1. - seqid, length, number)
+    w = 1. / (1. + counts)
+    meff = w.sum()
     LOGGER.report('Meff was calculated in %.2fs.', '_meff')
+    if weight:
+        return meff, w
     return meff
 
+
+# case insensitive indices of the twenty standard amino acids in _INDEX
+_TWENTY = [1, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14, 16, 17, 18, 19, 20, 22,
+           23, 25]
+
+
+class MSACountAccumulator(object):
+
+    """Accumulate case insensitive residue counts for each column of
+    alignment chunks, e.g. those yielded by :func:`.iterMSAChunks`, to
+    calculate occupancy and Shannon entropy without keeping the whole
+    alignment in memory.  Accumulators of chunks of the same alignment may
+    be combined using :meth:`merge`, e.g. when chunks are processed in
+    parallel."""
+
+    def __init__(self):
+
+        self._counts = None
+        self._number = 0
+        self._total = 0.
+
+    def __len__(self):
+
+        return self._number
+
+    def update(self, msa, weights=None):
+        """Add residue counts of sequences in *msa*, which may be an
+        :class:`.MSA` instance or a 2D Numpy character array.  Counts are
+        weighted by *weights*, e.g. sequence weights returned by
+        :func:`.calcMeff`, when given."""
+
+        codes = _INDEX.take(_getCodes(getMSA(msa, encoded=True)))
+        if weights is not None:
+            weights = array(weights, float).ravel()
+            if len(weights) != len(codes):
+                raise ValueError('weights must have an element for each '
+                                 'sequence')
+        self._update(codes, weights)
+
+    def _update(self, codes, weights):
+
+        number, length = codes.shape
+        if self._counts is None:
+            self._counts = zeros((length, NUMCHARS), float)
+        elif len(self._counts) != length:
+            raise ValueError('msa must have {0} columns'
+                             .format(len(self._counts)))
+        offsets = arange(0, length * NUMCHARS, NUMCHARS)
+        counts = self._counts.reshape(length * NUMCHARS)
+        step = max(1, 2**20 // max(length, 1))
+        for start in range(0, number, step):
+            stop = min(start + step, number)
+            if weights is None:
+                counts += bincount((codes[start:stop] + offsets).ravel(),
+                                   minlength=length * NUMCHARS)
+            else:
+                counts += bincount((codes[start:stop] + offsets).ravel(),
+                                   weights[start:stop].repeat(length),
+                                   minlength=length * NUMCHARS)
+        self._number += number
+        self._total += number if weights is None else weights.sum()
+
+    def merge(self, other):
+        """Add counts accumulated by *other* accumulator."""
+
+        if not isinstance(other, MSACountAccumulator):
+            raise TypeError('other must be an MSACountAccumulator')
+        if other._counts is None:
+            return
+        if self._counts is None:
+            self._counts = other._counts.copy()
+        elif self._counts.shape != other._counts.shape:
+            raise ValueError('accumulators must have the same number of '
+                             'columns')
+        else:
+            self._counts += other._counts
+        self._number += other._number
+        self._total += other._total
+
+    def numSequences(self):
+        """Returns number of accumulated sequences."""
+
+        return self._number
+
+    def getCounts(self):
+        """Returns a copy of residue counts array, with a row for each column
+        and gap counts in the first column followed by counts of letters
+        from **A** to **Z**."""
+
+        if self._counts is None:
+            return None
+        return self._counts.copy()
+
+    def calcOccupancy(self, count=False):
+        """Returns column occupancy, as :func:`.calcMSAOccupancy` does.  If
+        *count* is **True**, count of non-gap characters will be returned."""
+
+        if self._counts is None:
+            return None
+        occ = self._total - self._counts[:, 0]
+        if count:
+            return occ
+        return occ / self._total
+
+    def calcShannonEntropy(self, ambiguity=True, omitgaps=True):
+        """Returns Shannon entropy array calculated as
+        :func:`.calcShannonEntropy` does."""
+
+        if self._counts is None:
+            return None
+        counts = self._counts[:, 1:].copy()
+        if ambiguity:
+            # B, Z, J and X are indices 1, 25, 9 and 23 in this array
+            for amb, (one, two) in ((1, (3, 13)), (25, (4, 16)),
+                                    (9, (8, 11))):
+                half = counts[:, amb] / 2.
+                counts[:, amb] = 0
+                counts[:, one] += half
+                counts[:, two] += half
+            part = counts[:, 23] / 20.
+            counts[:, 23] = 0
+            counts[:, [i - 1 for i in _TWENTY]] += part[:, None]
+
+        number = self._total
+        numgap = number - counts.sum(1)
+        shannon = zeros(len(counts))
+        if omitgaps:
+            denom = (number - numgap)[:, None]
+        else:
+            denom = number
+            gaps = numgap > 0
+            prob = numgap[gaps] / number
+            shannon[gaps] = prob * log(prob)
+        denom = where(denom > 0, denom, 1)
+        prob = counts / denom
+        shannon += (prob * log(where(counts > 0, prob, 1))).sum(1)
+        return -shannon
+
+
+def _getAmbiguityMatrix():
+    """Returns a matrix that allocates counts of ambiguous amino acids in its
+    rows to the amino acids they stand for in its columns."""
+
+    amb = eye(NUMCHARS)
+    for code, members in ((2, (4, 14)), (10, (9, 12)), (26, (5, 17))):
+        amb[code, code] = 0
+        amb[code, members] = .5
+    amb[24, 24] = 0
+    amb[24, _TWENTY] = 1. / 20
+    return amb
+
+
+class MSAPairCountAccumulator(MSACountAccumulator):
+
+    """Accumulate weighted counts of residue pairs for all pairs of columns
+    of alignment chunks in a single count tensor, from which mutual
+    information, normalized and corrected mutual information, and OMES
+    matrices are derived.  Adding sequences updates counts, so that
+    matrices do not need to be recalculated from scratch when an alignment
+    grows.  Pair counts are computed using *n_cpu* threads, which is the
+    number of CPUs by default.  Counts take ``L*(L-1)/2*27*27*8`` bytes of
+    memory for an alignment with *L* columns."""
+
+    def __init__(self, **kwargs):
+
+        MSACountAccumulator.__init__(self)
+        self._pairs = None
+        self._n_cpu = kwargs.get('n_cpu')
+
+    def _update(self, codes, weights):
+
+        from .msatools import msapaircounts
+
+        MSACountAccumulator._update(self, codes, weights)
+        number, length = codes.shape
+        if self._pairs is None:
+            self._pairs = zeros((length * (length - 1) // 2,
+                                 NUMCHARS, NUMCHARS))
+        if weights is None:
+            weights = ones(number)
+        columns = codes.T.copy()
+        runThreads(lambda start, stop, thread:
+                    msapaircounts(columns, weights, self._pairs,
+                                  start=start, stop=stop),
+                    length, self._n_cpu, size=8)
+
+    def merge(self, other):
+        """Add counts accumulated by *other* accumulator."""
+
+        if not isinstance(other, MSAPairCountAccumulator):
+            raise TypeError('other must be an MSAPairCountAccumulator')
+        if other._pairs is None:
+            return
+        MSACountAccumulator.merge(self, other)
+        if self._pairs is None:
+            self._pairs = other._pairs.copy()
+        else:
+            self._pairs += other._pairs
+
+    def _iterPairs(self, ambiguity, size=4096):
+        """Yield row and column indices, joint probabilities and column
+        probabilities for tiles of *size* column pairs."""
+
+        length = len(self._counts)
+        total = self._total
+        probs = self._counts / total
+        amb = None
+        if ambiguity:
+            amb = _getAmbiguityMatrix()
+            probs = probs.dot(amb)
+        rows, cols = triu_indices(length, 1)
+        for start in range(0, len(rows), size):
+            stop = start + size
+            joint = self._pairs[start:stop] / total
+            if amb is not None:
+                joint = matmul(matmul(amb.T, joint), amb)
+            yield (rows[start:stop], cols[start:stop], joint,
+                   probs[rows[start:stop]], probs[cols[start:stop]])
+
+    def calcMutinfoMatrix(self, ambiguity=True, norm=False, corr=None):
+        """Returns mutual information matrix calculated as
+        :func:`.buildMutinfoMatrix` does, using weighted counts.  *norm*
+        may be **True** for normalization by joint entropy, or one of the
+        normalizations accepted by :func:`.applyMutinfoNorm`, which uses
+        entropy calculated from the same counts.  *corr* may be one of the
+        corrections accepted by :func:`.applyMutinfoCorr`, e.g. ``'apc'``."""
+
+        if self._counts is None:
+            return None
+        LOGGER.timeit('_mutinfo')
+        length = len(self._counts)
+        mutinfo = zeros((length, length))
+        joint_norm = norm is True
+        for rows, cols, joint, iprb, jprb in self._iterPairs(ambiguity):
+            inside = joint / (iprb[:, :, None] * jprb[:, None, :]
+                              + (joint == 0))
+            inside = where(joint > 0, inside, 1)
+            mi = (joint * log(inside)).sum(2).sum(1)
+            if joint_norm:
+                # as in applyMutinfoNorm, zero for zero joint entropy
+                ent = -(joint * log(where(joint > 0, joint, 1))).sum(2).sum(1)
+                mi = where(ent > 0, mi, 0) / where(ent > 0, ent, 1)
+            mutinfo[rows, cols] = mutinfo[cols, rows] = mi
+        if norm and not joint_norm:
+            mutinfo = applyMutinfoNorm(mutinfo,
+                                       self.calcShannonEntropy(ambiguity),
+                                       norm)
+        if corr:
+            mutinfo = applyMutinfoCorr(mutinfo, corr)
+        LOGGER.report('Mutual information matrix was calculated in %.2fs.',
+                      '_mutinfo')
+        return mutinfo
+
+    def calcOMESMatrix(self, ambiguity=True):
+        """Returns OMES matrix calculated as :func:`.buildOMESMatrix` does,
+        using weighted counts."""
+
+        if self._counts is None:
+            return None
+        LOGGER.timeit('_omes')
+        length = len(self._counts)
+        omes = zeros((length, length))
+        for rows, cols, joint, iprb, jprb in self._iterPairs(ambiguity):
+            inside = iprb[:, :, None] * jprb[:, None, :]
+            nonzero = inside != 0
+            diff = where(nonzero, joint - inside, 0)
+            omes[rows, cols] = omes[cols, rows] = self._total * (
+                diff * diff / where(nonzero, inside, 1)).sum(2).sum(1)
+        LOGGER.report('OMES matrix was calculated in %.2fs.', '_omes')
+        return omes
+
+
+class MSAMeffAccumulator(object):
+
+    """Accumulate sequences of alignment chunks, e.g. those yielded by
+    :func:`.iterMSAChunks`, in packed form to calculate Meff and sequence
+    weights as :func:`.calcMeff` does.  Each new sequence is compared to all
+    accumulated sequences when it is added, and the packed sequences take
+    about 5/8 of a byte per residue.  Accumulators may be combined using
+    :meth:`merge`.
+
+    Sequences sharing sequence identity of *seqid* or more with another
+    sequence are regarded as similar sequences.  Similar sequences are
+    counted using *n_cpu* threads, which is the number of CPUs by
+    default."""
+
+    def __init__(self, seqid=.8, **kwargs):
+
+        self._seqid = float(seqid)
+        self._n_cpu = kwargs.get('n_cpu')
+        self._length = None
+        self._seqs = None
+        self._counts = None
+        self._buffers = None
+        self._number = 0
+
+    def __len__(self):
+
+        return self._number
+
+    def _reserve(self, number, words):
+
+        if self._seqs is None:
+            self._seqs = empty((number, words), uint64)
+            self._counts = zeros(number)
+        elif len(self._seqs) < number:
+            # grow geometrically to amortize copying
+            size = max(number, 2 * len(self._seqs))
+            seqs = empty((size, words), uint64)
+            seqs[:self._number] = self._seqs[:self._number]
+            counts = zeros(size)
+            counts[:self._number] = self._counts[:self._number]
+            self._seqs, self._counts = seqs, counts
+
+    def _count(self, number, stop, jstart):
+        """Count similar sequences in rows [0, stop) and following rows
+        starting from *jstart*, for the first *number* sequences."""
+
+        # threads other than the first count into buffers that are kept
+        # for following chunks and reallocated only when sequences outgrow
+        # them, the first one counts into the accumulated counts
+        n_threads = _numMeffThreads(self._n_cpu, stop)
+        buffers = self._buffers
+        if (buffers is None or len(buffers) < n_threads - 1 or
+                buffers.shape[1] < number):
+            self._buffers = buffers = zeros((n_threads - 1, len(self._seqs)))
+        _countNeighbors(self._seqs[:number], self._counts[:number],
+                        buffers[:n_threads - 1], 1. - self._seqid,
+                        self._length, stop, jstart)
+
+    def update(self, msa):
+        """Add sequences in *msa*, which may be an :class:`.MSA` instance or
+        a 2D Numpy character array."""
+
+        codes = _getCodes(getMSA(msa, encoded=True))
+        if self._length is None:
+            self._length = codes.shape[1]
+        elif codes.shape[1] != self._length:
+            raise ValueError('msa must have {0} columns'.format(self._length))
+        seqs, _ = _packMSA(_DCA_STATES.take(codes))
+        old = self._number
+        number = old + len(seqs)
+        self._reserve(number, seqs.shape[1])
+        self._seqs[old:number] = seqs
+        self._count(number, number, old)
+        self._number = number
+
+    def merge(self, other):
+        """Add sequences accumulated by *other* accumulator, which must use
+        the same *seqid*."""
+
+        if not isinstance(other, MSAMeffAccumulator):
+            raise TypeError('other must be an MSAMeffAccumulator')
+        if other._seqid != self._seqid:
+            raise ValueError('accumulators must have the same seqid')
+        if not other._number:
+            return
+        if self._length is None:
+            self._length = other._length
+        elif other._length != self._length:
+            raise ValueError('accumulators must have the same number of '
+                             'columns')
+        old = self._number
+        number = old + other._number
+        self._reserve(number, other._seqs.shape[1])
+        self._seqs[old:number] = other._seqs[:other._number]
+        self._counts[old:number] = other._counts[:other._number]
+        self._count(number, old, old)
+        self._number = number
+
+    def numSequences(self):
+        """Returns number of accumulated sequences."""
+
+        return self._number
+
+    def getWeights(self):
+        """Returns sequence weights."""
+
+        return 1. / (1. + self._counts[:self._number])
+
+    def getMeff(self):
+        """Returns Meff, the sum of sequence weights."""
+
+        if not self._number:
+            return 0.
+        return self.getWeights().sum()
+
+
 def alignSequencesByChain(PDBs, **kwargs):
     """
     Runs :func:`buildMSA` for each chain and optionally joins the results.
@@ -958,9 +1632,9 @@ def alignSequenceToMSA(seq, msa, **kwargs):
         not an :class:`.Atomic` object.
     :type chain: str
     
-    Parameters for Biopython ``pairwise2`` alignments can be provided as 
-    keyword arguments. Default values are originally from ``proteins.compare`` 
-    module, but now found in ``utilities.seqtools``.
+    Parameters for pairwise alignment with :func:`.alignPairwise` can be
+    provided as keyword arguments. Default values are originally from
+    ``proteins.compare`` module, but now found in ``utilities.seqtools``.
 
     :arg match: a positive integer, used to reward finding a match
     :type match: int
@@ -974,7 +1648,7 @@ def alignSequenceToMSA(seq, msa, **kwargs):
     :arg gap_extension: a negative integer, used to penalise extending a gap
     :type gap_extension: int
 
-    :arg method: method for pairwise2 alignment. 
+    :arg method: method for pairwise alignment. 
         Possible values are ``"local"`` and ``"global"``
     :type method: str
     """
@@ -1075,16 +1749,10 @@ def alignSequenceToMSA(seq, msa, **kwargs):
     else:
         raise TypeError('The output from querying that label against msa is not a single sequence.')
     
-    if method == 'local':
-        alignment = alignBioPairwise(sequence, str(refMsaSeq), "local",
-                                     match, mismatch, gap_opening, gap_extension,
-                                     max_alignments=1)
-    elif method == 'global':
-        alignment = alignBioPairwise(sequence, str(refMsaSeq), "global",
-                                     match, mismatch, gap_opening, gap_extension,
-                                     max_alignments=1)
-    else:
-        raise ValueError('method should be local or global')
+    mapping, _ = alignPairwise(sequence, refMsaSeq, match=match,
+                               mismatch=mismatch, gap_opening=gap_opening,
+                               gap_extension=gap_extension, method=method)
+    alignment = [_getAlignedRows(sequence, refMsaSeq, mapping)]
 
     seq_indices = [0]
     msa_indices = [0]
@@ -1121,6 +1789,102 @@ def alignSequenceToMSA(seq, msa, **kwargs):
 
     return alignment, seq_indices, msa_indices
 
+def alignPairwise(seq1, seq2, **kwargs):
+    """Align *seq1* to *seq2* using a built-in implementation of
+    Needleman-Wunsch (global) or Smith-Waterman (local) algorithms with
+    affine gap penalties, and return the mapping of residues of *seq1* onto
+    *seq2* and alignment score.  Mapping is an integer array with the index
+    of the aligned residue of *seq2* for each residue of *seq1*, or -1 for
+    residues aligned to a gap or outside a local alignment.  Alignments are
+    scored as in :func:`Bio.pairwise2.align.localms` and :func:`globalms`,
+    which penalize gaps at the ends of global alignments.
+
+    When *seq2* is a list of sequences, *seq1* is aligned to each of them
+    using *n_cpu* threads, which is the number of CPUs by default, and a
+    list of mappings and an array of scores are returned.
+
+    :arg seq1: sequence to be mapped
+    :type seq1: str, :class:`.Sequence`
+
+    :arg seq2: sequence or list of sequences
+    :type seq2: str, :class:`.Sequence`, list
+
+    :arg match: score for identical residues, default is ``MATCH_SCORE``
+    :type match: float
+
+    :arg mismatch: score for different residues, default is
+        ``MISMATCH_SCORE``
+    :type mismatch: float
+
+    :arg gap_opening: score for opening a gap, default is ``GAP_PENALTY``
+    :type gap_opening: float
+
+    :arg gap_extension: score for extending a gap, default is
+        ``GAP_EXT_PENALTY``
+    :type gap_extension: float
+
+    :arg method: ``"local"`` or ``"global"``, default is
+        ``ALIGNMENT_METHOD``
+    :type method: str"""
+
+    from .seqtools import pwalign
+
+    method = kwargs.get('method', ALIGNMENT_METHOD)
+    if method not in ('local', 'global'):
+        raise ValueError('method should be local or global')
+    params = dict(match=float(kwargs.get('match', MATCH_SCORE)),
+                  mismatch=float(kwargs.get('mismatch', MISMATCH_SCORE)),
+                  gap=float(kwargs.get('gap_opening', GAP_PENALTY)),
+                  ext=float(kwargs.get('gap_extension', GAP_EXT_PENALTY)),
+                  local=method == 'local')
+
+    seqa = _getSequenceBytes(seq1)
+    if isinstance(seq2, (str, bytes, Sequence)):
+        amap = empty(len(seqa), intp)
+        score = pwalign(seqa, _getSequenceBytes(seq2), amap, **params)
+        return amap, score
+
+    seqs = [_getSequenceBytes(seq) for seq in seq2]
+    maps = [empty(len(seqa), intp) for seq in seqs]
+    scores = zeros(len(seqs))
+    def align(start, stop, thread):
+        for i in range(start, stop):
+            scores[i] = pwalign(seqa, seqs[i], maps[i], **params)
+
+    runThreads(align, len(seqs), kwargs.get('n_cpu'), size=16)
+    return maps, scores
+
+
+def _getSequenceBytes(seq):
+    """Returns bytes of sequence *seq*."""
+
+    if isinstance(seq, bytes):
+        return seq
+    return str(seq).encode()
+
+
+def _getAlignedRows(seq1, seq2, mapping):
+    """Returns gapped strings for *seq1* and *seq2* aligned according to
+    *mapping* returned by :func:`alignPairwise`."""
+
+    row1 = []
+    row2 = []
+    j = 0
+    for i, k in enumerate(mapping):
+        if k < 0:
+            row1.append(seq1[i])
+            row2.append('-')
+            continue
+        row1.append('-' * (k - j))
+        row2.append(seq2[j:k])
+        row1.append(seq1[i])
+        row2.append(seq2[k])
+        j = k + 1
+    row1.append('-' * (len(seq2) - j))
+    row2.append(seq2[j:])
+    return ''.join(row1), ''.join(row2)
+
+
 def alignTwoSequencesWithBiopython(seq1, seq2, **kwargs):
     """Easily align two sequences with Biopython's globalms or localms.
     Returns an MSA and indices for use with :func:`.showAlignment`.
@@ -3,18 +3,37 @@
 
 from numbers import Integral
 
-from numpy import all, zeros, dtype, array, char, cumsum, ceil, reshape
+from numpy import all, zeros, dtype, array, cumsum, ceil, reshape
 from numpy import where, sort, concatenate, vstack, isscalar, chararray
+from numpy import arange, uint8
 
 from prody import LOGGER, PY3K
 from prody.atomic import Atomic
-from prody.utilities import toChararray, pystr, splitSeqLabel
+from prody.utilities import toChararray, pystr, splitSeqLabel, appendRows
 from .sequence import Sequence
 
 import sys
 
 __all__ = ['MSA', 'refineMSA', 'mergeMSA', 'specMergeMSA',]
 
+NUMCHARS = 27
+
+# letters are encoded as ord(ch) - 64, i.e. 1-26 for upper and 33-58 for
+# lower case letters, and all other characters (gaps) as 0; _INDEX maps
+# codes to case insensitive alphabet indices as in msatools
+_ENCODE = zeros(256, uint8)
+_ENCODE[65:91] = arange(1, 27)
+_ENCODE[97:123] = arange(33, 59)
+_INDEX = zeros(256, uint8)
+_INDEX[1:27] = _INDEX[33:59] = arange(1, 27)
+
+
+def _encodeMSA(msa):
+    """Returns uint8 alphabet codes for character array *msa*."""
+
+    return _ENCODE.take(msa.view(uint8))
+
+
 class MSA(object):
 
     """Store and manipulate multiple sequence alignments."""
@@ -35,6 +54,8 @@ class MSA(object):
         
         if labels is None:
             labels = [str(i+1) for i in range(numseq)]
+        else:
+            labels = list(labels)
 
         if PY3K:
             for i, label in enumerate(labels):
@@ -46,9 +67,18 @@ class MSA(object):
         mapping = kwargs.get('mapping')
         self._map(mapping)
         self._msa = msa
+        self._buffer = None
+        self._encoded = None
         self._title = str(title) or 'Unknown'
         self._split = bool(kwargs.get('split', True))
 
+    def __getstate__(self):
+
+        state = self.__dict__.copy()
+        state['_buffer'] = None
+        state['_encoded'] = None
+        return state
+
     def _map(self, mapping=None):
 
         labels = self._labels
@@ -66,8 +96,14 @@ class MSA(object):
                     if not key in labels[i]:
                         labels[i] = key
         
-        self._mapping = mapping = {}
-        for index, label in enumerate(labels):
+        self._mapping = {}
+        return self._mapLabels(labels)
+
+    def _mapLabels(self, labels, start=0):
+        """Adds *labels* of sequences starting at index *start* to mapping."""
+
+        mapping = self._mapping
+        for index, label in enumerate(labels, start):
             label = splitSeqLabel(label)[0]
             try:
                 value = mapping[label]
@@ -251,17 +287,20 @@ class MSA(object):
                 raise ValueError('failed to add {1} to {0}'
                              .format(repr(self), repr(other)))
         try:
-            AB = vstack((A, B))
+            # MSA instances unpickled from earlier versions have no buffer
+            AB, self._buffer = appendRows(A, B, getattr(self, '_buffer', None))
         except:
             raise ValueError('failed to add {1} to {0}: shapes do not match'
                              .format(repr(self), repr(other)))
 
-        labels = list(self._labels)
-        labels.extend(otherlabels)
+        if isinstance(otherlabels, str):
+            otherlabels = [otherlabels]
+        n_seqs = len(self._labels)
+        self._labels.extend(otherlabels)
 
         self._msa = AB
-        self._labels = labels
-        self._map()
+        self._encoded = None
+        self._mapLabels(otherlabels, n_seqs)
 
     def isAligned(self):
         """Returns **True** if MSA is aligned."""
@@ -334,6 +373,23 @@ class MSA(object):
 
         return self._msa
 
+    def getEncoded(self):
+        """Returns a copy of the MSA encoded as a uint8 array.  Letters are
+        stored as their character code minus 64, i.e. 1-26 for upper and
+        33-58 for lower case letters, and all other characters as 0.  The
+        encoding is calculated once and cached, and it is accepted by the
+        MSA analysis functions in place of the character array."""
+
+        return self._getEncoded().copy()
+
+    def _getEncoded(self):
+        """Returns MSA encoded as a uint8 array."""
+
+        encoded = getattr(self, '_encoded', None)
+        if encoded is None:
+            encoded = self._encoded = _encodeMSA(self._msa)
+        return encoded
+
     def getIndex(self, label):
         """Returns index of the sequence that *label* maps onto.  If *label*
         maps onto multiple sequences or *label* is a list of labels, a list
@@ -454,14 +510,18 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
     if ndim != 2:
         raise ValueError('msa must be a 2D array or an MSA instance')
 
+    # gaps and occupancies are found using the uint8 encoding of the MSA
+    enc = _encodeMSA(arr) if msa is None else msa._getEncoded()
+
     title = []
     cols = None
 
     if index is not None:
         before = arr.shape[1]
         LOGGER.timeit('_refine')
-        cols = char.isalpha(arr[index]).nonzero()[0]
+        cols = enc[index].nonzero()[0]
         arr = arr.take(cols, 1)
+        enc = enc.take(cols, 1)
         title.append('index=' + str(index))
         LOGGER.report('Index refinement reduced number of columns from {0} to '
                       '{1} in %.2fs.'.format(before, arr.shape[1]), '_refine')
@@ -533,8 +593,9 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
                                  'so cannot be used for refinement'.format(label))
 
             title.append('label=' + label)
-            cols = char.isalpha(arr[index]).nonzero()[0]
+            cols = enc[index].nonzero()[0]
             arr = arr.take(cols, 1)
+            enc = enc.take(cols, 1)
             LOGGER.report('Label refinement reduced number of columns from {0} to '
                           '{1} in %.2fs.'.format(before, arr.shape[1]), '_refine')
 
@@ -564,6 +625,7 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
                 assert tsum <= before, 'problem in mapping sequence to structure'
                 if tsum < before:
                     arr = arr.take(torf.nonzero()[0], 1)
+                    enc = enc.take(torf.nonzero()[0], 1)
                     resnums = resnums.take(torf.nonzero()[0]-torf.nonzero()[0][0]+1)
                     LOGGER.report('Structure refinement reduced number of '
                                   'columns from {0} to {1} in %.2fs.'
@@ -587,11 +649,12 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
             raise TypeError('rowocc must be a float ({0})'.format(str(err)))
         assert 0. <= rowocc <= 1., 'rowocc must be between 0 and 1'
 
-        rows = calcMSAOccupancy(arr, 'row') >= rowocc
+        rows = calcMSAOccupancy(enc, 'row') >= rowocc
         if index is not None:
             index = rows[:index].sum()
         rows = (rows).nonzero()[0]
         arr = arr[rows]
+        enc = enc[rows]
         title.append('rowocc>=' + str(rowocc))
         LOGGER.report('Row occupancy refinement reduced number of rows from '
                       '{0} to {1} in %.2fs.'.format(before, arr.shape[0]),
@@ -600,11 +663,12 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
     if seqid is not None:
         before = arr.shape[0]
         LOGGER.timeit('_refine')
-        unique = uniqueSequences(arr, seqid)
+        unique = uniqueSequences(enc, seqid)
         if index is not None:
             unique[index] = True
         unique = unique.nonzero()[0]
         arr = arr[unique]
+        enc = enc[unique]
         title.append('seqid>=' + str(seqid))
         if rows is not None:
             rows = rows[unique]
@@ -623,8 +687,9 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
             raise TypeError('colocc must be a float ({0})'.format(str(err)))
         assert 0. <= colocc <= 1., 'colocc must be between 0 and 1'
 
-        cols = (calcMSAOccupancy(arr, 'col') >= colocc).nonzero()[0]
+        cols = (calcMSAOccupancy(enc, 'col') >= colocc).nonzero()[0]
         arr = arr.take(cols, 1)
+        enc = enc.take(cols, 1)
         title.append('colocc>=' + str(colocc))
         LOGGER.report('Column occupancy refinement reduced number of columns '
                       'from {0} to {1} in %.2fs.'.format(before, arr.shape[1]),
@@ -646,8 +711,11 @@ def refineMSA(msa, index=None, label=None, rowocc=None, seqid=None, colocc=None,
         else:
             labels = msa._labels
             labels = [labels[i] for i in rows]
-        return MSA(arr, title=msa.getTitle() + ' refined ({0})'
-                   .format(', '.join(title)), labels=labels)
+        refined = MSA(arr, title=msa.getTitle() + ' refined ({0})'
+                      .format(', '.join(title)), labels=labels)
+        # enc is refined along with arr, so it encodes the refined MSA
+        refined._encoded = enc
+        return refined
 
 
 def mergeMSA(*msa, **kwargs):
@@ -6,14 +6,15 @@ __author__ = 'Anindita Dutta, Ahmet Bakan'
 
 from os.path import isfile, splitext, split, getsize
 
-from numpy import array, fromstring, empty
+from numpy import array, fromstring, frombuffer, empty
 
 from .sequence import splitSeqLabel, Sequence
 
 from prody import LOGGER, PY3K
-from prody.utilities import openFile, isListLike
+from prody.utilities import openFile, isListLike, pystr
 
-__all__ = ['MSAFile', 'splitSeqLabel', 'parseMSA', 'writeMSA']
+__all__ = ['MSAFile', 'splitSeqLabel', 'parseMSA', 'iterMSAChunks',
+           'writeMSA']
 
 if PY3K:
     basestring = str
@@ -52,6 +53,7 @@ WSJOIN = ' '.join
 ESJOIN = ''.join
 
 NUMLINES = 1000
+BLOCKSIZE = 2**24
 LEN_FASTA_LINE = 60
 LEN_SELEX_LABEL = 31
 
@@ -615,6 +617,206 @@ def parseMSA(filename, **kwargs):
                       .format(*msaarr.shape), '_parsemsa')
     return msa
 
+def iterMSAChunks(filename, chunk_size=10000, **kwargs):
+    """Yield :class:`.MSA` instances that contain up to *chunk_size*
+    sequences parsed from FASTA, SELEX, or Stockholm format *filename*,
+    which may be a compressed file.  Alignments larger than memory can be
+    analyzed in a single pass this way, e.g. using
+    :class:`.MSACountAccumulator` and :class:`.MSAMeffAccumulator`.  The
+    file is read in large blocks, which are decompressed by :mod:`gzip`
+    (zlib) and split into sequences using bytes operations, and the uint8
+    encoding of each chunk (see :meth:`.MSA.getEncoded`) is cached.
+
+    :arg format: file format, determined from the extension by default
+    :type format: str
+
+    :arg filter: function used for filtering sequences by label and
+        sequence, see :meth:`.MSAFile.setFilter`
+    :type filter: callable
+
+    :arg filter_full: apply *filter* to the full label, default is **False**
+    :type filter_full: bool
+
+    :arg slice: slice or list of indices of columns to keep, applied after
+        filtering
+    :type slice: slice, list
+
+    :arg index: index of the reference sequence among sequences that pass
+        *filter*, i.e. in the first chunk, columns that are gaps in this
+        sequence are removed from all chunks
+    :type index: int
+
+    :arg rowocc: row occupancy, sequences with less occupancy are removed
+        from each chunk after *index* refinement is applied
+    :type rowocc: float
+
+    Refinements that depend on the whole alignment, such as column
+    occupancy and sequence identity, are not applied."""
+
+    from .msa import MSA, _encodeMSA
+
+    try:
+        fileok = isfile(filename)
+    except TypeError:
+        raise TypeError('filename must be a string')
+    else:
+        if not fileok:
+            raise IOError('[Errno 2] No such file or directory: ' +
+                          repr(filename))
+
+    title, ext = splitext(split(filename)[1])
+    if ext.lower() == '.gz':
+        title, ext = splitext(title)
+    format = kwargs.get('format')
+    if format is None:
+        format = MSAEXTMAP.get(ext.lower())
+    else:
+        format = MSAFORMATS.get(str(format).lower())
+    if format not in (FASTA, SELEX, STOCKHOLM):
+        raise ValueError('only FASTA, SELEX, and Stockholm files can be read '
+                         'in chunks')
+
+    chunk_size = int(chunk_size)
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be a positive integer')
+
+    filter = kwargs.get('filter')
+    if filter is not None and not callable(filter):
+        raise TypeError('filter must be callable')
+    filter_full = kwargs.get('filter_full', False)
+    slc = kwargs.get('slice')
+    index = kwargs.get('index')
+    if index is not None and not 0 <= index < chunk_size:
+        raise ValueError('index must be in the first chunk')
+    rowocc = kwargs.get('rowocc')
+    if rowocc is not None:
+        rowocc = float(rowocc)
+        assert 0. <= rowocc <= 1., 'rowocc must be between 0 and 1'
+
+    if format == FASTA:
+        records = _iterFastaRecords
+    else:
+        records = _iterSelexRecords
+
+    labels = []
+    seqs = []
+    lenseq = None
+    cols = None
+    nchunk = 0
+    stream = openFile(filename, 'rb')
+    try:
+        for block in records(stream):
+            for label, seq in block:
+                if not lenseq:
+                    lenseq = len(seq)
+                if len(seq) != lenseq:
+                    raise IOError('sequence for {0} does not have expected '
+                                  'length {1}'.format(pystr(label), lenseq))
+                label = pystr(label)
+                if filter is not None:
+                    key = label if filter_full else splitSeqLabel(label)[0]
+                    if not filter(key, pystr(seq)):
+                        continue
+                labels.append(label)
+                seqs.append(seq)
+
+            while len(seqs) >= chunk_size or (not block and seqs):
+                chunk = frombuffer(b''.join(seqs[:chunk_size]), '|S1')
+                chunk = chunk.reshape((len(chunk) // lenseq, lenseq))
+                if slc is not None:
+                    chunk = chunk[:, slc]
+                codes = _encodeMSA(chunk)
+                if index is not None:
+                    if cols is None:
+                        if index >= len(codes):
+                            raise ValueError('index must be in the first '
+                                             'chunk')
+                        cols = codes[index].nonzero()[0]
+                    chunk = chunk.take(cols, 1)
+                    codes = codes.take(cols, 1)
+                chunk_labels = labels[:chunk_size]
+                if rowocc is not None:
+                    rows = ((codes != 0).sum(1) >=
+                            rowocc * codes.shape[1]).nonzero()[0]
+                    chunk = chunk[rows]
+                    codes = codes[rows]
+                    chunk_labels = [chunk_labels[i] for i in rows]
+                del seqs[:chunk_size], labels[:chunk_size]
+
+                nchunk += 1
+                if not len(chunk):
+                    continue
+                msa = MSA(chunk, title='{0} chunk {1}'.format(title, nchunk),
+                          labels=chunk_labels)
+                msa._encoded = codes
+                yield msa
+    finally:
+        stream.close()
+
+
+def _iterFastaRecords(stream, blocksize=BLOCKSIZE):
+    """Yield lists of (label, sequence) bytes for FASTA records read from
+    binary *stream* in blocks, and an empty list at the end."""
+
+    rest = b''
+    while True:
+        data = stream.read(blocksize)
+        if data:
+            data = rest + data
+            cut = data.rfind(b'\n>')
+            if cut < 0:
+                rest = data
+                continue
+            rest = data[cut+1:]
+            data = data[:cut+1]
+        else:
+            data, rest = rest, b''
+        start = data.find(b'>')
+        records = []
+        if start >= 0:
+            for record in data[start+1:].split(b'\n>'):
+                label, _, seq = record.partition(b'\n')
+                records.append((label.strip(),
+                                seq.translate(None, b'\r\n\t ')))
+        if records:
+            yield records
+        if not data:
+            break
+    yield []
+
+
+def _iterSelexRecords(stream, blocksize=BLOCKSIZE):
+    """Yield lists of (label, sequence) bytes for SELEX or Stockholm lines
+    read from binary *stream* in blocks, and an empty list at the end."""
+
+    rest = b''
+    while True:
+        data = stream.read(blocksize)
+        if data:
+            data = rest + data
+            cut = data.rfind(b'\n')
+            if cut < 0:
+                rest = data
+                continue
+            rest = data[cut+1:]
+            data = data[:cut+1]
+        else:
+            data, rest = rest, b''
+        records = []
+        for line in data.splitlines():
+            if not line or line[:1] in b'#/':
+                continue
+            items = line.split()
+            if not items:
+                continue
+            records.append((b' '.join(items[:-1]), items[-1]))
+        if records:
+            yield records
+        if not data:
+            break
+    yield []
+
+
 def parseClustal(filename, msaarr):
     """
     Parses a CLUSTAL format (:file:`.aln`) alignment file.
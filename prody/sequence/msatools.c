@@ -305,6 +305,39 @@ int aanum(int ch)
 
 /* Functions for PSICOV array handling END*/
 
+/* MSA arrays are either |S1 character arrays or uint8 arrays encoded by
+   MSA.getEncoded(), where letters are stored as ch - 64 (1-26 for upper
+   and 33-58 for lower case) and all other characters as 0.  Kernels look
+   up array values in these tables instead of re-mapping characters. */
+static void fillIndexTable(PyArrayObject *msa, unsigned char *alphabet) {
+
+    /* Fill *alphabet* with case insensitive alphabet indices, 0 for gaps. */
+
+    int i, encoded = PyArray_TYPE(msa) == NPY_UINT8;
+    for (i = 0; i < 256; i++) {
+        if (encoded)
+            alphabet[i] = (0 < i && i < 27) ? i :
+                       ((32 < i && i < 59) ? i - 32 : 0);
+        else
+            alphabet[i] = (64 < i && i < 91) ? i - 64 :
+                       ((96 < i && i < 123) ? i - 96 : 0);
+    }
+}
+
+
+static void fillASCIITable(PyArrayObject *msa, unsigned char *ascii) {
+
+    /* Fill *ascii* with the character each array value stands for. */
+
+    int i, encoded = PyArray_TYPE(msa) == NPY_UINT8;
+    for (i = 0; i < 256; i++) {
+        if (encoded)
+            ascii[i] = ((0 < i && i < 27) || (32 < i && i < 59)) ? i + 64 : 45;
+        else
+            ascii[i] = i;
+    }
+}
+
 static PyObject *msaentropy(PyObject *self, PyObject *args, PyObject *kwargs) {
 
     PyArrayObject *msa, *entropy;
@@ -322,12 +355,14 @@ static PyObject *msaentropy(PyObject *self, PyObject *args, PyObject *kwargs) {
 
     long number = PyArray_DIMS(msa)[0], length = PyArray_DIMS(msa)[1];
 
-    char *seq = (char *) PyArray_DATA(msa);
+    unsigned char *seq = (unsigned char *) PyArray_DATA(msa);
     double *ent = (double *) PyArray_DATA(entropy);
+    unsigned char ascii[256];
+    fillASCIITable(msa, ascii);
 
     /* start here */
     long size = number * length;
-    double count[128]; /* number of ASCII characters*/
+    double count[256]; /* number of ASCII characters*/
     double shannon = 0, probability = 0, numgap = 0, denom = number;
     long i = 0, j = 0;
 
@@ -344,7 +379,7 @@ static PyObject *msaentropy(PyObject *self, PyObject *args, PyObject *kwargs) {
 
         /* count characters in a column*/
         for (j = i; j < size; j += length)
-            count[(int) seq[j]]++;
+            count[ascii[seq[j]]]++;
         for (j = 65; j < 91; j++)
             count[j] += count[j + 32];
 
@@ -798,8 +833,10 @@ static PyObject *msamutinfo(PyObject *self, PyObject *args, PyObject *kwargs) {
     long number = PyArray_DIMS(msa)[0], length = PyArray_DIMS(msa)[1];
 
     /* get pointers to data */
-    char *seq = (char *) PyArray_DATA(msa); /*size: number x length */
+    unsigned char *seq = (unsigned char *) PyArray_DATA(msa); /*size: number x length */
     double *mut = (double *) PyArray_DATA(mutinfo);
+    unsigned char alphabet[256];
+    fillIndexTable(msa, alphabet);
 
 
     long i, j;
@@ -914,24 +951,12 @@ static PyObject *msamutinfo(PyObject *self, PyObject *args, PyObject *kwargs) {
             if (diff) {
                 a = iseq[k];
             } else {
-                a = (unsigned char) seq[offset + i];
-                if (a > 90)
-                    a -= 96;
-                else
-                    a -= 64;
-                if (a < 1 || a > 26)
-                    a = 0; /* gap character */
+                a = alphabet[seq[offset + i]];
                 iseq[k] = a;
                 prow[a] += p_incr;
             }
 
-            b = (unsigned char) seq[offset + j];
-            if (b > 90)
-                b -= 96;
-            else
-                b -= 64;
-            if (b < 1 || b > 26)
-                b = 0; /* gap character */
+            b = alphabet[seq[offset + j]];
             if (turbo)  /* we keep the refined chars for all sequences*/
                 jseq[k] = b;
             joint[a][b] += p_incr;
@@ -1019,23 +1044,11 @@ static PyObject *msamutinfo(PyObject *self, PyObject *args, PyObject *kwargs) {
                     if (diff) {
                         a = iseq[k];
                     } else {
-                        a = (unsigned char) seq[offset + i];
-                        if (a > 90)
-                            a -= 96;
-                        else
-                            a -= 64;
-                        if (a < 1 || a > 26)
-                            a = 0; /* gap character */
+                        a = alphabet[seq[offset + i]];
                         iseq[k] = a;
                     }
 
-                    b = (unsigned char) seq[offset + j];
-                    if (b > 90)
-                        b -= 96;
-                    else
-                        b -= 64;
-                    if (b < 1 || b > 26)
-                        b = 0; /* gap character */
+                    b = alphabet[seq[offset + j]];
                     joint[a][b] += p_incr;
                 }
             }
@@ -1068,6 +1081,57 @@ static PyObject *msamutinfo(PyObject *self, PyObject *args, PyObject *kwargs) {
 }
 
 
+static PyObject *msapaircounts(PyObject *self, PyObject *args,
+                               PyObject *kwargs) {
+
+    PyArrayObject *columns, *weights, *counts;
+    long start = 0, stop = -1, tile = 4096;
+
+    static char *kwlist[] = {"columns", "weights", "counts",
+                             "start", "stop", "tile", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|lll", kwlist,
+                                     &columns, &weights, &counts,
+                                     &start, &stop, &tile))
+        return NULL;
+
+    long length = PyArray_DIMS(columns)[0], number = PyArray_DIMS(columns)[1];
+    unsigned char *cols = (unsigned char *) PyArray_DATA(columns);
+    double *wght = (double *) PyArray_DATA(weights);
+    double *cnts = (double *) PyArray_DATA(counts);
+    if (stop < 0 || stop > length)
+        stop = length;
+    if (tile < 1)
+        tile = number;
+
+    long i, j, k, t, end;
+    unsigned char *icol, *jcol;
+    double *pair;
+
+    Py_BEGIN_ALLOW_THREADS
+    /* add weighted counts of character pairs of column i and following
+       columns to NUMCHARSxNUMCHARS tables stored for the upper triangle of
+       column pairs, sequences are processed in tiles so that column i and
+       weights stay in cache */
+    for (i = start; i < stop; i++) {
+        icol = cols + i * number;
+        for (t = 0; t < number; t += tile) {
+            end = t + tile < number ? t + tile : number;
+            pair = cnts + (i * (2 * length - i - 1) / 2) * NUMCHARS * NUMCHARS;
+            for (j = i + 1; j < length; j++) {
+                jcol = cols + j * number;
+                for (k = t; k < end; k++)
+                    pair[icol[k] * NUMCHARS + jcol[k]] += wght[k];
+                pair += NUMCHARS * NUMCHARS;
+            }
+        }
+    }
+    Py_END_ALLOW_THREADS
+
+    Py_RETURN_NONE;
+}
+
+
 static PyObject *msaocc(PyObject *self, PyObject *args, PyObject *kwargs) {
 
     PyArrayObject *msa, *occ;
@@ -1081,8 +1145,10 @@ static PyObject *msaocc(PyObject *self, PyObject *args, PyObject *kwargs) {
         return NULL;
 
     long number = PyArray_DIMS(msa)[0], length = PyArray_DIMS(msa)[1];
-    char *seq = (char *) PyArray_DATA(msa), *row, ch;
+    unsigned char *seq = (unsigned char *) PyArray_DATA(msa), *row;
     double *cnt = (double *) PyArray_DATA(occ);
+    unsigned char alphabet[256];
+    fillIndexTable(msa, alphabet);
 
     long i, j, *k;
     if (dim)
@@ -1093,8 +1159,7 @@ static PyObject *msaocc(PyObject *self, PyObject *args, PyObject *kwargs) {
     for (i = 0; i < number; i++) {
         row = seq + i * length;
         for (j = 0; j < length; j++) {
-            ch = row[j];
-            if ((64 < ch && ch < 91) || (96 < ch && ch < 123))
+            if (alphabet[row[j]])
                 cnt[*k]++;
         }
     }
@@ -1151,8 +1216,10 @@ static PyObject *msaomes(PyObject *self, PyObject *args, PyObject *kwargs) {
     long number = PyArray_DIMS(msa)[0], length = PyArray_DIMS(msa)[1];
 
     /* get pointers to data */
-    char *seq = (char *) PyArray_DATA(msa); /*size: number x length */
+    unsigned char *seq = (unsigned char *) PyArray_DATA(msa); /*size: number x length */
     double *data = (double *) PyArray_DATA(omes);
+    unsigned char alphabet[256];
+    fillIndexTable(msa, alphabet);
 
     long i, j;
     /* allocate memory */
@@ -1266,24 +1333,12 @@ static PyObject *msaomes(PyObject *self, PyObject *args, PyObject *kwargs) {
             if (diff) {
                 a = iseq[k];
             } else {
-                a = (unsigned char) seq[offset + i];
-                if (a > 90)
-                    a -= 96;
-                else
-                    a -= 64;
-                if (a < 1 || a > 26)
-                    a = 0; /* gap character */
+                a = alphabet[seq[offset + i]];
                 iseq[k] = a;
                 prow[a] += p_incr;
             }
 
-            b = (unsigned char) seq[offset + j];
-            if (b > 90)
-                b -= 96;
-            else
-                b -= 64;
-            if (b < 1 || b > 26)
-                b = 0; /* gap character */
+            b = alphabet[seq[offset + j]];
             if (turbo)  /* we keep the refined chars for all sequences*/
                 jseq[k] = b;
             joint[a][b] += p_incr;
@@ -1366,23 +1421,11 @@ static PyObject *msaomes(PyObject *self, PyObject *args, PyObject *kwargs) {
                     if (diff) {
                         a = iseq[k];
                     } else {
-                        a = (unsigned char) seq[offset + i];
-                        if (a > 90)
-                            a -= 96;
-                        else
-                            a -= 64;
-                        if (a < 1 || a > 26)
-                            a = 0; /* gap character */
+                        a = alphabet[seq[offset + i]];
                         iseq[k] = a;
                     }
 
-                    b = (unsigned char) seq[offset + j];
-                    if (b > 90)
-                        b -= 96;
-                    else
-                        b -= 64;
-                    if (b < 1 || b > 26)
-                        b = 0; /* gap character */
+                    b = alphabet[seq[offset + j]];
                     joint[a][b] += p_incr;
                 }
             }
@@ -1424,8 +1467,10 @@ static PyObject *msasca(PyObject *self, PyObject *args, PyObject *kwargs) {
     /* check dimensions */
     long number = PyArray_DIMS(msa)[0], length = PyArray_DIMS(msa)[1];
     /* get pointers to data */
-    char *seq = (char *) PyArray_DATA(msa); /*size: number x length */
+    unsigned char *seq = (unsigned char *) PyArray_DATA(msa); /*size: number x length */
     double *sca = (double *) PyArray_DATA(scainfo);
+    unsigned char alphabet[256];
+    fillIndexTable(msa, alphabet);
 
     long i, j, k;
     double q[NUMCHARS] = {0., 0.073, 0., 0.025, 0.05, 0.061, 0.042, 0.072,
@@ -1482,10 +1527,9 @@ static PyObject *msasca(PyObject *self, PyObject *args, PyObject *kwargs) {
             phi[i] = 0.0;
         }
         for (j=0; j<number; j++){
-            int temp = seq[j * length + i];
-            temp = (temp > 96) ?  temp - 97 : temp - 65;
-            if ((temp >= 0) && (temp <= 25))
-                prob[temp + 1] += 1.0 ;
+            int temp = alphabet[seq[j * length + i]];
+            if (temp)
+                prob[temp] += 1.0 ;
         }
         for (j=0; j<NUMCHARS; j++){
             prob[j] = prob[j] / number;
@@ -1542,10 +1586,9 @@ static PyObject *msasca(PyObject *self, PyObject *args, PyObject *kwargs) {
         prob[24] = sum;
         if (turbo){
             for (j = 0; j < number; j++){
-                int temp = seq[j * length + i];
-                temp = (temp > 96) ? temp - 97 : temp - 65;
-                if (temp >= 0 && temp <= 25)
-                    wx[i][j] = prob[temp + 1];
+                int temp = alphabet[seq[j * length + i]];
+                if (temp)
+                    wx[i][j] = prob[temp];
                 else
                     wx[i][j] = 0.0;
             }
@@ -1567,14 +1610,8 @@ static PyObject *msasca(PyObject *self, PyObject *args, PyObject *kwargs) {
             }
             else{
                 for (k = 0; k < number; k++){
-                    int tempi = (seq[k*length + i] > 96) ?
-                    seq[k * length + i] - 97 : seq[k * length + i] - 65;
-                    double xi = (tempi >= 0 && tempi <= 25) ?
-                        wprob[i][tempi + 1] : wprob[i][0];
-                    int tempj = (seq[k * length + j] > 96) ?
-                        seq[k * length + j] - 97 : seq[k * length + j] - 65;
-                    double xj = (tempj >= 0 && tempj <= 25) ?
-                        wprob[j][tempj + 1] : wprob[j][0];
+                    double xi = wprob[i][alphabet[seq[k * length + i]]];
+                    double xj = wprob[j][alphabet[seq[k * length + j]]];
                     sumi += xi;
                     sumj += xj;
                     sum += xi * xj;
@@ -1621,7 +1658,9 @@ static PyObject *msameff(PyObject *self, PyObject *args, PyObject *kwargs) {
     long number = PyArray_DIMS(msa)[0], length = PyArray_DIMS(msa)[1];
     long i, j, k, l = 0;
     /* get pointers to data */
-    char *seq = (char *) PyArray_DATA(msa); /*size: number x length */
+    unsigned char *seq = (unsigned char *) PyArray_DATA(msa); /*size: number x length */
+    unsigned char ascii[256];
+    fillASCIITable(msa, ascii);
 
     /*Set ind and get l first.*/
     int *ind = malloc(length * sizeof(int));
@@ -1637,7 +1676,7 @@ static PyObject *msameff(PyObject *self, PyObject *args, PyObject *kwargs) {
     }
     else{
         for (i = 0; i < length; i++){
-            if (seq[i] <= 90 && seq[i] >= 65){
+            if (ascii[seq[i]] <= 90 && ascii[seq[i]] >= 65){
                 l += 1;
                 ind[i] = l;
             }
@@ -1668,8 +1707,9 @@ static PyObject *msameff(PyObject *self, PyObject *args, PyObject *kwargs) {
     for (i = 0; i < number; i++){
         for (j = 0; j < length; j++){
             if (ind[j] != 0){
-                if (seq[i*length+j] >= 65 && seq[i*length+j] <= 90)
-                    align(i,ind[j]-1) = alignlist[seq[i*length+j] - 65];
+                unsigned char ch = ascii[seq[i*length+j]];
+                if (ch >= 65 && ch <= 90)
+                    align(i,ind[j]-1) = alignlist[ch - 65];
                 else
                     align(i,ind[j]-1) = 0;
             }
@@ -1683,8 +1723,12 @@ static PyObject *msameff(PyObject *self, PyObject *args, PyObject *kwargs) {
         for (j = i+1; j < number; j++){
             double temp = 0.;
             for (k = 0; k < l; k++){
-                if (align(i,k) != align(j,k))
+                if (align(i,k) != align(j,k)) {
                     temp += 1.;
+                    /* mismatches only grow, stop once past theta */
+                    if (temp / l >= theta)
+                        break;
+                }
             }
             temp /= l;
             if (temp < theta){
@@ -1740,7 +1784,9 @@ static PyObject *msadipretest(PyObject *self, PyObject *args, PyObject *kwargs)
         return NULL;
     msa = PyArray_GETCONTIGUOUS(msa);
     long number = PyArray_DIMS(msa)[0], length = PyArray_DIMS(msa)[1];
-    char *seq = (char *) PyArray_DATA(msa);
+    unsigned char *seq = (unsigned char *) PyArray_DATA(msa), ch;
+    unsigned char ascii[256];
+    fillASCIITable(msa, ascii);
     long i, j, k = 0, l = 0;
     int *ind = malloc(length * sizeof(int));
     if (!ind)
@@ -1752,7 +1798,7 @@ static PyObject *msadipretest(PyObject *self, PyObject *args, PyObject *kwargs)
     }
     else
         for (i = 0; i < length; i++)
-            if (seq[i] <= 90 && seq[i] >= 65){
+            if (ascii[seq[i]] <= 90 && ascii[seq[i]] >= 65){
                 l += 1;
                 ind[i] = l;
             }
@@ -1760,10 +1806,11 @@ static PyObject *msadipretest(PyObject *self, PyObject *args, PyObject *kwargs)
                 ind[i] = 0;
     for (i = 0; i < number; i++)
         for (j = 0; j < length; j++)
-            if (ind[j])
-                if (seq[i*length+j] >= 65 && seq[i*length+j] <= 90)
-                    k = alignlist[seq[i*length+j]-65]>k?
-                        alignlist[seq[i*length+j]-65]:k;
+            if (ind[j]) {
+                ch = ascii[seq[i*length+j]];
+                if (ch >= 65 && ch <= 90)
+                    k = alignlist[ch-65]>k? alignlist[ch-65]:k;
+            }
     free(ind);
     return Py_BuildValue("ii",l,k);
 }
@@ -1783,7 +1830,10 @@ static PyObject *msadirectinfo1(PyObject *self, PyObject *args, PyObject *kwargs
     long i, j, k, k1, k2;
     cinfo = PyArray_GETCONTIGUOUS(cinfo);
     pinfo = PyArray_GETCONTIGUOUS(pinfo);
+    /* c may be a single precision array to halve memory usage */
+    int single = PyArray_TYPE(cinfo) == NPY_FLOAT;
     double *c = (double *) PyArray_DATA(cinfo);
+    float *cf = (float *) PyArray_DATA(cinfo);
     double *prob = (double *) PyArray_DATA(pinfo);
 
     /*Calculate meff, w and align.*/
@@ -1822,6 +1872,7 @@ static PyObject *msadirectinfo1(PyObject *self, PyObject *args, PyObject *kwargs
     }
     #define joint(x,y) joint[(x)*q + (y)]
     #define c(x,y) c[(x)*l*(q-1) + (y)]
+    #define cf(x,y) cf[(x)*l*(q-1) + (y)]
     for (i = 0; i < l; i++){
         for (j = i; j < l; j++){
 
@@ -1844,8 +1895,10 @@ static PyObject *msadirectinfo1(PyObject *self, PyObject *args, PyObject *kwargs
 
             for (k1 = 0; k1 < q-1; k1++){
                 for(k2 = 0; k2 < q-1; k2++){
-                    c((q-1)*j+k2, (q-1)*i+k1) = c((q-1)*i+k1, (q-1)*j+k2) = joint(k1,k2) - prob(i,k1) * prob(j,k2);
-                    // c((q-1)*j+k2, (q-1)*i+k1) = c((q-1)*i+k1, (q-1)*j+k2);
+                    if (single)
+                        cf((q-1)*j+k2, (q-1)*i+k1) = cf((q-1)*i+k1, (q-1)*j+k2) = (float) (joint(k1,k2) - prob(i,k1) * prob(j,k2));
+                    else
+                        c((q-1)*j+k2, (q-1)*i+k1) = c((q-1)*i+k1, (q-1)*j+k2) = joint(k1,k2) - prob(i,k1) * prob(j,k2);
                 }
             }
         }
@@ -1858,6 +1911,7 @@ static PyObject *msadirectinfo1(PyObject *self, PyObject *args, PyObject *kwargs
     #undef align
     #undef joint
     #undef c
+    #undef cf
 
     return Py_BuildValue("dllOO", meff, number, l, cinfo, pinfo);
 }
@@ -1874,7 +1928,9 @@ static PyObject *msadirectinfo2(PyObject *self, PyObject *args, PyObject *kwargs
     cinfo = PyArray_GETCONTIGUOUS(cinfo);
     pinfo = PyArray_GETCONTIGUOUS(pinfo);
     diinfo = PyArray_GETCONTIGUOUS(diinfo);
+    int single = PyArray_TYPE(cinfo) == NPY_FLOAT;
     double *c = (double *) PyArray_DATA(cinfo);
+    float *cf = (float *) PyArray_DATA(cinfo);
     double *prob = (double *) PyArray_DATA(pinfo);
     double *di = (double *) PyArray_DATA(diinfo);
 
@@ -1888,6 +1944,7 @@ static PyObject *msadirectinfo2(PyObject *self, PyObject *args, PyObject *kwargs
 
     #define w(x, y) w[(x)*q+(y)]
     #define c(x, y) c[(x)*l*(q-1) + (y)]
+    #define cf(x, y) cf[(x)*l*(q-1) + (y)]
     #define prob(x, y) prob[(x)*q + (y)]
     #define di(x, y) di[(x)*l + (y)]
 
@@ -1900,7 +1957,8 @@ static PyObject *msadirectinfo2(PyObject *self, PyObject *args, PyObject *kwargs
         for (j = i+1; j < l; j++){
             for (k1 = 0; k1 < q-1; k1++){
                 for (k2 = 0; k2 < q-1; k2++){
-                    w(k1, k2) = exp(-c((q-1)*i + k1, (q-1)*j + k2));
+                    w(k1, k2) = exp(-(single ? cf((q-1)*i + k1, (q-1)*j + k2)
+                                             : c((q-1)*i + k1, (q-1)*j + k2)));
                 }
             }
             for (k1 = 0; k1 < q; k1++){
@@ -1967,6 +2025,7 @@ static PyObject *msadirectinfo2(PyObject *self, PyObject *args, PyObject *kwargs
 
     #undef w
     #undef c
+    #undef cf
     #undef prob
     #undef di
     free(w);
@@ -2271,6 +2330,11 @@ static PyMethodDef msatools_methods[] = {
      "Return mutual information matrix calculated for given character \n"
      "array that contains an MSA."},
 
+    {"msapaircounts",  (PyCFunction)msapaircounts,
+     METH_VARARGS | METH_KEYWORDS,
+     "Add weighted character pair counts of columns from start to stop and\n"
+     "following columns of an index coded and transposed MSA."},
+
     {"msaocc",  (PyCFunction)msaocc, METH_VARARGS | METH_KEYWORDS,
      "Return occupancy (or count) array calculated for MSA rows or columns."},
 
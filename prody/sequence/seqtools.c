@@ -1,226 +1,372 @@
+#define PY_SSIZE_T_CLEAN
 #include "Python.h"
 #define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
 #include "numpy/arrayobject.h"
 #define NUMCHARS 27
 #include <stdio.h>
+#include <stdlib.h>
+#include <math.h>
 
 const int twenty[20] = {1, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13,
                         14, 16, 17, 18, 19, 20, 22, 23, 25};
 const int unambiguous[23] = {0, 1, 3, 4, 5, 6, 7, 8, 9, 11, 12, 13, 14,
                              15, 16, 17, 18, 19, 20, 21, 22, 23, 25};
 
-static PyObject *msaeye(PyObject *self, PyObject *args,
-                                   PyObject *kwargs) {
+/* Sequences are compared in a packed encoding, where residue codes (< 32)
+   are stored in 5 bits each and 12 residues fit in a 64-bit word.  Fields
+   that differ between two words are found with a few bitwise operations,
+   leaving a set bit at the lowest position of each differing field, and
+   are counted using popcount.  Occupancy masks have the lowest bit of a
+   field set for non-gap residues. */
+#define FIELDS 12
+#define LOWBITS 0x84210842108421ULL
+
+#if defined(__GNUC__) || defined(__clang__)
+#define POPCOUNT(x) __builtin_popcountll(x)
+#else
+static int POPCOUNT(npy_uint64 x) {
 
-    PyArrayObject *msa, *array;
-    double unique = 0;
-    int turbo = 1;
+    x = x - ((x >> 1) & 0x5555555555555555ULL);
+    x = (x & 0x3333333333333333ULL) + ((x >> 2) & 0x3333333333333333ULL);
+    x = (x + (x >> 4)) & 0x0F0F0F0F0F0F0F0FULL;
+    return (int) ((x * 0x0101010101010101ULL) >> 56);
+}
+#endif
 
-    static char *kwlist[] = {"msa", "array", "unique", "turbo", NULL};
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|di", kwlist,
-                                     &msa, &array, &unique, &turbo))
-        return NULL;
+static npy_uint64 differ(npy_uint64 a, npy_uint64 b) {
 
-    /* make sure to have a contiguous and well-behaved array */
-    msa = PyArray_GETCONTIGUOUS(msa);
+    /* Return mask with lowest bits of differing fields set. */
 
-    /* get dimensions */
-    long number = PyArray_DIMS(msa)[0], length = PyArray_DIMS(msa)[1];
+    npy_uint64 x = a ^ b;
+    return (x | (x >> 1) | (x >> 2) | (x >> 3) | (x >> 4)) & LOWBITS;
+}
 
-    /* get pointers to data */
-    char *iraw, *jraw, *raw = (char *) PyArray_DATA(msa);
 
-    long i, j;
-    /* allocate memory */
-    double *jrow, *sim =  (double *) raw;
-    _Bool *unq = (_Bool *) raw; /* to avoid uninitialized warnings*/
-    if (unique)
-        unq = (_Bool *) PyArray_DATA(array);
-    else
-        sim = (double *) PyArray_DATA(array);
+static void countPair(npy_uint64 *iseq, npy_uint64 *iocc, npy_uint64 *jseq,
+                      npy_uint64 *jocc, long words, long *ncols, long *nmis) {
 
-    /* arrays to store refined sequences*/
-    unsigned char *iseq = malloc(length * sizeof(unsigned char));
-    if (!iseq)
-        return PyErr_NoMemory();
+    /* Count columns where either sequence has a residue and mismatches. */
 
-    unsigned char **seq = malloc(number * sizeof(unsigned char *));
-    if (!seq) {
-        turbo = 0;
+    long k, cols = 0, mis = 0;
+    npy_uint64 occ;
+    for (k = 0; k < words; k++) {
+        occ = iocc[k] | jocc[k];
+        cols += POPCOUNT(occ);
+        mis += POPCOUNT(differ(iseq[k], jseq[k]) & occ);
     }
+    *ncols = cols;
+    *nmis = mis;
+}
 
-    if (turbo) {
-        /* allocate rows that will store columns of MSA */
-        seq[0] = iseq;
-        for (i = 1; i < number; i++) {
-            seq[i] = malloc(length * sizeof(unsigned char));
-            if (!seq[i]) {
-                for (j = 1; j < i; j++)
-                    free(seq[j]);
-                free(seq);
-                turbo = 0;
-            }
-        }
-    }
 
-    /* initialize jseq, so that we don't get uninitialized warning */
-    unsigned char *jseq = iseq;
-
-    unsigned char a, b;
-    long k, diff;
-
-    /* zero sim array */
-    if (unique) {
-        for (i = 0; i < number; i++)
-            unq[i] = 1;
-    } else {
-        for (i = 0; i < number; i++) {
-            jrow = sim + i * number;
-            for (j = 0; j < number; j++)
-                jrow[j] = 0;
-            jrow[i] = 1;
+static PyObject *msaeye(PyObject *self, PyObject *args, PyObject *kwargs) {
+
+    PyArrayObject *seqs, *occs, *array;
+    long start = 0, stop = -1;
+
+    static char *kwlist[] = {"seqs", "occs", "array", "start", "stop", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOO|ll", kwlist,
+                                     &seqs, &occs, &array, &start, &stop))
+        return NULL;
+
+    long number = PyArray_DIMS(seqs)[0], words = PyArray_DIMS(seqs)[1];
+    npy_uint64 *seq = (npy_uint64 *) PyArray_DATA(seqs);
+    npy_uint64 *occ = (npy_uint64 *) PyArray_DATA(occs);
+    double *sim = (double *) PyArray_DATA(array);
+    if (stop < 0 || stop > number)
+        stop = number;
+
+    long i, j, ncols, nmis;
+
+    Py_BEGIN_ALLOW_THREADS
+    /* rows are calculated for columns past the diagonal and mirrored, so
+       blocks of rows can be calculated concurrently */
+    for (i = start; i < stop; i++) {
+        sim[i * number + i] = 1;
+        for (j = i + 1; j < number; j++) {
+            countPair(seq + i * words, occ + i * words,
+                      seq + j * words, occ + j * words, words, &ncols, &nmis);
+            if (ncols)
+                sim[i * number + j] = sim[j * number + i] =
+                    (double) (ncols - nmis) / ncols;
         }
     }
+    Py_END_ALLOW_THREADS
 
-    double ncols, score, seqid;
-
-    /* START calculation */
-    /* calculate first row of MI matrix and all column probabilities */
-    i = 0;
-    iraw = raw;
-    for (j = 1; j < number; j++) {
-        ncols = score = 0.;
-        jraw = raw + length * j;
-        diff = j - 1;
-        if (turbo) /* in turbo mode, there is a row for refined sequences */
-            jseq = seq[j];
-        for (k = 0; k < length; k++) {
-            if (diff) {
-                a = iseq[k];
-            } else {
-                a = (unsigned char) iraw[k];
-                if (a > 90)
-                    a -= 96;
-                else
-                    a -= 64;
-                if (a < 1 || a > 26)
-                    a = 0; /* gap character */
-                iseq[k] = a;
-            }
+    Py_RETURN_NONE;
+}
 
-            b = (unsigned char) jraw[k];
-            if (b > 90)
-                b -= 96;
-            else
-                b -= 64;
-            if (b < 1 || b > 26)
-                b = 0; /* gap character */
-            if (turbo)  /* we keep the refined chars for all sequences*/
-                jseq[k] = b;
-
-            if (a || b) {
-                ncols++;
-                if (a == b)
-                    score++;
-            }
-        }
 
-        seqid = score / ncols;
-        if (unique) {
-            if (seqid >= unique)
+static PyObject *msaunique(PyObject *self, PyObject *args, PyObject *kwargs) {
+
+    PyArrayObject *seqs, *occs, *array;
+    double unique = 0;
+
+    static char *kwlist[] = {"seqs", "occs", "array", "unique", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOd", kwlist,
+                                     &seqs, &occs, &array, &unique))
+        return NULL;
+
+    long number = PyArray_DIMS(seqs)[0], words = PyArray_DIMS(seqs)[1];
+    npy_uint64 *seq = (npy_uint64 *) PyArray_DATA(seqs);
+    npy_uint64 *occ = (npy_uint64 *) PyArray_DATA(occs);
+    npy_bool *unq = (npy_bool *) PyArray_DATA(array);
+
+    long *kept = malloc(number * sizeof(long));
+    if (!kept)
+        return PyErr_NoMemory();
+
+    long i, j, k, n, nkept = 0, ncols, nmis;
+    double slack = 1. - unique;
+    npy_uint64 *iseq, *iocc, *jseq, *jocc, o;
+
+    Py_BEGIN_ALLOW_THREADS
+    /* a sequence is unique unless it is similar to an earlier unique one,
+       comparisons stop at the first similar sequence, and a pair is dropped
+       as soon as mismatches rule out reaching the threshold */
+    for (j = 0; j < number; j++) {
+        jseq = seq + j * words;
+        jocc = occ + j * words;
+        unq[j] = 1;
+        for (n = 0; n < nkept; n++) {
+            i = kept[n];
+            iseq = seq + i * words;
+            iocc = occ + i * words;
+            ncols = nmis = 0;
+            for (k = 0; k < words; k++) {
+                o = iocc[k] | jocc[k];
+                ncols += POPCOUNT(o);
+                nmis += POPCOUNT(differ(iseq[k], jseq[k]) & o);
+                if (nmis > slack * (ncols + FIELDS * (words - k - 1)) + .5)
+                    break;
+            }
+            if (k == words && (double) (ncols - nmis) / ncols >= unique) {
                 unq[j] = 0;
-        } else
-            if (ncols)
-                sim[j] = sim[number * j] = seqid;
+                break;
+            }
+        }
+        if (unq[j])
+            kept[nkept++] = j;
     }
+    Py_END_ALLOW_THREADS
 
-    if (turbo)
-        free(iseq);
+    free(kept);
+    Py_RETURN_NONE;
+}
 
-    /* calculate rest of identities */
-    for (i = 1; i < number; i++) {
 
-        if (unique && !unq[i])
-            continue;
+static PyObject *msameff(PyObject *self, PyObject *args, PyObject *kwargs) {
 
-        if (turbo)
-            iseq = seq[i];
-        else
-            iraw = raw + length * i;
+    PyArrayObject *seqs, *array;
+    double theta = 0;
+    long length = 0, start = 0, stop = -1, jstart = 0;
 
-        for (j = i + 1; j < number; j++) {
-            ncols = score = 0.;
-        
-            if (turbo) {
-                jseq = seq[j];
-                for (k = 0; k < length; k++) {
-                    a = iseq[k];
-                    b = jseq[k];
-                    if (a || b) {
-                        ncols++;
-                        if (a == b)
-                            score++;
-                    }
-                }
-            } else {
-                jraw = raw + length * j;
-                diff = j - i - 1;
-                for (k = 0; k < length; k++) {
-                    if (diff) {
-                        a = iseq[k];
-                    } else {
-                        a = (unsigned char) iraw[k];
-                        if (a > 90)
-                            a -= 96;
-                        else
-                            a -= 64;
-                        if (a < 1 || a > 26)
-                            a = 0; /* gap character */
-                        iseq[k] = a;
-                    }
-
-                    b = (unsigned char) jraw[k];
-                    if (b > 90)
-                        b -= 96;
-                    else
-                        b -= 64;
-                    if (b < 1 || b > 26)
-                        b = 0; /* gap character */
-
-                    if (a || b) {
-                        ncols++;
-                        if (a == b)
-                            score++;
-                    }
-                }
+    static char *kwlist[] = {"seqs", "count", "theta", "length",
+                             "start", "stop", "jstart", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOdl|lll", kwlist,
+                                     &seqs, &array, &theta, &length,
+                                     &start, &stop, &jstart))
+        return NULL;
+
+    long number = PyArray_DIMS(seqs)[0], words = PyArray_DIMS(seqs)[1];
+    npy_uint64 *seq = (npy_uint64 *) PyArray_DATA(seqs);
+    double *count = (double *) PyArray_DATA(array);
+    if (stop < 0 || stop > number)
+        stop = number;
+
+    long i, j, k, nmis;
+    npy_uint64 *iseq, *jseq;
+
+    Py_BEGIN_ALLOW_THREADS
+    /* neighbors are counted without forming the pair matrix, a pair is
+       dropped once the fraction of mismatches reaches theta; rows are
+       compared to following rows starting from jstart, so that sequences
+       appended to those already counted can be compared to all others */
+    for (i = start; i < stop; i++) {
+        iseq = seq + i * words;
+        for (j = (i < jstart ? jstart : i + 1); j < number; j++) {
+            jseq = seq + j * words;
+            nmis = 0;
+            for (k = 0; k < words; k++) {
+                nmis += POPCOUNT(differ(iseq[k], jseq[k]));
+                if ((double) nmis / length >= theta)
+                    break;
+            }
+            if (k == words) {
+                count[i]++;
+                count[j]++;
             }
+        }
+    }
+    Py_END_ALLOW_THREADS
 
-            seqid = score / ncols;
-            if (unique) {
-                if (seqid >= unique)
-                    unq[j] = 0;
+    Py_RETURN_NONE;
+}
+
+/* Traceback bits for pairwise alignment, two bits tell whether the best
+   score of a cell comes from a match/mismatch, a gap in the second or the
+   first sequence, or the start of a local alignment, and two bits tell
+   whether the gaps are extended from the preceding cell. */
+#define TB_STOP 0
+#define TB_DIAG 1
+#define TB_UP 2
+#define TB_LEFT 3
+#define TB_UPEXT 4
+#define TB_LEFTEXT 8
+
+static PyObject *pwalign(PyObject *self, PyObject *args, PyObject *kwargs) {
+
+    const char *a, *b;
+    Py_ssize_t n, m;
+    PyArrayObject *array;
+    double match = 1., mismatch = 0., gap = -1., ext = -.1;
+    int local = 1;
+
+    static char *kwlist[] = {"seqa", "seqb", "amap", "match", "mismatch",
+                             "gap", "ext", "local", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwargs, "y#y#O|ddddi", kwlist,
+                                     &a, &n, &b, &m, &array, &match,
+                                     &mismatch, &gap, &ext, &local))
+        return NULL;
+
+    npy_intp *amap = (npy_intp *) PyArray_DATA(array);
+    long i, j, width = m + 1, bi = 0, bj = 0;
+    unsigned char *trace = malloc((n + 1) * width);
+    double *hrow = malloc(width * sizeof(double));
+    double *erow = malloc(width * sizeof(double));
+    if (!trace || !hrow || !erow) {
+        free(trace);
+        free(hrow);
+        free(erow);
+        return PyErr_NoMemory();
+    }
+
+    double best = 0, diag, f, h, score;
+    unsigned char t;
+
+    Py_BEGIN_ALLOW_THREADS
+    /* Gotoh's algorithm with a row of scores and vertical gap scores; gaps
+       at the ends of global alignments are penalized as internal gaps, as
+       in Biopython's pairwise2.align.globalms */
+    hrow[0] = 0;
+    erow[0] = -HUGE_VAL;
+    trace[0] = TB_STOP;
+    for (j = 1; j < width; j++) {
+        hrow[j] = local ? 0 : gap + (j - 1) * ext;
+        erow[j] = -HUGE_VAL;
+        trace[j] = TB_STOP;
+    }
+    for (i = 1; i <= n; i++) {
+        diag = hrow[0];
+        if (!local)
+            hrow[0] = gap + (i - 1) * ext;
+        f = -HUGE_VAL;
+        trace[i * width] = TB_STOP;
+        for (j = 1; j <= m; j++) {
+            t = 0;
+            if (erow[j] + ext > hrow[j] + gap) {
+                erow[j] += ext;
+                t |= TB_UPEXT;
+            } else
+                erow[j] = hrow[j] + gap;
+            if (f + ext > hrow[j - 1] + gap) {
+                f += ext;
+                t |= TB_LEFTEXT;
             } else
-                if (ncols)
-                    sim[i * number + j] = sim[i + number * j] = seqid;
-         }
+                f = hrow[j - 1] + gap;
+
+            h = diag + (a[i - 1] == b[j - 1] ? match : mismatch);
+            t |= TB_DIAG;
+            if (erow[j] > h) {
+                h = erow[j];
+                t = (t & ~3) | TB_UP;
+            }
+            if (f > h) {
+                h = f;
+                t = (t & ~3) | TB_LEFT;
+            }
+            if (local && h <= 0) {
+                h = 0;
+                t &= ~3;
+            }
+            diag = hrow[j];
+            hrow[j] = h;
+            trace[i * width + j] = t;
+
+            if (local && h > best) {
+                best = h;
+                bi = i;
+                bj = j;
+            }
+        }
+    }
+    if (!local) {
+        best = hrow[m];
+        bi = n;
+        bj = m;
     }
 
-    /* free memory */
-    if (turbo)
-        for (j = 1; j < number; j++)
-            free(seq[j]);
-    free(seq);
+    for (i = 0; i < n; i++)
+        amap[i] = -1;
+    score = best;
+    i = bi;
+    j = bj;
+    int state = TB_STOP;
+    while (i > 0 && j > 0) {
+        t = trace[i * width + j];
+        if (state == TB_STOP) {
+            state = t & 3;
+            if (state == TB_STOP)
+                break;
+            if (state == TB_DIAG) {
+                amap[--i] = --j;
+                state = TB_STOP;
+                continue;
+            }
+        }
+        if (state == TB_UP) {
+            i--;
+            state = (t & TB_UPEXT) ? TB_UP : TB_STOP;
+        } else {
+            j--;
+            state = (t & TB_LEFTEXT) ? TB_LEFT : TB_STOP;
+        }
+    }
+    Py_END_ALLOW_THREADS
 
-    return Py_BuildValue("O", array);
+    free(trace);
+    free(hrow);
+    free(erow);
+    return Py_BuildValue("d", score);
 }
 
+
 static PyMethodDef seqtools_methods[] = {
 
     {"msaeye",  (PyCFunction)msaeye,
      METH_VARARGS | METH_KEYWORDS,
-     "Return sequence identity matrix calculated for given character \n"
-     "array that contains an MSA."},
+     "Calculate rows from start to stop of sequence identity matrix for \n"
+     "packed sequences and occupancy masks."},
+
+    {"msaunique",  (PyCFunction)msaunique,
+     METH_VARARGS | METH_KEYWORDS,
+     "Mark sequences that are not similar to a preceding unique sequence \n"
+     "at given sequence identity level."},
+
+    {"pwalign",  (PyCFunction)pwalign,
+     METH_VARARGS | METH_KEYWORDS,
+     "Align two sequences globally or locally using affine gap penalties\n"
+     "and fill the mapping of residues of the first onto the second."},
+
+    {"msameff",  (PyCFunction)msameff,
+     METH_VARARGS | METH_KEYWORDS,
+     "Count neighbors of sequences from start to stop, which differ at \n"
+     "a fraction of positions less than theta."},
 
     {NULL, NULL, 0, NULL}
 };
@@ -48,6 +48,21 @@ class TestCatdcdCommand(TestCase):
         assert_equal(coords, concat[3:6])
         assert_equal(coords, concat[6:])
 
+    @dec.slow
+    @skipIf(NOPRODYCMD, 'prody command not found')
+    @skipIf(WINDOWS, 'command tests are not run on Windows')
+    def testStrideConcat(self):
+
+        command = self.command + ' --first 1 --stride 2 {0:s} {0:s}'.format(
+                                self.dcdpath)
+
+        namespace = prody_parser.parse_args(shlex.split(command))
+        namespace.func(namespace)
+
+        coords = self.dcd[:]._getCoordsets()
+        concat = parseDCD(self.output)._getCoordsets()
+        assert_equal(concat, coords[[1, 0, 2]])
+
     @dec.slow
     @skipIf(NOPRODYCMD, 'prody command not found')
     @skipIf(WINDOWS, 'command tests are not run on Windows')
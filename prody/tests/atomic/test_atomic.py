@@ -107,6 +107,25 @@ class TestPickling(unittest.TestCase):
         self.assertEqual(atom, pickle.loads(pickle.dumps(atom)))
 
 
+class TestAddCoordset(unittest.TestCase):
+
+    def testOneByOne(self):
+
+        coordsets = ATOMS.getCoordsets()
+        atoms = ATOMS.copy()
+        atoms.setCoords(coordsets[0], overwrite=True)
+        atoms.reserve(3)
+        views = []
+        for i in range(1, len(coordsets)):
+            atoms.addCoordset(coordsets[i])
+            views.append(atoms._getCoordsets())
+        assert_equal(atoms.getCoordsets(), coordsets)
+        for i, view in enumerate(views):
+            assert_equal(view, coordsets[:i+2],
+                         'adding coordsets changed earlier coordsets')
+        self.assertEqual(len(atoms._timestamps), len(coordsets))
+
+
 class TestAtomIterations(unittest.TestCase):
 
     def testAtomGroup(self):
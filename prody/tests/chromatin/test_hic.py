@@ -0,0 +1,152 @@
+"""This module contains unit tests for :mod:`~prody.chromatin.hic`."""
+
+import io
+import os
+
+import numpy as np
+from numpy.testing import *
+from scipy.sparse import csr_matrix, issparse
+
+from prody import *
+from prody import LOGGER
+from prody.chromatin.hic import _loadNumbers
+from prody.tests import unittest, TEMPDIR
+
+LOGGER.verbosity = 'none'
+
+
+def randomMap(n=30, density=.3, seed=0):
+
+    random = np.random.RandomState(seed)
+    M = random.rand(n, n) * (random.rand(n, n) < density)
+    M = np.triu(M) + np.triu(M, 1).T
+    M[5] = M[:, 5] = 0
+    return M
+
+
+class TestLoadNumbers(unittest.TestCase):
+
+    def testDelimiters(self):
+
+        expected = np.arange(12.).reshape((4, 3)) / 4
+        for delimiter in (' ', '\t', ',', ';'):
+            text = '\n'.join(delimiter.join(repr(x) for x in row)
+                             for row in expected) + '\n\n'
+            assert_equal(_loadNumbers(io.StringIO(text)), expected,
+                         'failed to parse numbers delimited by {0!r}'
+                         .format(delimiter))
+            assert_equal(_loadNumbers(io.BytesIO(text.encode())), expected,
+                         'failed to parse bytes')
+
+    def testChunks(self):
+
+        expected = np.random.RandomState(1).rand(200, 3)
+        text = ''.join('{0!r} {1!r} {2!r}\n'.format(*row) for row in expected)
+        assert_equal(_loadNumbers(io.StringIO(text), chunk_size=100),
+                     expected, 'failed to parse numbers in chunks')
+
+    def testRagged(self):
+
+        for text in ('1 2 3\n4 5 6\n7 8\n9 1 2 3\n', '1 2 3\n4 5\n',
+                     '1 2\n3 4 5 6\n'):
+            self.assertRaises(ValueError, parseHiCStream, io.StringIO(text))
+        self.assertRaises(ValueError, parseHiCStream,
+                          io.StringIO('1 2 3\n4 x 6\n'))
+        self.assertRaises(ValueError, parseHiCStream, io.StringIO('\n\n'))
+
+
+class TestSparseMaps(unittest.TestCase):
+
+    def setUp(self):
+
+        self.map = randomMap()
+        self.filename = os.path.join(TEMPDIR, 'hic_test')
+
+    def tearDown(self):
+
+        for ext in ('.txt', '.hic.npz'):
+            if os.path.isfile(self.filename + ext):
+                os.remove(self.filename + ext)
+
+    def testParseSparseFormat(self):
+
+        I, J = np.triu(self.map).nonzero()
+        text = ''.join('{0} {1} {2!r}\n'.format(i * 100, j * 100,
+                                                self.map[i, j])
+                       for i, j in zip(I, J))
+        M, bin = parseHiCStream(io.StringIO(text), bin=100)
+        S, bin = parseHiCStream(io.StringIO(text), bin=100, dense=False)
+        self.assertEqual(bin, 100)
+        self.assertTrue(issparse(S))
+        assert_equal(S.toarray(), M, 'failed to parse a sparse map')
+        assert_equal(HiC(map=S).getCompleteMap().toarray(),
+                     self.map[:len(M), :len(M)],
+                     'failed to symmetrize a sparse map')
+
+    def testSaveAndLoad(self):
+
+        hic = HiC('test', map=csr_matrix(self.map), bin=100)
+        filename = saveHiC(hic, self.filename)
+        loaded = loadHiC(filename)
+        self.assertTrue(issparse(loaded._map))
+        assert_equal(loaded._map.toarray(), self.map,
+                     'failed to save and load a sparse map')
+        assert_equal(loaded.mask, hic.mask, 'failed to save and load mask')
+        assert_equal(loaded.getTrimedMap().toarray(),
+                     hic.getTrimedMap().toarray())
+
+    def testWriteMap(self):
+
+        for bin in (None, 100):
+            filename = writeMap(self.filename + '.txt', csr_matrix(self.map),
+                                bin=bin)
+            hic = parseHiC(filename, dense=False, bin=bin)
+            self.assertTrue(issparse(hic._map))
+            assert_allclose(hic._map.toarray(), self.map, rtol=1e-5,
+                            atol=1e-6, err_msg='failed to write a sparse map '
+                            'with bin={0}'.format(bin))
+            dense = parseHiC(filename, bin=bin)
+            assert_equal(dense._map, hic._map.toarray())
+
+
+class TestSparseGNM(unittest.TestCase):
+
+    def assertSameModes(self, M, n_modes):
+
+        dense = HiC(map=M).calcGNM(n_modes)
+        sparse = HiC(map=csr_matrix(M)).calcGNM(n_modes)
+        self.assertEqual(sparse.numAtoms(), dense.numAtoms())
+        assert_allclose(sparse.getEigvals(), dense.getEigvals(), rtol=1e-8,
+                        atol=1e-10, err_msg='failed to get eigenvalues')
+        expected = dense.getArray()
+        vectors = sparse.getArray()
+        signs = np.sign((vectors * expected).sum(0))
+        assert_allclose(vectors * signs, expected, rtol=1e-6, atol=1e-8,
+                        err_msg='failed to get eigenvectors')
+
+    def testModes(self):
+
+        self.assertSameModes(randomMap(), 6)
+
+    def testUnmaskedModes(self):
+
+        M = randomMap(n=20, density=.6, seed=1)
+        M[5, 5] = 1.
+        M[np.arange(19), np.arange(1, 20)] += 1
+        M[np.arange(1, 20), np.arange(19)] += 1
+        self.assertSameModes(M, 4)
+
+    def testCustomMask(self):
+
+        M = randomMap(n=30, density=.6, seed=2)
+        mask = M.sum(1) != 0
+        mask[[0, 7, 8, 20]] = False
+        dense = HiC(map=M)
+        dense.mask = mask
+        sparse = HiC(map=csr_matrix(M))
+        sparse.mask = mask
+        expected = dense.calcGNM(5)
+        modes = sparse.calcGNM(5)
+        self.assertEqual(modes.numAtoms(), np.count_nonzero(mask))
+        assert_allclose(modes.getEigvals(), expected.getEigvals(), rtol=1e-8,
+                        atol=1e-10, err_msg='failed to apply custom mask')
@@ -0,0 +1,127 @@
+"""This module contains unit tests for :mod:`~prody.chromatin.norm`."""
+
+import numpy as np
+from numpy.testing import *
+from scipy.sparse import csr_matrix, issparse
+
+from prody import *
+from prody import LOGGER
+from prody.chromatin.functions import div0
+from prody.tests import unittest
+
+LOGGER.verbosity = 'none'
+
+
+def randomMap(n=30, density=.5, seed=0):
+
+    random = np.random.RandomState(seed)
+    M = random.rand(n, n) * (random.rand(n, n) < density)
+    M = np.triu(M) + np.triu(M, 1).T
+    M[5] = M[:, 5] = 0
+    return M
+
+
+def scaleByDiagonals(M, r, c):
+    """Returns ``R * M * C`` computed with diagonal matrices."""
+
+    return np.dot(np.dot(np.diag(r), M), np.diag(c))
+
+
+class TestCoverageNorms(unittest.TestCase):
+
+    def setUp(self):
+
+        self.M = randomMap()
+
+    def testVCnorm(self):
+
+        M = self.M
+        N = scaleByDiagonals(M, div0(1., M.sum(1)), div0(1., M.sum(0)))
+        expected = N * M.sum() / N.sum()
+        assert_allclose(VCnorm(M), expected, rtol=1e-12,
+                        err_msg='failed to normalize by coverage')
+        assert_allclose(VCnorm(csr_matrix(M)).toarray(), expected,
+                        rtol=1e-12, err_msg='failed to normalize sparse map')
+
+    def testSQRTVCnorm(self):
+
+        M = self.M
+        N = scaleByDiagonals(M, np.sqrt(div0(1., M.sum(1))),
+                             np.sqrt(div0(1., M.sum(0))))
+        expected = N * M.sum() / N.sum()
+        assert_allclose(SQRTVCnorm(M), expected, rtol=1e-12,
+                        err_msg='failed to normalize by square-root coverage')
+        assert_allclose(SQRTVCnorm(csr_matrix(M)).toarray(), expected,
+                        rtol=1e-12, err_msg='failed to normalize sparse map')
+
+    def testSCN(self):
+
+        M = self.M
+        N = M.copy()
+        d0 = last_p = None
+        for n in range(100):
+            N = np.dot(N, np.diag(div0(1., N.sum(0))))
+            N = np.dot(np.diag(div0(1., N.sum(1))), N)
+            d = np.mean(np.abs(N - N.T))
+            if d0 is None:
+                d0, p = d, 1
+            else:
+                p = div0(d, d0)
+                if np.abs(p - last_p) < 1e-5:
+                    break
+            last_p = p
+        expected = (N + N.T) / 2.
+        assert_allclose(SCN(M), expected, rtol=1e-10, atol=1e-14,
+                        err_msg='failed to perform SCN')
+        assert_allclose(SCN(csr_matrix(M)).toarray(), expected, rtol=1e-10,
+                        atol=1e-14, err_msg='failed to perform sparse SCN')
+
+
+class TestKRnorm(unittest.TestCase):
+
+    def setUp(self):
+
+        self.M = randomMap()
+        self.mapped = self.M.sum(1) != 0
+
+    def assertBalanced(self, N):
+
+        N = N.toarray() if issparse(N) else N
+        assert_allclose(N.sum(0)[self.mapped], 1, atol=1e-5,
+                        err_msg='failed to balance columns')
+        assert_allclose(N.sum(1)[self.mapped], 1, atol=1e-5,
+                        err_msg='failed to balance rows')
+        assert_equal(N[~self.mapped], 0, 'failed to leave unmapped loci')
+        assert_allclose(N, N.T, atol=1e-12, err_msg='failed to keep symmetry')
+
+    def testDense(self):
+
+        self.assertBalanced(KRnorm(self.M, total_count=None))
+        N = KRnorm(self.M)
+        assert_allclose(N.sum(), self.M.sum(), err_msg='failed to rescale')
+
+    def testSparse(self):
+
+        N = KRnorm(csr_matrix(self.M), total_count=None)
+        self.assertTrue(issparse(N))
+        self.assertBalanced(N)
+        assert_allclose(N.toarray(), KRnorm(self.M, total_count=None),
+                        rtol=1e-10, err_msg='failed to balance sparse map')
+
+    def testNearlySymmetric(self):
+
+        M = self.M + np.triu(self.M, 1) * 1e-12
+        self.assertBalanced(KRnorm(M, total_count=None))
+        self.assertRaises(ValueError, KRnorm, self.M + np.triu(self.M, 1))
+        self.assertRaises(ValueError, KRnorm, -self.M)
+
+    def testSparseAfterVCnorm(self):
+
+        M = csr_matrix(self.M)
+        N = KRnorm(VCnorm(M), total_count=None)
+        self.assertBalanced(N)
+        assert_allclose(N.toarray(), KRnorm(VCnorm(self.M), total_count=None),
+                        rtol=1e-8, atol=1e-12,
+                        err_msg='failed to balance sparse normalized map')
+        self.assertRaises(ValueError, KRnorm,
+                          csr_matrix(self.M + np.triu(self.M, 1)))
@@ -0,0 +1,125 @@
+"""This module contains unit tests for :mod:`~prody.chromatin.straw`."""
+
+import struct
+import zlib
+
+import numpy as np
+from numpy.testing import *
+
+from prody import LOGGER
+from prody.chromatin import straw
+from prody.chromatin.straw import decodeBlock
+from prody.tests import unittest
+
+LOGGER.verbosity = 'none'
+
+X_OFFSET = 100
+Y_OFFSET = 200
+
+
+def packCount(count, useShort):
+
+    return struct.pack('<h' if useShort == 0 else '<f', count)
+
+
+def buildRowBlock(rows, useShort):
+    """Returns a compressed type 1 block from *rows*, a list of row numbers
+    paired with lists of column numbers and counts."""
+
+    n_records = sum(len(records) for y, records in rows)
+    data = struct.pack('<iiibbh', n_records, X_OFFSET, Y_OFFSET, useShort, 1,
+                       len(rows))
+    for y, records in rows:
+        data += struct.pack('<hh', y, len(records))
+        for x, count in records:
+            data += struct.pack('<h', x) + packCount(count, useShort)
+    return zlib.compress(data)
+
+
+def buildDenseBlock(counts, width, useShort):
+    """Returns a compressed type 2 block from *counts* of a dense window of
+    *width* columns."""
+
+    data = struct.pack('<iiibbih', len(counts), X_OFFSET, Y_OFFSET, useShort,
+                       2, len(counts), width)
+    for count in counts:
+        data += packCount(count, useShort)
+    return zlib.compress(data)
+
+
+def decodeRecords(compressedBytes):
+    """Decode a block one record at a time."""
+
+    data = zlib.decompress(compressedBytes)
+    binXOffset, binYOffset, useShort, type_ = struct.unpack('<iibb', data[4:14])
+    fmt, size = ('<h', 2) if useShort == 0 else ('<f', 4)
+    records = []
+    if type_ == 1:
+        rowCount = struct.unpack('<h', data[14:16])[0]
+        temp = 16
+        for i in range(rowCount):
+            y, colCount = struct.unpack('<hh', data[temp:temp+4])
+            temp += 4
+            for j in range(colCount):
+                x = struct.unpack('<h', data[temp:temp+2])[0]
+                count = struct.unpack(fmt, data[temp+2:temp+2+size])[0]
+                temp += 2 + size
+                records.append((binXOffset + x, binYOffset + y, count))
+    else:
+        nPts, w = struct.unpack('<ih', data[14:20])
+        temp = 20
+        for i in range(nPts):
+            count = struct.unpack(fmt, data[temp:temp+size])[0]
+            temp += size
+            if count == -32768 or count != count:
+                continue
+            row = i // w
+            records.append((binXOffset + i - row * w, binYOffset + row, count))
+    return records
+
+
+class TestDecodeBlock(unittest.TestCase):
+
+    def setUp(self):
+
+        self.version = straw.version
+        straw.version = 8
+        random = np.random.RandomState(0)
+        self.rows = []
+        for y in random.choice(50, 10, replace=False):
+            xs = random.choice(50, random.randint(0, 8), replace=False)
+            self.rows.append((y, [(x, random.randint(1, 1000)) for x in xs]))
+        self.counts = list(random.randint(1, 1000, 24))
+        self.counts[3] = self.counts[17] = None
+
+    def tearDown(self):
+
+        straw.version = self.version
+
+    def assertDecoded(self, block):
+
+        binX, binY, counts = decodeBlock(block)
+        expected = decodeRecords(block)
+        self.assertEqual(len(binX), len(expected))
+        assert_equal(binX, [record[0] for record in expected],
+                     'failed to decode row bins')
+        assert_equal(binY, [record[1] for record in expected],
+                     'failed to decode column bins')
+        assert_equal(counts, [record[2] for record in expected],
+                     'failed to decode counts')
+
+    def testRowBlocks(self):
+
+        for useShort in (0, 1):
+            self.assertDecoded(buildRowBlock(self.rows, useShort))
+            self.assertDecoded(buildRowBlock([], useShort))
+
+    def testDenseBlocks(self):
+
+        counts = [-32768 if count is None else count for count in self.counts]
+        self.assertDecoded(buildDenseBlock(counts, 5, 0))
+        counts = [np.nan if count is None else count + .5
+                  for count in self.counts]
+        self.assertDecoded(buildDenseBlock(counts, 5, 1))
+        self.assertEqual(len(decodeBlock(buildDenseBlock(counts, 5, 1))[0]),
+                         len(counts) - 2)
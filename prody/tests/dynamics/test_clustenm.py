@@ -0,0 +1,139 @@
+"""This module contains unit tests for :mod:`~prody.dynamics.clustenm`, which
+do not require OpenMM."""
+
+import os
+
+import numpy as np
+from numpy.testing import *
+from scipy.spatial.distance import squareform
+
+from prody import *
+from prody import LOGGER
+from prody.tests import unittest, TEMPDIR
+
+LOGGER.verbosity = 'none'
+
+N_CG = 12
+
+RNG = np.random.RandomState(1)
+CENTERS = RNG.normal(scale=10, size=(2, N_CG, 3))
+COORDS = np.concatenate([CENTERS[0] + RNG.normal(scale=.3, size=(6, N_CG, 3)),
+                         CENTERS[1] + RNG.normal(scale=.3, size=(4, N_CG, 3))])
+LABELS = np.array([0] * 6 + [1] * 4)
+
+
+def calcPairwiseRMSDs(coords):
+
+    n_confs = len(coords)
+    rmsds = np.zeros((n_confs, n_confs))
+    for i in range(n_confs):
+        for j in range(n_confs):
+            rmsds[i, j] = calcRMSD(coords[i], coords[j])
+    return rmsds
+
+
+def newClustENM():
+
+    ens = ClustENM()
+    ens._n_cg = N_CG
+    ens._idx_cg = np.arange(N_CG)
+    return ens
+
+
+class TestClustering(unittest.TestCase):
+
+    def testRMSDs(self):
+
+        ens = newClustENM()
+        assert_allclose(squareform(ens._rmsds(COORDS)),
+                        calcPairwiseRMSDs(COORDS), rtol=0, atol=1e-10,
+                        err_msg='failed to calculate pairwise RMSDs')
+
+    def testHierarchicalClustering(self):
+
+        ens = newClustENM()
+        ens._threshold = (0, 5.)
+        ens._cycle = 1
+        labels = ens._hc(COORDS)
+        assert_equal(labels == labels[0], LABELS == 0,
+                     'failed to cluster conformers by threshold')
+
+        ens._threshold = None
+        ens._maxclust = (0, 2)
+        assert_equal(ens._hc(COORDS, ens._rmsds(COORDS)), labels,
+                     'failed to cluster conformers by maxclust')
+
+    def testCentroids(self):
+
+        ens = newClustENM()
+        rmsds = calcPairwiseRMSDs(COORDS)
+        centers, weights = ens._centers(COORDS, LABELS, ens._rmsds(COORDS))
+        for label, center in enumerate(centers):
+            members = np.flatnonzero(LABELS == label)
+            sub = rmsds[np.ix_(members, members)]
+            sim = np.exp(-sub / squareform(sub, checks=False).std())
+            self.assertEqual(center, members[sim.sum(1).argmax()])
+            self.assertEqual(ens._centroid(COORDS[members]),
+                             sim.sum(1).argmax())
+        assert_equal(weights, [6, 4], 'failed to get cluster sizes')
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+
+        self.filename = os.path.join(TEMPDIR, 'clustenm_checkpoint.npz')
+        self.atoms = AtomGroup('synthetic')
+        self.atoms.setCoords(COORDS[0])
+
+    def tearDown(self):
+
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+    def testSaveAndResume(self):
+
+        ens = newClustENM()
+        ens._atoms = self.atoms
+        ens._cycle = 2
+        keys = [(0, 0), (1, 0), (1, 1), (2, 0)]
+        potentials = [-10., -12., -11., -13.]
+        sizes = [1, 6, 4, 10]
+        np.random.seed(7)
+        ens._saveCheckpoint(self.filename, COORDS[:4], keys, potentials,
+                            sizes, COORDS[3:4])
+        self.assertFalse(os.path.isfile(self.filename + '.tmp'))
+        expected = np.random.rand(5)
+
+        resumed = newClustENM()
+        resumed._atoms = self.atoms
+        resumed._n_gens = 3
+        np.random.seed(0)
+        conformers, keys_, potentials_, sizes_, start_confs = \
+            resumed._loadCheckpoint(self.filename)
+        self.assertEqual(resumed._cycle, 2)
+        assert_equal(conformers, COORDS[:4], 'failed to resume conformers')
+        assert_equal(start_confs, COORDS[3:4],
+                     'failed to resume starting conformers')
+        self.assertEqual(keys_, keys)
+        self.assertEqual(potentials_, potentials)
+        self.assertEqual(sizes_, sizes)
+        assert_equal(np.random.rand(5), expected,
+                     'failed to resume random number generator state')
+
+    def testMismatch(self):
+
+        ens = newClustENM()
+        ens._atoms = self.atoms
+        ens._cycle = 2
+        ens._saveCheckpoint(self.filename, COORDS[:1], [(0, 0)], [0.], [1],
+                            COORDS[:1])
+
+        resumed = newClustENM()
+        resumed._atoms = self.atoms
+        resumed._n_gens = 1
+        self.assertRaises(ValueError, resumed._loadCheckpoint, self.filename)
+
+        resumed._n_gens = 2
+        resumed._atoms = self.atoms[:5]
+        self.assertRaises(ValueError, resumed._loadCheckpoint, self.filename)
@@ -264,7 +264,25 @@ class TestGNMResults(testGNMBase):
                         err_msg='failed to get correct hit times')
         assert_allclose(commuteTime, COMMUTETIME,
                         rtol=0, atol=ATOL,
-                        err_msg='failed to get correct commute times')             
+                        err_msg='failed to get correct commute times')
+
+    def testCommuteTimeBlocks(self):
+        sources, targets = [5, 2, 70], [1, 2, 3, 60]
+        for method in ('modes', 'sparse'):
+            hitTime, commuteTime = calcHitTime(gnm, method, sources=sources,
+                                               targets=targets, chunk_size=2)
+
+            assert_allclose(hitTime, HITTIME[np.ix_(sources, targets)],
+                            rtol=0, atol=ATOL,
+                            err_msg='failed to get correct hit times')
+            assert_allclose(commuteTime, COMMUTETIME[np.ix_(sources, targets)],
+                            rtol=0, atol=ATOL,
+                            err_msg='failed to get correct commute times')
+
+    def testCommuteTimeNoModes(self):
+        model = GNM()
+        model.setKirchhoff(gnm.getKirchhoff())
+        self.assertRaises(ValueError, calcHitTime, model, 'modes')
 
 class TestGNM(unittest.TestCase):
 
@@ -391,5 +409,33 @@ class TestRTB(unittest.TestCase):
 
         rtb.calcModes()
 
+class TestMechStiff(unittest.TestCase):
+
+    def setUp(self):
+
+        self.model = ANM()
+        self.model.buildHessian(ATOMS)
+        self.model.calcModes(n_modes=None)
+        self.expected = np.loadtxt(pathDatafile('anm1ubi_stiffness.txt'))
+
+    def testStiffness(self):
+
+        assert_allclose(calcMechStiff(self.model, ATOMS, n_cpu=2),
+                        self.expected, rtol=0, atol=ATOL,
+                        err_msg='failed to get correct stiffness matrix')
+
+    def testRowsAndPairs(self):
+
+        rows = [5, 0, 70]
+        assert_allclose(calcMechStiff(self.model, ATOMS, rows=rows),
+                        self.expected[rows], rtol=0, atol=ATOL,
+                        err_msg='failed to get correct stiffness rows')
+
+        pairs = np.array([[0, 5], [70, 3]])
+        assert_allclose(calcMechStiff(self.model, ATOMS, pairs=pairs),
+                        self.expected[pairs[:, 0], pairs[:, 1]],
+                        rtol=0, atol=ATOL,
+                        err_msg='failed to get correct stiffness for pairs')
+
 if __name__ == '__main__':
     unittest.main()
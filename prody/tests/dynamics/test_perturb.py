@@ -0,0 +1,82 @@
+"""This module contains unit tests for :mod:`~prody.dynamics.perturb`."""
+
+import numpy as np
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.utilities import div0
+from prody.tests import unittest
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+ATOMS = parseDatafile('1ubi_ca')
+
+anm = ANM()
+anm.buildHessian(ATOMS)
+anm.calcModes(n_modes=20)
+
+gnm = GNM()
+gnm.buildKirchhoff(ATOMS)
+gnm.calcModes(n_modes=20)
+
+
+def calcDensePRS(model):
+
+    n_atoms = model.numAtoms()
+    array = model.getArray()
+    cov = np.dot(array, np.dot(np.diag(model.getVariances()), array.T))
+    prs = cov**2
+    if model.is3d():
+        prs = prs.reshape((n_atoms, 3, n_atoms, 3)).sum(axis=(1, 3))
+    norm = div0(prs, np.diag(prs).reshape((n_atoms, 1)))
+    W = 1 - np.eye(n_atoms)
+    return (norm, np.average(norm, weights=W, axis=1),
+            np.average(norm, weights=W, axis=0))
+
+
+class TestPerturbResponse(unittest.TestCase):
+
+    def testResults(self):
+        """Test results of block-wise PRS against the dense calculation."""
+
+        for model in (anm, gnm):
+            expected = calcDensePRS(model)
+            result = calcPerturbResponse(model, chunk_size=7)
+            for res, exp in zip(result, expected):
+                assert_allclose(res, exp, atol=1e-10)
+
+    def testRows(self):
+        """Test selecting rows of the PRS matrix."""
+
+        rows = [3, 1, 50]
+        expected = calcDensePRS(anm)
+        prs, eff, sen = calcPerturbResponse(anm, rows=rows, chunk_size=2)
+        assert_allclose(prs, expected[0][rows], atol=1e-10)
+        assert_allclose(eff[rows], expected[1][rows], atol=1e-10)
+        self.assertEqual(np.isnan(eff).sum(), len(eff) - len(rows))
+
+        others = np.ones(len(eff), dtype=bool)
+        others[rows] = False
+        matrix = expected[0][rows]
+        assert_allclose(sen[others], matrix[:, others].mean(0), atol=1e-10)
+
+    def testProfilesOnly(self):
+        """Test calculating effectiveness and sensitivity only."""
+
+        expected = calcDensePRS(gnm)
+        prs, eff, sen = calcPerturbResponse(gnm, return_matrix=False)
+        self.assertIsNone(prs)
+        assert_allclose(eff, expected[1], atol=1e-10)
+        assert_allclose(sen, expected[2], atol=1e-10)
+
+    def testDynamicCouplingIndex(self):
+        """Test DCI calculated from a model against the PRS matrix."""
+
+        prs = calcDensePRS(anm)[0]
+        result = calcDynamicCouplingIndex(anm, ATOMS, 'resnum 10 to 20',
+                                          'resnum 30 to 40', norm=True)
+        expected = calcDynamicCouplingIndex(prs, ATOMS, 'resnum 10 to 20',
+                                            'resnum 30 to 40')
+        assert_allclose(result, expected, atol=1e-10)
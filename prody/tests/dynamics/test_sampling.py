@@ -0,0 +1,113 @@
+"""This module contains unit tests for :mod:`~prody.dynamics.sampling`."""
+
+import os
+
+import numpy as np
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.tests import unittest, TEMPDIR
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+ATOMS = parseDatafile('1ubi_ca')
+
+anm = ANM()
+anm.buildHessian(ATOMS)
+anm.calcModes(n_modes=5)
+
+
+def sampleModesLoop(modes, atoms, n_confs, rmsd):
+    """Sample conformations one at a time as in :func:`.sampleModes`."""
+
+    n_atoms = modes.numAtoms()
+    variances = modes.getVariances()
+    magnitudes = np.array([abs(mode) for mode in modes])
+    randn = np.random.standard_normal((n_confs, len(modes)))
+    coef = ((randn ** 2 * variances).sum(1) ** 0.5).mean()
+    scale = n_atoms**0.5 * rmsd / coef / magnitudes * variances ** 0.5
+    array = modes._getArray()
+    confs = [(array * scale * randn[i]).sum(1).reshape((n_atoms, 3))
+             for i in range(n_confs)]
+    return np.array(confs) + atoms.getCoords()
+
+
+class TestSampleModes(unittest.TestCase):
+
+    def testSampleModes(self):
+
+        np.random.seed(11)
+        expected = sampleModesLoop(anm, ATOMS, 25, 1.5)
+        np.random.seed(11)
+        ensemble = sampleModes(anm, ATOMS, n_confs=25, rmsd=1.5)
+        assert_allclose(ensemble.getCoordsets(), expected, rtol=1e-12,
+                        err_msg='failed to sample conformations')
+        assert_allclose(calcRMSD(ATOMS.getCoords(),
+                                 ensemble.getCoordsets()).mean(), 1.5,
+                        rtol=1e-10, err_msg='failed to scale conformations')
+
+    def testIterSampleModes(self):
+
+        np.random.seed(3)
+        expected = sampleModes(anm, ATOMS, n_confs=25).getCoordsets()
+        np.random.seed(3)
+        chunks = list(iterSampleModes(anm, ATOMS, n_confs=25, chunk_size=10))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        assert_allclose(np.concatenate(chunks), expected, rtol=1e-12,
+                        err_msg='failed to sample conformations in blocks')
+        self.assertRaises(ValueError, next,
+                          iterSampleModes(anm, ATOMS, chunk_size=0))
+
+    def testFilename(self):
+
+        filename = os.path.join(TEMPDIR, 'sampled')
+        np.random.seed(5)
+        expected = sampleModes(anm, ATOMS, n_confs=25).getCoordsets()
+        np.random.seed(5)
+        result = sampleModes(anm, ATOMS, n_confs=25, filename=filename,
+                             chunk_size=7)
+        try:
+            self.assertEqual(result, filename + '.dcd')
+            assert_allclose(parseDCD(result).getCoordsets(), expected,
+                            rtol=0, atol=1e-4,
+                            err_msg='failed to write sampled conformations')
+        finally:
+            os.remove(result)
+
+
+class TestTraverseMode(unittest.TestCase):
+
+    def testTraverseMode(self):
+
+        mode = anm[0]
+        n_steps = 4
+        ensemble = traverseMode(mode, ATOMS, n_steps=n_steps, rmsd=2.)
+        coords = ensemble.getCoordsets()
+        self.assertEqual(len(coords), 2 * n_steps + 1)
+        assert_allclose(coords[n_steps], ATOMS.getCoords(),
+                        err_msg='failed to keep initial conformation')
+        array = coords[n_steps + 1] - coords[n_steps]
+        for i, conf in enumerate(coords):
+            assert_allclose(conf, ATOMS.getCoords() + (i - n_steps) * array,
+                            rtol=1e-12, atol=1e-10,
+                            err_msg='failed to take steps along mode')
+        assert_allclose(calcRMSD(ATOMS.getCoords(), coords[-1]), 2.,
+                        rtol=1e-5, err_msg='failed to scale mode')
+
+    def testDirections(self):
+
+        mode = anm[0]
+        both = traverseMode(mode, ATOMS, n_steps=3).getCoordsets()
+        assert_allclose(traverseMode(mode, ATOMS, n_steps=3,
+                                     neg=False).getCoordsets(), both[3:],
+                        err_msg='failed to traverse in positive direction')
+        assert_allclose(traverseMode(mode, ATOMS, n_steps=3,
+                                     pos=False).getCoordsets(), both[:4],
+                        err_msg='failed to traverse in negative direction')
+        assert_allclose(traverseMode(mode, ATOMS, n_steps=3,
+                                     reverse=True).getCoordsets(), both[::-1],
+                        err_msg='failed to reverse traversal')
+        self.assertRaises(ValueError, traverseMode, mode, ATOMS,
+                          pos=False, neg=False)
@@ -214,3 +214,19 @@ class TestEnsemble(TestCase):
         assert_equal(ensemble.getCoordsets(), ATOMS.getCoordsets(),
                      'restoration failed')
         
+
+    def testAddCoordsetsOneByOne(self):
+
+        ensemble = ENSEMBLE[:0]
+        ensemble.reserve(2)
+        views = []
+        for i, xyz in enumerate(ATOMS.iterCoordsets()):
+            ensemble.addCoordset(xyz, data={'index': [i]})
+            views.append(ensemble._getCoordsets())
+        assert_equal(ensemble._getCoordsets(), ATOMS.getCoordsets(),
+                     'adding coordsets one by one failed')
+        assert_equal(ensemble.getData('index'), arange(ATOMS.numCoordsets()),
+                     'adding data one by one failed')
+        for i, view in enumerate(views):
+            assert_equal(view, ATOMS.getCoordsets()[:i+1],
+                         'adding coordsets changed earlier coordsets')
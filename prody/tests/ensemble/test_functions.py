@@ -1,12 +1,17 @@
 """This module contains unit tests for :mod:`~prody.ensemble`."""
 
+import os
+from tempfile import mkdtemp
+from shutil import rmtree
+
 from prody.tests import TestCase
 
+import numpy as np
 from numpy.testing import assert_equal
 
 from prody import (calcOccupancies, trimPDBEnsemble, PDBEnsemble, 
                    parsePDB, buildPDBEnsemble, bestMatch, sameChid, 
-                   sameChainPos)
+                   sameChainPos, MappingCache)
 from prody.tests.datafiles import *
 from . import PDBENSEMBLE, WEIGHTS, ENSEMBLE, ATOMS, PDBENSEMBLEA
 
@@ -90,3 +95,58 @@ class TestBuildPDBEnsemble(TestCase):
         assert_equal(ens6.numConfs(), 5, 
             'buildPDBEnsemble with sameChainPos on biomols did not include all AMPAR dimers')        
         
+
+
+class TestMappingCache(TestCase):
+
+    def setUp(self):
+
+        self.ags = parsePDB([DATA_FILES['3hsy']['path'],
+                             DATA_FILES['3o21']['path']], subset='ca')
+        self.tempdir = mkdtemp()
+
+    def tearDown(self):
+
+        rmtree(self.tempdir)
+
+    def testResults(self):
+
+        ens = buildPDBEnsemble(self.ags, cache=False)
+
+        filename = os.path.join(self.tempdir, 'mappings.db')
+        cache = MappingCache(filename=filename)
+        ens1 = buildPDBEnsemble(self.ags, cache=cache)
+        self.assertTrue(len(cache) > 0, 'mappings were not cached')
+        assert_equal(ens1.getCoordsets(), ens.getCoordsets(),
+                     'buildPDBEnsemble with cache returns a wrong result')
+        cache.close()
+
+        cache = MappingCache(maxsize=1, filename=filename)
+        ens2 = buildPDBEnsemble(self.ags, cache=cache)
+        assert_equal(ens2.getCoordsets(), ens.getCoordsets(),
+                     'buildPDBEnsemble with cache on disk returns a wrong '
+                     'result')
+        assert_equal(ens2.getWeights(), ens.getWeights(),
+                     'buildPDBEnsemble with cache on disk returns wrong '
+                     'weights')
+        cache.close()
+
+    def testStorage(self):
+
+        filename = os.path.join(self.tempdir, 'values.db')
+        cache = MappingCache(filename=filename)
+        cache.set('align', np.array([2, -1, 0]))
+        cache.set('map', (np.array([1, 0]), 50., 100.))
+        cache.set('none', (None, 0., 0.))
+        self.assertRaises(TypeError, cache.set, 'bad', ['a', 'b'])
+        cache.close()
+
+        cache = MappingCache(filename=filename)
+        self.assertEqual(len(cache), 3)
+        assert_equal(cache.get('align'), [2, -1, 0])
+        positions, seqid, cover = cache.get('map')
+        assert_equal(positions, [1, 0])
+        self.assertEqual((seqid, cover), (50., 100.))
+        self.assertEqual(cache.get('none'), (None, 0., 0.))
+        self.assertIsNone(cache.get('missing'))
+        cache.close()
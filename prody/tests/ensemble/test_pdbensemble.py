@@ -1,8 +1,9 @@
 """This module contains unit tests for :mod:`~prody.ensemble`."""
 
+from prody import PDBEnsemble
 from prody.tests import TestCase
 
-from numpy import arange
+from numpy import arange, eye
 from numpy.testing import assert_equal
 
 from . import ATOMS, PDBENSEMBLE, PDBENSEMBLEA, COORDS, WEIGHTS_BOOL, ENSEMBLE, WEIGHTS
@@ -162,3 +163,24 @@ class TestPDBEnsemble(TestCase):
         ensemble.addCoordset(ATOMS, degeneracy=True)
         assert_equal(ensemble.numCoordsets(), n_conf+n_csets+1,
                      'adding coordsets failed')
+
+    def testAddCoordsetsOneByOne(self):
+
+        ensemble = PDBEnsemble('one by one')
+        ensemble.setCoords(COORDS)
+        ensemble.reserve(2)
+        views = []
+        for i, xyz in enumerate(ATOMS.iterCoordsets()):
+            ensemble.addCoordset(xyz, weights=WEIGHTS[i], label=str(i),
+                                 transformation=eye(4) * i)
+            views.append(ensemble._confs)
+        assert_equal(ensemble._confs, ATOMS.getCoordsets(),
+                     'adding coordsets one by one failed')
+        assert_equal(ensemble._weights, WEIGHTS,
+                     'adding weights one by one failed')
+        assert_equal(ensemble._trans,
+                     [eye(4) * i for i in range(ensemble.numConfs())],
+                     'adding transformations one by one failed')
+        for i, view in enumerate(views):
+            assert_equal(view, ATOMS.getCoordsets()[:i+1],
+                         'adding coordsets changed earlier coordsets')
@@ -0,0 +1,154 @@
+"""This module contains unit tests for :mod:`~prody.proteins.compare`."""
+
+import numpy as np
+from numpy import arange
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.proteins.compare import SimpleChain, rankAtomMaps
+from prody.utilities import multilap
+from prody.tests import unittest
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+ATOMS = parseDatafile('3hsy')
+
+
+class TestSimpleChain(unittest.TestCase):
+
+    def setUp(self):
+
+        self.chain = ATOMS['A']
+        self.simple = SimpleChain(self.chain)
+
+    def testResidues(self):
+
+        residues = list(self.chain)
+        self.assertEqual(len(self.simple), len(residues),
+                         'SimpleChain has wrong number of residues')
+        self.assertEqual(self.simple.getSequence(),
+                         self.chain.getSequence(allres=True),
+                         'SimpleChain has wrong sequence')
+        for simple, res in zip(self.simple, residues):
+            self.assertEqual(simple.getResnum(), res.getResnum())
+            self.assertEqual(simple.getIcode(), res.getIcode())
+            self.assertIs(simple.getResidue(), res)
+
+    def testIndexing(self):
+
+        res = self.chain.getResidue(400)
+        self.assertIs(self.simple[400].getResidue(), res,
+                      'SimpleChain indexing failed')
+        self.assertIsNone(self.simple[-1000],
+                          'SimpleChain indexing failed for missing residue')
+
+
+class TestMatchChains(unittest.TestCase):
+
+    def testSubsets(self):
+
+        chain = ATOMS['A']
+        for subset, selstr in [('calpha', 'name CA'),
+                               ('backbone', 'name N CA C O'),
+                               ('heavy', 'not hydrogen'),
+                               ('all', 'all')]:
+            match = matchChains(chain, chain, subset=subset, cache=False)
+            self.assertEqual(len(match), 1)
+            one, two, seqid, cover = match[0]
+            assert_equal(one.getIndices(), two.getIndices(),
+                         'matchChains failed for subset ' + subset)
+            assert_equal(one.getIndices(), chain.select(selstr).getIndices(),
+                         'matchChains failed for subset ' + subset)
+            self.assertEqual(seqid, 100)
+            self.assertEqual(cover, 100)
+
+
+class TestCombineAtomMaps(unittest.TestCase):
+
+    def testMultipleCopies(self):
+
+        target = ATOMS.select('calpha').copy()
+        mobile = target.copy()
+        random = np.random.RandomState(0)
+        for i in range(2):
+            copy = target.copy()
+            coords = copy.getCoords()
+            copy.setCoords(coords + 5. * random.randn(*coords.shape))
+            copy.setSegnames('S%d' % i)
+            mobile += copy
+
+        debug = {}
+        mappings = mapOntoChains(mobile, target, cache=False)
+        atommaps = combineAtomMaps(mappings, target, least=1,
+                                   debug=debug, n_cpu=1)
+        self.assertEqual(len(atommaps), 1,
+                         'combineAtomMaps failed to prune atommaps')
+        assert_equal(atommaps[0].getIndices(),
+                     arange(target.numAtoms()),
+                     'combineAtomMaps failed to find the best atommap')
+        self.assertAlmostEqual(debug['rmsd'][0], 0.)
+
+    def testBruteForce(self):
+
+        target = parseDatafile('3o21', subset='ca')
+        mobile = target.copy()
+        random = np.random.RandomState(0)
+        for i in range(3):
+            copy = target.copy()
+            coords = copy.getCoords()
+            copy.setCoords(coords + 5. * random.randn(*coords.shape))
+            copy.setSegnames('S%d' % i)
+            mobile += copy
+        mappings = mapOntoChains(mobile, target, cache=False)
+
+        for drmsd in (3., 5.):
+            atommaps = combineAtomMaps(mappings, target, least=1,
+                                       drmsd=drmsd, n_cpu=1)
+            self.assertEqual(getSegChids(atommaps),
+                             rankBruteForce(mappings, target, drmsd),
+                             'combineAtomMaps failed for drmsd={0}'
+                             .format(drmsd))
+
+
+def getSegChids(atommaps):
+
+    segchids = []
+    for atommap in atommaps:
+        which = atommap.getFlags('mapped')
+        segchids.append(set(zip(atommap.getSegnames()[which].tolist(),
+                                atommap.getChids()[which].tolist())))
+    return segchids
+
+
+def rankBruteForce(mappings, target, drmsd, reject_rmsd=15.):
+    """Returns chains of atommaps selected from all combinations of the first
+    assignment of chains by ranking them with :func:`.rankAtomMaps`."""
+
+    mapped = np.array([[mapping is not None for mapping in row]
+                       for row in mappings])
+    cost = np.where(mapped, 1., 1e6)
+    for r, c in zip(*mapped.nonzero()):
+        cost[r, c] -= mappings[r, c][3] / 100.
+    (R, C), combinations = multilap(cost, [], 1e6)
+
+    candidates = []
+    for rows, cols in combinations:
+        atommap = None
+        for r, c in sorted(zip(rows, cols)):
+            if atommap is None:
+                atommap = mappings[r, c][0]
+            else:
+                atommap += mappings[r, c][0]
+        candidates.append(atommap)
+    ranked, rmsds = rankAtomMaps(candidates, target)
+
+    selected = []
+    segchids = getSegChids(ranked)
+    for atommap, rmsd, chains in zip(ranked, rmsds, segchids):
+        if rmsd > reject_rmsd or rmsd > rmsds[0] + drmsd:
+            break
+        if not any(chains & other for other in selected):
+            selected.append(chains)
+    return selected
@@ -147,5 +147,36 @@ class TestParsePDBHeaderMissingAtoms(unittest.TestCase):
         self.header = None
 
 
+class TestHeaderDict(unittest.TestCase):
+
+    def setUp(self):
+        self.path = pathDatafile('pdb3o21.pdb')
+        self.header = parsePDB(self.path, header=True, model=0)
+
+    def testLazyParsing(self):
+        header = self.header
+        self.assertIn('polymers', header._parsers,
+            'header values were parsed before they were accessed')
+        self.assertEqual(header['identifier'], '3O21')
+        self.assertIn('polymers', header._parsers,
+            'polymers were parsed when identifier was accessed')
+        self.assertIs(header['A'], header['polymers'][0],
+            'failed to access polymer by chain identifier')
+
+    def testSameAsParsingKeys(self):
+        keys = sorted(self.header)
+        self.assertFalse(self.header._parsers,
+            'iterating over header keys did not parse all values')
+        self.assertEqual(len(keys), len(self.header))
+        for key in ['resolution', 'experiment', 'biomoltrans']:
+            self.assertEqual(self.header[key],
+                             parsePDBHeader(self.path, key),
+                'header value for {0} is incorrect'.format(key))
+
+    def tearDown(self):
+
+        self.header = None
+
+
 if __name__ == '__main__':
     unittest.main()
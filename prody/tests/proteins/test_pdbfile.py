@@ -1,6 +1,7 @@
 """This module contains unit tests for :mod:`~prody.proteins`."""
 
 import os
+from io import StringIO
 
 import numpy as np
 from numpy.testing import *
@@ -464,6 +465,22 @@ class TestWritePDB(unittest.TestCase):
         self.assertEqual(lines1[7], lines2[7],
             'writePDB failed to write correct ANISOU line 7 for 6flr selection with altloc None')
         
+    def testWritingModelsLineByLine(self):
+        """Test if models written at once match those written atom by atom,
+        which is the case when hybrid36 serials are requested."""
+
+        for atoms in [self.ag, self.ubi, self.altloc_full,
+                      self.ubi.select('not resnum 10 to 20')]:
+            stream = StringIO()
+            writePDBStream(stream, atoms)
+            fast = stream.getvalue()
+
+            stream = StringIO()
+            writePDBStream(stream, atoms, hybrid36=True)
+            self.assertEqual(fast, stream.getvalue(),
+                'writePDBStream failed to write the same lines for ' +
+                repr(atoms))
+
     def testWriteEnsembleToPDB(self):
         """Test that writePDB can handle ensembles."""
 
@@ -3,6 +3,7 @@ __author__ = 'Ahmet Bakan, Anindita Dutta, Wenzhi Mao, James Krieger'
 from prody.tests import TestCase
 
 from numpy import array, log, zeros, char, ones, fromfile
+from numpy.random import RandomState
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 
 from prody.tests.datafiles import *
@@ -10,7 +11,10 @@ from prody.tests.datafiles import *
 from prody import LOGGER, calcShannonEntropy, buildMutinfoMatrix, parseMSA, parsePDB
 from prody import calcMSAOccupancy, buildSeqidMatrix, uniqueSequences
 from prody import buildOMESMatrix, buildSCAMatrix, calcMeff, buildMSA
-from prody import buildDirectInfoMatrix
+from prody import buildDirectInfoMatrix, iterMSAChunks
+from prody import MSACountAccumulator, MSAMeffAccumulator
+from prody import MSAPairCountAccumulator, applyMutinfoCorr, applyMutinfoNorm
+from prody import alignPairwise
 
 LOGGER.verbosity = None
 
@@ -282,6 +286,54 @@ class TestCalcMutualInfo(TestCase):
         assert_array_almost_equal(expect, result, err_msg='norm failed')
 
 
+class TestMSAPairCountAccumulator(TestCase):
+
+    def testMutinfo(self):
+
+        counter = MSAPairCountAccumulator()
+        for chunk in iterMSAChunks(pathDatafile('msa_Cys_knot.fasta'),
+                                   chunk_size=10):
+            counter.update(chunk)
+        for ambiguity in (True, False):
+            assert_array_almost_equal(counter.calcMutinfoMatrix(ambiguity),
+                                      buildMutinfoMatrix(FASTA, ambiguity))
+            assert_array_almost_equal(counter.calcOMESMatrix(ambiguity),
+                                      buildOMESMatrix(FASTA, ambiguity))
+        mutinfo = buildMutinfoMatrix(FASTA)
+        assert_array_almost_equal(counter.calcMutinfoMatrix(corr='apc'),
+                                  applyMutinfoCorr(mutinfo, 'apc'))
+        assert_array_almost_equal(counter.calcMutinfoMatrix(norm='sument'),
+                                  applyMutinfoNorm(mutinfo,
+                                                   calcShannonEntropy(FASTA)))
+
+    def testAmbiguous(self):
+
+        msa = array([list('bjzxA-'), list('BJZXa.'), list('dLqWc-'),
+                     list('XXBZJB')], dtype='|S1')
+        counter = MSAPairCountAccumulator()
+        counter.update(msa)
+        assert_array_almost_equal(counter.calcMutinfoMatrix(),
+                                  buildMutinfoMatrix(msa))
+        assert_array_almost_equal(counter.calcOMESMatrix(),
+                                  buildOMESMatrix(msa))
+
+    def testWeights(self):
+
+        weights = RandomState(0).rand(FASTA_NUMBER)
+        counter = MSAPairCountAccumulator()
+        other = MSAPairCountAccumulator()
+        counter.update(FASTA[:8], weights[:8])
+        other.update(FASTA[8:], weights[8:])
+        counter.merge(other)
+        assert_array_almost_equal(counter.calcMutinfoMatrix(),
+                                  buildMutinfoMatrix(FASTA, weights=weights))
+        # integer weights are equivalent to repeated sequences
+        repeated = FASTA._getArray().repeat(2, 0)
+        assert_array_almost_equal(
+            buildOMESMatrix(FASTA, weights=ones(FASTA_NUMBER) * 2),
+            buildOMESMatrix(repeated))
+
+
 class TestCalcMSAOccupancy(TestCase):
 
     def testResidueCount(self):
@@ -316,6 +368,13 @@ class TestIdentity(TestCase):
         assert_array_almost_equal(FASTA_EYE,
                                   buildSeqidMatrix(FASTA, turbo=False))
 
+    def testIdentityMatrixThreads(self):
+
+        msa = FASTA._getArray()[[i % FASTA_NUMBER for i in range(150)]]
+        expect = FASTA_EYE[[[i % FASTA_NUMBER] for i in range(150)],
+                           [i % FASTA_NUMBER for i in range(150)]]
+        assert_array_almost_equal(expect, buildSeqidMatrix(msa, n_cpu=3))
+
 
 class TestUnique(TestCase):
 
@@ -719,6 +778,52 @@ class TestCalcMeff(TestCase):
                                   err_msg='weight failed')
 
 
+    def testAccumulator(self):
+
+        expect = calcMeff(FASTA, weight=True)
+        meff = MSAMeffAccumulator()
+        other = MSAMeffAccumulator()
+        for chunk in iterMSAChunks(pathDatafile('msa_Cys_knot.fasta'),
+                                   chunk_size=4):
+            if len(meff) < 12:
+                meff.update(chunk)
+            else:
+                other.update(chunk)
+        meff.merge(other)
+        assert_array_almost_equal(expect[0], meff.getMeff())
+        assert_array_almost_equal(expect[1], meff.getWeights())
+
+
+class TestMSACountAccumulator(TestCase):
+
+    def testChunks(self):
+
+        counter = MSACountAccumulator()
+        for chunk in iterMSAChunks(pathDatafile('msa_Cys_knot.fasta'),
+                                   chunk_size=6):
+            counter.update(chunk)
+        self.assertEqual(counter.numSequences(), FASTA_NUMBER)
+        assert_array_almost_equal(counter.calcOccupancy(),
+                                  calcMSAOccupancy(FASTA))
+        for ambiguity in (True, False):
+            for omitgaps in (True, False):
+                assert_array_almost_equal(
+                    counter.calcShannonEntropy(ambiguity, omitgaps),
+                    calcShannonEntropy(FASTA, ambiguity, omitgaps))
+
+    def testAmbiguous(self):
+
+        msa = array([list('bjzxA-'), list('BJZXa.'), list('dLqWc-')],
+                    dtype='|S1')
+        first, second = MSACountAccumulator(), MSACountAccumulator()
+        first.update(msa[:1])
+        second.update(msa[1:])
+        first.merge(second)
+        for omitgaps in (True, False):
+            assert_array_almost_equal(
+                first.calcShannonEntropy(omitgaps=omitgaps),
+                calcShannonEntropy(msa, omitgaps=omitgaps))
+
 class TestDirectInfo(TestCase):
 
     def testZero(self):
@@ -1199,6 +1304,23 @@ class TestDirectInfo(TestCase):
         result = buildDirectInfoMatrix(fasta, refine=True)
         assert_array_almost_equal(expect, result, err_msg='refine failed')
 
+    def testFloat32(self):
+
+        di = fromfile(pathDatafile('msa_Cys_knot_di.dat'))
+        expect = di.reshape((8, 8))
+        result = buildDirectInfoMatrix(FASTA[:, :8], dtype='float32')
+        assert_array_almost_equal(expect, result, decimal=4,
+                                  err_msg='float32 failed')
+
+    def testPLM(self):
+
+        aas = array(list('ACDEFGHIKLMNPQRSTVWY'), dtype='|S1')
+        index = RandomState(0).randint(0, 20, (400, 8))
+        index[:, 5] = (index[:, 1] + 3) % 20
+        result = buildDirectInfoMatrix(aas[index], seqid=1., method='plm')
+        assert_array_almost_equal(result, result.T)
+        self.assertEqual(result.argmax(), 1 * 8 + 5)
+
 class TestBuildMSA(TestCase):
 
     def testBuildMSAlocal(self):
@@ -1209,4 +1331,42 @@ class TestBuildMSA(TestCase):
         expect2 = parseMSA(pathDatafile('msa_3hsyA_3o21A_new.fasta'))
         result = buildMSA(sequences, method="local", labels=["A2", "A3"])
         assert result in (expect1, expect2), "The list of expected buildMSA results did not contain " + result
-        
\ No newline at end of file
+        
+
+
+class TestAlignPairwise(TestCase):
+
+    def testLocal(self):
+
+        mapping, score = alignPairwise('XXXXACDEFGHIKLYYYY', 'ZZACDEFHIKLZZZ',
+                                       method='local')
+        self.assertAlmostEqual(score, 8.)
+        assert_array_equal(mapping, [-1] * 4 + [2, 3, 4, 5, 6, -1, 7, 8, 9,
+                                               10] + [-1] * 4)
+
+    def testGlobal(self):
+
+        # gaps at the ends are penalized, as in pairwise2.align.globalms
+        mapping, score = alignPairwise('ACDEFGHIKL', 'CDEFHIKLM',
+                                       method='global', match=1,
+                                       mismatch=0, gap_opening=-1,
+                                       gap_extension=-.1)
+        self.assertAlmostEqual(score, 5.)
+        assert_array_equal(mapping, [-1, 0, 1, 2, 3, -1, 4, 5, 6, 7])
+
+    def testAffine(self):
+
+        mapping, score = alignPairwise('AAACCCCCGGG', 'AAAGGG',
+                                       method='global', gap_opening=-1,
+                                       gap_extension=-.1)
+        self.assertAlmostEqual(score, 6 - 1 - .4)
+        assert_array_equal(mapping, [0, 1, 2] + [-1] * 5 + [3, 4, 5])
+
+    def testBatch(self):
+
+        sequences = [str(seq) for seq in FASTA]
+        maps, scores = alignPairwise(sequences[0], sequences, n_cpu=2)
+        for seq, mapping, score in zip(sequences, maps, scores):
+            expect = alignPairwise(sequences[0], seq)
+            assert_array_equal(mapping, expect[0])
+            self.assertAlmostEqual(score, expect[1])
@@ -6,7 +6,7 @@ from numpy.testing import assert_equal, assert_array_equal, assert_array_almost_
 from prody.tests.datafiles import *
 
 from prody import LOGGER, refineMSA, parseMSA, calcMSAOccupancy, mergeMSA
-from prody import uniqueSequences
+from prody import uniqueSequences, MSA
 
 LOGGER.verbosity = None
 
@@ -112,6 +112,45 @@ class TestRefinement(TestCase):
         msa.extend(FASTA)
         assert_equal(msa[numSeq:].getArray(), FASTA.getArray(), 'MSA extension failed')
 
+class TestEncoding(TestCase):
+
+    def testEncoded(self):
+
+        encoded = FASTA.getEncoded()
+        assert_array_equal(encoded != 0, FASTA_ALPHA)
+        assert_array_equal(encoded[FASTA_ALPHA] + 64,
+                           FASTA._msa[FASTA_ALPHA].view('uint8'))
+
+    def testOccupancy(self):
+
+        assert_array_equal(calcMSAOccupancy(FASTA.getEncoded(), 'col'),
+                           calcMSAOccupancy(FASTA._msa, 'col'))
+
+    def testExtension(self):
+
+        msa = FASTA[:]
+        msa._getEncoded()
+        msa.extend(FASTA)
+        self.assertEqual(msa._getEncoded().shape, msa._getArray().shape)
+
+    def testRefinement(self):
+
+        refined = refineMSA(FASTA, label='FSHB_BOVIN', rowocc=.9, seqid=.98,
+                            colocc=.5)
+        assert_array_equal(refined._getEncoded(),
+                           MSA(refined._getArray().copy())._getEncoded())
+
+    def testPickle(self):
+
+        msa = FASTA[:]
+        msa._getEncoded()
+        self.assertIsNone(msa.__getstate__()['_encoded'])
+        state = msa.__getstate__()
+        del state['_encoded']
+        old = MSA.__new__(MSA)
+        old.__dict__.update(state)
+        assert_array_equal(old._getEncoded(), FASTA._getEncoded())
+
 class TestMerging(TestCase):
 
 
@@ -4,12 +4,13 @@ from prody.tests import TestCase
 import os
 from os.path import join
 
-from numpy import array, log, zeros, char
+from numpy import array, log, zeros, char, concatenate
 from numpy.testing import assert_array_equal
 
 from prody.tests.datafiles import *
 from prody.tests import TEMPDIR
-from prody import MSA, MSAFile, parseMSA, LOGGER, writeMSA
+from prody import MSA, MSAFile, parseMSA, LOGGER, writeMSA, iterMSAChunks
+from prody import refineMSA
 from prody.utilities import createStringIO, importDec
 dec = importDec()
 
@@ -91,3 +92,43 @@ class TestWriteMSA(TestCase):
         self.assertListEqual(list(FASTA), list(fasta))
         if os.path.isfile(filename):
             os.remove(filename)
+
+
+class TestIterMSAChunks(TestCase):
+
+    def testChunks(self):
+
+        chunks = list(iterMSAChunks(pathDatafile('msa_Cys_knot.fasta'),
+                                    chunk_size=7))
+        self.assertEqual([len(chunk) for chunk in chunks], [7, 7, 7, 4])
+        assert_array_equal(concatenate([chunk._getArray()
+                                        for chunk in chunks]),
+                           FASTA._getArray())
+        self.assertListEqual(sum([chunk.getLabels() for chunk in chunks], []),
+                             FASTA.getLabels())
+
+    def testSelex(self):
+
+        for ext in ('slx', 'sth'):
+            chunks = list(iterMSAChunks(pathDatafile('msa_Cys_knot.' + ext),
+                                        chunk_size=10))
+            self.assertListEqual(sum([list(chunk) for chunk in chunks], []),
+                                 list(STOCK))
+
+    def testCompressed(self):
+
+        filename = writeMSA(join(TEMPDIR, 'test.fasta.gz'), FASTA)
+        chunks = list(iterMSAChunks(filename, chunk_size=10))
+        self.assertListEqual(sum([list(chunk) for chunk in chunks], []),
+                             list(FASTA))
+        if os.path.isfile(filename):
+            os.remove(filename)
+
+    def testRefine(self):
+
+        chunks = list(iterMSAChunks(pathDatafile('msa_Cys_knot.fasta'),
+                                    chunk_size=10, index=0, rowocc=.5))
+        refined = refineMSA(FASTA, index=0, rowocc=.5)
+        assert_array_equal(concatenate([chunk._getArray()
+                                        for chunk in chunks]),
+                           refined._getArray())
@@ -1,8 +1,11 @@
 """This module contains unit tests for :mod:`~prody.ensemble`."""
 
+import os
 from os.path import join
+
 from prody.tests import TestCase
 
+import numpy as np
 from numpy.testing import assert_equal, assert_allclose
 
 from prody import DCDFile, writeDCD, parseDCD
@@ -46,3 +49,35 @@ class TestDCDFile(TestCase):
         assert_allclose(coordsets[:n_csets], ENSEMBLE._getCoordsets(),
                         rtol=RTOL, atol=ATOL,
                         err_msg='failed to parse DCD file correctly')
+
+    def testWriteBlockUnitcell(self):
+        coords = ENSEMBLE.getCoordsets()
+        unitcell = np.array([[30., 40., 50., 90., 90., 90.]] * len(coords))
+        unitcell[:, 4] += np.arange(len(coords))
+        dcd = DCDFile(self.dcd, 'w')
+        dcd.write(coords, unitcell)
+        dcd.write(coords[0], unitcell[0])
+        dcd.close()
+        dcd = DCDFile(self.dcd)
+        self.assertEqual(dcd.numFrames(), len(coords) + 1)
+        assert_allclose(dcd[:]._getCoordsets()[:-1], coords,
+                        rtol=RTOL, atol=ATOL,
+                        err_msg='failed to write block of frames correctly')
+        assert_allclose([frame.getUnitcell() for frame in dcd],
+                        np.concatenate([unitcell, unitcell[:1]]),
+                        err_msg='failed to write unit cells correctly')
+        dcd.close()
+
+    def testWriteDCDUnitcell(self):
+        unitcell = [30., 40., 50., 90., 80., 90.]
+        dcd = DCDFile(self.dcd, 'w')
+        dcd.write(ENSEMBLE.getCoordsets(), unitcell)
+        dcd.close()
+        out = join(TEMPDIR, 'temp2.dcd')
+        writeDCD(out, DCDFile(self.dcd), step=2)
+        dcd = DCDFile(out)
+        self.assertEqual(dcd.numFrames(), (len(ENSEMBLE) + 1) // 2)
+        assert_allclose(next(dcd).getUnitcell(), unitcell,
+                        err_msg='failed to write unit cells correctly')
+        dcd.close()
+        os.remove(out)
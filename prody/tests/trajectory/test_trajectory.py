@@ -0,0 +1,72 @@
+"""This module contains unit tests for :mod:`.trajectory` module."""
+
+import os
+from os.path import join
+
+from prody.tests import TestCase
+
+import numpy as np
+from numpy.testing import assert_equal
+
+from prody import DCDFile, Trajectory
+
+from prody.tests import TEMPDIR
+from prody.tests.ensemble import ENSEMBLE
+
+
+class TestTrajectory(TestCase):
+
+    def setUp(self):
+
+        coords = ENSEMBLE.getCoordsets().astype(np.float32)
+        self.coords = np.concatenate([coords, coords[::-1], coords[:1]])
+        self.files = []
+        start = 0
+        for i, stop in enumerate([2, 3, 7]):
+            filename = join(TEMPDIR, 'temp{0}.dcd'.format(i))
+            dcd = DCDFile(filename, 'w')
+            dcd.write(self.coords[start:stop])
+            dcd.close()
+            self.files.append(filename)
+            start = stop
+
+    def tearDown(self):
+
+        for filename in self.files:
+            os.remove(filename)
+
+    def _trajectory(self, **kwargs):
+
+        traj = Trajectory(self.files[0], **kwargs)
+        for filename in self.files[1:]:
+            traj.addFile(filename)
+        return traj
+
+    def testGetCoordsets(self):
+
+        traj = self._trajectory()
+        indices = [6, 0, 2, 3, 5]
+        assert_equal(traj.getCoordsets(indices),
+                     self.coords[np.unique(indices)],
+                     'failed to get coordinate sets across files')
+        traj.close()
+
+    def testGoto(self):
+
+        traj = self._trajectory()
+        for index in [4, 2, 6, 0, 3]:
+            traj.goto(index)
+            assert_equal(next(traj).getCoords(), self.coords[index],
+                         'failed to go to frame {0}'.format(index))
+        traj.close()
+
+    def testReadAhead(self):
+
+        traj = self._trajectory(readahead=2)
+        assert_equal([frame.getCoords() for frame in traj], self.coords,
+                     'failed to iterate over frames read ahead')
+        traj.goto(1)
+        traj.skip(2)
+        assert_equal([traj.nextCoordset() for i in range(4)],
+                     self.coords[3:], 'failed to read ahead after skip')
+        traj.close()
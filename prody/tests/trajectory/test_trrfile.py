@@ -0,0 +1,136 @@
+"""This module contains unit tests for :mod:`.trrfile` module."""
+
+import os
+from os.path import join
+from struct import pack
+
+from prody.tests import TestCase
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from prody import TRRFile, Trajectory
+
+from prody.tests import TEMPDIR
+from prody.tests.ensemble import ENSEMBLE
+
+COORDSETS = ENSEMBLE.getCoordsets() / 10
+
+
+def writeTRR(filename, coordsets, double=False, velocities=True, boxes=None,
+             extra=False):
+    """Write a TRR file with box, coordinates, velocities and forces.  If
+    *boxes* is given, only frames for which it is **True** have a box.  If
+    *extra* is **True**, each frame is followed by a frame with velocities
+    and forces only."""
+
+    real = 'd' if double else 'f'
+    size = 8 if double else 4
+    n_atoms = coordsets.shape[1]
+    x_size = n_atoms * 3 * size
+
+    def write(out, step, xyz, box, x, v):
+        out.write(pack('>ii', 1993, 13))
+        out.write(pack('>i', 12) + b'GMX_trn_file')
+        out.write(pack('>13i', 0, 0, 9 * size if box else 0, 0, 0, 0, 0,
+                       x_size if x else 0, x_size if v else 0, x_size,
+                       n_atoms, step, 0))
+        out.write(pack('>' + real * 2, step * 0.002, 0))
+        if box:
+            out.write(pack('>' + real * 9, 3, 0, 0, 0, 3, 0, 1.5, 0, 3))
+        if x:
+            out.write(pack('>' + real * (3 * n_atoms), *xyz.flatten()))
+        if v:
+            out.write(pack('>' + real * (3 * n_atoms), *-xyz.flatten()))
+        out.write(pack('>' + real * (3 * n_atoms), *xyz.flatten()))
+
+    with open(filename, 'wb') as out:
+        for i, xyz in enumerate(coordsets):
+            write(out, i * 100, xyz, boxes is None or boxes[i], True,
+                  velocities)
+            if extra:
+                write(out, i * 100 + 50, xyz + 1, True, False, True)
+
+
+class TestTRRFile(TestCase):
+
+    def setUp(self):
+
+        self.trr = join(TEMPDIR, 'temp.trr')
+
+    def tearDown(self):
+
+        if os.path.isfile(self.trr):
+            os.remove(self.trr)
+
+    def testRead(self):
+
+        writeTRR(self.trr, COORDSETS)
+        trr = TRRFile(self.trr)
+        self.assertEqual(trr.numFrames(), len(COORDSETS))
+        self.assertEqual(trr.getFrameFreq(), 100)
+        frames = list(trr)
+        assert_allclose([frame.getCoords() for frame in frames],
+                        COORDSETS * 10, rtol=1e-6,
+                        err_msg='failed to parse coordinates')
+        assert_allclose(frames[1].getVelocities(), -COORDSETS[1] * 10,
+                        rtol=1e-6, err_msg='failed to parse velocities')
+        assert_allclose(frames[0].getUnitcell(), [30, 30, 33.541, 90,
+                                                  63.435, 90], atol=1e-3,
+                        err_msg='failed to parse box vectors')
+        assert_allclose(trr.getCoordsets([2, 0]), COORDSETS[[0, 2]] * 10,
+                        rtol=1e-6, err_msg='failed to get coordinate sets')
+        trr.close()
+
+    def testDouble(self):
+
+        writeTRR(self.trr, COORDSETS, double=True, velocities=False)
+        traj = Trajectory(self.trr, readahead=2)
+        coords = np.array([traj.nextCoordset() for i in range(len(traj))])
+        self.assertEqual(coords.dtype, np.float64)
+        assert_allclose(coords, COORDSETS * 10,
+                        err_msg='failed to parse double precision file')
+        traj.close()
+
+    def testFramesWithoutCoordinates(self):
+
+        writeTRR(self.trr, COORDSETS, extra=True)
+        trr = TRRFile(self.trr)
+        self.assertEqual(trr.numFrames(), len(COORDSETS))
+        self.assertEqual(trr.getFrameFreq(), 100)
+        frames = list(trr)
+        assert_allclose([frame.getCoords() for frame in frames],
+                        COORDSETS * 10, rtol=1e-6,
+                        err_msg='failed to skip frames without coordinates')
+        assert_allclose(frames[2].getVelocities(), -COORDSETS[2] * 10,
+                        rtol=1e-6, err_msg='failed to parse velocities')
+        assert_allclose(trr.getCoordsets([2, 1]), COORDSETS[[1, 2]] * 10,
+                        rtol=1e-6, err_msg='failed to get coordinate sets')
+        trr.goto(2)
+        assert_allclose(next(trr).getCoords(), COORDSETS[2] * 10, rtol=1e-6,
+                        err_msg='failed to go to frame')
+        trr.close()
+
+    def testFramesWithoutBox(self):
+
+        boxes = [i % 2 == 0 for i in range(len(COORDSETS))]
+        writeTRR(self.trr, COORDSETS, boxes=boxes)
+        for readahead in (0, 2):
+            traj = Trajectory(self.trr, readahead=readahead)
+            unitcells = [frame.getUnitcell() for frame in traj]
+            self.assertIsNone(unitcells[1])
+            assert_allclose(unitcells[2], [30, 30, 33.541, 90, 63.435, 90],
+                            atol=1e-3, err_msg='failed to parse box vectors')
+            traj.close()
+
+    def testTrajectoryVelocities(self):
+
+        writeTRR(self.trr, COORDSETS, extra=True)
+        for readahead in (0, 2):
+            traj = Trajectory(self.trr, readahead=readahead)
+            traj.addFile(self.trr)
+            velocs = [frame.getVelocities() for frame in traj]
+            assert_allclose(velocs, -np.concatenate([COORDSETS] * 2) * 10,
+                            rtol=1e-6, err_msg='failed to get velocities '
+                            'with readahead={0}'.format(readahead))
+            traj.close()
@@ -0,0 +1,66 @@
+"""This module contains unit tests for :mod:`.xtcfile` module."""
+
+import os
+from os.path import join
+from struct import pack
+
+from prody.tests import TestCase
+
+import numpy as np
+from numpy.testing import assert_equal, assert_allclose
+
+from prody import DCDFile, XTCFile, Trajectory, parseXTC
+
+from prody.tests import TEMPDIR
+from prody.tests.datafiles import pathDatafile
+
+XTC = pathDatafile('MCV1900370.xtc')
+COORDSETS = DCDFile(pathDatafile('MCV1900370.dcd')).getCoordsets()
+
+
+class TestXTCFile(TestCase):
+
+    def testParseXTC(self):
+
+        assert_equal(parseXTC(XTC)._getCoordsets(), COORDSETS,
+                     'failed to decompress XTC file correctly')
+
+    def testRandomAccess(self):
+
+        xtc = XTCFile(XTC)
+        self.assertEqual(xtc.numFrames(), len(COORDSETS))
+        assert_equal(xtc.getCoordsets([4, 1]), COORDSETS[[1, 4]],
+                     'failed to get coordinate sets')
+        xtc.goto(3)
+        assert_equal(next(xtc).getCoords(), COORDSETS[3],
+                     'failed to go to frame')
+        xtc.close()
+
+    def testTrajectory(self):
+
+        traj = Trajectory(XTC, readahead=2)
+        traj.addFile(pathDatafile('MCV1900370.dcd'))
+        assert_equal([frame.getCoords() for frame in traj],
+                     np.concatenate([COORDSETS, COORDSETS]),
+                     'failed to read XTC and DCD files in a trajectory')
+        traj.close()
+
+    def testUnitcell(self):
+
+        filename = join(TEMPDIR, 'temp.xtc')
+        coords = np.arange(9, dtype=np.float32).reshape((3, 3))
+        with open(filename, 'wb') as out:
+            for step in range(2):
+                out.write(pack('>iiif', 1995, 3, step * 10, step * 0.02))
+                out.write(pack('>9f', 3, 0, 0, 0, 4, 0, 0, 0, 5))
+                out.write(pack('>i', 3))
+                out.write(pack('>9f', *(coords.flatten() + step)))
+        xtc = XTCFile(filename)
+        self.assertEqual(xtc.getFrameFreq(), 10)
+        frames = list(xtc)
+        assert_allclose(frames[1].getCoords(), (coords + 1) * 10,
+                        err_msg='failed to parse uncompressed coordinates')
+        assert_allclose(frames[0].getUnitcell(), [30, 40, 50, 90, 90, 90],
+                        err_msg='failed to parse box vectors')
+        xtc.close()
+        os.remove(filename)
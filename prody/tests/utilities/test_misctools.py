@@ -1,6 +1,8 @@
 from prody.tests import TestCase
 
-from prody.utilities import rangeString
+from numpy.testing import assert_equal
+
+from prody.utilities import rangeString, appendRows, reserveRows, runThreads
 
 
 class TestRangeString(TestCase):
@@ -26,3 +28,49 @@ class TestRangeString(TestCase):
         self.assertEqual(rangeString(list(range(10, 20)) +
                                      list(range(15, 20)) +
                                      list(range(30))), '0 to 29')
+
+
+class TestAppendRows(TestCase):
+
+    def testAppendRows(self):
+
+        array, buffer = None, None
+        for i in range(10):
+            view = array
+            array, buffer = appendRows(array, [[i, i]], buffer)
+            if view is not None:
+                assert_equal(view, [[j, j] for j in range(i)])
+        assert_equal(array, [[i, i] for i in range(10)])
+        self.assertEqual(len(buffer), 16)
+
+    def testReserveRows(self):
+
+        array, buffer = appendRows(None, [[0., 1.]], None, size=8)
+        self.assertEqual(len(buffer), 8)
+        array, buffer = reserveRows(array, 32, buffer)
+        self.assertEqual(len(buffer), 32)
+        assert_equal(array, [[0., 1.]])
+
+
+class TestRunThreads(TestCase):
+
+    def testBlocks(self):
+
+        for n_cpu in (1, 3, 100):
+            calls = []
+            n_threads = runThreads(lambda start, stop, thread:
+                                   calls.append((start, stop, thread)),
+                                   10, n_cpu, size=4)
+            self.assertEqual(n_threads, min(n_cpu, 3))
+            self.assertEqual(sorted(call[:2] for call in calls),
+                             [(0, 4), (4, 8), (8, 10)])
+            for start, stop, thread in calls:
+                self.assertEqual(thread, start // 4 % n_threads)
+
+    def testErrors(self):
+
+        def func(start, stop, thread):
+            if start:
+                raise ValueError('failed block')
+
+        self.assertRaises(ValueError, runThreads, func, 10, 2, size=2)
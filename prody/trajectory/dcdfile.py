@@ -34,6 +34,7 @@ DEBUG = False
 PISQUARE = np.pi ** 2
 RECSCALE32BIT = 1
 RECSCALE64BIT = 2
+BLOCK_SIZE = 2 ** 20 # bytes of coordinate data written at a time
 
 class DCDFile(TrajFile):
 
@@ -292,13 +293,7 @@ class DCDFile(TrajFile):
         if self._unitcell:
             self._file.read(4)
             unitcell = fromstring(self._file.read(48), dtype=np.float64)
-            unitcell = unitcell[[0,2,5,1,3,4]]
-            if np.all(abs(unitcell[3:]) <= 1):
-                # This file was generated by CHARMM, or by NAMD > 2.5, with the angle */
-                # cosines of the periodic cell angles written to the DCD file.        */
-                # This formulation improves rounding behavior for orthogonal cells    */
-                # so that the angles end up at precisely 90 degrees, unlike acos().   */
-                unitcell[3:] = 90. - np.arcsin(unitcell[3:]) * 90 / PISQUARE
+            unitcell = _parseUnitcells(unitcell)
             self._file.read(4)
             return unitcell
 
@@ -338,6 +333,40 @@ class DCDFile(TrajFile):
 
     getCoordsets.__doc__ = TrajBase.getCoordsets.__doc__
 
+    def _mapFrames(self):
+        """Returns a memory map of frame records.  Records have an *xyz*
+        field with shape (3, n_atoms+2), which includes Fortran record
+        markers at both ends, and a *unitcell* field with 6 values in the
+        order stored in the file, if the file has unit cell data."""
+
+        endian = self._endian or '='
+        fields = []
+        if self._unitcell:
+            fields.extend([('_', endian + 'i4'),
+                           ('unitcell', endian + 'f8', (6,)),
+                           ('__', endian + 'i4')])
+        fields.append(('xyz', endian + 'f' + str(self._itemsize),
+                       (3, self._n_atoms + 2)))
+        return np.memmap(self._filename, np.dtype(fields), 'r',
+                         self._first_byte, (self._n_csets,))
+
+    def _readFrames(self, indices):
+        """Returns coordinates of all atoms and unit cells, or **None** if
+        file has no unit cell data, for frames at *indices*, which may be a
+        slice or an array of integers.  Frames are read from a memory map,
+        so file position is not changed and frames can be read from another
+        thread."""
+
+        frames = self._mapFrames()[indices]
+        coords = np.ascontiguousarray(
+            frames['xyz'][:, :, 1:-1].transpose(0, 2, 1), self._dtype)
+        if self._astype is not None and self._astype != coords.dtype:
+            coords = coords.astype(self._astype)
+        unitcells = None
+        if self._unitcell:
+            unitcells = _parseUnitcells(frames['unitcell'])
+        return coords, unitcells
+
     def write(self, coords, unitcell=None, **kwargs):
         """Write *coords* to a file open in 'a' or 'w' mode.  *coords* may be
         a NUmpy array or a ProDy object that stores or points to coordinate
@@ -348,6 +377,13 @@ class DCDFile(TrajFile):
         coordinate sets as well.  If *coords* is an :class:`~.Atomic` or
         :class:`~.Ensemble` all coordinate sets will be written.
 
+        A block of coordinate sets with shape (n_frames, n_atoms, 3) is
+        written in a single call, so writing many frames at a time is much
+        faster than writing them one by one.  *unitcell* may be a single
+        unit cell for all frames or an array with shape (n_frames, 6).
+        Number of frames in the file header is updated when the file is
+        flushed or closed.
+
         Following keywords are used when writing the first coordinate set:
 
         :arg timestep: timestep used for integration, default is 1
@@ -363,113 +399,177 @@ class DCDFile(TrajFile):
             coords = coords._getCoordsets()
         except AttributeError:
             try:
-                coords = coords._getCoords()
+                frame, coords = coords, coords._getCoords()
             except AttributeError:
                 checkCoords(coords, csets=True, dtype=None)
             else:
                 if unitcell is None:
                     try:
-                        coords = coords.getUnitcell()
+                        unitcell = frame.getUnitcell()
                     except AttributeError:
                         pass
 
-        if coords.dtype != float32:
-            coords = coords.astype(float32)
         n_atoms = coords.shape[-2]
         if self._n_atoms == 0:
             self._n_atoms = n_atoms
         elif self._n_atoms != n_atoms:
             raise ValueError('coords does not have correct number of atoms')
         if coords.ndim == 2:
-            coords = [coords]
-
+            coords = coords.reshape((1,) + coords.shape)
+        n_csets = len(coords)
 
-        dcd = self._file
-        pack_i_4N = pack('i', self._n_atoms * 4)
         if self._n_csets == 0:
-            if unitcell is None:
-                self._unitcell = False
-            else:
-                self._unitcell = True
-            timestep = float(kwargs.get('timestep', 1.0))
-            first_ts = int(kwargs.get('firsttimestep', 0))
-            framefreq = int(kwargs.get('framefreq', 1))
-            n_fixed = 0
-
-            pack_i_0 = pack(b'i', 0)
-            pack_ix4_0x4 = pack(b'i'*4, 0, 0, 0, 0)
-            pack_i_1 = pack(b'i', 1)
-            pack_i_2 = pack(b'i', 2)
-            pack_i_4 = pack(b'i', 4)
-            pack_i_84 = pack(b'i', 84)
-            pack_i_164 = pack(b'i', 164)
-
-            dcd.write(pack_i_84)
-            dcd.write(b'CORD')
-            dcd.write(pack_i_0) # 0 Number of frames in file, none written yet
-            dcd.write(pack(b'i', first_ts)) # 1 Starting timestep
-            dcd.write(pack(b'i', framefreq)) # 2 Timesteps between frames
-            dcd.write(pack_i_0) # 3 Number of timesteps in simulation
-            dcd.write(pack_i_0) # 4 NAMD writes NSTEP or ISTART - NSAVC here?
-            dcd.write(pack_ix4_0x4) # 5, 6, 7, 8
-            dcd.write(pack('f', timestep)) # 9 timestep
-            dcd.write(pack('i', int(self._unitcell))) # 10 with unitcell
-            dcd.write(pack_ix4_0x4) # 11, 12, 13, 14
-            dcd.write(pack_ix4_0x4) # 15, 16, 17, 18
-            dcd.write(pack('i', 24)) # 19 Pretend to be CHARMM version 24
-            dcd.write(pack_i_84)
-            dcd.write(pack_i_164)
-            dcd.write(pack_i_2)
-            dcd.write(b'Created by ProDy'.ljust(80))
-            temp = now().strftime('%d %B, %Y at %H:%M')
-            try:
-                temp = bytes(temp, encoding='utf-8')
-            except TypeError:
-                pass
-            dcd.write((b'REMARKS Created ' + temp).ljust(80))
-            dcd.write(pack_i_164)
-
-            dcd.write(pack_i_4)
-            dcd.write(pack(b'i', n_atoms))
-            dcd.write(pack_i_4)
-            self._first_byte = dcd.tell()
+            self._writeHeader(n_atoms, unitcell is not None, **kwargs)
         if self._unitcell:
             if unitcell is None:
                 raise TypeError('unitcell data is expected')
-            else:
-                uc = unitcell
-                uc[3:] = np.sin((PISQUARE/90) * (90-uc[3:]))
-                uc = uc[[0,3,1,4,5,2]]
-                pack_i_48 = pack('i', 48)
-        dcd.seek(0, 2)
-        for xyz in coords:
+            uc = np.array(unitcell, np.float64)
+            if uc.ndim == 1:
+                uc = np.tile(uc, (n_csets, 1))
+            if uc.shape != (n_csets, 6):
+                raise ValueError('unitcell must have shape (6,) or '
+                                 '({0}, 6)'.format(n_csets))
+
+        n_block = max(1, BLOCK_SIZE // (n_atoms * 12))
+        for i in range(0, n_csets, n_block):
+            block = coords[i:i+n_block]
+            frames, xyz = _newFrames(len(block), n_atoms, self._unitcell)
+            xyz[:] = block.transpose(0, 2, 1)
             if self._unitcell:
-                dcd.write(pack_i_48)
-                uc.tofile(dcd)
-                dcd.write(pack_i_48)
-            xyz = xyz.T
-            dcd.write(pack_i_4N)
-            xyz[0].tofile(dcd)
-            dcd.write(pack_i_4N)
-            dcd.write(pack_i_4N)
-            xyz[1].tofile(dcd)
-            dcd.write(pack_i_4N)
-            dcd.write(pack_i_4N)
-            xyz[2].tofile(dcd)
-            dcd.write(pack_i_4N)
-            self._n_csets += 1
+                _setUnitcells(frames, uc[i:i+n_block])
+            self._writeFrames(frames)
+
+    def _writeHeader(self, n_atoms, unitcell, **kwargs):
+        """Write file header for frames of *n_atoms* with or without
+        *unitcell* data.  See :meth:`write` for keyword arguments."""
+
+        dcd = self._file
+        self._unitcell = bool(unitcell)
+        timestep = float(kwargs.get('timestep', 1.0))
+        first_ts = int(kwargs.get('firsttimestep', 0))
+        framefreq = int(kwargs.get('framefreq', 1))
+        n_fixed = 0
+
+        pack_i_0 = pack(b'i', 0)
+        pack_ix4_0x4 = pack(b'i'*4, 0, 0, 0, 0)
+        pack_i_1 = pack(b'i', 1)
+        pack_i_2 = pack(b'i', 2)
+        pack_i_4 = pack(b'i', 4)
+        pack_i_84 = pack(b'i', 84)
+        pack_i_164 = pack(b'i', 164)
+
+        dcd.write(pack_i_84)
+        dcd.write(b'CORD')
+        dcd.write(pack_i_0) # 0 Number of frames in file, none written yet
+        dcd.write(pack(b'i', first_ts)) # 1 Starting timestep
+        dcd.write(pack(b'i', framefreq)) # 2 Timesteps between frames
+        dcd.write(pack_i_0) # 3 Number of timesteps in simulation
+        dcd.write(pack_i_0) # 4 NAMD writes NSTEP or ISTART - NSAVC here?
+        dcd.write(pack_ix4_0x4) # 5, 6, 7, 8
+        dcd.write(pack('f', timestep)) # 9 timestep
+        dcd.write(pack('i', int(self._unitcell))) # 10 with unitcell
+        dcd.write(pack_ix4_0x4) # 11, 12, 13, 14
+        dcd.write(pack_ix4_0x4) # 15, 16, 17, 18
+        dcd.write(pack('i', 24)) # 19 Pretend to be CHARMM version 24
+        dcd.write(pack_i_84)
+        dcd.write(pack_i_164)
+        dcd.write(pack_i_2)
+        dcd.write(b'Created by ProDy'.ljust(80))
+        temp = now().strftime('%d %B, %Y at %H:%M')
+        try:
+            temp = bytes(temp, encoding='utf-8')
+        except TypeError:
+            pass
+        dcd.write((b'REMARKS Created ' + temp).ljust(80))
+        dcd.write(pack_i_164)
+
+        dcd.write(pack_i_4)
+        dcd.write(pack(b'i', n_atoms))
+        dcd.write(pack_i_4)
+        self._first_byte = dcd.tell()
+
+    def _writeFrames(self, frames):
+        """Write frame records returned by :func:`_newFrames` to the end of
+        the file."""
+
+        self._file.seek(0, 2)
+        frames.tofile(self._file)
+        self._n_csets += len(frames)
+        self._nfi = self._n_csets
+
+    def _writeNumFrames(self):
+        """Write number of frames into the file header."""
+
+        if self._mode != 'rb' and self._first_byte is not None:
+            dcd = self._file
             dcd.seek(8, 0)
             dcd.write(pack('i', self._n_csets))
             dcd.seek(0, 2)
-        self._nfi = self._n_csets
 
     def flush(self):
         """Flush the internal output buffer."""
 
         if self._mode != 'r':
+            self._writeNumFrames()
             self._file.flush()
             os.fsync(self._file.fileno())
 
+    def close(self):
+
+        if not self._closed:
+            self._writeNumFrames()
+        TrajFile.close(self)
+
+    close.__doc__ = TrajBase.close.__doc__
+
+
+def _parseUnitcells(unitcells):
+    """Returns unit cell dimensions and angles from *unitcells* in the order
+    and format they are stored in DCD files.  *unitcells* may be a single
+    unit cell or an array with shape (n_frames, 6)."""
+
+    unitcells = np.asarray(unitcells, np.float64)[..., [0,2,5,1,3,4]]
+    angles = unitcells[..., 3:]
+    # This file was generated by CHARMM, or by NAMD > 2.5, with the angle */
+    # cosines of the periodic cell angles written to the DCD file.        */
+    # This formulation improves rounding behavior for orthogonal cells    */
+    # so that the angles end up at precisely 90 degrees, unlike acos().   */
+    cosines = np.all(abs(angles) <= 1, -1)
+    angles[cosines] = 90. - np.arcsin(angles[cosines]) * 90 / PISQUARE
+    return unitcells
+
+
+def _newFrames(n_frames, n_atoms, unitcell=False):
+    """Returns an array for *n_frames* DCD frame records with Fortran record
+    markers set, so that records can be written in one call, and a view of
+    it for coordinates with shape (n_frames, 3, n_atoms).  When *unitcell*
+    is **True**, records start with space for unit cell data, which can be
+    set using :func:`_setUnitcells`."""
+
+    offset = 14 if unitcell else 0
+    frames = np.empty((n_frames, offset + 3 * (n_atoms + 2)), float32)
+    markers = frames.view(np.int32)
+    if unitcell:
+        markers[:, 0] = markers[:, 13] = 48
+    xyz = frames[:, offset:]
+    xyz.shape = (n_frames, 3, n_atoms + 2)
+    markers = markers[:, offset:]
+    markers.shape = xyz.shape
+    markers[:, :, 0] = markers[:, :, -1] = n_atoms * 4
+    return frames, xyz[:, :, 1:-1]
+
+
+def _setUnitcells(frames, unitcells):
+    """Set *unitcells* with shape (n_frames, 6) in *frames* returned by
+    :func:`_newFrames`, in the order and format they are stored in DCD
+    files."""
+
+    unitcells = np.array(unitcells, np.float64)
+    unitcells[:, 3:] = np.sin((PISQUARE/90) * (90-unitcells[:, 3:]))
+    unitcells = np.ascontiguousarray(unitcells[:, [0,3,1,4,5,2]])
+    frames.view(np.int32)[:, 1:13] = unitcells.view(np.int32)
+
+
 def parseDCD(filename, start=None, stop=None, step=None, astype=None):
     """Parse CHARMM format DCD files (also NAMD 2.1 and later).  Returns an
     :class:`Ensemble` instance. Conformations in the ensemble will be ordered
@@ -544,7 +644,6 @@ def writeDCD(filename, trajectory, start=None, stop=None, step=None,
         unitcell = trajectory.hasUnitcell()
         nfi = trajectory.nextIndex()
         trajectory.reset()
-        pack_i_48 = pack('i', 48)
         if isinstance(trajectory, Trajectory):
             timestep = trajectory.getTimestep()[0]
             first_ts = trajectory.getFirstTimestep()[0]
@@ -569,9 +668,15 @@ def writeDCD(filename, trajectory, start=None, stop=None, step=None,
         n_fixed = 0
 
     dcd = DCDFile(filename, mode='w')
+    dcd._writeHeader(n_atoms, unitcell, timestep=timestep,
+                     firsttimestep=first_ts, framefreq=framefreq)
+    frames, xyz = _newFrames(max(1, min(n_csets,
+                                        BLOCK_SIZE // (n_atoms * 12))),
+                             n_atoms, unitcell)
+    ucs = np.zeros((len(frames), 6)) if unitcell else None
     LOGGER.progress('Writing DCD', len(irange), '_prody_writeDCD')
     prev = -1
-    uc = None
+    k = 0
     time_ = time()
     for j, i in enumerate(irange):
         diff = i - prev
@@ -583,24 +688,29 @@ def writeDCD(filename, trajectory, start=None, stop=None, step=None,
             if frame is None:
                 break
             if unitcell:
-                uc = frame._getUnitcell()
-                uc[3:] = np.sin((PISQUARE/90) * (90-uc[3:]))
-                uc = uc[[0,3,1,4,5,2]]
+                ucs[k] = frame._getUnitcell()
         elif isEnsemble:
             frame._index = i
         else:
             frame.setACSIndex(i)
         if align:
             frame.superpose()
-        if j == 0:
-            dcd.write(frame._getCoords(), uc, timestep=timestep,
-                      firsttimestep=first_ts, framefreq=framefreq)
-        else:
-            dcd.write(frame._getCoords(), uc)
+        xyz[k] = frame._getCoords().T
+        k += 1
+        if k == len(frames):
+            if unitcell:
+                _setUnitcells(frames, ucs)
+            dcd._writeFrames(frames)
+            k = 0
         LOGGER.update(i, label='_prody_writeDCD')
+    else:
+        j += 1
+    if k:
+        if unitcell:
+            _setUnitcells(frames[:k], ucs[:k])
+        dcd._writeFrames(frames[:k])
     if isAtomic:
         trajectory.setACSIndex(acsi)
-    j += 1
     LOGGER.finish()
     dcd.close()
     time_ = time() - time_ or 0.01
@@ -2,12 +2,14 @@
 """This module defines a class for handling multiple trajectories."""
 
 import os.path
+from threading import Thread
 
 import numpy as np
 from numbers import Integral
 
 from .trajbase import TrajBase
 from .frame import Frame
+from .trrfile import TRRFile
 
 from prody.trajectory import openTrajFile
 
@@ -20,7 +22,13 @@ class Trajectory(TrajBase):
     def __init__(self, name, **kwargs):
         """Trajectory can be instantiated with a *name* or a filename. When
         name is a valid path to a trajectory file it will be opened for
-        reading."""
+        reading.
+
+        :arg readahead: number of frames that are read at a time when
+            frames are iterated over sequentially, next block of frames is
+            read in a background thread while the current one is analyzed,
+            default is 0 meaning frames are read one by one
+        :type readahead: int"""
 
         TrajBase.__init__(self, name)
         self._trajectory = None
@@ -28,6 +36,11 @@ class Trajectory(TrajBase):
         self._filenames = set()
         self._n_files = 0
         self._cfi = 0 # current file index
+        self._catalog = None # file and frame indices of frames
+        self._readahead = int(kwargs.pop('readahead', 0))
+        self._chunk = None # start, stop, coordinates and unit cells
+        self._pending = None # start, thread, and result of read-ahead
+        self._last = -1 # index of the last frame that was read
         assert 'mode' not in kwargs, 'mode is an invalid keyword argument'
         self._kwargs = kwargs
         if os.path.isfile(name):
@@ -73,6 +86,124 @@ class Trajectory(TrajBase):
             if self._trajectory.nextIndex() > 0:
                 self._trajectory.reset()
 
+    def _getCatalog(self):
+        """Returns file indices and frame indices within files for all
+        frames.  Catalog is built once after files are added, so that
+        frames can be located without walking over files."""
+
+        if self._catalog is None:
+            counts = [traj._n_csets for traj in self._trajectories]
+            files = np.repeat(np.arange(self._n_files), counts)
+            frames = np.arange(self._n_csets)
+            if self._n_files > 1:
+                frames -= np.repeat(np.cumsum(counts) - counts, counts)
+            self._catalog = files, frames
+        return self._catalog
+
+    def _readChunk(self, start):
+        """Returns a block of frames starting at *start*, which does not
+        span files, or **None** if the file does not support reading blocks
+        of frames."""
+
+        files, frames = self._getCatalog()
+        traj = self._trajectories[files[start]]
+        if not hasattr(traj, '_readFrames'):
+            return None
+        first = frames[start]
+        stop = min(first + self._readahead, traj._n_csets)
+        velocs = None
+        if isinstance(traj, TRRFile):
+            coords, unitcells, velocs = traj._readFrames(slice(first, stop),
+                                                         velocities=True)
+        else:
+            coords, unitcells = traj._readFrames(slice(first, stop))
+        return start, start + len(coords), coords, unitcells, velocs
+
+    def _startReadAhead(self, start):
+        """Start reading the block of frames at *start* in a background
+        thread."""
+
+        result = []
+
+        def read():
+            try:
+                result.append(self._readChunk(start))
+            except Exception as err:
+                result.append(err)
+
+        thread = Thread(target=read)
+        thread.daemon = True
+        thread.start()
+        self._pending = start, thread, result
+
+    def _joinReadAhead(self):
+        """Wait for the background thread and return the block of frames
+        that it read."""
+
+        start, thread, result = self._pending
+        self._pending = None
+        thread.join()
+        if isinstance(result[0], Exception):
+            raise result[0]
+        return result[0]
+
+    def _stopReadAhead(self):
+        """Wait for the background thread and discard the block of frames
+        that it read."""
+
+        if self._pending is not None:
+            self._pending[1].join()
+            self._pending = None
+
+    def _bufferedFrame(self, nfi):
+        """Returns a copy of coordinates, unit cell, and velocities of frame
+        *nfi* from blocks of frames that are read ahead, or **None** when read-ahead is
+        off or frames are not accessed sequentially.  Position of the file
+        that contains the frame is moved past the frame and coordinates of
+        linked atom group are set as if the frame was read from the file."""
+
+        if not self._readahead:
+            return None
+        last, self._last = self._last, nfi
+        chunk = self._chunk
+        if chunk is None or not chunk[0] <= nfi < chunk[1]:
+            if self._pending is not None and self._pending[0] == nfi:
+                chunk = self._joinReadAhead()
+            elif nfi == last + 1:
+                self._stopReadAhead()
+                chunk = self._readChunk(nfi)
+            else:
+                return None
+            self._chunk = chunk
+            if chunk is None:
+                return None
+        if chunk[1] < self._n_csets and (self._pending is None or
+                                         self._pending[0] != chunk[1]):
+            self._stopReadAhead()
+            self._startReadAhead(chunk[1])
+
+        files, frames = self._getCatalog()
+        which, first = int(files[nfi]), int(frames[nfi])
+        if which != self._cfi:
+            self._cfi = which
+            self._trajectory = self._trajectories[which]
+        traj = self._trajectory
+        traj.goto(first + 1)
+
+        i = nfi - chunk[0]
+        coords = chunk[2][i].copy()
+        unitcell = None
+        # frames without box vectors have zero unit cells
+        if chunk[3] is not None and chunk[3][i].any():
+            unitcell = chunk[3][i].copy()
+        velocs = None
+        if chunk[4] is not None and chunk[4][i] is not None:
+            velocs = chunk[4][i].copy()
+        if self._ag is not None:
+            self._ag._setCoords(coords, traj._title + ' frame ' + str(first),
+                                overwrite=True)
+        return coords, unitcell, velocs
+
     def setAtoms(self, atoms):
 
         for traj in self._trajectories:
@@ -93,8 +224,8 @@ class Trajectory(TrajBase):
     link.__doc__ = TrajBase.link.__doc__
 
     def addFile(self, filename, **kwargs):
-        """Add a file to the trajectory instance. Currently only DCD files
-        are supported."""
+        """Add a file to the trajectory instance. DCD, XTC, and TRR files
+        are supported, and files in different formats can be mixed."""
 
         if not isinstance(filename, str):
             raise ValueError('filename must be a string')
@@ -117,6 +248,7 @@ class Trajectory(TrajBase):
         self._trajectories.append(traj)
         self._n_csets += traj.numFrames()
         self._n_files += 1
+        self._catalog = None
         if self._ag is not None:
             traj.setAtoms(self._ag)
 
@@ -154,19 +286,21 @@ class Trajectory(TrajBase):
             raise TypeError('indices must be an integer or a list of '
                             'integers')
 
-        nfi = self._nfi
-        self.reset()
         coords = np.zeros((len(indices), self.numSelected(), 3),
                           self._trajectories[0]._dtype)
-        prev = -1
-        next = self.nextCoordset
-        for i, index in enumerate(indices):
-            diff = index - prev
-            if diff > 1:
-                self.skip(diff - 1)
-            coords[i] = next()
-            prev = index
-        self.goto(nfi)
+        files, frames = self._getCatalog()
+        files, frames = files[indices], frames[indices]
+        bounds = np.unique(np.concatenate(
+            [[0], np.flatnonzero(np.diff(files)) + 1, [len(indices)]]))
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            traj = self._trajectories[files[start]]
+            if hasattr(traj, '_readFrames'):
+                xyz = traj._readFrames(frames[start:stop])[0]
+                if self._indices is not None:
+                    xyz = xyz[:, self._indices]
+                coords[start:stop] = xyz
+            else:
+                coords[start:stop] = traj.getCoordsets(frames[start:stop])
         return coords
 
     getCoordsets.__doc__ = TrajBase.getCoordsets.__doc__
@@ -177,17 +311,25 @@ class Trajectory(TrajBase):
             raise ValueError('I/O operation on closed file')
         nfi = self._nfi
         if nfi < self._n_csets:
-            traj = self._trajectory
-            while traj._nfi == traj._n_csets:
-                self._nextFile()
+            buffered = self._bufferedFrame(nfi)
+            if buffered is None:
                 traj = self._trajectory
-            unitcell = traj._nextUnitcell()
-            coords = traj._nextCoordset()
+                while traj._nfi == traj._n_csets:
+                    self._nextFile()
+                    traj = self._trajectory
+                if isinstance(traj, TRRFile):
+                    coords, unitcell, velocs = traj._nextFrame()
+                else:
+                    velocs = None
+                    unitcell = traj._nextUnitcell()
+                    coords = traj._nextCoordset()
+            else:
+                coords, unitcell, velocs = buffered
 
             if self._ag is None:
-                frame = Frame(self, nfi, coords, unitcell)
+                frame = Frame(self, nfi, coords, unitcell, velocs)
             else:
-                frame = Frame(self, nfi, None, unitcell)
+                frame = Frame(self, nfi, None, unitcell, velocs)
                 self._ag.setACSLabel(self._title + ' frame ' + str(self._nfi))
             self._nfi += 1
             return frame
@@ -200,6 +342,12 @@ class Trajectory(TrajBase):
         if self._closed:
             raise ValueError('I/O operation on closed file')
         if self._nfi < self._n_csets:
+            buffered = self._bufferedFrame(self._nfi)
+            if buffered is not None:
+                self._nfi += 1
+                if self._indices is None:
+                    return buffered[0]
+                return buffered[0][self._indices]
             traj = self._trajectory
             while traj._nfi == traj._n_csets:
                 self._nextFile()
@@ -231,12 +379,12 @@ class Trajectory(TrajBase):
                 n = 0
             elif n > n_csets:
                 n = n_csets
-            nfi = n
-            for which, traj in enumerate(self._trajectories):
-                if traj._n_csets >= nfi:
-                    break
-                else:
-                    nfi -= traj._n_csets
+            if n < n_csets:
+                files, frames = self._getCatalog()
+                which, nfi = int(files[n]), int(frames[n])
+            else:
+                which = self._n_files - 1
+                nfi = self._trajectories[which]._n_csets
             self._gotoFile(which)
             self._trajectory.goto(nfi)
             self._nfi = n
@@ -278,6 +426,8 @@ class Trajectory(TrajBase):
 
     def close(self):
 
+        self._stopReadAhead()
+        self._chunk = None
         for traj in self._trajectories:
             traj.close()
         self._closed = True
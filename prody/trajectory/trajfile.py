@@ -18,7 +18,9 @@ class TrajFile(TrajBase):
 
     """A base class for trajectory file classes:
 
-      * :class:`.DCDFile`"""
+      * :class:`.DCDFile`
+      * :class:`.XTCFile`
+      * :class:`.TRRFile`"""
 
 
     def __init__(self, filename, mode='r'):
@@ -52,6 +54,9 @@ class TrajFile(TrajBase):
         self._mode = mode
         self._bytes_per_frame = None
         self._first_byte = None
+        # byte offsets of frames and of the end of last frame, for files
+        # with frames of variable size
+        self._offsets = None
         self._dtype = np.float32
 
         self._timestep = 1
@@ -140,7 +145,7 @@ class TrajFile(TrajBase):
         n_atoms = self.numSelected()
         coords = np.zeros((len(indices), n_atoms, 3), self._dtype)
 
-        prev = 0
+        prev = -1
         next = self.nextCoordset
         for i, index in enumerate(indices):
             diff = index - prev
@@ -170,7 +175,10 @@ class TrajFile(TrajBase):
             left = self._n_csets - self._nfi
             if n > left:
                 n = left
-            self._file.seek(n * self._bytes_per_frame, 1)
+            if self._offsets is None:
+                self._file.seek(n * self._bytes_per_frame, 1)
+            else:
+                self._file.seek(self._offsets[self._nfi + n])
             self._nfi += n
 
     skip.__doc__ = TrajBase.skip.__doc__
@@ -191,7 +199,10 @@ class TrajFile(TrajBase):
                 n = 0
             elif n > n_csets:
                 n = n_csets
-            self._file.seek(self._first_byte + n * self._bytes_per_frame)
+            if self._offsets is None:
+                self._file.seek(self._first_byte + n * self._bytes_per_frame)
+            else:
+                self._file.seek(self._offsets[n])
             self._nfi = n
 
     goto.__doc__ = TrajBase.goto.__doc__
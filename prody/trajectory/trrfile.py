@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""This module defines classes for handling trajectory files in `TRR format`_
+written by GROMACS.
+
+.. _TRR format: https://manual.gromacs.org/current/reference-manual/file-formats.html#trr"""
+
+from time import time
+from struct import calcsize, unpack
+from os.path import getsize
+
+import numpy as np
+
+from prody import LOGGER
+
+from .frame import Frame
+from .trajbase import TrajBase
+from .trajfile import TrajFile
+from .xtcfile import _parseBox
+
+__all__ = ['TRRFile', 'parseTRR']
+
+TRR_MAGIC = 1993
+TRR_SIZES = '>13i'
+TRR_SIZES_SIZE = calcsize(TRR_SIZES)
+
+
+class TRRFile(TrajFile):
+
+    """A class for reading TRR files written by GROMACS, which store full
+    precision coordinates, velocities, and forces.  Coordinates and
+    velocities are converted from nanometers to angstroms, and box vectors
+    to unit cell dimensions and angles.  Velocities are available from
+    frames, e.g. using :meth:`.Frame.getVelocities`.  Byte offsets of frames
+    are indexed at instantiation, so that frames can be accessed randomly.
+    Frames that do not contain coordinates, e.g. those written only for
+    velocities or forces, are skipped.
+    Coordinates from the first frame is set as the reference coordinate set.
+    Coordinates of single or double precision files are returned as 32-bit
+    or 64-bit floating-point arrays, which can be casted to a specified type
+    using *astype* keyword argument, as in :class:`.DCDFile`.  TRR files can
+    only be opened for reading."""
+
+    def __init__(self, filename, mode='r', **kwargs):
+
+        if not mode.startswith('r') or '+' in mode:
+            raise ValueError('TRR files can only be opened for reading')
+        TrajFile.__init__(self, filename, 'r')
+        self._astype = kwargs.get('astype', None)
+        self._parseHeader()
+
+    __init__.__doc__ = TrajFile.__init__.__doc__
+
+    def _parseHeader(self):
+        """Read headers of all frames to index byte offsets of those with
+        coordinates, and set number of atoms, timestep information, and
+        reference coordinates."""
+
+        trr = self._file
+        size = getsize(self._filename)
+        offsets = [0]
+        headers = []
+        while offsets[-1] < size:
+            trr.seek(offsets[-1])
+            try:
+                header = _readHeader(trr)
+            except (IOError, ValueError) as err:
+                if headers:
+                    break
+                raise IOError('{0} is not a valid TRR file: {1}'
+                              .format(self._filename, err))
+            if headers and header['natoms'] != headers[0]['natoms']:
+                raise IOError('frame {0} of {1} has a different number of '
+                              'atoms'.format(len(headers), self._filename))
+            if offsets[-1] + header['size'] > size:
+                break
+            offsets.append(offsets[-1] + header['size'])
+            headers.append(header)
+
+        if offsets[-1] != size:
+            LOGGER.warning('TRR file {0} is truncated, {1} complete frames '
+                           'were found.'.format(self._filename, len(headers)))
+        if not headers:
+            raise IOError('{0} does not contain any frames'
+                          .format(self._filename))
+
+        # frames without coordinates are not indexed, and the offset past
+        # the last complete frame is kept to mark the end of the file
+        which = [i for i, header in enumerate(headers) if header['x_size']]
+        if not which:
+            raise IOError('{0} does not contain any frames with coordinates'
+                          .format(self._filename))
+        if len(which) < len(headers):
+            LOGGER.info('{0} frames of TRR file {1} do not contain '
+                        'coordinates and are skipped.'
+                        .format(len(headers) - len(which), self._filename))
+        offsets = [offsets[i] for i in which] + [offsets[-1]]
+        headers = [headers[i] for i in which]
+
+        first = headers[0]
+        self._offsets = np.array(offsets)
+        self._first_byte = offsets[0]
+        self._n_csets = len(headers)
+        self._n_atoms = first['natoms']
+        self._dtype = first['dtype']
+        self._first_ts = first['step']
+        self._unitcell = bool(first['box_size'])
+        if len(headers) > 1:
+            self._framefreq = headers[1]['step'] - first['step']
+            if self._framefreq:
+                self._timestep = ((headers[1]['t'] - first['t']) /
+                                  self._framefreq)
+
+        trr.seek(self._first_byte)
+        self._coords = self.nextCoordset()
+        self.reset()
+
+    def hasUnitcell(self):
+
+        return self._unitcell
+
+    hasUnitcell.__doc__ = TrajBase.hasUnitcell.__doc__
+
+    def __next__(self):
+
+        if self._closed:
+            raise ValueError('I/O operation on closed file')
+        nfi = self._nfi
+        if nfi < self._n_csets:
+            coords, unitcell, velocs = self._nextFrame()
+            if self._ag is None:
+                frame = Frame(self, nfi, coords, unitcell, velocs)
+            else:
+                frame = self._frame
+                Frame.__init__(frame, self, nfi, None, unitcell, velocs)
+            return frame
+
+    __next__.__doc__ = TrajBase.__next__.__doc__
+    next = __next__
+
+    def nextCoordset(self):
+
+        if self._closed:
+            raise ValueError('I/O operation on closed file')
+        if self._nfi < self._n_csets:
+            if self._indices is None:
+                return self._nextCoordset()
+            else:
+                return self._nextCoordset()[self._indices]
+
+    nextCoordset.__doc__ = TrajBase.nextCoordset.__doc__
+
+    def _nextCoordset(self):
+
+        return self._nextFrame()[0]
+
+    def _nextFrame(self):
+        """Returns coordinates, unit cell, and velocities of the next
+        frame."""
+
+        trr = self._file
+        trr.seek(self._offsets[self._nfi])
+        data = _readFrame(trr)
+        coords = data['x']
+        if self._ag is not None:
+            self._ag._setCoords(coords, self._title + ' frame ' + str(self._nfi),
+                                overwrite=True)
+        self._nfi += 1
+        if self._astype is not None and self._astype != coords.dtype:
+            coords = coords.astype(self._astype)
+        unitcell = None
+        if data['box'] is not None:
+            unitcell = _parseBox(data['box'])
+        return coords, unitcell, data['v']
+
+    def _nextUnitcell(self):
+
+        if self._unitcell:
+            trr = self._file
+            trr.seek(self._offsets[self._nfi])
+            header = _readHeader(trr)
+            box = None
+            if header['box_size']:
+                box = np.frombuffer(trr.read(header['box_size']),
+                                    header['xdr'])
+            trr.seek(self._offsets[self._nfi])
+            if box is not None:
+                return _parseBox(box)
+
+    def _readFrames(self, indices, velocities=False):
+        """Returns coordinates of all atoms and unit cells, or **None** if
+        file has no unit cell data, for frames at *indices*, which may be a
+        slice or an array of integers.  Unit cells of frames without box
+        vectors are left as zeros.  If *velocities* is **True**, a list of
+        velocities, or **None** for frames without velocities, is returned
+        too.  Frames are read using another file object, so file position
+        is not changed and frames can be read from another thread."""
+
+        offsets = self._offsets[:-1][indices]
+        coords = np.empty((len(offsets), self._n_atoms, 3), self._dtype)
+        unitcells = np.zeros((len(offsets), 6)) if self._unitcell else None
+        velocs = []
+        with open(self._filename, 'rb') as trr:
+            for i, offset in enumerate(offsets):
+                trr.seek(offset)
+                data = _readFrame(trr)
+                coords[i] = data['x']
+                if unitcells is not None and data['box'] is not None:
+                    unitcells[i] = _parseBox(data['box'])
+                velocs.append(data['v'])
+        if self._astype is not None and self._astype != coords.dtype:
+            coords = coords.astype(self._astype)
+        if velocities:
+            return coords, unitcells, velocs
+        return coords, unitcells
+
+
+def _readHeader(trr):
+    """Returns a dictionary with header of the frame at the current position
+    of file *trr*.  Sizes of data blocks, *natoms*, *step*, time *t*, XDR
+    data type of real numbers *xdr*, native data type *dtype*, and total
+    frame *size* in bytes are included."""
+
+    data = trr.read(8)
+    if len(data) < 8:
+        raise IOError('unexpected end of file')
+    magic, slen = unpack('>ii', data)
+    if magic != TRR_MAGIC:
+        raise ValueError('unrecognized magic number {0}'.format(magic))
+    n_chars = unpack('>i', trr.read(4))[0]
+    trr.read(n_chars + -n_chars % 4)
+    data = trr.read(TRR_SIZES_SIZE)
+    if len(data) < TRR_SIZES_SIZE:
+        raise IOError('unexpected end of file')
+    keys = ('ir_size', 'e_size', 'box_size', 'vir_size', 'pres_size',
+            'top_size', 'sym_size', 'x_size', 'v_size', 'f_size', 'natoms',
+            'step', 'nre')
+    header = dict(zip(keys, unpack(TRR_SIZES, data)))
+
+    natoms = header['natoms']
+    if header['box_size']:
+        real = header['box_size'] // 9
+    elif natoms and header['x_size']:
+        real = header['x_size'] // (natoms * 3)
+    elif natoms and header['v_size']:
+        real = header['v_size'] // (natoms * 3)
+    elif natoms and header['f_size']:
+        real = header['f_size'] // (natoms * 3)
+    else:
+        raise ValueError('size of real numbers could not be determined')
+    if real not in (4, 8):
+        raise ValueError('size of real numbers must be 4 or 8')
+    header['xdr'] = '>f{0}'.format(real)
+    header['dtype'] = np.float32 if real == 4 else np.float64
+    header['t'] = unpack('>' + 'fd'[real == 8], trr.read(real))[0]
+    trr.read(real) # lambda
+
+    header['size'] = (12 + n_chars + -n_chars % 4 + TRR_SIZES_SIZE +
+                      2 * real + header['box_size'] + header['vir_size'] +
+                      header['pres_size'] + header['x_size'] +
+                      header['v_size'] + header['f_size'])
+    return header
+
+
+def _readFrame(trr):
+    """Returns a dictionary with *box* vectors in nanometers, and
+    coordinates *x* and velocities *v* in angstroms read from the frame at
+    the current position of file *trr*.  Missing data blocks are **None**."""
+
+    header = _readHeader(trr)
+    xdr, dtype = header['xdr'], header['dtype']
+    data = {}
+    for key in ('box', 'vir', 'pres', 'x', 'v', 'f'):
+        n_bytes = header[key + '_size']
+        if key in ('vir', 'pres', 'f'):
+            trr.seek(n_bytes, 1)
+        elif n_bytes:
+            array = np.frombuffer(trr.read(n_bytes), xdr).astype(dtype)
+            if key != 'box':
+                array = array.reshape((header['natoms'], 3))
+                array *= 10
+            data[key] = array
+        else:
+            data[key] = None
+    return data
+
+
+def parseTRR(filename, start=None, stop=None, step=None, astype=None):
+    """Parse TRR files written by GROMACS.  Returns an :class:`Ensemble`
+    instance.  Conformations in the ensemble will be ordered as they appear
+    in the trajectory file.  Use :class:`TRRFile` class for parsing
+    coordinates of a subset of atoms.
+
+    :arg filename: TRR filename
+    :type filename: str
+
+    :arg start: index of first frame to read
+    :type start: int
+
+    :arg stop: index of the frame that stops reading
+    :type stop: int
+
+    :arg step: steps between reading frames, default is 1 meaning every frame
+    :type step: int
+
+    :arg astype: cast coordinate array to specified type
+    :type astype: type"""
+
+    trr = TRRFile(filename, astype=astype)
+    time_ = time()
+    n_frames = trr.numFrames()
+    LOGGER.info('TRR file contains {0} coordinate sets for {1} atoms.'
+                .format(n_frames, trr.numAtoms()))
+    ensemble = trr[slice(start, stop, step)]
+    trr.close()
+    time_ = time() - time_ or 0.01
+    LOGGER.info('TRR file was parsed in {0:.2f} seconds.'.format(time_))
+    LOGGER.info('{0} coordinate sets parsed at input rate {1} frame/s.'
+                .format(n_frames, int(n_frames/time_)))
+    return ensemble
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""This module defines classes for handling trajectory files in `XTC format`_
+written by GROMACS.
+
+.. _XTC format: https://manual.gromacs.org/current/reference-manual/file-formats.html#xtc"""
+
+from time import time
+from struct import calcsize, unpack
+from os.path import getsize
+
+import numpy as np
+
+from prody import LOGGER
+
+from .frame import Frame
+from .trajbase import TrajBase
+from .trajfile import TrajFile
+
+__all__ = ['XTCFile', 'parseXTC']
+
+XTC_MAGIC = 1995
+XTC_MAGIC_LARGE = 2023 # GROMACS 2023 and later, 64-bit byte counts
+XTC_HEADER = '>iiif9fi'
+XTC_HEADER_SIZE = calcsize(XTC_HEADER)
+XTC_COMPRESSED = {XTC_MAGIC: '>f7ii', XTC_MAGIC_LARGE: '>f7iq'}
+
+
+class XTCFile(TrajFile):
+
+    """A class for reading XTC files written by GROMACS.  Coordinates are
+    stored in XTC files as integers with reduced precision and compressed,
+    and they are decompressed using a C extension.  Coordinates are converted
+    from nanometers to angstroms, and box vectors to unit cell dimensions and
+    angles.  Byte offsets of frames are indexed at instantiation, so that
+    frames can be accessed randomly.  Coordinates from the first frame is set
+    as the reference coordinate set.  32-bit floating-point coordinate array
+    can be casted to a specified type using *astype* keyword argument, as in
+    :class:`.DCDFile`.  XTC files can only be opened for reading."""
+
+    def __init__(self, filename, mode='r', **kwargs):
+
+        if not mode.startswith('r') or '+' in mode:
+            raise ValueError('XTC files can only be opened for reading')
+        TrajFile.__init__(self, filename, 'r')
+        self._astype = kwargs.get('astype', None)
+        self._parseHeader()
+
+    __init__.__doc__ = TrajFile.__init__.__doc__
+
+    def _parseHeader(self):
+        """Read headers of all frames to index their byte offsets, and set
+        number of atoms, timestep information, and reference coordinates."""
+
+        xtc = self._file
+        size = getsize(self._filename)
+        offsets = [0]
+        headers = []
+        while offsets[-1] + XTC_HEADER_SIZE <= size:
+            xtc.seek(offsets[-1])
+            header = unpack(XTC_HEADER, xtc.read(XTC_HEADER_SIZE))
+            magic, n_atoms = header[:2]
+            if magic not in XTC_COMPRESSED:
+                raise IOError('{0} is not a valid XTC file, frame {1} has an '
+                              'unrecognized magic number'
+                              .format(self._filename, len(headers)))
+            if headers and n_atoms != headers[0][1]:
+                raise IOError('frame {0} of {1} has a different number of '
+                              'atoms'.format(len(headers), self._filename))
+            if n_atoms <= 9:
+                n_bytes = XTC_HEADER_SIZE + n_atoms * 12
+            else:
+                fmt = XTC_COMPRESSED[magic]
+                data = xtc.read(calcsize(fmt))
+                if len(data) < calcsize(fmt):
+                    break
+                n_bytes = unpack(fmt, data)[-1]
+                n_bytes = (XTC_HEADER_SIZE + calcsize(fmt) +
+                           n_bytes + -n_bytes % 4)
+            if offsets[-1] + n_bytes > size:
+                break
+            offsets.append(offsets[-1] + n_bytes)
+            headers.append(header)
+
+        if offsets[-1] != size:
+            LOGGER.warning('XTC file {0} is truncated, {1} complete frames '
+                           'were found.'.format(self._filename, len(headers)))
+        if not headers:
+            raise IOError('{0} does not contain any frames'
+                          .format(self._filename))
+
+        self._offsets = np.array(offsets)
+        self._first_byte = 0
+        self._n_csets = len(headers)
+        self._n_atoms = headers[0][1]
+        self._first_ts = headers[0][2]
+        self._unitcell = any(headers[0][4:13])
+        if len(headers) > 1:
+            self._framefreq = headers[1][2] - headers[0][2]
+            if self._framefreq:
+                self._timestep = ((headers[1][3] - headers[0][3]) /
+                                  self._framefreq)
+
+        xtc.seek(0)
+        self._coords = self.nextCoordset()
+        self.reset()
+
+    def hasUnitcell(self):
+
+        return self._unitcell
+
+    hasUnitcell.__doc__ = TrajBase.hasUnitcell.__doc__
+
+    def __next__(self):
+
+        if self._closed:
+            raise ValueError('I/O operation on closed file')
+        nfi = self._nfi
+        if nfi < self._n_csets:
+            coords, unitcell = self._nextFrame()
+            if self._ag is None:
+                frame = Frame(self, nfi, coords, unitcell)
+            else:
+                frame = self._frame
+                Frame.__init__(frame, self, nfi, None, unitcell)
+            return frame
+
+    __next__.__doc__ = TrajBase.__next__.__doc__
+    next = __next__
+
+    def nextCoordset(self):
+
+        if self._closed:
+            raise ValueError('I/O operation on closed file')
+        if self._nfi < self._n_csets:
+            if self._indices is None:
+                return self._nextCoordset()
+            else:
+                return self._nextCoordset()[self._indices]
+
+    nextCoordset.__doc__ = TrajBase.nextCoordset.__doc__
+
+    def _nextCoordset(self):
+
+        return self._nextFrame()[0]
+
+    def _nextFrame(self):
+        """Returns coordinates and unit cell of the next frame."""
+
+        coords, box = _readFrame(self._file)
+        if self._ag is not None:
+            self._ag._setCoords(coords, self._title + ' frame ' + str(self._nfi),
+                                overwrite=True)
+        self._nfi += 1
+        if self._astype is not None and self._astype != coords.dtype:
+            coords = coords.astype(self._astype)
+        return coords, _parseBox(box) if self._unitcell else None
+
+    def _nextUnitcell(self):
+
+        if self._unitcell:
+            xtc = self._file
+            xtc.seek(self._offsets[self._nfi] + 16)
+            box = np.frombuffer(xtc.read(36), '>f4')
+            xtc.seek(self._offsets[self._nfi])
+            return _parseBox(box)
+
+    def _readFrames(self, indices):
+        """Returns coordinates of all atoms and unit cells, or **None** if
+        file has no unit cell data, for frames at *indices*, which may be a
+        slice or an array of integers.  Frames are read using another file
+        object, so file position is not changed and frames can be read from
+        another thread."""
+
+        offsets = self._offsets[:-1][indices]
+        coords = np.empty((len(offsets), self._n_atoms, 3), np.float32)
+        unitcells = np.zeros((len(offsets), 6)) if self._unitcell else None
+        with open(self._filename, 'rb') as xtc:
+            for i, offset in enumerate(offsets):
+                xtc.seek(offset)
+                box = _readFrame(xtc, coords[i])[1]
+                if unitcells is not None:
+                    unitcells[i] = _parseBox(box)
+        if self._astype is not None and self._astype != coords.dtype:
+            coords = coords.astype(self._astype)
+        return coords, unitcells
+
+
+def _readFrame(xtc, coords=None):
+    """Returns coordinates in angstroms and box vectors in nanometers read
+    from the frame at the current position of file *xtc*.  Coordinates are
+    decompressed into *coords*, a contiguous float32 array, when it is
+    given."""
+
+    from .xtctools import decompressXTC
+
+    header = xtc.read(XTC_HEADER_SIZE)
+    magic, n_atoms = unpack('>ii', header[:8])
+    box = np.frombuffer(header, '>f4', 9, 16).reshape((3, 3))
+    if coords is None:
+        coords = np.empty((n_atoms, 3), np.float32)
+    if n_atoms <= 9:
+        coords[:] = np.frombuffer(xtc.read(n_atoms * 12),
+                                  '>f4').reshape((n_atoms, 3))
+    else:
+        fmt = XTC_COMPRESSED[magic]
+        values = unpack(fmt, xtc.read(calcsize(fmt)))
+        n_bytes = values[-1]
+        data = xtc.read(n_bytes + -n_bytes % 4)
+        decompressXTC(data, coords, values[1:4], values[4:7], values[7],
+                      values[0])
+    coords *= 10
+    return coords, box
+
+
+def _parseBox(box):
+    """Returns unit cell dimensions in angstroms and angles in degrees for
+    *box* vectors in nanometers, which are rows of a 3x3 array."""
+
+    box = np.asarray(box, np.float64).reshape((3, 3)) * 10
+    lengths = np.sqrt((box ** 2).sum(1))
+    angles = np.zeros(3) + 90.
+    for i, (j, k) in enumerate([(1, 2), (0, 2), (0, 1)]):
+        if lengths[j] and lengths[k]:
+            cosine = np.dot(box[j], box[k]) / (lengths[j] * lengths[k])
+            angles[i] = np.degrees(np.arccos(np.clip(cosine, -1, 1)))
+    return np.concatenate([lengths, angles])
+
+
+def parseXTC(filename, start=None, stop=None, step=None, astype=None):
+    """Parse XTC files written by GROMACS.  Returns an :class:`Ensemble`
+    instance.  Conformations in the ensemble will be ordered as they appear
+    in the trajectory file.  Use :class:`XTCFile` class for parsing
+    coordinates of a subset of atoms.
+
+    :arg filename: XTC filename
+    :type filename: str
+
+    :arg start: index of first frame to read
+    :type start: int
+
+    :arg stop: index of the frame that stops reading
+    :type stop: int
+
+    :arg step: steps between reading frames, default is 1 meaning every frame
+    :type step: int
+
+    :arg astype: cast coordinate array to specified type
+    :type astype: type"""
+
+    xtc = XTCFile(filename, astype=astype)
+    time_ = time()
+    n_frames = xtc.numFrames()
+    LOGGER.info('XTC file contains {0} coordinate sets for {1} atoms.'
+                .format(n_frames, xtc.numAtoms()))
+    ensemble = xtc[slice(start, stop, step)]
+    xtc.close()
+    time_ = time() - time_ or 0.01
+    LOGGER.info('XTC file was parsed in {0:.2f} seconds.'.format(time_))
+    LOGGER.info('{0} coordinate sets parsed at input rate {1} frame/s.'
+                .format(n_frames, int(n_frames/time_)))
+    return ensemble
@@ -0,0 +1,330 @@
+#include "Python.h"
+#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION
+#include "numpy/arrayobject.h"
+
+/* Decompression of coordinates in XTC files written by GROMACS, which are
+   stored as integers packed with a variable number of bits.  Algorithm and
+   the table of magic integers follow xdrfile library, which is distributed
+   with GROMACS under BSD license. */
+
+static const int magicints[] = {
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    8, 10, 12, 16, 20, 25, 32, 40, 50, 64,
+    80, 101, 128, 161, 203, 256, 322, 406, 512, 645,
+    812, 1024, 1290, 1625, 2048, 2580, 3250, 4096, 5060, 6501,
+    8192, 10321, 13003, 16384, 20642, 26007, 32768, 41285, 52015, 65536,
+    82570, 104031, 131072, 165140, 208063, 262144, 330280, 416127, 524287,
+    660561, 832255, 1048576, 1321122, 1664510, 2097152, 2642245, 3329021,
+    4194304, 5284491, 6658042, 8388607, 10568983, 13316085, 16777216};
+
+#define FIRSTIDX 9
+#define LASTIDX ((int) (sizeof(magicints) / sizeof(*magicints)))
+
+
+typedef struct {
+  const unsigned char *data;
+  Py_ssize_t size;
+  Py_ssize_t count;
+  unsigned int lastbits;
+  unsigned int lastbyte;
+  int overflow;
+} BitReader;
+
+
+static int sizeofint(unsigned int size)
+{
+  /* Returns number of bits needed to store integers up to size. */
+  unsigned int num = 1;
+  int nbits = 0;
+
+  while (size >= num && nbits < 32) {
+    nbits++;
+    num <<= 1;
+  }
+  return nbits;
+}
+
+
+static int sizeofints(int nints, const unsigned int *sizes)
+{
+  /* Returns number of bits needed to store nints integers with given
+     sizes as a single large integer. */
+  int i, nbits = 0;
+  unsigned int nbytes = 1, bytecnt, tmp, num = 1;
+  unsigned int bytes[32];
+
+  bytes[0] = 1;
+  for (i = 0; i < nints; i++) {
+    tmp = 0;
+    for (bytecnt = 0; bytecnt < nbytes; bytecnt++) {
+      tmp = bytes[bytecnt] * sizes[i] + tmp;
+      bytes[bytecnt] = tmp & 0xff;
+      tmp >>= 8;
+    }
+    while (tmp != 0) {
+      bytes[bytecnt++] = tmp & 0xff;
+      tmp >>= 8;
+    }
+    nbytes = bytecnt;
+  }
+  nbytes--;
+  while (bytes[nbytes] >= num) {
+    nbits++;
+    num *= 2;
+  }
+  return nbits + nbytes * 8;
+}
+
+
+static int nextByte(BitReader *reader)
+{
+  if (reader->count >= reader->size) {
+    reader->overflow = 1;
+    return 0;
+  }
+  return reader->data[reader->count++];
+}
+
+
+static int receivebits(BitReader *reader, int nbits)
+{
+  /* Returns next nbits bits as an integer. */
+  unsigned int lastbits = reader->lastbits, lastbyte = reader->lastbyte;
+  unsigned int mask = nbits < 32 ? (1u << nbits) - 1 : 0xffffffffu;
+  unsigned int num = 0;
+
+  while (nbits >= 8) {
+    lastbyte = (lastbyte << 8) | nextByte(reader);
+    num |= (lastbyte >> lastbits) << (nbits - 8);
+    nbits -= 8;
+  }
+  if (nbits > 0) {
+    if ((int) lastbits < nbits) {
+      lastbits += 8;
+      lastbyte = (lastbyte << 8) | nextByte(reader);
+    }
+    lastbits -= nbits;
+    num |= (lastbyte >> lastbits) & ((1u << nbits) - 1);
+  }
+  reader->lastbits = lastbits;
+  reader->lastbyte = lastbyte;
+  return (int) (num & mask);
+}
+
+
+static void receiveints(BitReader *reader, int nbits,
+                        const unsigned int *sizes, int *nums)
+{
+  /* Unpacks three integers with given sizes stored in nbits bits. */
+  int bytes[32];
+  int i, j, nbytes = 0;
+  unsigned int num, p;
+
+  bytes[1] = bytes[2] = bytes[3] = 0;
+  while (nbits > 8) {
+    bytes[nbytes++] = receivebits(reader, 8);
+    nbits -= 8;
+  }
+  if (nbits > 0)
+    bytes[nbytes++] = receivebits(reader, nbits);
+
+  for (i = 2; i > 0; i--) {
+    num = 0;
+    for (j = nbytes - 1; j >= 0; j--) {
+      num = (num << 8) | bytes[j];
+      p = num / sizes[i];
+      bytes[j] = (int) p;
+      num = num - p * sizes[i];
+    }
+    nums[i] = (int) num;
+  }
+  nums[0] = bytes[0] | (bytes[1] << 8) | (bytes[2] << 16) | (bytes[3] << 24);
+}
+
+
+static int decompress(BitReader *reader, float *xyz, int natoms,
+                      const int *minint, const int *maxint, int smallidx,
+                      float precision)
+{
+  /* Decompresses coordinates of natoms atoms into xyz.  Returns 0 on
+     success, and -1 if data is corrupt. */
+  unsigned int sizeint[3], sizesmall[3];
+  int bitsizeint[3] = {0, 0, 0};
+  int thiscoord[3], prevcoord[3];
+  int bitsize, smaller, smallnum, is_smaller, run = 0, flag, tmp, i = 0, k;
+  float inv_precision = 1.0 / precision;
+  float *end = xyz + 3 * (npy_intp) natoms;
+
+  for (k = 0; k < 3; k++)
+    sizeint[k] = (unsigned int) (maxint[k] - minint[k]) + 1;
+
+  /* check if one of the sizes is too big to be multiplied */
+  if ((sizeint[0] | sizeint[1] | sizeint[2]) > 0xffffff) {
+    for (k = 0; k < 3; k++)
+      bitsizeint[k] = sizeofint(sizeint[k]);
+    bitsize = 0;
+  } else
+    bitsize = sizeofints(3, sizeint);
+
+  if (smallidx < FIRSTIDX || smallidx >= LASTIDX)
+    return -1;
+  smaller = magicints[FIRSTIDX > smallidx - 1 ? FIRSTIDX : smallidx - 1] / 2;
+  smallnum = magicints[smallidx] / 2;
+  sizesmall[0] = sizesmall[1] = sizesmall[2] = magicints[smallidx];
+
+  while (i < natoms) {
+    if (bitsize == 0) {
+      for (k = 0; k < 3; k++)
+        thiscoord[k] = receivebits(reader, bitsizeint[k]);
+    } else
+      receiveints(reader, bitsize, sizeint, thiscoord);
+
+    i++;
+    for (k = 0; k < 3; k++) {
+      thiscoord[k] += minint[k];
+      prevcoord[k] = thiscoord[k];
+    }
+
+    flag = receivebits(reader, 1);
+    is_smaller = 0;
+    if (flag == 1) {
+      run = receivebits(reader, 5);
+      is_smaller = run % 3;
+      run -= is_smaller;
+      is_smaller--;
+    }
+    if (run > 0) {
+      if (xyz + run + 3 > end)
+        return -1;
+      for (k = 0; k < run; k += 3) {
+        receiveints(reader, smallidx, sizesmall, thiscoord);
+        i++;
+        thiscoord[0] += prevcoord[0] - smallnum;
+        thiscoord[1] += prevcoord[1] - smallnum;
+        thiscoord[2] += prevcoord[2] - smallnum;
+        if (k == 0) {
+          /* interchange first with second atom for better compression of
+             water molecules */
+          tmp = thiscoord[0]; thiscoord[0] = prevcoord[0]; prevcoord[0] = tmp;
+          tmp = thiscoord[1]; thiscoord[1] = prevcoord[1]; prevcoord[1] = tmp;
+          tmp = thiscoord[2]; thiscoord[2] = prevcoord[2]; prevcoord[2] = tmp;
+          *xyz++ = prevcoord[0] * inv_precision;
+          *xyz++ = prevcoord[1] * inv_precision;
+          *xyz++ = prevcoord[2] * inv_precision;
+        } else {
+          prevcoord[0] = thiscoord[0];
+          prevcoord[1] = thiscoord[1];
+          prevcoord[2] = thiscoord[2];
+        }
+        *xyz++ = thiscoord[0] * inv_precision;
+        *xyz++ = thiscoord[1] * inv_precision;
+        *xyz++ = thiscoord[2] * inv_precision;
+      }
+    } else {
+      if (xyz + 3 > end)
+        return -1;
+      *xyz++ = thiscoord[0] * inv_precision;
+      *xyz++ = thiscoord[1] * inv_precision;
+      *xyz++ = thiscoord[2] * inv_precision;
+    }
+
+    smallidx += is_smaller;
+    if (smallidx < FIRSTIDX || smallidx >= LASTIDX)
+      return -1;
+    if (is_smaller < 0) {
+      smallnum = smaller;
+      if (smallidx > FIRSTIDX)
+        smaller = magicints[smallidx - 1] / 2;
+      else
+        smaller = 0;
+    } else if (is_smaller > 0) {
+      smaller = smallnum;
+      smallnum = magicints[smallidx] / 2;
+    }
+    sizesmall[0] = sizesmall[1] = sizesmall[2] = magicints[smallidx];
+
+    if (reader->overflow)
+      return -1;
+  }
+  return xyz == end ? 0 : -1;
+}
+
+
+static PyObject *decompressXTC(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+  /* Decompresses coordinates packed in data into coords, a contiguous
+     float32 array with shape (n_atoms, 3). */
+  PyArrayObject *coords;
+  Py_buffer data;
+  int minint[3], maxint[3], smallidx, natoms, status;
+  float precision;
+  BitReader reader;
+  static char *kwlist[] = {"data", "coords", "minint", "maxint", "smallidx",
+                           "precision", NULL};
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "s*O(iii)(iii)if", kwlist,
+          &data, &coords, &minint[0], &minint[1], &minint[2],
+          &maxint[0], &maxint[1], &maxint[2], &smallidx, &precision))
+    return NULL;
+
+  if (!PyArray_Check(coords) || PyArray_TYPE(coords) != NPY_FLOAT32 ||
+      !PyArray_IS_C_CONTIGUOUS(coords) || PyArray_SIZE(coords) % 3) {
+    PyBuffer_Release(&data);
+    PyErr_SetString(PyExc_TypeError,
+                    "coords must be a contiguous float32 array");
+    return NULL;
+  }
+  natoms = (int) (PyArray_SIZE(coords) / 3);
+
+  reader.data = (const unsigned char *) data.buf;
+  reader.size = data.len;
+  reader.count = 0;
+  reader.lastbits = 0;
+  reader.lastbyte = 0;
+  reader.overflow = 0;
+
+  Py_BEGIN_ALLOW_THREADS
+  status = decompress(&reader, (float *) PyArray_DATA(coords), natoms,
+                      minint, maxint, smallidx, precision);
+  Py_END_ALLOW_THREADS
+
+  PyBuffer_Release(&data);
+  if (status) {
+    PyErr_SetString(PyExc_ValueError, "compressed coordinates are corrupt");
+    return NULL;
+  }
+  Py_RETURN_NONE;
+}
+
+
+static PyMethodDef xtctools_methods[] = {
+
+    {"decompressXTC",  (PyCFunction)decompressXTC,
+     METH_VARARGS | METH_KEYWORDS,
+     "Decompress coordinates of a frame in an XTC file."},
+
+    {NULL, NULL, 0, NULL}
+};
+
+#if PY_MAJOR_VERSION >= 3
+
+static struct PyModuleDef xtctools = {
+        PyModuleDef_HEAD_INIT,
+        "xtctools",
+        "XTC tools.",
+        -1,
+        xtctools_methods,
+};
+PyMODINIT_FUNC PyInit_xtctools(void) {
+    import_array();
+    return PyModule_Create(&xtctools);
+}
+#else
+PyMODINIT_FUNC initxtctools(void) {
+
+    Py_InitModule3("xtctools", xtctools_methods,
+        "XTC tools.");
+
+    import_array();
+}
+#endif
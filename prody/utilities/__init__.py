@@ -58,6 +58,7 @@ Miscellaneous tools
   * :func:`.alnum`
   * :func:`.importLA`
   * :func:`.dictElement`
+  * :func:`.runThreads`
 
 """
 
@@ -73,6 +74,7 @@ from .laptools import *
 from .seqtools import *
 from .TreeConstruction import *
 from .eigtools import *
+from .threadtools import *
 
 from . import catchall
 from .catchall import *
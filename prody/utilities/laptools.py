@@ -36,10 +36,13 @@ def expand_nodes(node):
 
     return nodes
     
-def multilap(cost_matrix, nodes=[], BIG_NUMBER=1e6):
+def multilap(cost_matrix, nodes=[], BIG_NUMBER=1e6, combinations=True):
     """ Finds the (next) optimal solution to the linear assignment problem. 
     The function can handle the cases where each row can be assigned to multiple 
-    columns. 
+    columns. Returns row and column indices of the assignments, and a list of 
+    combinations with one column for each row drawn from them, see 
+    :func:`gen_mappings`. If *combinations* is **False**, they are not listed, 
+    which may be costly for many rows, and **None** is returned in their place.
 
     .. [KM68] Murty KG. Letter to the editor-An algorithm for ranking 
        all the assignments in order of increasing cost.
@@ -128,9 +131,15 @@ def multilap(cost_matrix, nodes=[], BIG_NUMBER=1e6):
 
     R_ = row_labels[R]
 
+    if not combinations:
+        return (R_, C), None
     return (R_, C), gen_mappings((R_, C))
 
 def gen_mappings(assignments):
+    """Returns a list of assignments of one column to each row that can be 
+    drawn from *assignments*, in which a row may be assigned to multiple 
+    columns."""
+
     from itertools import product as iproduct
 
     I, J = assignments
@@ -4,7 +4,7 @@ import re
 from numpy import unique, linalg, diag, sqrt, dot, chararray, divide, zeros_like, zeros, allclose, ceil, abs
 from numpy import diff, where, insert, nan, isnan, loadtxt, array, round, average, min, max, delete, vstack
 from numpy import sign, arange, asarray, ndarray, subtract, power, sum, isscalar, empty, triu, tril, median
-from numpy import all
+from numpy import all, empty_like, result_type
 try:
     from numpy import alltrue
 except ImportError:
@@ -25,7 +25,7 @@ __all__ = ['Everything', 'Cursor', 'ImageCursor', 'rangeString', 'alnum', 'impor
            'getDataPath', 'openData', 'chr2', 'toChararray', 'interpY', 'cmp', 'pystr',
            'getValue', 'indentElement', 'isPDB', 'isURL', 'isListLike', 'isSymmetric', 'makeSymmetric',
            'getDistance', 'fastin', 'createStringIO', 'div0', 'wmean', 'bin2dec', 'wrapModes', 
-           'fixArraySize', 'decToHybrid36', 'hybrid36ToDec', 'DTYPE', 'checkIdentifiers', 'split', 'mad',
+           'fixArraySize', 'appendRows', 'reserveRows', 'decToHybrid36', 'hybrid36ToDec', 'DTYPE', 'checkIdentifiers', 'split', 'mad',
            'importDec', 'impLoadModule']
 
 DTYPE = array(['a']).dtype.char  # 'S' for PY2K and 'U' for PY3K
@@ -613,6 +613,81 @@ def fixArraySize(arr, sizes, value=0):
 
     return arr2
 
+def _isBufferHead(array, buffer):
+    """Returns **True** if *array* is a view of the first rows of *buffer*."""
+
+    return (buffer is not None and len(array) <= len(buffer) and
+            array.shape[1:] == buffer.shape[1:] and
+            array.strides == buffer.strides and
+            array.__array_interface__['data'][0] ==
+            buffer.__array_interface__['data'][0])
+
+def appendRows(array, rows, buffer=None, size=0):
+    """Returns *array* with *rows* appended along the first axis and the
+    buffer that holds the result in its first rows.  If *buffer* was returned
+    by an earlier call for *array* and has room left, *rows* are copied into
+    it.  Otherwise, a new buffer is allocated with room for at least twice
+    as many rows as *array* has or *size* rows, so that appending rows one
+    at a time takes linear time.  Other views of *array* are not changed.
+
+    :arg array: an array or **None**
+    :type array: :class:`~numpy.ndarray`
+
+    :arg rows: rows to append
+    :type rows: :class:`~numpy.ndarray`
+
+    :arg buffer: buffer returned by an earlier call
+    :type buffer: :class:`~numpy.ndarray`
+
+    :arg size: least number of rows to allocate room for
+    :type size: int"""
+
+    rows = asarray(rows)
+    if array is None:
+        n_rows = 0
+        dtype = rows.dtype
+        like = rows
+    else:
+        if rows.shape[1:] != array.shape[1:]:
+            raise ValueError('shape of rows {0} does not match that of array {1}'
+                             .format(rows.shape, array.shape))
+        n_rows = len(array)
+        dtype = result_type(array, rows)
+        like = array
+
+    n_total = n_rows + len(rows)
+    if (array is not None and dtype == array.dtype and
+        _isBufferHead(array, buffer) and len(buffer) >= n_total):
+        buffer[n_rows:n_total] = rows
+        return buffer[:n_total], buffer
+
+    capacity = n_total
+    if capacity < 2 * n_rows:
+        capacity = 2 * n_rows
+    if capacity < size:
+        capacity = size
+    buffer = empty_like(like, dtype=dtype, shape=(capacity,) + like.shape[1:])
+    if n_rows:
+        buffer[:n_rows] = array
+    buffer[n_rows:n_total] = rows
+    return buffer[:n_total], buffer
+
+def reserveRows(array, size, buffer=None):
+    """Returns *array* and a buffer that holds it in its first rows and has
+    room for *size* rows.  *buffer* is reused if it was returned by an
+    earlier call for *array* and is large enough.  See :func:`appendRows`."""
+
+    if array is None:
+        return None, buffer
+    if _isBufferHead(array, buffer) and len(buffer) >= size:
+        return array, buffer
+
+    n_rows = len(array)
+    capacity = size if size > n_rows else n_rows
+    buffer = empty_like(array, shape=(capacity,) + array.shape[1:])
+    buffer[:n_rows] = array
+    return buffer[:n_rows], buffer
+
 def isSymmetric(M, rtol=1e-05, atol=1e-08):
     """Checks if the matrix is symmetric."""
     if M.shape != M.T.shape:
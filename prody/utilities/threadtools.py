@@ -0,0 +1,40 @@
+"""This module defines functions for running calculations in threads."""
+
+__all__ = ['runThreads']
+
+
+def runThreads(func, n_items, n_cpu=None, size=64):
+    """Calls *func* with (start, stop, thread) for blocks of *size* items,
+    which are distributed among *n_cpu* threads in an interleaved fashion
+    to balance triangular workloads.  *func* must release the GIL to run in
+    parallel.  Exceptions raised in threads are raised again after all
+    threads finish.  Returns the number of threads."""
+
+    if n_cpu is None:
+        from multiprocessing import cpu_count
+        n_cpu = cpu_count()
+    blocks = [(i, min(i + size, n_items)) for i in range(0, n_items, size)]
+    n_cpu = max(1, min(int(n_cpu), len(blocks)))
+    if n_cpu == 1:
+        for start, stop in blocks:
+            func(start, stop, 0)
+        return 1
+
+    from threading import Thread
+
+    errors = []
+    def run(thread):
+        try:
+            for start, stop in blocks[thread::n_cpu]:
+                func(start, stop, thread)
+        except Exception as err:
+            errors.append(err)
+
+    threads = [Thread(target=run, args=(i,)) for i in range(n_cpu)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return n_cpu
@@ -126,6 +126,9 @@ EXTENSIONS = [
     Extension('prody.sequence.seqtools',
               [join('prody', 'sequence', 'seqtools.c'),],
               include_dirs=[numpy.get_include()]),
+    Extension('prody.trajectory.xtctools',
+              [join('prody', 'trajectory', 'xtctools.c'),],
+              include_dirs=[numpy.get_include()]),
 ]
 
 # extra arguments for compiling C++ extensions on MacOSX